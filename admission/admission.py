@@ -0,0 +1,169 @@
+"""
+Controle de admissão e descarte de carga (load shedding) para as chamadas ao modelo de IA
+"""
+# coding: utf-8
+
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+
+
+class AdmissaoRejeitadaError(Exception):
+    """
+    Exceção para quando a requisição não é admitida (fila cheia, limite do requisitor ou tempo máximo de espera excedido)
+    """
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        """
+        :param status_code: Status HTTP a ser retornado (429 ou 503)
+        :param detail: Mensagem de erro
+        :param retry_after: Tempo sugerido em segundos para uma nova tentativa (cabeçalho Retry-After)
+        """
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Classe responsável por limitar a quantidade de inferências simultâneas no worker.
+    As requisições excedentes aguardam em uma fila limitada, com tempo máximo de espera, e são atendidas de forma justa
+    entre os requisitores (round-robin entre as filas de cada requisitor). Quando a fila está cheia a requisição é descartada
+    imediatamente (503) e quando o requisitor excede a sua parcela da fila a requisição é limitada (429).
+    """
+    def __init__(self, config, logs):
+        """
+        Inicializa o controle de admissão
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        """
+        self.logs = logs
+        self.max_concorrencia = config.get("ADMISSAO_MAX_CONCORRENCIA")
+        self.max_fila = config.get("ADMISSAO_MAX_FILA")
+        self.max_fila_requisitor = config.get("ADMISSAO_MAX_FILA_REQUISITOR")
+        self.timeout_fila = config.get("ADMISSAO_TIMEOUT_FILA")
+        self.em_execucao = 0
+        self.tamanho_fila = 0
+        self.filas = {}
+        self.ordem = deque()
+        self.tempo_medio = 1.0
+        self.estatisticas = {"admitidas": 0, "enfileiradas": 0, "rejeitadas_fila_cheia": 0, "rejeitadas_requisitor": 0, "rejeitadas_timeout": 0}
+
+    def retry_after(self) -> int:
+        """
+        Estima o tempo até haver capacidade disponível, a partir do tempo médio de execução e do tamanho da fila
+        :return: Tempo em segundos
+        """
+        return max(1, math.ceil(self.tempo_medio * (self.tamanho_fila + 1) / self.max_concorrencia))
+
+    def rejeita(self, motivo: str, status_code: int, detail: str):
+        """
+        Registra e lança a rejeição da requisição
+        :param motivo: Contador a ser incrementado
+        :param status_code: Status HTTP
+        :param detail: Mensagem de erro
+        :raises AdmissaoRejeitadaError: Sempre
+        """
+        self.estatisticas[motivo] += 1
+        raise AdmissaoRejeitadaError(status_code, detail, self.retry_after())
+
+    async def adquirir(self, requisitor: str):
+        """
+        Aguarda a liberação de uma vaga de execução para o requisitor
+        :param requisitor: Identificador do requisitor
+        :raises AdmissaoRejeitadaError: Se a requisição for descartada
+        """
+        if self.em_execucao < self.max_concorrencia and self.tamanho_fila == 0:
+            self.em_execucao += 1
+            self.estatisticas["admitidas"] += 1
+            return
+
+        if self.tamanho_fila >= self.max_fila:
+            self.rejeita("rejeitadas_fila_cheia", 503, "Servidor sobrecarregado, tente novamente mais tarde.")
+
+        fila = self.filas.setdefault(requisitor, deque())
+        if len(fila) >= self.max_fila_requisitor:
+            self.rejeita("rejeitadas_requisitor", 429, "Muitas requisições simultâneas para o requisitor, tente novamente mais tarde.")
+
+        # Entrando na fila do requisitor (o requisitor entra no round-robin quando a sua fila deixa de estar vazia)
+        futuro = asyncio.get_running_loop().create_future()
+        fila.append(futuro)
+        if len(fila) == 1:
+            self.ordem.append(requisitor)
+        self.tamanho_fila += 1
+        self.estatisticas["enfileiradas"] += 1
+
+        try:
+            await asyncio.wait({futuro}, timeout=self.timeout_fila)
+        except asyncio.CancelledError:
+            # Se a vaga já tinha sido repassada, ela é devolvida para o próximo da fila
+            if futuro.done():
+                self.liberar()
+            else:
+                self.remove_da_fila(requisitor, futuro)
+            raise
+
+        if not futuro.done():
+            self.remove_da_fila(requisitor, futuro)
+            self.rejeita("rejeitadas_timeout", 503, "Tempo máximo de espera na fila excedido, tente novamente mais tarde.")
+
+        self.estatisticas["admitidas"] += 1
+
+    def remove_da_fila(self, requisitor: str, futuro: asyncio.Future):
+        """
+        Remove uma espera da fila do requisitor
+        :param requisitor: Identificador do requisitor
+        :param futuro: Espera a ser removida
+        """
+        fila = self.filas.get(requisitor)
+        if fila is None or futuro not in fila:
+            return
+        fila.remove(futuro)
+        self.tamanho_fila -= 1
+        if not fila:
+            del self.filas[requisitor]
+            self.ordem.remove(requisitor)
+
+    def liberar(self, duracao: float = None):
+        """
+        Libera a vaga de execução, repassando-a diretamente para o próximo requisitor da vez (round-robin)
+        :param duracao: Tempo em segundos que a vaga ficou em uso, para o tempo médio de execução (None não atualiza a média)
+        """
+        if duracao is not None:
+            self.tempo_medio = 0.9 * self.tempo_medio + 0.1 * duracao
+        while self.ordem:
+            requisitor = self.ordem.popleft()
+            fila = self.filas[requisitor]
+            futuro = fila.popleft()
+            self.tamanho_fila -= 1
+            if fila:
+                self.ordem.append(requisitor)
+            else:
+                del self.filas[requisitor]
+            if not futuro.done():
+                futuro.set_result(True)
+                return
+        self.em_execucao -= 1
+
+    @asynccontextmanager
+    async def admitir(self, requisitor: str):
+        """
+        Context manager que adquire a vaga de execução e a libera ao final, atualizando o tempo médio de execução
+        :param requisitor: Identificador do requisitor
+        """
+        await self.adquirir(requisitor)
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.liberar(time.monotonic() - inicio)
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do controle de admissão
+        :return: Dicionário com a ocupação, o tamanho da fila e os contadores de admissão e descarte
+        """
+        return {**self.estatisticas, "em_execucao": self.em_execucao, "max_concorrencia": self.max_concorrencia, "tamanho_fila": self.tamanho_fila,
+                "requisitores_na_fila": len(self.filas), "tempo_medio_execucao": round(self.tempo_medio, 3)}
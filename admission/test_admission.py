@@ -0,0 +1,106 @@
+"""
+Testes do controle de admissão (fila justa entre os requisitores e descarte de carga)
+"""
+# coding: utf-8
+
+from admission.admission import AdmissaoRejeitadaError, AdmissionController
+from loguru import logger
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"ADMISSAO_MAX_CONCORRENCIA": 1, "ADMISSAO_MAX_FILA": 10, "ADMISSAO_MAX_FILA_REQUISITOR": 3, "ADMISSAO_TIMEOUT_FILA": 5}
+
+
+async def enfileira(controle: AdmissionController, requisitor: str, ordem: list) -> asyncio.Task:
+    async def executar():
+        await controle.adquirir(requisitor)
+        ordem.append(requisitor)
+
+    tarefa = asyncio.create_task(executar())
+    await asyncio.sleep(0)
+    return tarefa
+
+
+async def test_vagas_sao_repassadas_em_round_robin_entre_os_requisitores():
+    controle = AdmissionController(CONFIG, logger)
+    await controle.adquirir("ocupante")
+    ordem = []
+    tarefas = [await enfileira(controle, requisitor, ordem) for requisitor in ("a", "a", "a", "b", "c")]
+    assert controle.metricas()["tamanho_fila"] == 5 and controle.metricas()["requisitores_na_fila"] == 3
+
+    for _ in tarefas:
+        controle.liberar()
+        await asyncio.sleep(0)
+    await asyncio.gather(*tarefas)
+    assert ordem == ["a", "b", "c", "a", "a"]
+    assert controle.em_execucao == 1 and controle.tamanho_fila == 0 and not controle.ordem
+
+    controle.liberar()
+    assert controle.em_execucao == 0
+
+
+async def test_fila_cheia_e_limite_do_requisitor():
+    controle = AdmissionController({**CONFIG, "ADMISSAO_MAX_FILA": 3, "ADMISSAO_MAX_FILA_REQUISITOR": 2}, logger)
+    await controle.adquirir("ocupante")
+    tarefas = [await enfileira(controle, "a", []), await enfileira(controle, "a", [])]
+    with pytest.raises(AdmissaoRejeitadaError) as erro:
+        await controle.adquirir("a")
+    assert erro.value.status_code == 429
+
+    tarefas.append(await enfileira(controle, "b", []))
+    with pytest.raises(AdmissaoRejeitadaError) as erro:
+        await controle.adquirir("c")
+    assert erro.value.status_code == 503 and erro.value.retry_after >= 1
+    assert controle.estatisticas["rejeitadas_requisitor"] == 1 and controle.estatisticas["rejeitadas_fila_cheia"] == 1
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    assert controle.tamanho_fila == 0 and not controle.filas
+
+
+async def test_tempo_maximo_de_espera_remove_da_fila():
+    controle = AdmissionController({**CONFIG, "ADMISSAO_TIMEOUT_FILA": 0.01}, logger)
+    await controle.adquirir("ocupante")
+    with pytest.raises(AdmissaoRejeitadaError) as erro:
+        await controle.adquirir("a")
+    assert erro.value.status_code == 503
+    assert controle.tamanho_fila == 0 and not controle.ordem
+    assert controle.estatisticas["rejeitadas_timeout"] == 1
+
+
+async def test_cancelamento_apos_receber_a_vaga_repassa_para_o_proximo():
+    controle = AdmissionController(CONFIG, logger)
+    await controle.adquirir("ocupante")
+    ordem = []
+    cancelada = await enfileira(controle, "a", ordem)
+    seguinte = await enfileira(controle, "b", ordem)
+
+    controle.liberar()
+    cancelada.cancel()
+    await asyncio.gather(cancelada, seguinte, return_exceptions=True)
+    assert ordem == ["b"]
+    assert controle.em_execucao == 1 and controle.tamanho_fila == 0
+
+
+async def test_admitir_libera_a_vaga_mesmo_com_erro():
+    controle = AdmissionController(CONFIG, logger)
+    with pytest.raises(ValueError):
+        async with controle.admitir("a"):
+            assert controle.em_execucao == 1
+            raise ValueError("falha na inferência")
+    assert controle.em_execucao == 0
+
+
+async def test_vaga_liberada_diretamente_atualiza_o_tempo_medio():
+    # Caminho do streaming: a vaga é adquirida antes da resposta e liberada ao final do stream, com a duração
+    controle = AdmissionController(CONFIG, logger)
+    await controle.adquirir("a")
+    controle.liberar(11.0)
+    assert controle.tempo_medio == pytest.approx(2.0)
+    assert controle.retry_after() == 2
+
+    await controle.adquirir("a")
+    controle.liberar()
+    assert controle.tempo_medio == pytest.approx(2.0) and controle.em_execucao == 0
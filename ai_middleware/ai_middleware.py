@@ -3,33 +3,127 @@ Classe com o middleware para a IA - Isolando a lógica de inferência da IA das
 """
 # coding: utf-8
 
-from chat_gpt.chat_gpt import ChatGpt
-from models.context_model import ContextModel
+from backends.router import BackendRouter
+from models.context_model import AsyncContextModel
+from ai_middleware.json_stream import JsonStreamParser
+from cache.response_cache import ResponseCache
+from single_flight.single_flight import SingleFlight, RedisSingleFlight
+from ai_middleware.hedging import Hedger
+import hashlib
+import asyncio
 import json
 
+# Nome do backends.fake_backend.FakeBackend (as respostas do backend fake nunca são guardadas nos caches)
+BACKEND_FAKE = "fake"
+
 
 class AIMiddleware:
     """
     Classe responsável por isolar a lógica de inferência da IA das API's utilizadas
     """
-    def __init__(self, config, logs):
+    def __init__(self, config, logs, backend: BackendRouter = None, context_model: AsyncContextModel = None, response_cache: ResponseCache = None, redis_single_flight: RedisSingleFlight = None, semantic_cache=None):
+        """
+        Inicializa o middleware
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param backend: Roteador dos backends de IA compartilhado (se não informado, é criado um próprio, apenas com a ChatGpt)
+        :param context_model: Modelo de contexto compartilhado, ou o cache.context_cache.ContextCache (se não informado, é criado um próprio)
+        :param response_cache: Cache das respostas do chatbot (opcional)
+        :param redis_single_flight: Coalescência das chamadas idênticas entre os workers (opcional)
+        :param semantic_cache: Cache semântico local das respostas (opcional, cache.semantic_cache.SemanticCache)
+        """
         self.config = config
         self.logs = logs
-        self.chat_gpt = ChatGpt(config, logs)
+        self.response_cache = response_cache
+        self.single_flight = SingleFlight()
+        self.redis_single_flight = redis_single_flight
+        self.semantic_cache = semantic_cache
+        self.recursos_proprios = backend is None, context_model is None
+        if backend is None:
+            # Importado apenas aqui: o módulo da OpenAI só é carregado quando o middleware cria o próprio backend
+            from chat_gpt.chat_gpt import ChatGpt
+            backend = BackendRouter(config, logs, backends=[ChatGpt(config, logs)])
+        self.backend = backend
+        self.context_model = context_model if context_model is not None else AsyncContextModel(logs=logs)
+        self.hedger = Hedger(config, logs) if config.get("HEDGE_ATIVO") else None
 
-    def inferir_chat_gpt(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None) -> (str, int):
+    async def close(self):
         """
-        Envia uma mensagem para o chat da GPT
+        Fecha os recursos criados pelo próprio middleware
+        """
+        backend_proprio, context_model_proprio = self.recursos_proprios
+        if backend_proprio:
+            await self.backend.close()
+        if context_model_proprio:
+            await self.context_model.close_connection()
+
+    async def inferir_backend(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None) -> (str, int, list):
+        """
+        Envia uma mensagem para o chat do backend escolhido pelo roteador
         :param mensagem: Mensagem a ser enviada
         :param json_format: Formato da resposta
         :param prefix: Prefixo da mensagem
         :param context: Contexto da mensagem
         :param temperature: Temperatura da resposta
-        :return: Resposta do chat
+        :return: Resposta do chat, total de tokens e a origem da resposta ([backend, modelo])
         """
-        return self.chat_gpt.envia_mensagem_chat(mensagem, json_format, prefix, context, temperature)
+        async def chamar(**opcoes):
+            detalhes = {}
+            resposta, total_tokens = await self.backend.envia_mensagem_chat(mensagem, json_format, prefix, context, temperature, detalhes=detalhes, **opcoes)
+            return resposta, total_tokens, [detalhes.get("backend"), detalhes.get("modelo")]
+
+        if self.hedger is None:
+            return await chamar()
+
+        # A chamada de reserva vai para outro backend, se houver; senão para a chave menos carregada (a da chamada principal está ocupada)
+        # ou para o modelo secundário
+        return await self.hedger.executar(lambda: chamar(), lambda: chamar(modelo=self.config.get("HEDGE_MODELO") or None, alternativo=True))
 
-    def inferir(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None) -> (str, int):
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do middleware
+        :return: Dicionário com as métricas de coalescência das chamadas ao modelo
+        """
+        return {
+            "single_flight": self.single_flight.metricas(),
+            "redis_single_flight": self.redis_single_flight.metricas() if self.redis_single_flight is not None else None,
+            "semantic_cache": self.semantic_cache.metricas() if self.semantic_cache is not None else None,
+            "hedging": self.hedger.metricas() if self.hedger is not None else None,
+            "backends": self.backend.metricas()
+        }
+
+    def chave_inferencia(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None) -> str:
+        """
+        Gera a chave que identifica chamadas idênticas ao modelo (mensagens, modelo, formato da resposta e temperatura)
+        :return: Hash da chamada
+        """
+        chamada = [self.backend.monta_mensagens(mensagem, prefix, context), self.backend.monta_parametros(json_format, temperature)]
+        return hashlib.sha256(json.dumps(chamada, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+    async def inferir_coalescido(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None) -> (str, int, list):
+        """
+        Envia a mensagem para o chat compartilhando a mesma chamada entre as requisições idênticas em andamento
+        (no worker e, se configurado, entre os workers). Apenas quem de fato executou a chamada recebe o total de tokens.
+        :return: Resposta do chat, o total de tokens utilizados e a origem da resposta ([backend, modelo])
+        """
+        executou = []
+
+        async def chamar():
+            executou.append(True)
+            return await self.inferir_backend(mensagem, json_format, prefix, context, temperature)
+
+        async def chamar_entre_workers():
+            if self.redis_single_flight is None:
+                return await chamar()
+            return await self.redis_single_flight.executar(chave, chamar)
+
+        chave = self.chave_inferencia(mensagem, json_format, prefix, context, temperature)
+        # Resultados publicados entre os workers sem a origem (versão anterior) ficam sem origem
+        resultado, total_tokens, *origem = await self.single_flight.executar(chave, chamar_entre_workers)
+
+        return resultado, total_tokens if executou else 0, origem[0] if origem else [None, None]
+
+    async def inferir(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None, detalhes: dict = None) -> (str, int):
         """
         Envia uma mensagem para o chat da Mistral ou GPT
         :param mensagem: Mensagem a ser enviada
@@ -37,12 +131,15 @@ class AIMiddleware:
         :param prefix: Prefixo da mensagem
         :param context: Contexto da mensagem
         :param temperature: Temperatura da resposta
+        :param detalhes: Dicionário preenchido com o backend ("backend") e o modelo ("modelo") que responderam (opcional)
         :return: Resposta do chat
         """
         total_tokens = 0
         resultado = None
         try:
-            resultado, total_tokens = self.inferir_chat_gpt(mensagem, json_format, prefix, context, temperature)
+            resultado, total_tokens, (backend, modelo) = await self.inferir_coalescido(mensagem, json_format, prefix, context, temperature)
+            if detalhes is not None:
+                detalhes.update({"backend": backend, "modelo": modelo})
 
             if resultado is not None and resultado != "":
                 resultado = resultado.strip()
@@ -51,16 +148,17 @@ class AIMiddleware:
         finally:
             return resultado, total_tokens
 
-    def inferir_chatbot(self, mensagem_chatbot: str, prompt_assistente: str) -> (str, str, int):
+    async def inferir_chatbot(self, mensagem_chatbot: str, prompt_assistente: str, detalhes: dict = None) -> (str, str, int):
         """
         Envia o comando do usuário, mas o contexto do agente para fazer a inferência da resposta do chatbot
         :param mensagem_chatbot: Mensagem completa para o chatbot com todos os dados do campo conhecidos e fornecidos pelo usuário.
         :param prompt_assistente: Prompt do assistente (Prompt para tornar o assistente em um chatbot especializado para cada item).
+        :param detalhes: Dicionário preenchido com o backend ("backend") e o modelo ("modelo") que responderam (opcional)
         :return: Resposta do chat contendo o sumário da alteração executada na resposta e a resposta com o texto do campo ajustado.
         Retorna também o total de tokens utilizados na inferência.
         """
         try:
-            resposta, total_tokens = self.inferir(mensagem=mensagem_chatbot, json_format=True, context=prompt_assistente, temperature=self.config.get("TEMPERATURE_CHATBOT"))
+            resposta, total_tokens = await self.inferir(mensagem=mensagem_chatbot, json_format=True, context=prompt_assistente, temperature=self.config.get("TEMPERATURE_CHATBOT"), detalhes=detalhes)
 
             # Tratando o retorno
             try:
@@ -78,71 +176,195 @@ class AIMiddleware:
             self.logs.error(f"Erro chatbot: {ex}")
             raise ex
 
-    def inferir_chatbot_from_context(self, chatbot: dict) -> (str, str, int):
+    @staticmethod
+    def monta_prompts_chatbot(chatbot: dict, context: dict) -> (str, str):
+        """
+        Monta os prompts do chatbot a partir do contexto do campo e das informações enviadas pelo usuário.
+        :param chatbot: Dados do chatbot (campo, comando, texto e histórico)
+        :param context: Contexto do campo recuperado do MongoDB
+        :return: Prompt do chatbot (mensagem do usuário) e prompt do assistente (mensagem de sistema)
+        """
+        nome_campo = chatbot.get("campo")
+        historico = chatbot.get("historico", "")
+        texto = chatbot.get("texto", "")
+
+        # Separando os valores para o chatbot
+        contexto = context.get("context")
+        limite_base = context.get("soft_limit", 0)
+        limite_maximo = context.get("hard_limit", 0)
+
+        # Preparando o chatbot
+        prompt_chatbot = f"""Tendo como nome do campo: '{nome_campo.strip()}'\n 
+        Tendo como contexto do campo: '{contexto.strip()}'\n
+        Tendo como limite de caracteres do campo: {int(limite_base)}\n
+        Tendo como valor atual do campo: '{texto.strip()}'\n
+        Tendo como última resposta sua como agente (histórico): '{historico.strip()}'\n
+        Tendo como comando do usuário: '{chatbot.get("comando").strip()}'\n
+        Seguindo a sua orientação como chatbot do sistema Banco de Preços. Especializado em automatizar o preenchimento de alguns campos em diversos formulários da plataforma.
+        Retorne o sumário da alteração e o texto criado/ajustado para os dados do campo e comando informados.
+        Observações: 
+        - Se o limite for igual a zero (0). Significa que o campo não possui limite de caracteres, ou seja, pode ser preenchido com qualquer quantidade de caracteres.
+        - Se o texto for vazio, significa que o campo não possui valor atual preenchido, ou seja, está em branco. Você deverá atuar em cima da última resposta sua como agente e o comando enviado pelo usuário.
+        - Se ambos os valores do texto e do histórico forem vazios, você deverá atuar apenas em cima do comando enviado pelo usuário.
+        - Se o comando do usuário não tiver nenhuma relação com o texto e/ou com o histórico, ou não for claro, você deve retornar uma mensagem informando que não foi possível entender o comando, no sumário e retornar o valor do texto None (None do Python).
+        - O comando não precisa ter relação direta com o contexto do campo, o contexto deve ser utilizado apenas como balizador de como responder para cada campo informado.
+        - Caso o usuário solicite para expandir, detalhar, aumentar o tamanho do texto ou declaradamente informe um limite de caracteres maior do que o limite de caracteres do campo (informado anteriormente), você deve respeitar o comando do usuário, limitando-se agora a um limite máximo de caracteres no valor de {int(limite_maximo)} caracteres.
+        """
+
+        prompt_assistente = """Você é um chatbot do sistema Banco de Preços. Especializado em automatizar o preenchimento de alguns campos em diversos formulários da plataforma.
+        Você vai receber como entrada o nome do campo no formulário (o valor da tag name do form html), o contexto do campo (uma descrição do que é o campo, sua importância e significado e/ou como ele deve ser preenchido), o limite de caracteres do campo (quantidade máxima de caracteres que o campo aceita), e se houver, o valor atual do campo (o valor que está atualmente preenchido no campo), e sua última resposta como agente (histórico). Que são os valores que deverá utilizar para alterar a depender do comando do usuário.
+        Além dessas entradas referentes ao campo, você também vai receber o comando do usuário (uma instrução de como o usuário deseja que o campo seja preenchido ou ajustado).
+        Com base nessas entradas você vai ajustar o valor do campo seguindo o comando do usuário ou ajustar a sua última resposta (histórico) também seguindo o comando do usuário.
+        Os ajustes serão feitos seguindo o comando enviado pelo usuário e as informações do campo, principalmente o contexto, que vai definir de que se trata e como deve ser preenchido o campo.
+        Se o comando do usuário não tiver nenhuma relação com o texto e/ou com a o histórico, ou não for claro você deve retornar uma mensagem informando que não foi possível entender o comando, no sumário e retornar o valor do texto None (None do Python).
+        Você sempre irá responder com um Json contendo o sumário da alteração executada e o texto criado/ajustado ou o histórico ajustado, a depender do comando do usuário e da existência do texto e do histórico.
+        O sumário da alteração será uma descrição curta e objetiva do que foi executado.
+        O texto criado/ajustado será o valor do campo ajustado, seguindo o comando do usuário e as informações do campo.
+        No Json de retorno o sumário da alteração estará na chave ("sumario") e o texto criado/ajustado estará na chave ("texto")."""
+
+        return prompt_chatbot.strip(), prompt_assistente.strip()
+
+    async def inferir_chatbot_from_context(self, chatbot: dict, context: dict = None, detalhes: dict = None) -> (str, str, int):
         """
         Inferência a partir do contexto do campo informado e das informações enviadas pelo usuário.
         :param chatbot: Dados do chatbot quando for necessário utilizar o chatbot para inferir a descrição
+        :param context: Contexto do campo já recuperado (se não informado, é buscado no MongoDB)
+        :param detalhes: Dicionário preenchido com a origem da resposta ("cache": True se veio do cache de respostas ou do cache semântico)
         :return: Sumário da alteração, valor do campo ajustado e total de tokens utilizados na inferência.
         """
         try:
             # buscando o contexto do chatbot
             nome_campo = chatbot.get("campo")
-            historico = chatbot.get("historico", "")
-            texto = chatbot.get("texto", "")
-            context_model = ContextModel(logs=self.logs)
-            context = context_model.get_context(field=nome_campo)
-            context_model.close_connection()
+            if context is None:
+                context = await self.context_model.get_context(field=nome_campo)
 
             if not context:
                 raise Exception(f'Contexto não encontrado para o campo: {nome_campo}')
 
-            # Separando os valores para o chatbot
-            contexto = context.get("context")
-            limite_base = context.get("soft_limit", 0)
-            limite_maximo = context.get("hard_limit", 0)
+            # Consultando o cache de respostas (turnos idênticos não consomem tokens). As respostas são guardadas com o backend e o modelo
+            # que as geraram e consultadas com os do backend que o roteador escolheria agora; as do backend fake nunca são guardadas
+            preferencial = self.backend.preferencial()
+            if self.response_cache is not None and preferencial[0] != BACKEND_FAKE:
+                chave_cache = self.response_cache.chave(chatbot, context, "/".join(preferencial), self.config.get("TEMPERATURE_CHATBOT"))
+                em_cache = await self.response_cache.get(chave_cache, ignorar=chatbot.get("ignorar_cache", False))
+                if em_cache is not None:
+                    if detalhes is not None:
+                        detalhes["cache"] = True
+                    sumario, resposta = em_cache
+                    return sumario, resposta, 0
 
-            # Preparando o chatbot
-            prompt_chatbot = f"""Tendo como nome do campo: '{nome_campo.strip()}'\n 
-            Tendo como contexto do campo: '{contexto.strip()}'\n
-            Tendo como limite de caracteres do campo: {int(limite_base)}\n
-            Tendo como valor atual do campo: '{texto.strip()}'\n
-            Tendo como última resposta sua como agente (histórico): '{historico.strip()}'\n
-            Tendo como comando do usuário: '{chatbot.get("comando").strip()}'\n
-            Seguindo a sua orientação como chatbot do sistema Banco de Preços. Especializado em automatizar o preenchimento de alguns campos em diversos formulários da plataforma.
-            Retorne o sumário da alteração e o texto criado/ajustado para os dados do campo e comando informados.
-            Observações: 
-            - Se o limite for igual a zero (0). Significa que o campo não possui limite de caracteres, ou seja, pode ser preenchido com qualquer quantidade de caracteres.
-            - Se o texto for vazio, significa que o campo não possui valor atual preenchido, ou seja, está em branco. Você deverá atuar em cima da última resposta sua como agente e o comando enviado pelo usuário.
-            - Se ambos os valores do texto e do histórico forem vazios, você deverá atuar apenas em cima do comando enviado pelo usuário.
-            - Se o comando do usuário não tiver nenhuma relação com o texto e/ou com o histórico, ou não for claro, você deve retornar uma mensagem informando que não foi possível entender o comando, no sumário e retornar o valor do texto None (None do Python).
-            - O comando não precisa ter relação direta com o contexto do campo, o contexto deve ser utilizado apenas como balizador de como responder para cada campo informado.
-            - Caso o usuário solicite para expandir, detalhar, aumentar o tamanho do texto ou declaradamente informe um limite de caracteres maior do que o limite de caracteres do campo (informado anteriormente), você deve respeitar o comando do usuário, limitando-se agora a um limite máximo de caracteres no valor de {int(limite_maximo)} caracteres.
-            """
+            # Consultando o cache semântico (comandos similares sobre o mesmo campo, texto e histórico, respondidos pelo mesmo backend e modelo)
+            if self.semantic_cache is not None and preferencial[0] != BACKEND_FAKE and not chatbot.get("ignorar_cache", False):
+                em_cache = self.semantic_cache.buscar(chatbot, context, "/".join(preferencial))
+                if em_cache is not None:
+                    if detalhes is not None:
+                        detalhes["cache"] = True
+                    sumario, resposta = em_cache
+                    return sumario, resposta, 0
 
-            prompt_assistente = """Você é um chatbot do sistema Banco de Preços. Especializado em automatizar o preenchimento de alguns campos em diversos formulários da plataforma.
-            Você vai receber como entrada o nome do campo no formulário (o valor da tag name do form html), o contexto do campo (uma descrição do que é o campo, sua importância e significado e/ou como ele deve ser preenchido), o limite de caracteres do campo (quantidade máxima de caracteres que o campo aceita), e se houver, o valor atual do campo (o valor que está atualmente preenchido no campo), e sua última resposta como agente (histórico). Que são os valores que deverá utilizar para alterar a depender do comando do usuário.
-            Além dessas entradas referentes ao campo, você também vai receber o comando do usuário (uma instrução de como o usuário deseja que o campo seja preenchido ou ajustado).
-            Com base nessas entradas você vai ajustar o valor do campo seguindo o comando do usuário ou ajustar a sua última resposta (histórico) também seguindo o comando do usuário.
-            Os ajustes serão feitos seguindo o comando enviado pelo usuário e as informações do campo, principalmente o contexto, que vai definir de que se trata e como deve ser preenchido o campo.
-            Se o comando do usuário não tiver nenhuma relação com o texto e/ou com a o histórico, ou não for claro você deve retornar uma mensagem informando que não foi possível entender o comando, no sumário e retornar o valor do texto None (None do Python).
-            Você sempre irá responder com um Json contendo o sumário da alteração executada e o texto criado/ajustado ou o histórico ajustado, a depender do comando do usuário e da existência do texto e do histórico.
-            O sumário da alteração será uma descrição curta e objetiva do que foi executado.
-            O texto criado/ajustado será o valor do campo ajustado, seguindo o comando do usuário e as informações do campo.
-            No Json de retorno o sumário da alteração estará na chave ("sumario") e o texto criado/ajustado estará na chave ("texto")."""
+            # Preparando o chatbot
+            prompt_chatbot, prompt_assistente = self.monta_prompts_chatbot(chatbot, context)
 
             # Chamando o chatbot com todos os parâmetros
-            sumario, resposta, total_tokens = self.inferir_chatbot(mensagem_chatbot=prompt_chatbot.strip(), prompt_assistente=prompt_assistente.strip())
+            origem = {}
+            sumario, resposta, total_tokens = await self.inferir_chatbot(mensagem_chatbot=prompt_chatbot, prompt_assistente=prompt_assistente, detalhes=origem)
 
             if sumario is None or sumario == "":
                 raise Exception(f'Não foi possível inferir a solicitação do chat: {chatbot.get("message", None)}')
 
+            if origem.get("backend") not in (None, BACKEND_FAKE):
+                modelo = f'{origem.get("backend")}/{origem.get("modelo")}'
+                if self.response_cache is not None:
+                    chave_cache = self.response_cache.chave(chatbot, context, modelo, self.config.get("TEMPERATURE_CHATBOT"))
+                    await self.response_cache.set(chave_cache, sumario, resposta)
+                if self.semantic_cache is not None:
+                    self.semantic_cache.adicionar(chatbot, context, modelo, sumario, resposta)
+
             return sumario, resposta, total_tokens
         except Exception as ex:
             self.logs.error(f'Erro ao inferir a descrição da necessidade: {ex}')
             raise ex
 
 
-    def inferir_reescrita_completa(self, texto: str) -> str:
+    async def inferir_chatbot_lote(self, itens: list, admissao=None) -> list:
+        """
+        Inferência de vários campos de um formulário: os contextos são buscados em uma única consulta e as inferências
+        são executadas concorrentemente, limitadas a BATCH_MAX_CONCORRENCIA chamadas simultâneas.
+        :param itens: Lista com os dados do chatbot de cada campo
+        :param admissao: Função que retorna o context manager de admissão de cada inferência (opcional)
+        :return: Lista (na mesma ordem dos itens) de dicionários com campo, sumario, texto, tokens, cache e erro
+        """
+        contextos = await self.context_model.get_contexts([item.get("campo") for item in itens])
+        semaforo = asyncio.Semaphore(self.config.get("BATCH_MAX_CONCORRENCIA"))
+
+        async def inferir_item(item: dict) -> dict:
+            nome_campo = item.get("campo")
+            detalhes = {"cache": False}
+            try:
+                context = contextos.get(nome_campo)
+                if not context:
+                    raise Exception(f'Contexto não encontrado para o campo: {nome_campo}')
+
+                async with semaforo:
+                    if admissao is not None:
+                        async with admissao():
+                            sumario, texto, tokens = await self.inferir_chatbot_from_context(item, context=context, detalhes=detalhes)
+                    else:
+                        sumario, texto, tokens = await self.inferir_chatbot_from_context(item, context=context, detalhes=detalhes)
+
+                return {"campo": nome_campo, "sumario": sumario, "texto": texto, "tokens": tokens, "cache": detalhes["cache"], "erro": None}
+            except Exception as ex:
+                return {"campo": nome_campo, "sumario": None, "texto": None, "tokens": 0, "cache": False, "erro": str(ex)}
+
+        return await asyncio.gather(*[inferir_item(item) for item in itens])
+
+    async def inferir_chatbot_from_context_stream(self, chatbot: dict):
+        """
+        Inferência em streaming a partir do contexto do campo informado e das informações enviadas pelo usuário.
+        O texto do campo é repassado à medida que é gerado e, ao final, são retornados o sumário, o texto completo e o total de tokens.
+        :param chatbot: Dados do chatbot quando for necessário utilizar o chatbot para inferir a descrição
+        :return: Gerador assíncrono de eventos: {"evento": "texto", "delta": ...} e, ao final, {"evento": "fim", "sumario": ..., "texto": ..., "tokens": ...}
+        """
+        try:
+            # buscando o contexto do chatbot
+            nome_campo = chatbot.get("campo")
+            context = await self.context_model.get_context(field=nome_campo)
+
+            if not context:
+                raise Exception(f'Contexto não encontrado para o campo: {nome_campo}')
+
+            # Preparando o chatbot
+            prompt_chatbot, prompt_assistente = self.monta_prompts_chatbot(chatbot, context)
+
+            # Repassando o texto do campo à medida que o JSON da resposta é recebido
+            parser = JsonStreamParser()
+            resposta = ""
+            total_tokens = 0
+            async for tipo, valor in self.backend.envia_mensagem_chat_stream(prompt_chatbot, json_format=True, context=prompt_assistente, temperature=self.config.get("TEMPERATURE_CHATBOT")):
+                if tipo == "tokens":
+                    total_tokens = valor
+                    continue
+                resposta += valor
+                delta = parser.alimentar(valor).get("texto")
+                if delta:
+                    yield {"evento": "texto", "delta": delta}
+
+            # Tratando o retorno completo
+            try:
+                resposta = json.loads(resposta.strip())
+            except Exception as ex:
+                raise Exception(f'Erro ao converter a resposta para o formato correto: {ex}')
+
+            sumario, texto = (resposta.get("sumario", None), resposta.get("texto", None)) if isinstance(resposta, dict) else (resposta, None)
+            if sumario is None or sumario == "":
+                raise Exception(f'Não foi possível inferir a solicitação do chat: {chatbot.get("comando", None)}')
+
+            yield {"evento": "fim", "sumario": sumario, "texto": texto, "tokens": total_tokens}
+        except Exception as ex:
+            self.logs.error(f'Erro ao inferir a descrição da necessidade (stream): {ex}')
+            raise ex
+
+    async def inferir_reescrita_completa(self, texto: str) -> str:
         """
         Infere a reescrita de um texto
         :param texto: Texto a ser reescrito
@@ -165,7 +387,7 @@ class AIMiddleware:
             prompt_chat_gpt = prompt_chat_gpt.format(texto=texto)
 
             # Inferindo a reescrita do texto
-            resultado, total_tokens = self.inferir(mensagem=prompt_chat_gpt)
+            resultado, total_tokens = await self.inferir(mensagem=prompt_chat_gpt)
 
             if resultado is None:
                 raise Exception('Não foi possível inferir a reescrita do texto.')
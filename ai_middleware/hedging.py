@@ -0,0 +1,108 @@
+"""
+Requisições hedged: segunda chamada ao modelo quando a primeira demora mais que o percentil configurado da latência recente
+"""
+# coding: utf-8
+
+from collections import deque
+import asyncio
+import time
+
+
+class Hedger:
+    """
+    Classe responsável por disparar uma chamada de reserva (hedge) quando a chamada principal não termina dentro do atraso calculado
+    (percentil HEDGE_PERCENTIL das latências recentes, no mínimo HEDGE_ATRASO_MIN). A primeira resposta vence e a outra chamada é cancelada.
+    O gasto extra é limitado por um balde de fichas: cada chamada principal acrescenta HEDGE_ORCAMENTO fichas e cada hedge consome uma,
+    de forma que no máximo essa fração das chamadas é duplicada.
+    """
+    MAX_FICHAS = 10.0
+
+    def __init__(self, config, logs):
+        """
+        Inicializa o hedger
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        """
+        self.logs = logs
+        self.percentil = config.get("HEDGE_PERCENTIL")
+        self.atraso_min = config.get("HEDGE_ATRASO_MIN")
+        self.atraso_inicial = config.get("HEDGE_ATRASO_INICIAL")
+        self.amostras_min = config.get("HEDGE_AMOSTRAS_MIN")
+        self.orcamento = config.get("HEDGE_ORCAMENTO")
+        self.latencias = deque(maxlen=config.get("HEDGE_JANELA"))
+        self.fichas = 1.0
+        self.estatisticas = {"chamadas": 0, "hedges": 0, "hedges_venceram": 0, "sem_orcamento": 0, "falhas_principal_recuperadas": 0}
+
+    def atraso(self) -> float:
+        """
+        Atraso até o disparo do hedge: percentil das latências recentes (ou o atraso inicial enquanto houver poucas amostras)
+        :return: Tempo em segundos
+        """
+        if len(self.latencias) < self.amostras_min:
+            return self.atraso_inicial
+        ordenadas = sorted(self.latencias)
+        posicao = min(int(len(ordenadas) * self.percentil / 100), len(ordenadas) - 1)
+        return max(ordenadas[posicao], self.atraso_min)
+
+    async def cronometrar(self, funcao) -> tuple:
+        """
+        Executa a chamada registrando a sua latência
+        :param funcao: Função sem parâmetros que retorna a coroutine da chamada
+        :return: Resultado da chamada
+        """
+        inicio = time.monotonic()
+        resultado = await funcao()
+        self.latencias.append(time.monotonic() - inicio)
+        return resultado
+
+    async def executar(self, principal, hedge):
+        """
+        Executa a chamada principal e, se ela não terminar dentro do atraso e houver orçamento, a chamada de reserva
+        :param principal: Função sem parâmetros que retorna a coroutine da chamada principal
+        :param hedge: Função sem parâmetros que retorna a coroutine da chamada de reserva (outra chave ou modelo secundário)
+        :return: Resultado da primeira chamada bem sucedida
+        :raises Exception: Erro da chamada principal, se as duas falharem
+        """
+        self.estatisticas["chamadas"] += 1
+        self.fichas = min(self.fichas + self.orcamento, self.MAX_FICHAS)
+        tarefa_principal = asyncio.ensure_future(self.cronometrar(principal))
+        tarefa_hedge = None
+        try:
+            concluidas, _ = await asyncio.wait({tarefa_principal}, timeout=self.atraso())
+            if concluidas:
+                return tarefa_principal.result()
+            if self.fichas < 1:
+                self.estatisticas["sem_orcamento"] += 1
+                return await tarefa_principal
+
+            self.fichas -= 1
+            self.estatisticas["hedges"] += 1
+            tarefa_hedge = asyncio.ensure_future(self.cronometrar(hedge))
+            pendentes = {tarefa_principal, tarefa_hedge}
+            while pendentes:
+                concluidas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in (tarefa_principal, tarefa_hedge):
+                    if tarefa in concluidas and not tarefa.cancelled() and tarefa.exception() is None:
+                        if tarefa is tarefa_hedge:
+                            self.estatisticas["hedges_venceram"] += 1
+                            if tarefa_principal.done():
+                                self.estatisticas["falhas_principal_recuperadas"] += 1
+                        return tarefa.result()
+            # As duas chamadas falharam
+            if tarefa_hedge.exception() is not None:
+                self.logs.error(f'Erro na chamada de reserva (hedge): {tarefa_hedge.exception()}')
+            return tarefa_principal.result()
+        finally:
+            # A chamada perdedora (ou as duas, se quem aguarda for cancelado) é cancelada
+            for tarefa in (tarefa_principal, tarefa_hedge):
+                if tarefa is not None and not tarefa.done():
+                    tarefa.cancel()
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do hedging
+        :return: Dicionário com as chamadas, hedges disparados e vencedores, o atraso atual e a taxa de hedge
+        """
+        chamadas = self.estatisticas["chamadas"]
+        return {**self.estatisticas, "atraso_atual": round(self.atraso(), 3), "fichas": round(self.fichas, 2),
+                "taxa_hedge": round(self.estatisticas["hedges"] / chamadas, 4) if chamadas else 0.0}
@@ -0,0 +1,131 @@
+"""
+Parser incremental do JSON de resposta do chatbot, para repassar o texto enquanto a resposta ainda está sendo gerada
+"""
+# coding: utf-8
+
+import json
+
+
+class JsonStreamParser:
+    """
+    Classe que recebe os trechos de um objeto JSON (ex.: {"sumario": ..., "texto": ...}) à medida que chegam
+    e retorna os trechos já decodificados dos valores string de primeiro nível.
+    Valores que não são string (ex.: null) são ignorados, o objeto completo deve ser validado com json.loads ao final.
+    """
+    ANTES_OBJETO = 0
+    ANTES_CHAVE = 1
+    CHAVE = 2
+    ANTES_DOIS_PONTOS = 3
+    ANTES_VALOR = 4
+    VALOR_STRING = 5
+    VALOR_OUTRO = 6
+    FIM = 7
+
+    def __init__(self):
+        """
+        Inicializa o estado do parser
+        """
+        self.estado = self.ANTES_OBJETO
+        self.chave = ""
+        self.escape = ""
+        self.surrogate = ""
+        self.profundidade = 0
+        self.em_string = False
+        self.escape_outro = False
+
+    def decodifica_escape(self) -> str:
+        """
+        Decodifica a sequência de escape acumulada, aguardando o par completo no caso de surrogates (\\ud83d\\ude00)
+        :return: Texto decodificado ou vazio se ainda faltar parte da sequência
+        """
+        sequencia = self.surrogate + self.escape
+        self.escape = ""
+        if len(sequencia) == 6 and 0xD800 <= int(sequencia[2:], 16) <= 0xDBFF:
+            self.surrogate = sequencia
+            return ""
+        self.surrogate = ""
+        try:
+            return json.loads(f'"{sequencia}"')
+        except ValueError:
+            return ""
+
+    def escape_completo(self) -> bool:
+        """
+        Verifica se a sequência de escape acumulada está completa
+        :return: True se estiver completa
+        """
+        if len(self.escape) < 2:
+            return False
+        return self.escape[1] != "u" or len(self.escape) == 6
+
+    def alimentar(self, trecho: str) -> dict:
+        """
+        Processa um trecho da resposta
+        :param trecho: Trecho recebido
+        :return: Dicionário {chave: texto decodificado neste trecho} para os valores string
+        """
+        deltas = {}
+        for caractere in trecho:
+            if self.estado == self.ANTES_OBJETO:
+                if caractere == "{":
+                    self.estado = self.ANTES_CHAVE
+            elif self.estado == self.ANTES_CHAVE:
+                if caractere == '"':
+                    self.chave = ""
+                    self.estado = self.CHAVE
+                elif caractere == "}":
+                    self.estado = self.FIM
+            elif self.estado == self.CHAVE:
+                if self.escape:
+                    self.escape += caractere
+                    if self.escape_completo():
+                        self.chave += self.decodifica_escape()
+                elif caractere == "\\":
+                    self.escape = caractere
+                elif caractere == '"':
+                    self.estado = self.ANTES_DOIS_PONTOS
+                else:
+                    self.chave += caractere
+            elif self.estado == self.ANTES_DOIS_PONTOS:
+                if caractere == ":":
+                    self.estado = self.ANTES_VALOR
+            elif self.estado == self.ANTES_VALOR:
+                if caractere == '"':
+                    self.estado = self.VALOR_STRING
+                elif not caractere.isspace():
+                    self.estado = self.VALOR_OUTRO
+                    self.profundidade = 1 if caractere in "{[" else 0
+                    self.em_string = False
+                    self.escape_outro = False
+            elif self.estado == self.VALOR_STRING:
+                if self.escape:
+                    self.escape += caractere
+                    if self.escape_completo():
+                        texto = self.decodifica_escape()
+                        if texto:
+                            deltas[self.chave] = deltas.get(self.chave, "") + texto
+                elif caractere == "\\":
+                    self.escape = caractere
+                elif caractere == '"':
+                    self.estado = self.ANTES_CHAVE
+                else:
+                    deltas[self.chave] = deltas.get(self.chave, "") + caractere
+            elif self.estado == self.VALOR_OUTRO:
+                if self.em_string:
+                    if self.escape_outro:
+                        self.escape_outro = False
+                    elif caractere == "\\":
+                        self.escape_outro = True
+                    elif caractere == '"':
+                        self.em_string = False
+                elif caractere == '"':
+                    self.em_string = True
+                elif caractere in "{[":
+                    self.profundidade += 1
+                elif caractere in "}]" and self.profundidade > 0:
+                    self.profundidade -= 1
+                elif self.profundidade == 0 and caractere == ",":
+                    self.estado = self.ANTES_CHAVE
+                elif self.profundidade == 0 and caractere == "}":
+                    self.estado = self.FIM
+        return deltas
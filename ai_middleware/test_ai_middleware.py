@@ -0,0 +1,111 @@
+"""
+Testes do middleware da IA: cache das respostas do chatbot conforme o backend que respondeu
+"""
+# coding: utf-8
+
+from ai_middleware.ai_middleware import AIMiddleware
+from backends.fake_backend import FakeBackend
+from backends.router import BackendRouter
+from cache.response_cache import ResponseCache
+from cache.semantic_cache import SemanticCache
+from loguru import logger
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"FAKE_CUSTO_MIL_TOKENS": 0, "FAKE_LATENCIA": 0, "HEDGE_ATIVO": False, "TEMPERATURE_CHATBOT": 0.2, "RESPONSE_CACHE_ATIVO": True,
+          "RESPONSE_CACHE_TTL": 60, "RESPONSE_CACHE_MAX_ITENS": 100, "ROTEADOR_SLO_P95": 10, "ROTEADOR_MAX_ERRO": 0.5, "ROTEADOR_EXPLORACAO": 0,
+          "ROTEADOR_AMOSTRAS_MIN": 5, "ROTEADOR_JANELA": 50, "ROTEADOR_ALFA_ERRO": 0.2, "SEMANTIC_CACHE_LIMIAR": 0.9,
+          "SEMANTIC_CACHE_CAPACIDADE": 100, "SEMANTIC_CACHE_DIMENSAO": 1024, "SEMANTIC_CACHE_ARQUIVO": "semantic_cache.npz"}
+
+CONTEXTO = {"_id": "descricao", "context": "Descrição do objeto", "soft_limit": 0, "hard_limit": 0}
+
+
+class BackendSimulado(FakeBackend):
+    """
+    Backend simulado com nome e modelo próprios
+    """
+    def __init__(self, nome: str, modelo: str):
+        super().__init__(CONFIG, logger)
+        self.NOME = nome
+        self.modelo = modelo
+
+
+class ContextModelFake:
+    async def get_context(self, field: str):
+        return CONTEXTO
+
+
+def cria_middleware(redis, *backends, semantic_cache: SemanticCache = None) -> AIMiddleware:
+    return AIMiddleware(CONFIG, logger, backend=BackendRouter(CONFIG, logger, backends=list(backends)), context_model=ContextModelFake(),
+                        response_cache=ResponseCache(CONFIG, logger, redis=redis) if redis is not None else None, semantic_cache=semantic_cache)
+
+
+def chatbot() -> dict:
+    return {"campo": "descricao", "comando": "resuma o texto", "texto": "Texto do campo", "historico": ""}
+
+
+async def respostas_em_cache(redis) -> list:
+    return [chave async for chave in redis.get_conn().scan_iter(match=ResponseCache.PREFIXO + "*") if chave != ResponseCache.INDICE.encode()]
+
+
+async def test_respostas_do_backend_preferencial_sao_reaproveitadas(redis):
+    preferencial = BackendSimulado("chat_gpt", "gpt-teste")
+    middleware = cria_middleware(redis, preferencial)
+    detalhes = {}
+    primeira = await middleware.inferir_chatbot_from_context(chatbot(), detalhes=detalhes)
+    assert await middleware.inferir_chatbot_from_context(chatbot(), detalhes=detalhes) == (primeira[0], primeira[1], 0)
+    assert detalhes["cache"] and preferencial.estatisticas["chamadas"] == 1
+
+
+async def test_respostas_do_backend_fake_nao_sao_guardadas(redis):
+    fake = FakeBackend(CONFIG, logger)
+    middleware = cria_middleware(redis, fake)
+    await middleware.inferir_chatbot_from_context(chatbot())
+    await middleware.inferir_chatbot_from_context(chatbot())
+    assert fake.estatisticas["chamadas"] == 2
+    assert await respostas_em_cache(redis) == []
+
+    # Ao trocar para um backend real, a resposta simulada não é servida
+    real = BackendSimulado("chat_gpt", "gpt-teste")
+    await cria_middleware(redis, real).inferir_chatbot_from_context(chatbot())
+    assert real.estatisticas["chamadas"] == 1
+
+
+async def test_resposta_e_guardada_com_o_backend_que_respondeu(redis, monkeypatch):
+    chat_gpt, mistral = BackendSimulado("chat_gpt", "gpt-teste"), BackendSimulado("mistral", "mistral-teste")
+    middleware = cria_middleware(redis, chat_gpt, mistral)
+    monkeypatch.setattr(middleware.backend, "escolher", lambda alternativo=False: "mistral")
+    await middleware.inferir_chatbot_from_context(chatbot())
+    assert mistral.estatisticas["chamadas"] == 1
+    assert len(await respostas_em_cache(redis)) == 1
+
+    # A consulta usa o backend que o roteador escolheria: a resposta da mistral não é servida no lugar da ChatGPT
+    monkeypatch.setattr(middleware.backend, "preferencial", lambda: ("chat_gpt", "gpt-teste"))
+    monkeypatch.setattr(middleware.backend, "escolher", lambda alternativo=False: "chat_gpt")
+    await middleware.inferir_chatbot_from_context(chatbot())
+    assert chat_gpt.estatisticas["chamadas"] == 1
+    assert len(await respostas_em_cache(redis)) == 2
+
+    monkeypatch.setattr(middleware.backend, "preferencial", lambda: ("mistral", "mistral-teste"))
+    detalhes = {}
+    await middleware.inferir_chatbot_from_context(chatbot(), detalhes=detalhes)
+    assert detalhes["cache"] and mistral.estatisticas["chamadas"] == 1
+
+
+async def test_cache_semantico_separa_as_respostas_pelo_backend_que_respondeu(monkeypatch):
+    chat_gpt, mistral = BackendSimulado("chat_gpt", "gpt-teste"), BackendSimulado("mistral", "mistral-teste")
+    semantic_cache = SemanticCache(CONFIG, logger)
+    middleware = cria_middleware(None, chat_gpt, mistral, semantic_cache=semantic_cache)
+
+    # Resposta de contingência da mistral, com a ChatGPT como preferencial: não é servida no lugar da ChatGPT
+    monkeypatch.setattr(middleware.backend, "preferencial", lambda: ("chat_gpt", "gpt-teste"))
+    monkeypatch.setattr(middleware.backend, "escolher", lambda alternativo=False: "mistral")
+    await middleware.inferir_chatbot_from_context(chatbot())
+    monkeypatch.setattr(middleware.backend, "escolher", lambda alternativo=False: "chat_gpt")
+    await middleware.inferir_chatbot_from_context(chatbot())
+    assert (chat_gpt.estatisticas["chamadas"], mistral.estatisticas["chamadas"]) == (1, 1)
+
+    detalhes = {}
+    await middleware.inferir_chatbot_from_context({**chatbot(), "comando": "Resuma o texto."}, detalhes=detalhes)
+    assert detalhes["cache"] and chat_gpt.estatisticas["chamadas"] == 1
@@ -0,0 +1,95 @@
+"""
+Testes das requisições hedged
+"""
+# coding: utf-8
+
+from ai_middleware.hedging import Hedger
+from loguru import logger
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"HEDGE_PERCENTIL": 90, "HEDGE_ATRASO_MIN": 0.01, "HEDGE_ATRASO_INICIAL": 0.02, "HEDGE_AMOSTRAS_MIN": 5, "HEDGE_ORCAMENTO": 1.0, "HEDGE_JANELA": 100}
+
+
+class Chamada:
+    """
+    Chamada simulada com duração e resultado (ou erro) fixos, registrando se foi iniciada e cancelada
+    """
+    def __init__(self, duracao: float, resultado=None, erro: Exception = None):
+        self.duracao = duracao
+        self.resultado = resultado
+        self.erro = erro
+        self.iniciada = False
+        self.cancelada = False
+
+    async def __call__(self):
+        self.iniciada = True
+        try:
+            await asyncio.sleep(self.duracao)
+        except asyncio.CancelledError:
+            self.cancelada = True
+            raise
+        if self.erro is not None:
+            raise self.erro
+        return self.resultado
+
+
+async def test_chamada_rapida_nao_dispara_o_hedge():
+    hedger = Hedger(CONFIG, logger)
+    hedge = Chamada(0, "reserva")
+    assert await hedger.executar(Chamada(0, "principal"), hedge) == "principal"
+    assert not hedge.iniciada and hedger.estatisticas["hedges"] == 0
+
+
+async def test_hedge_vence_a_chamada_lenta_que_e_cancelada():
+    hedger = Hedger(CONFIG, logger)
+    principal, hedge = Chamada(1, "principal"), Chamada(0, "reserva")
+    assert await hedger.executar(principal, hedge) == "reserva"
+    await asyncio.sleep(0)
+    assert principal.cancelada
+    assert hedger.estatisticas["hedges"] == 1 and hedger.estatisticas["hedges_venceram"] == 1
+
+
+async def test_falha_da_principal_apos_o_disparo_e_recuperada_pelo_hedge():
+    hedger = Hedger(CONFIG, logger)
+    assert await hedger.executar(Chamada(0.03, erro=ConnectionError("falha")), Chamada(0.05, "reserva")) == "reserva"
+    assert hedger.estatisticas["falhas_principal_recuperadas"] == 1
+
+
+async def test_falha_das_duas_chamadas_levanta_o_erro_da_principal():
+    hedger = Hedger(CONFIG, logger)
+    with pytest.raises(ConnectionError, match="principal"):
+        await hedger.executar(Chamada(0.03, erro=ConnectionError("principal")), Chamada(0, erro=TimeoutError("reserva")))
+
+
+async def test_orcamento_limita_a_fracao_de_chamadas_duplicadas():
+    hedger = Hedger({**CONFIG, "HEDGE_ORCAMENTO": 0.0}, logger)
+    assert await hedger.executar(Chamada(0.05, "principal"), Chamada(0, "reserva")) == "reserva"
+    hedge = Chamada(0, "reserva")
+    assert await hedger.executar(Chamada(0.05, "principal"), hedge) == "principal"
+    assert not hedge.iniciada
+    assert hedger.estatisticas["sem_orcamento"] == 1
+
+
+async def test_atraso_segue_o_percentil_das_latencias_recentes():
+    hedger = Hedger(CONFIG, logger)
+    assert hedger.atraso() == CONFIG["HEDGE_ATRASO_INICIAL"]
+    hedger.latencias.extend([0.1] * 8 + [0.5, 2.0])
+    assert hedger.atraso() == 2.0
+    hedger.latencias.clear()
+    hedger.latencias.extend([0.001] * 10)
+    assert hedger.atraso() == CONFIG["HEDGE_ATRASO_MIN"]
+
+
+async def test_cancelar_quem_aguarda_cancela_as_duas_chamadas():
+    hedger = Hedger(CONFIG, logger)
+    principal, hedge = Chamada(1, "principal"), Chamada(1, "reserva")
+    tarefa = asyncio.create_task(hedger.executar(principal, hedge))
+    await asyncio.sleep(0.05)
+    tarefa.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await tarefa
+    await asyncio.sleep(0)
+    assert principal.cancelada and hedge.cancelada
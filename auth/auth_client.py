@@ -0,0 +1,196 @@
+"""
+Cliente do serviço de autenticação (validação dos tokens)
+"""
+# coding: utf-8
+
+from auth.token_cache import TokenCache
+from single_flight.single_flight import SingleFlight
+import hashlib
+import httpx
+import json
+import time
+
+
+class AuthIndisponivelError(Exception):
+    """
+    Exceção para quando o serviço de autenticação não está disponível (circuito aberto ou falha na chamada)
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples: abre após N falhas consecutivas e, depois do tempo de reset, libera uma única chamada de teste (meio-aberto).
+    Se a chamada de teste não registrar o resultado (ex.: cancelada), uma nova chamada de teste é liberada após outro tempo de reset.
+    """
+    FECHADO = "fechado"
+    ABERTO = "aberto"
+    MEIO_ABERTO = "meio_aberto"
+
+    def __init__(self, max_falhas: int, tempo_reset: float):
+        """
+        Inicializa o circuit breaker
+        :param max_falhas: Quantidade de falhas consecutivas para abrir o circuito
+        :param tempo_reset: Tempo em segundos com o circuito aberto antes de liberar a chamada de teste
+        """
+        self.max_falhas = max_falhas
+        self.tempo_reset = tempo_reset
+        self.falhas = 0
+        self.estado = self.FECHADO
+        self.aberto_em = 0.0
+        self.teste_em = 0.0
+        self.aberturas = 0
+
+    def permite(self) -> bool:
+        """
+        Verifica se a chamada pode ser feita
+        :return: True se o circuito permitir a chamada
+        """
+        if self.estado == self.FECHADO:
+            return True
+        agora = time.monotonic()
+        if (self.estado == self.ABERTO and agora - self.aberto_em >= self.tempo_reset) or (self.estado == self.MEIO_ABERTO and agora - self.teste_em >= self.tempo_reset):
+            self.estado = self.MEIO_ABERTO
+            self.teste_em = agora
+            return True
+        return False
+
+    def sucesso(self):
+        """
+        Registra uma chamada bem sucedida, fechando o circuito
+        """
+        self.falhas = 0
+        self.estado = self.FECHADO
+
+    def falha(self):
+        """
+        Registra uma falha, abrindo o circuito quando o limite for atingido ou quando a chamada de teste falhar
+        """
+        self.falhas += 1
+        if self.estado == self.MEIO_ABERTO or self.falhas >= self.max_falhas:
+            self.estado = self.ABERTO
+            self.aberto_em = time.monotonic()
+            self.aberturas += 1
+
+
+class AuthClient:
+    """
+    Classe responsável por validar os tokens no serviço de autenticação.
+    Utiliza um cliente HTTP com pool de conexões keep-alive e timeouts, um circuit breaker para falhar rápido quando o serviço está fora,
+    o cache de validações e a coalescência das validações concorrentes do mesmo token em uma única chamada.
+    """
+    def __init__(self, config, logs, token_cache: TokenCache = None):
+        """
+        Inicializa o cliente
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param token_cache: Cache dos resultados de validação
+        """
+        self.config = config
+        self.logs = logs
+        self.url = config.get("AUTH_TOKEN_URI")
+        self.token_cache = token_cache
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=config.get("AUTH_HTTP_MAX_CONNECTIONS"), max_keepalive_connections=config.get("AUTH_HTTP_MAX_KEEPALIVE"), keepalive_expiry=config.get("AUTH_HTTP_KEEPALIVE_EXPIRY")),
+            timeout=httpx.Timeout(config.get("AUTH_HTTP_READ_TIMEOUT"), connect=config.get("AUTH_HTTP_CONNECT_TIMEOUT")),
+            headers={'Content-Type': 'application/json'})
+        self.circuit_breaker = CircuitBreaker(config.get("AUTH_CIRCUIT_FAILURES"), config.get("AUTH_CIRCUIT_RESET"))
+        self.single_flight = SingleFlight()
+        self.estatisticas = {"chamadas_servico": 0, "falhas_servico": 0, "rejeitadas_circuito": 0}
+
+    async def validar_token(self, token: str) -> (bool, dict):
+        """
+        Valida o token de autenticação
+        :param token: Token a ser validado
+        :return: Tupla (valido, payload)
+        :raises AuthIndisponivelError: Se o serviço de autenticação estiver indisponível
+        """
+        # Validando se o token é uma string válida
+        if token is None or token == "":
+            return False, None
+
+        # Consultando o cache antes de chamar o serviço de autenticação
+        if self.token_cache is not None:
+            em_cache = await self.token_cache.get(token)
+            if em_cache is not None:
+                return em_cache
+            chave = self.token_cache.chave(token)
+        else:
+            chave = hashlib.sha256(token.encode()).hexdigest()
+
+        # Validações concorrentes do mesmo token compartilham a mesma chamada ao serviço
+        return await self.single_flight.executar(chave, lambda: self.consulta_servico(token))
+
+    async def consulta_servico(self, token: str) -> (bool, dict):
+        """
+        Chama o serviço de autenticação e guarda o resultado no cache
+        :param token: Token a ser validado
+        :return: Tupla (valido, payload)
+        :raises AuthIndisponivelError: Se o circuito estiver aberto ou o serviço falhar
+        """
+        if not self.circuit_breaker.permite():
+            self.estatisticas["rejeitadas_circuito"] += 1
+            raise AuthIndisponivelError('Serviço de autenticação indisponível (circuito aberto)')
+
+        try:
+            self.estatisticas["chamadas_servico"] += 1
+            response = await self.http_client.post(self.url, content=json.dumps({"token": token}))
+        except httpx.HTTPError as ex:
+            self.registra_falha()
+            raise AuthIndisponivelError(f'Erro ao chamar o serviço de autenticação: {ex!r}')
+
+        # Verificando o status da resposta
+        if response.status_code == 200:
+            try:
+                resultado = response.json()
+                valido, payload = (True, resultado.get("payload")) if resultado.get("valid") else (False, None)
+            except (ValueError, AttributeError) as ex:
+                # Resposta fora do formato esperado é uma falha do serviço (não é guardada no cache)
+                self.registra_falha()
+                raise AuthIndisponivelError(f'Serviço de autenticação retornou uma resposta inválida: {ex!r}')
+        elif response.status_code in (400, 401, 403):
+            valido, payload = False, None
+        else:
+            # Falhas do serviço de autenticação não são guardadas no cache
+            self.registra_falha()
+            raise AuthIndisponivelError(f'Serviço de autenticação retornou o status {response.status_code}')
+
+        self.circuit_breaker.sucesso()
+        if self.token_cache is not None:
+            await self.token_cache.set(token, valido, payload)
+
+        return valido, payload
+
+    async def verificar_disponibilidade(self) -> int:
+        """
+        Verifica se o serviço de autenticação responde, abrindo a conexão keep-alive do pool.
+        Envia um token vazio (recusado pelo serviço) e não altera o circuit breaker nem as estatísticas das validações.
+        :return: Status HTTP retornado pelo serviço
+        :raises AuthIndisponivelError: Se o serviço não responder ou retornar erro (5xx)
+        """
+        try:
+            response = await self.http_client.post(self.url, content=json.dumps({"token": ""}))
+        except httpx.HTTPError as ex:
+            raise AuthIndisponivelError(f'Erro ao chamar o serviço de autenticação: {ex!r}')
+        if response.status_code >= 500:
+            raise AuthIndisponivelError(f'Serviço de autenticação retornou o status {response.status_code}')
+        return response.status_code
+
+    def registra_falha(self):
+        """
+        Registra a falha do serviço no circuit breaker e nas estatísticas
+        """
+        self.estatisticas["falhas_servico"] += 1
+        self.circuit_breaker.falha()
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do cliente
+        :return: Dicionário com as chamadas ao serviço, falhas, estado do circuito e coalescência
+        """
+        return {**self.estatisticas, "circuito": self.circuit_breaker.estado, "aberturas_circuito": self.circuit_breaker.aberturas, "single_flight": self.single_flight.metricas()}
+
+    async def close(self):
+        """
+        Fecha o pool de conexões HTTP
+        """
+        await self.http_client.aclose()
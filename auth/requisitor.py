@@ -0,0 +1,27 @@
+"""
+Identificação do requisitor a partir do payload retornado pelo serviço de autenticação
+"""
+# coding: utf-8
+
+import hashlib
+import json
+
+CHAVES_IDENTIFICADOR = ("id", "_id", "usuario_id", "user_id", "sub", "cliente_id", "email", "usuario", "username")
+
+
+def identifica_requisitor(payload) -> str:
+    """
+    Retorna um identificador estável do requisitor, utilizado nas filas, limites e métricas por requisitor
+    :param payload: Payload retornado por validar_token_api_auth
+    :return: Identificador do requisitor (o primeiro campo identificador conhecido ou o hash do payload)
+    """
+    if isinstance(payload, dict):
+        for chave in CHAVES_IDENTIFICADOR:
+            valor = payload.get(chave)
+            if valor is not None and valor != "":
+                return str(valor)
+    if payload is None:
+        return "anonimo"
+    if isinstance(payload, (str, int)):
+        return str(payload)
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:32]
@@ -0,0 +1,115 @@
+"""
+Testes do cliente do serviço de autenticação e do circuit breaker
+"""
+# coding: utf-8
+
+from auth.auth_client import AuthClient, AuthIndisponivelError, CircuitBreaker
+from loguru import logger
+from types import SimpleNamespace
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"AUTH_TOKEN_URI": "http://auth.local/validar", "AUTH_HTTP_MAX_CONNECTIONS": 10, "AUTH_HTTP_MAX_KEEPALIVE": 5,
+          "AUTH_HTTP_KEEPALIVE_EXPIRY": 30, "AUTH_HTTP_READ_TIMEOUT": 1, "AUTH_HTTP_CONNECT_TIMEOUT": 1,
+          "AUTH_CIRCUIT_FAILURES": 2, "AUTH_CIRCUIT_RESET": 0.05}
+
+
+class Relogio:
+    def __init__(self, monkeypatch):
+        self.agora = 1000.0
+        monkeypatch.setattr("auth.auth_client.time", SimpleNamespace(monotonic=lambda: self.agora))
+
+
+def cria_cliente(respostas: list) -> AuthClient:
+    """
+    Cliente com transporte simulado: cada chamada consome a próxima resposta (httpx.Response ou exceção)
+    """
+    cliente = AuthClient(CONFIG, logger)
+
+    def responder(request):
+        resposta = respostas.pop(0)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+    cliente.http_client = httpx.AsyncClient(transport=httpx.MockTransport(responder))
+    return cliente
+
+
+def test_circuito_abre_apos_falhas_e_libera_uma_chamada_de_teste(monkeypatch):
+    relogio = Relogio(monkeypatch)
+    circuito = CircuitBreaker(max_falhas=2, tempo_reset=10)
+    circuito.falha()
+    assert circuito.permite()
+    circuito.falha()
+    assert circuito.estado == CircuitBreaker.ABERTO and not circuito.permite()
+    relogio.agora += 10
+    assert circuito.permite() and circuito.estado == CircuitBreaker.MEIO_ABERTO
+    assert not circuito.permite()
+    circuito.falha()
+    assert circuito.estado == CircuitBreaker.ABERTO and circuito.aberturas == 2
+    relogio.agora += 10
+    assert circuito.permite()
+    circuito.sucesso()
+    assert circuito.estado == CircuitBreaker.FECHADO and circuito.permite()
+
+
+def test_chamada_de_teste_sem_resultado_e_liberada_apos_o_tempo_de_reset(monkeypatch):
+    relogio = Relogio(monkeypatch)
+    circuito = CircuitBreaker(max_falhas=1, tempo_reset=10)
+    circuito.falha()
+    relogio.agora += 10
+    assert circuito.permite()
+    # A chamada de teste foi cancelada e não registrou sucesso nem falha
+    relogio.agora += 5
+    assert not circuito.permite()
+    relogio.agora += 5
+    assert circuito.permite()
+
+
+async def test_token_valido_e_invalido():
+    cliente = cria_cliente([httpx.Response(200, json={"valid": True, "payload": {"usuario": 1}}), httpx.Response(401)])
+    assert await cliente.validar_token("a") == (True, {"usuario": 1})
+    assert await cliente.validar_token("b") == (False, None)
+    assert cliente.circuit_breaker.estado == CircuitBreaker.FECHADO
+
+
+@pytest.mark.parametrize("resposta", [httpx.Response(200, text="<html>proxy</html>"), httpx.Response(200, json=["valid"]),
+                                      httpx.Response(200, json=None)])
+async def test_resposta_invalida_conta_como_falha(resposta):
+    cliente = cria_cliente([resposta])
+    with pytest.raises(AuthIndisponivelError):
+        await cliente.validar_token("a")
+    assert cliente.circuit_breaker.falhas == 1
+    assert cliente.estatisticas["falhas_servico"] == 1
+
+
+async def test_resposta_invalida_na_chamada_de_teste_nao_prende_o_circuito_meio_aberto(monkeypatch):
+    relogio = Relogio(monkeypatch)
+    cliente = cria_cliente([httpx.ConnectError("recusada"), httpx.ConnectError("recusada"), httpx.Response(200, text="não é json"),
+                            httpx.Response(200, json={"valid": True, "payload": {}})])
+    for _ in range(2):
+        with pytest.raises(AuthIndisponivelError):
+            await cliente.validar_token("a")
+    assert cliente.circuit_breaker.estado == CircuitBreaker.ABERTO
+
+    relogio.agora += 1
+    with pytest.raises(AuthIndisponivelError, match="resposta inválida"):
+        await cliente.validar_token("a")
+    assert cliente.circuit_breaker.estado == CircuitBreaker.ABERTO
+
+    relogio.agora += 1
+    assert await cliente.validar_token("a") == (True, {})
+    assert cliente.circuit_breaker.estado == CircuitBreaker.FECHADO
+
+
+async def test_erro_5xx_nao_e_guardado_e_circuito_aberto_rejeita_sem_chamar():
+    cliente = cria_cliente([httpx.Response(503), httpx.Response(500)])
+    for _ in range(2):
+        with pytest.raises(AuthIndisponivelError):
+            await cliente.validar_token("a")
+    with pytest.raises(AuthIndisponivelError, match="circuito aberto"):
+        await cliente.validar_token("a")
+    assert cliente.estatisticas == {"chamadas_servico": 2, "falhas_servico": 2, "rejeitadas_circuito": 1}
@@ -0,0 +1,71 @@
+"""
+Testes do cache em níveis da validação dos tokens
+"""
+# coding: utf-8
+
+from auth.token_cache import TokenCache
+from loguru import logger
+from shared_cache.shared_cache import SharedMemoryCache
+from types import SimpleNamespace
+import pytest
+import time
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"AUTH_CACHE_REDIS": True, "AUTH_CACHE_TTL": 10, "AUTH_CACHE_NEGATIVE_TTL": 2, "AUTH_CACHE_MAX_ITEMS": 100, "SECRET_KEY": "segredo"}
+
+
+class Relogio:
+    """
+    Relógio simulado do módulo (epoch e monotônico avançam juntos)
+    """
+    def __init__(self, monkeypatch):
+        self.avanco = 0.0
+        monkeypatch.setattr("auth.token_cache.time", SimpleNamespace(time=lambda: time.time() + self.avanco,
+                                                                     monotonic=lambda: time.monotonic() + self.avanco))
+
+
+@pytest.fixture
+def shared(tmp_path):
+    segmento = SharedMemoryCache({"SHARED_CACHE_SLOTS": 64, "SHARED_CACHE_TAMANHO_SLOT": 1024, "SHARED_CACHE_ARQUIVO": str(tmp_path / "shm")}, logger)
+    yield segmento
+    segmento.close()
+
+
+async def test_hit_no_nivel_compartilhado_guarda_apenas_o_tempo_restante(monkeypatch, shared):
+    relogio = Relogio(monkeypatch)
+    await TokenCache(CONFIG, logger, shared=shared).set("token", True, {"usuario": 1})
+
+    relogio.avanco = 8
+    outro_worker = TokenCache(CONFIG, logger, shared=shared)
+    assert await outro_worker.get("token") == (True, {"usuario": 1})
+    assert outro_worker.estatisticas["hits_compartilhado"] == 1
+
+    relogio.avanco = 11
+    assert await outro_worker.get("token") is None
+    assert outro_worker.estatisticas["misses"] == 1
+
+
+async def test_hit_no_redis_guarda_apenas_o_tempo_restante_nos_outros_niveis(monkeypatch, redis, shared):
+    relogio = Relogio(monkeypatch)
+    await TokenCache(CONFIG, logger, redis=redis).set("token", False, None)
+
+    relogio.avanco = 1
+    outra_instancia = TokenCache(CONFIG, logger, redis=redis, shared=shared)
+    assert await outra_instancia.get("token") == (False, None)
+    assert outra_instancia.estatisticas["hits_redis"] == 1
+    expira_em, _, _ = outra_instancia.itens[outra_instancia.chave("token")]
+    assert expira_em - time.monotonic() - relogio.avanco == pytest.approx(1, abs=0.1)
+    assert await TokenCache(CONFIG, logger, shared=shared).get("token") == (False, None)
+
+    relogio.avanco = 2.5
+    assert await outra_instancia.get("token") is None
+
+
+async def test_expiracao_do_token_limita_o_tempo_no_cache(monkeypatch, shared):
+    relogio = Relogio(monkeypatch)
+    cache = TokenCache(CONFIG, logger, shared=shared)
+    await cache.set("token", True, {"exp": time.time() + 5})
+    relogio.avanco = 6
+    assert await cache.get("token") is None
+    assert await TokenCache(CONFIG, logger, shared=shared).get("token") is None
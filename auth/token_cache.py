@@ -0,0 +1,181 @@
+"""
+Cache em níveis (memória do processo, memória compartilhada entre os workers e Redis) para o resultado da validação dos tokens de autenticação
+"""
+# coding: utf-8
+
+from collections import OrderedDict
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+from shared_cache.shared_cache import SharedMemoryCache
+import hashlib
+import hmac
+import json
+import time
+
+
+class TokenCache:
+    """
+    Classe responsável por guardar o resultado da validação dos tokens, evitando a chamada ao serviço de autenticação a cada turno do chat.
+    O primeiro nível é um LRU em memória do processo, o segundo (opcional) é o segmento de memória compartilhada entre os workers
+    da mesma máquina e o terceiro (opcional) é compartilhado entre todas as instâncias através do Redis.
+    Os tokens nunca são armazenados, apenas o HMAC-SHA256 do token (com a SECRET_KEY) é usado como chave.
+    Tokens inválidos também são lembrados por um tempo curto (cache negativo). A expiração é gravada junto com o resultado nos níveis
+    compartilhados: um resultado lido deles é guardado nos níveis mais próximos apenas pelo tempo que ainda lhe resta.
+    """
+    PREFIXO_REDIS = "auth_token:"
+
+    def __init__(self, config, logs, redis: AsyncRedisAdapter = None, shared: SharedMemoryCache = None):
+        """
+        Inicializa o cache
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis para o nível compartilhado (None desativa o nível compartilhado)
+        :param shared: Segmento de memória compartilhada entre os workers (None desativa o nível)
+        """
+        self.config = config
+        self.logs = logs
+        self.redis = redis if config.get("AUTH_CACHE_REDIS") else None
+        self.shared = shared
+        self.ttl = config.get("AUTH_CACHE_TTL")
+        self.ttl_negativo = config.get("AUTH_CACHE_NEGATIVE_TTL")
+        self.max_itens = config.get("AUTH_CACHE_MAX_ITEMS")
+        self.segredo = (config.get("SECRET_KEY") or "").encode()
+        self.itens = OrderedDict()
+        self.estatisticas = {"hits_memoria": 0, "hits_compartilhado": 0, "hits_redis": 0, "hits_negativos": 0, "misses": 0}
+
+    def chave(self, token: str) -> str:
+        """
+        Gera a chave do cache a partir do token
+        :param token: Token de autenticação
+        :return: Hash do token
+        """
+        return hmac.new(self.segredo, token.encode(), hashlib.sha256).hexdigest()
+
+    def calcula_ttl(self, valido: bool, payload: dict) -> int:
+        """
+        Calcula o tempo de vida do resultado no cache, limitado pela expiração do token (campo exp do payload) quando disponível
+        :param valido: Resultado da validação
+        :param payload: Payload retornado pelo serviço de autenticação
+        :return: Tempo de vida em segundos (0 para não armazenar)
+        """
+        if not valido:
+            return self.ttl_negativo
+
+        ttl = self.ttl
+        expiracao = payload.get("exp") if isinstance(payload, dict) else None
+        if isinstance(expiracao, (int, float)):
+            ttl = min(ttl, int(expiracao - time.time()))
+
+        return max(ttl, 0)
+
+    def tempo_restante(self, valor: dict) -> float:
+        """
+        Tempo de vida restante de um resultado lido de um nível compartilhado
+        :param valor: Resultado armazenado (valido, payload e expira, epoch da expiração)
+        :return: Tempo em segundos (0 ou negativo se já expirou)
+        """
+        ttl = self.calcula_ttl(valor.get("valido"), valor.get("payload"))
+        expira = valor.get("expira")
+        if isinstance(expira, (int, float)):
+            ttl = min(ttl, expira - time.time())
+        return ttl
+
+    def registra_hit(self, valido: bool, nivel: str):
+        """
+        Atualiza os contadores de hits
+        :param valido: Resultado armazenado
+        :param nivel: Nível do cache (memoria, compartilhado ou redis)
+        """
+        self.estatisticas[f"hits_{nivel}"] += 1
+        if not valido:
+            self.estatisticas["hits_negativos"] += 1
+
+    async def get(self, token: str):
+        """
+        Busca o resultado da validação do token no cache
+        :param token: Token de autenticação
+        :return: Tupla (valido, payload) ou None se não estiver no cache
+        """
+        chave = self.chave(token)
+
+        # Primeiro nível: memória do processo
+        item = self.itens.get(chave)
+        if item is not None:
+            expira_em, valido, payload = item
+            if expira_em > time.monotonic():
+                self.itens.move_to_end(chave)
+                self.registra_hit(valido, "memoria")
+                return valido, payload
+            del self.itens[chave]
+
+        # Segundo nível: memória compartilhada entre os workers da máquina
+        if self.shared is not None:
+            valor = self.shared.get(self.PREFIXO_REDIS + chave)
+            ttl = self.tempo_restante(valor) if valor is not None else 0
+            if ttl > 0:
+                valido, payload = valor.get("valido"), valor.get("payload")
+                self.guarda_memoria(chave, valido, payload, ttl)
+                self.registra_hit(valido, "compartilhado")
+                return valido, payload
+
+        # Terceiro nível: Redis compartilhado entre as instâncias
+        if self.redis is not None:
+            try:
+                valor = await self.redis.get(self.PREFIXO_REDIS + chave)
+                valor = json.loads(valor) if valor is not None else None
+                ttl = self.tempo_restante(valor) if valor is not None else 0
+                if ttl > 0:
+                    valido, payload = valor.get("valido"), valor.get("payload")
+                    self.guarda_memoria(chave, valido, payload, ttl)
+                    if self.shared is not None:
+                        self.shared.set(self.PREFIXO_REDIS + chave, valor, ttl)
+                    self.registra_hit(valido, "redis")
+                    return valido, payload
+            except Exception as ex:
+                self.logs.error(f'Erro ao consultar o cache de tokens no Redis: {ex}')
+
+        self.estatisticas["misses"] += 1
+        return None
+
+    def guarda_memoria(self, chave: str, valido: bool, payload: dict, ttl: float):
+        """
+        Guarda o resultado no LRU em memória, removendo o item menos recente quando a capacidade for atingida
+        :param chave: Chave do cache
+        :param valido: Resultado da validação
+        :param payload: Payload retornado pelo serviço de autenticação
+        :param ttl: Tempo de vida em segundos
+        """
+        self.itens[chave] = (time.monotonic() + ttl, valido, payload)
+        self.itens.move_to_end(chave)
+        while len(self.itens) > self.max_itens:
+            self.itens.popitem(last=False)
+
+    async def set(self, token: str, valido: bool, payload: dict):
+        """
+        Guarda o resultado da validação do token em todos os níveis do cache
+        :param token: Token de autenticação
+        :param valido: Resultado da validação
+        :param payload: Payload retornado pelo serviço de autenticação
+        """
+        ttl = self.calcula_ttl(valido, payload)
+        if ttl <= 0:
+            return
+
+        chave = self.chave(token)
+        self.guarda_memoria(chave, valido, payload, ttl)
+        valor = {"valido": valido, "payload": payload, "expira": time.time() + ttl}
+
+        if self.shared is not None:
+            self.shared.set(self.PREFIXO_REDIS + chave, valor, ttl)
+
+        if self.redis is not None:
+            try:
+                await self.redis.set_ex(self.PREFIXO_REDIS + chave, json.dumps(valor), ttl)
+            except Exception as ex:
+                self.logs.error(f'Erro ao gravar o cache de tokens no Redis: {ex}')
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do cache
+        :return: Dicionário com os contadores de hits/misses e o tamanho atual do cache em memória
+        """
+        return {**self.estatisticas, "itens_memoria": len(self.itens)}
@@ -0,0 +1,85 @@
+"""
+Interface dos backends de IA (provedores dos modelos) utilizados pelo middleware
+"""
+# coding: utf-8
+
+
+class Backend:
+    """
+    Interface comum dos backends de IA: montagem das mensagens e dos parâmetros, envio da mensagem (completa ou em streaming),
+    aquecimento dos clientes, métricas e fechamento. Cada backend informa o seu nome (NOME) e o custo por mil tokens, utilizados pelo roteador.
+    """
+    NOME = None
+
+    def __init__(self, config, logs, modelo: str = None, custo: float = 0.0):
+        """
+        Inicializa o backend
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param modelo: Modelo utilizado por padrão
+        :param custo: Custo por mil tokens
+        """
+        self.config = config
+        self.logs = logs
+        self.modelo = modelo
+        self.custo = custo
+
+    @staticmethod
+    def monta_mensagens(mensagem: str, prefix: str = None, context: str = None) -> list:
+        """
+        Monta a lista de mensagens do chat
+        :param mensagem: Mensagem a ser enviada
+        :param prefix: Prefixo da mensagem
+        :param context: Contexto da mensagem (mensagem de sistema)
+        :return: Lista de mensagens no formato da API
+        """
+        if context is not None:
+            return [{"role": "system", "content": context}, {"role": "user", "content": mensagem}]
+        return [{"role": "user", "content": mensagem}]
+
+    def monta_parametros(self, json_format: bool = False, temperature: float = None, modelo: str = None) -> dict:
+        """
+        Monta os parâmetros da chamada de completions (modelo, formato da resposta e temperatura)
+        :param json_format: Formato da resposta
+        :param temperature: Temperatura da resposta
+        :param modelo: Modelo a ser utilizado (se não informado, o modelo padrão do backend)
+        :return: Dicionário com os parâmetros
+        """
+        parametros = {"model": modelo or self.modelo, "response_format": {"type": "json_object" if json_format else "text"}}
+        if temperature is not None:
+            parametros["temperature"] = temperature
+        return parametros
+
+    async def envia_mensagem_chat(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None, modelo: str = None) -> (str, int):
+        """
+        Envia uma mensagem para o chat
+        :return: Resposta do chat e o total de tokens utilizados
+        """
+        raise NotImplementedError
+
+    async def envia_mensagem_chat_stream(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None):
+        """
+        Envia uma mensagem para o chat recebendo a resposta em streaming
+        :return: Gerador assíncrono de tuplas ("delta", trecho) e, ao final, ("tokens", total_tokens)
+        """
+        raise NotImplementedError
+        yield
+
+    async def aquecer_clientes(self) -> int:
+        """
+        Cria antecipadamente os clientes do backend
+        :return: Quantidade de clientes disponíveis
+        """
+        return 0
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do backend
+        :return: Dicionário com as métricas
+        """
+        return {}
+
+    async def close(self):
+        """
+        Fecha os recursos do backend
+        """
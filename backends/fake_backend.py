@@ -0,0 +1,71 @@
+"""
+Backend local e determinístico, sem chamadas externas (desenvolvimento, testes de carga e contingência)
+"""
+# coding: utf-8
+
+from backends.backend import Backend
+import asyncio
+import hashlib
+import json
+
+
+class FakeBackend(Backend):
+    """
+    Backend que gera a resposta localmente a partir do hash da mensagem: a mesma mensagem sempre produz a mesma resposta,
+    após a latência fixa FAKE_LATENCIA. Com json_format a resposta segue o formato do chatbot ({"sumario", "texto"}).
+    Os tokens são estimados em um token a cada quatro caracteres da mensagem e da resposta.
+    """
+    NOME = "fake"
+
+    def __init__(self, config, logs):
+        """
+        Inicializa o backend
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        """
+        super().__init__(config, logs, modelo="fake", custo=config.get("FAKE_CUSTO_MIL_TOKENS"))
+        self.latencia = config.get("FAKE_LATENCIA")
+        self.estatisticas = {"chamadas": 0}
+
+    def resposta(self, mensagem: str, json_format: bool = False, context: str = None) -> (str, int):
+        """
+        Gera a resposta determinística da mensagem
+        :param mensagem: Mensagem enviada
+        :param json_format: Formato da resposta
+        :param context: Contexto da mensagem
+        :return: Resposta e o total de tokens estimado
+        """
+        resumo = hashlib.sha256(f"{context or ''}\n{mensagem}".encode()).hexdigest()[:12]
+        if json_format:
+            resposta = json.dumps({"sumario": f"Resposta simulada {resumo}", "texto": f"Texto simulado {resumo}"}, ensure_ascii=False)
+        else:
+            resposta = f"Resposta simulada {resumo}"
+        return resposta, (len(context or "") + len(mensagem) + len(resposta)) // 4 + 1
+
+    async def envia_mensagem_chat(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None, modelo: str = None) -> (str, int):
+        """
+        Envia uma mensagem para o chat simulado
+        :return: Resposta do chat e o total de tokens estimado
+        """
+        self.estatisticas["chamadas"] += 1
+        await asyncio.sleep(self.latencia)
+        return self.resposta(mensagem, json_format, context)
+
+    async def envia_mensagem_chat_stream(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None):
+        """
+        Envia uma mensagem para o chat simulado recebendo a resposta em trechos
+        :return: Gerador assíncrono de tuplas ("delta", trecho) e, ao final, ("tokens", total_tokens)
+        """
+        self.estatisticas["chamadas"] += 1
+        resposta, total_tokens = self.resposta(mensagem, json_format, context)
+        await asyncio.sleep(self.latencia)
+        for inicio in range(0, len(resposta), 8):
+            yield "delta", resposta[inicio:inicio + 8]
+        yield "tokens", total_tokens
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do backend
+        :return: Dicionário com o total de chamadas
+        """
+        return dict(self.estatisticas)
@@ -0,0 +1,211 @@
+"""
+Roteamento das chamadas entre os backends de IA pela latência, taxa de erro e custo observados
+"""
+# coding: utf-8
+
+from backends.backend import Backend
+from collections import deque
+import asyncio
+import random
+import time
+
+
+class EstatisticasBackend:
+    """
+    Latências recentes (janela) e taxa de erro (média móvel) das chamadas a um backend
+    """
+    def __init__(self, janela: int, alfa: float):
+        """
+        :param janela: Quantidade de latências mantidas
+        :param alfa: Fator da média móvel da taxa de erro
+        """
+        self.latencias = deque(maxlen=janela)
+        self.alfa = alfa
+        self.erro = 0.0
+        self.chamadas = 0
+        self.falhas = 0
+        self.tokens = 0
+
+    def registra(self, latencia: float = None, falhou: bool = False, tokens: int = 0):
+        """
+        Registra o resultado de uma chamada
+        :param latencia: Latência da chamada em segundos (None se não deve compor a janela, ex.: streaming)
+        :param falhou: Se a chamada falhou
+        :param tokens: Tokens consumidos
+        """
+        self.chamadas += 1
+        self.falhas += int(falhou)
+        self.tokens += tokens or 0
+        self.erro = self.erro * (1 - self.alfa) + self.alfa * int(falhou)
+        if latencia is not None and not falhou:
+            self.latencias.append(latencia)
+
+    def percentil(self, percentil: float) -> float:
+        """
+        Percentil das latências recentes
+        :param percentil: Percentil (0 a 100)
+        :return: Latência em segundos (0 se não houver amostras)
+        """
+        if not self.latencias:
+            return 0.0
+        ordenadas = sorted(self.latencias)
+        return ordenadas[min(int(len(ordenadas) * percentil / 100), len(ordenadas) - 1)]
+
+
+class BackendRouter(Backend):
+    """
+    Classe responsável por escolher, a cada chamada, o backend de IA entre os de BACKENDS_ATIVOS. Um backend é saudável enquanto a sua latência
+    p95 recente estiver dentro do SLO (ROTEADOR_SLO_P95) e a taxa de erro abaixo de ROTEADOR_MAX_ERRO (backends com poucas amostras são
+    considerados saudáveis). Entre os saudáveis é escolhido o de menor custo por mil tokens, depois o de menor p50 e por fim a ordem de
+    BACKENDS_ATIVOS; sem backend saudável, o mais rápido entre os que respondem (taxa de erro abaixo do máximo). Uma fração ROTEADOR_EXPLORACAO das chamadas vai para
+    outro backend, para que as estatísticas de um backend degradado se atualizem e o tráfego volte quando ele se recuperar.
+    Possui a mesma interface dos backends.
+    """
+    NOME = "roteador"
+
+    def __init__(self, config, logs, backends: list):
+        """
+        Inicializa o roteador
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param backends: Backends na ordem de preferência
+        """
+        super().__init__(config, logs, modelo=backends[0].modelo, custo=backends[0].custo)
+        self.backends = {backend.NOME: backend for backend in backends}
+        self.ordem = [backend.NOME for backend in backends]
+        self.slo_p95 = config.get("ROTEADOR_SLO_P95")
+        self.max_erro = config.get("ROTEADOR_MAX_ERRO")
+        self.exploracao = config.get("ROTEADOR_EXPLORACAO")
+        self.amostras_min = config.get("ROTEADOR_AMOSTRAS_MIN")
+        self.estatisticas = {nome: EstatisticasBackend(config.get("ROTEADOR_JANELA"), config.get("ROTEADOR_ALFA_ERRO")) for nome in self.ordem}
+        self.escolhas = {nome: 0 for nome in self.ordem}
+
+    def saudavel(self, nome: str) -> bool:
+        """
+        Verifica se o backend está dentro do SLO de latência e da taxa de erro máxima
+        :param nome: Nome do backend
+        :return: True se o backend estiver saudável
+        """
+        estatisticas = self.estatisticas[nome]
+        if estatisticas.erro > self.max_erro:
+            return False
+        return len(estatisticas.latencias) < self.amostras_min or estatisticas.percentil(95) <= self.slo_p95
+
+    def melhor(self, candidatos: list) -> str:
+        """
+        Melhor backend entre os candidatos: o saudável de menor custo (depois menor p50 e ordem de preferência) ou,
+        sem backend saudável, o de menor p95 entre os que estão abaixo da taxa de erro máxima (depois o de menor taxa de erro)
+        :param candidatos: Nomes dos backends candidatos
+        :return: Nome do backend
+        """
+        saudaveis = [nome for nome in candidatos if self.saudavel(nome)]
+        if saudaveis:
+            return min(saudaveis, key=lambda nome: (self.backends[nome].custo, self.estatisticas[nome].percentil(50), self.ordem.index(nome)))
+        return min(candidatos, key=lambda nome: (self.estatisticas[nome].erro > self.max_erro, self.estatisticas[nome].percentil(95), self.estatisticas[nome].erro))
+
+    def escolher(self, alternativo: bool = False) -> str:
+        """
+        Escolhe o backend da chamada
+        :param alternativo: Se deve ser evitado o backend que seria escolhido (chamada de reserva do hedge), quando houver outro
+        :return: Nome do backend
+        """
+        candidatos = list(self.ordem)
+        if alternativo and len(candidatos) > 1:
+            candidatos.remove(self.melhor(candidatos))
+        escolhido = self.melhor(candidatos)
+        if len(candidatos) > 1 and random.random() < self.exploracao:
+            escolhido = random.choice([nome for nome in candidatos if nome != escolhido])
+        self.escolhas[escolhido] += 1
+        return escolhido
+
+    def preferencial(self) -> (str, str):
+        """
+        Backend que seria escolhido no momento (sem a exploração) e o seu modelo padrão
+        :return: Tupla (nome do backend, modelo)
+        """
+        nome = self.melhor(self.ordem)
+        return nome, self.backends[nome].modelo
+
+    def monta_parametros(self, json_format: bool = False, temperature: float = None, modelo: str = None) -> dict:
+        """
+        Parâmetros da chamada no backend preferencial (utilizados para identificar chamadas idênticas)
+        """
+        return self.backends[self.ordem[0]].monta_parametros(json_format, temperature, modelo)
+
+    async def envia_mensagem_chat(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None, modelo: str = None, alternativo: bool = False, detalhes: dict = None) -> (str, int):
+        """
+        Envia a mensagem para o backend escolhido, registrando a latência e o resultado
+        :param modelo: Modelo a ser utilizado (repassado apenas se o backend escolhido for o preferencial)
+        :param alternativo: Se a chamada deve evitar o backend que seria escolhido (chamada de reserva do hedge)
+        :param detalhes: Dicionário preenchido com o backend ("backend") e o modelo ("modelo") que responderam (opcional)
+        :return: Resposta do chat e o total de tokens utilizados
+        """
+        nome = self.escolher(alternativo)
+        backend = self.backends[nome]
+        modelo = modelo if nome == self.ordem[0] else None
+        if detalhes is not None:
+            detalhes.update({"backend": nome, "modelo": modelo or backend.modelo})
+        inicio = time.monotonic()
+        try:
+            resposta, total_tokens = await backend.envia_mensagem_chat(mensagem, json_format, prefix, context, temperature, modelo=modelo)
+        except asyncio.CancelledError:
+            # Chamada cancelada (hedge perdedor): o tempo decorrido é um limite inferior da latência e entra na janela,
+            # para que um backend lento não pareça rápido apenas porque as suas chamadas são canceladas
+            self.estatisticas[nome].registra(latencia=time.monotonic() - inicio)
+            raise
+        except Exception:
+            self.estatisticas[nome].registra(falhou=True)
+            raise
+        self.estatisticas[nome].registra(latencia=time.monotonic() - inicio, tokens=total_tokens)
+        return resposta, total_tokens
+
+    async def envia_mensagem_chat_stream(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None):
+        """
+        Envia a mensagem para o backend escolhido recebendo a resposta em streaming (a duração do streaming não compõe as latências)
+        :return: Gerador assíncrono de tuplas ("delta", trecho) e, ao final, ("tokens", total_tokens)
+        """
+        nome = self.escolher()
+        total_tokens = 0
+        try:
+            async for tipo, valor in self.backends[nome].envia_mensagem_chat_stream(mensagem, json_format, prefix, context, temperature):
+                if tipo == "tokens":
+                    total_tokens = valor
+                yield tipo, valor
+        except Exception:
+            self.estatisticas[nome].registra(falhou=True)
+            raise
+        self.estatisticas[nome].registra(tokens=total_tokens)
+
+    async def aquecer_clientes(self) -> int:
+        """
+        Aquece os clientes de todos os backends
+        :return: Quantidade total de clientes disponíveis
+        """
+        quantidade = 0
+        for nome, backend in self.backends.items():
+            try:
+                quantidade += await backend.aquecer_clientes()
+            except Exception as ex:
+                self.logs.error(f'Erro ao aquecer os clientes do backend {nome}: {ex}')
+        return quantidade
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do roteamento e de cada backend
+        :return: Dicionário por backend com as escolhas, latências p50/p95, taxa de erro, custo estimado e métricas próprias
+        """
+        return {nome: {"escolhas": self.escolhas[nome], "saudavel": self.saudavel(nome), "chamadas": estatisticas.chamadas, "falhas": estatisticas.falhas,
+                       "p50": round(estatisticas.percentil(50), 3), "p95": round(estatisticas.percentil(95), 3), "taxa_erro": round(estatisticas.erro, 4),
+                       "tokens": estatisticas.tokens, "custo_estimado": round(estatisticas.tokens / 1000 * self.backends[nome].custo, 4),
+                       **self.backends[nome].metricas()}
+                for nome, estatisticas in self.estatisticas.items()}
+
+    async def close(self):
+        """
+        Fecha todos os backends
+        """
+        for nome, backend in self.backends.items():
+            try:
+                await backend.close()
+            except Exception as ex:
+                self.logs.error(f'Erro ao fechar o backend {nome}: {ex}')
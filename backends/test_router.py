@@ -0,0 +1,120 @@
+"""
+Testes do roteamento das chamadas entre os backends de IA
+"""
+# coding: utf-8
+
+from backends.fake_backend import FakeBackend
+from backends.router import BackendRouter
+from loguru import logger
+from types import SimpleNamespace
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"FAKE_CUSTO_MIL_TOKENS": 0, "FAKE_LATENCIA": 0, "ROTEADOR_SLO_P95": 1.0, "ROTEADOR_MAX_ERRO": 0.5, "ROTEADOR_EXPLORACAO": 0,
+          "ROTEADOR_AMOSTRAS_MIN": 3, "ROTEADOR_JANELA": 20, "ROTEADOR_ALFA_ERRO": 0.5}
+
+
+class BackendSimulado(FakeBackend):
+    """
+    Backend simulado com nome, modelo e custo próprios, que registra o modelo de cada chamada e pode falhar
+    """
+    def __init__(self, nome: str, custo: float = 0.0, erro: Exception = None, latencia: float = 0):
+        super().__init__({**CONFIG, "FAKE_CUSTO_MIL_TOKENS": custo, "FAKE_LATENCIA": latencia}, logger)
+        self.NOME = nome
+        self.modelo = f"{nome}-padrao"
+        self.erro = erro
+        self.modelos = []
+
+    async def envia_mensagem_chat(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None, modelo: str = None):
+        self.modelos.append(modelo)
+        if self.erro is not None:
+            raise self.erro
+        return await super().envia_mensagem_chat(mensagem, json_format, prefix, context, temperature)
+
+    async def envia_mensagem_chat_stream(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None):
+        if self.erro is not None:
+            raise self.erro
+        async for tipo, valor in super().envia_mensagem_chat_stream(mensagem, json_format, prefix, context, temperature):
+            yield tipo, valor
+
+
+def cria_roteador(*backends, **config) -> BackendRouter:
+    return BackendRouter({**CONFIG, **config}, logger, backends=list(backends))
+
+
+def test_saudavel_de_menor_custo_e_depois_a_ordem_de_preferencia():
+    roteador = cria_roteador(BackendSimulado("chat_gpt", custo=2), BackendSimulado("mistral", custo=1))
+    assert roteador.escolher() == "mistral"
+    roteador = cria_roteador(BackendSimulado("chat_gpt"), BackendSimulado("mistral"))
+    assert roteador.escolher() == "chat_gpt"
+    assert roteador.preferencial() == ("chat_gpt", "chat_gpt-padrao")
+
+
+def test_backend_fora_do_slo_ou_com_erros_perde_o_trafego():
+    roteador = cria_roteador(BackendSimulado("chat_gpt"), BackendSimulado("mistral", custo=1))
+    for _ in range(3):
+        roteador.estatisticas["chat_gpt"].registra(latencia=2.0)
+    assert not roteador.saudavel("chat_gpt") and roteador.escolher() == "mistral"
+    assert roteador.preferencial() == ("mistral", "mistral-padrao")
+
+    roteador = cria_roteador(BackendSimulado("chat_gpt"), BackendSimulado("mistral", custo=1))
+    roteador.estatisticas["chat_gpt"].registra(falhou=True)
+    roteador.estatisticas["chat_gpt"].registra(falhou=True)
+    assert roteador.escolher() == "mistral"
+
+
+def test_sem_backend_saudavel_escolhe_o_mais_rapido_que_responde():
+    roteador = cria_roteador(BackendSimulado("chat_gpt"), BackendSimulado("mistral"), BackendSimulado("fake"))
+    for _ in range(3):
+        roteador.estatisticas["chat_gpt"].registra(latencia=3.0)
+        roteador.estatisticas["mistral"].registra(latencia=2.0)
+        roteador.estatisticas["fake"].registra(latencia=1.5)
+    roteador.estatisticas["fake"].registra(falhou=True)
+    roteador.estatisticas["fake"].registra(falhou=True)
+    assert roteador.escolher() == "mistral"
+
+
+def test_chamada_alternativa_e_exploracao_evitam_o_melhor(monkeypatch):
+    roteador = cria_roteador(BackendSimulado("chat_gpt"), BackendSimulado("mistral"))
+    assert roteador.escolher(alternativo=True) == "mistral"
+
+    roteador = cria_roteador(BackendSimulado("chat_gpt"), BackendSimulado("mistral"), ROTEADOR_EXPLORACAO=0.1)
+    monkeypatch.setattr("backends.router.random", SimpleNamespace(random=lambda: 0.05, choice=lambda opcoes: opcoes[0]))
+    assert roteador.escolher() == "mistral"
+    monkeypatch.setattr("backends.router.random", SimpleNamespace(random=lambda: 0.5, choice=lambda opcoes: opcoes[0]))
+    assert roteador.escolher() == "chat_gpt"
+    assert roteador.escolhas == {"chat_gpt": 1, "mistral": 1}
+
+
+async def test_envio_informa_quem_respondeu_e_repassa_o_modelo_apenas_ao_preferencial():
+    chat_gpt, mistral = BackendSimulado("chat_gpt"), BackendSimulado("mistral")
+    roteador = cria_roteador(chat_gpt, mistral)
+    detalhes = {}
+    await roteador.envia_mensagem_chat("mensagem", modelo="modelo-hedge", alternativo=True, detalhes=detalhes)
+    assert detalhes == {"backend": "mistral", "modelo": "mistral-padrao"} and mistral.modelos == [None]
+
+    await roteador.envia_mensagem_chat("mensagem", modelo="modelo-hedge", detalhes=detalhes)
+    assert detalhes == {"backend": "chat_gpt", "modelo": "modelo-hedge"} and chat_gpt.modelos == ["modelo-hedge"]
+    assert roteador.estatisticas["chat_gpt"].chamadas == 1 and len(roteador.estatisticas["chat_gpt"].latencias) == 1
+
+
+async def test_falhas_e_cancelamentos_entram_nas_estatisticas():
+    roteador = cria_roteador(BackendSimulado("chat_gpt", erro=ConnectionError("falha")), BackendSimulado("mistral", latencia=1))
+    with pytest.raises(ConnectionError):
+        await roteador.envia_mensagem_chat("mensagem")
+    assert roteador.estatisticas["chat_gpt"].falhas == 1 and roteador.estatisticas["chat_gpt"].erro == 0.5
+
+    with pytest.raises(ConnectionError):
+        async for _ in roteador.envia_mensagem_chat_stream("mensagem"):
+            pass
+    assert roteador.estatisticas["chat_gpt"].falhas == 2
+
+    # Chamada cancelada (hedge perdedor): o tempo decorrido entra na janela de latências
+    tarefa = asyncio.create_task(roteador.envia_mensagem_chat("mensagem"))
+    await asyncio.sleep(0.05)
+    tarefa.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await tarefa
+    assert len(roteador.estatisticas["mistral"].latencias) == 1 and roteador.estatisticas["mistral"].latencias[0] >= 0.05
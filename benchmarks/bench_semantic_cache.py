@@ -0,0 +1,64 @@
+"""
+Benchmark do cache semântico: latência da consulta em função do tamanho do índice de um campo
+Uso: python -m benchmarks.bench_semantic_cache [--tamanhos 100 1000 10000] [--consultas 200]
+"""
+# coding: utf-8
+
+from cache.semantic_cache import SemanticCache
+from loguru import logger
+import argparse
+import random
+import statistics
+import time
+
+VERBOS = ["gerar", "resumir", "melhorar", "reescrever", "expandir", "corrigir", "formalizar", "simplificar", "detalhar", "encurtar"]
+COMPLEMENTOS = ["o texto", "a descrição", "o objeto", "a justificativa", "em tópicos", "de forma clara", "para o edital", "com mais detalhes"]
+
+
+def comando_aleatorio(gerador: random.Random) -> str:
+    """
+    Gera um comando sintético do usuário
+    :param gerador: Gerador de números aleatórios (semente fixa para resultados determinísticos)
+    :return: Comando
+    """
+    return f"{gerador.choice(VERBOS)} {gerador.choice(COMPLEMENTOS)} {gerador.randint(0, 10 ** 6)}"
+
+
+def medir(tamanho: int, consultas: int, dimensao: int) -> dict:
+    """
+    Preenche o índice de um campo com o tamanho informado (todas as entradas no mesmo grupo, o pior caso) e mede as consultas
+    :param tamanho: Quantidade de entradas no índice
+    :param consultas: Quantidade de consultas medidas
+    :param dimensao: Dimensão dos vetores
+    :return: Dicionário com as latências em milissegundos
+    """
+    config = {"SEMANTIC_CACHE_LIMIAR": 0.8, "SEMANTIC_CACHE_CAPACIDADE": tamanho, "SEMANTIC_CACHE_ARQUIVO": "/tmp/bench_semantic_cache.npz", "SEMANTIC_CACHE_DIMENSAO": dimensao}
+    cache = SemanticCache(config, logger)
+    gerador = random.Random(42)
+    context = {"context": "Descrição do objeto da contratação", "soft_limit": 500, "hard_limit": 1000}
+
+    for _ in range(tamanho):
+        cache.adicionar({"campo": "objeto", "comando": comando_aleatorio(gerador)}, context, "chat_gpt/gpt-4o-mini", "sumário", "texto")
+
+    latencias = []
+    for _ in range(consultas):
+        chatbot = {"campo": "objeto", "comando": comando_aleatorio(gerador)}
+        inicio = time.perf_counter()
+        cache.buscar(chatbot, context, "chat_gpt/gpt-4o-mini")
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    latencias.sort()
+    return {"tamanho": tamanho, "p50_ms": statistics.median(latencias), "p95_ms": latencias[int(len(latencias) * 0.95) - 1], "max_ms": latencias[-1]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do cache semântico")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--dimensao", type=int, default=1024)
+    args = parser.parse_args()
+
+    print(f"{'tamanho':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'max (ms)':>10}")
+    for tamanho in args.tamanhos:
+        resultado = medir(tamanho, args.consultas, args.dimensao)
+        print(f"{resultado['tamanho']:>10} {resultado['p50_ms']:>10.3f} {resultado['p95_ms']:>10.3f} {resultado['max_ms']:>10.3f}")
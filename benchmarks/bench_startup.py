@@ -0,0 +1,73 @@
+"""
+Benchmark do tempo de inicialização da API: importação a frio do rest_api (processo pai do uvicorn) e tempo para um worker
+novo (processo criado com spawn, como no uvicorn com WORKERS > 1) importar a aplicação e ficar pronto.
+Não abre conexões com o MongoDB/Redis no lifespan, mede apenas o custo de importação e construção dos objetos de módulo.
+Uso: python -m benchmarks.bench_startup [--repeticoes 5]
+"""
+# coding: utf-8
+
+import argparse
+import multiprocessing
+import statistics
+import subprocess
+import sys
+import time
+
+CODIGO_IMPORTACAO = "import time; inicio = time.perf_counter(); import rest_api; print('TEMPO', time.perf_counter() - inicio)"
+
+
+def importacao_a_frio() -> float:
+    """
+    Importa o rest_api em um interpretador novo e retorna o tempo de importação
+    :return: Tempo em segundos
+    """
+    resultado = subprocess.run([sys.executable, "-c", CODIGO_IMPORTACAO], capture_output=True, text=True, check=True)
+    return float(next(linha for linha in resultado.stdout.splitlines() if linha.startswith("TEMPO")).split()[1])
+
+
+def worker(fila):
+    """
+    Processo worker: importa a aplicação e sinaliza que está pronto
+    :param fila: Fila para sinalizar o fim da importação
+    """
+    import rest_api  # noqa: F401
+    fila.put(time.perf_counter())
+
+
+def spawn_worker() -> float:
+    """
+    Cria um processo worker com spawn e mede o tempo até ele importar a aplicação
+    :return: Tempo em segundos
+    """
+    contexto = multiprocessing.get_context("spawn")
+    fila = contexto.Queue()
+    inicio = time.perf_counter()
+    processo = contexto.Process(target=worker, args=(fila,))
+    processo.start()
+    pronto = fila.get(timeout=120)
+    processo.join(timeout=30)
+    if processo.is_alive():
+        processo.kill()
+    return pronto - inicio
+
+
+def threads_apos_importacao() -> int:
+    """
+    Quantidade de threads em execução após a importação do rest_api (threads criadas antes do fork não existem nos workers)
+    :return: Quantidade de threads
+    """
+    resultado = subprocess.run([sys.executable, "-c", "import threading, rest_api; print('THREADS', threading.active_count())"], capture_output=True, text=True, check=True)
+    return int(next(linha for linha in resultado.stdout.splitlines() if linha.startswith("THREADS")).split()[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do tempo de inicialização da API")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    importacoes = [importacao_a_frio() for _ in range(args.repeticoes)]
+    spawns = [spawn_worker() for _ in range(args.repeticoes)]
+    print(f"{'medida':<32} {'mediana (s)':>12} {'mín (s)':>10} {'máx (s)':>10}")
+    print(f"{'importação a frio do rest_api':<32} {statistics.median(importacoes):>12.3f} {min(importacoes):>10.3f} {max(importacoes):>10.3f}")
+    print(f"{'spawn de worker até pronto':<32} {statistics.median(spawns):>12.3f} {min(spawns):>10.3f} {max(spawns):>10.3f}")
+    print(f"{'threads após a importação':<32} {threads_apos_importacao():>12}")
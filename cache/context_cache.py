@@ -0,0 +1,242 @@
+"""
+Cache em memória dos contextos dos campos, com atualização periódica e invalidação entre os workers
+"""
+# coding: utf-8
+
+from models.context_model import AsyncContextModel, CHAVE_VERSAO
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+from shared_cache.shared_cache import SharedMemoryCache
+import asyncio
+import time
+
+
+class ContextCache:
+    """
+    Classe responsável por manter em memória do worker os contextos de todos os campos, carregados na inicialização.
+    Os contextos são recarregados quando o contador de versão no Redis muda (verificado a cada CONTEXT_CACHE_INTERVALO_VERSAO),
+    quando o change stream do MongoDB notifica uma alteração (CONTEXT_CACHE_CHANGE_STREAM, requer replica set) ou quando
+    passam CONTEXT_CACHE_TTL segundos desde a última carga. Campos que não estão em memória são buscados no MongoDB.
+    Com o segmento de memória compartilhada, a carga de uma versão feita por um worker é reaproveitada pelos demais da máquina.
+    Possui a mesma interface de consulta do AsyncContextModel.
+    """
+    def __init__(self, config, logs, context_model: AsyncContextModel, redis: AsyncRedisAdapter, shared: SharedMemoryCache = None):
+        """
+        Inicializa o cache (os contextos são carregados no iniciar)
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param context_model: Modelo de contexto utilizado para a carga e para os campos que não estão em memória
+        :param redis: Adaptador do Redis compartilhado
+        :param shared: Segmento de memória compartilhada entre os workers (opcional)
+        """
+        self.logs = logs
+        self.context_model = context_model
+        self.redis = redis
+        self.shared = shared
+        self.ttl = config.get("CONTEXT_CACHE_TTL")
+        self.intervalo_versao = config.get("CONTEXT_CACHE_INTERVALO_VERSAO")
+        self.change_stream = config.get("CONTEXT_CACHE_CHANGE_STREAM")
+        self.contextos = {}
+        self.ausentes = set()
+        self.versao = None
+        self.carregado_em = 0.0
+        self.lock = asyncio.Lock()
+        self.tarefas = []
+        self.estatisticas = {"hits": 0, "misses": 0, "cargas": 0, "cargas_compartilhadas": 0, "falhas_carga": 0, "invalidacoes": 0, "falhas_redis": 0,
+                             "compartilhamentos_incompletos": 0, "cargas_compartilhadas_incompletas": 0}
+
+    async def iniciar(self):
+        """
+        Carrega os contextos e inicia o monitoramento das alterações
+        """
+        await self.carregar(await self.versao_atual())
+        self.tarefas.append(asyncio.create_task(self.monitorar_versao()))
+        if self.change_stream:
+            self.tarefas.append(asyncio.create_task(self.monitorar_change_stream()))
+
+    async def versao_atual(self):
+        """
+        Consulta o contador de versão dos contextos no Redis
+        :return: Versão atual ou None se o Redis estiver indisponível
+        """
+        try:
+            versao = await self.redis.get(CHAVE_VERSAO)
+            return int(versao or 0)
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao consultar a versão dos contextos no Redis: {ex}')
+            return None
+
+    async def carregar(self, versao=None, forcar: bool = False):
+        """
+        Recarrega todos os contextos do MongoDB, substituindo o dicionário em memória de uma só vez.
+        Em caso de erro os contextos anteriores são mantidos. O segmento compartilhado só é utilizado quando a versão é conhecida e a carga
+        não é forçada: sem versão (change stream) ou na expiração do TTL a carga do segmento pode ser tão antiga quanto a alteração.
+        :param versao: Versão dos contextos no Redis correspondente à carga (None se desconhecida)
+        :param forcar: Se a carga deve ser feita do MongoDB mesmo que a versão esteja no segmento compartilhado (a carga é regravada nele)
+        """
+        async with self.lock:
+            contextos = self.carrega_compartilhado(versao) if versao is not None and not forcar else None
+            if contextos is not None:
+                self.estatisticas["cargas_compartilhadas"] += 1
+            else:
+                try:
+                    contextos = await self.context_model.get_all_contexts()
+                except Exception as ex:
+                    self.estatisticas["falhas_carga"] += 1
+                    self.logs.error(f'Erro ao carregar os contextos em memória: {ex}')
+                    return
+                if versao is not None:
+                    self.guarda_compartilhado(versao, contextos)
+            self.contextos = contextos
+            self.ausentes = set()
+            self.carregado_em = time.monotonic()
+            if versao is not None:
+                self.versao = versao
+            self.estatisticas["cargas"] += 1
+
+    @staticmethod
+    def chave_compartilhada(versao, field: str = None) -> str:
+        """
+        Chave no segmento compartilhado da lista de campos (field None) ou do contexto de um campo em uma versão
+        :param versao: Versão dos contextos
+        :param field: Campo
+        :return: Chave
+        """
+        return f"contextos:{versao}:campos" if field is None else f"contextos:{versao}:campo:{field}"
+
+    def carrega_compartilhado(self, versao) -> dict:
+        """
+        Recupera do segmento compartilhado os contextos carregados por outro worker para a mesma versão
+        :param versao: Versão dos contextos
+        :return: Dicionário {campo: contexto} ou None se a carga não estiver completa no segmento
+        """
+        if self.shared is None:
+            return None
+        campos = self.shared.get(self.chave_compartilhada(versao))
+        if campos is None:
+            return None
+        contextos = {}
+        for field in campos:
+            context = self.shared.get(self.chave_compartilhada(versao, field))
+            if context is None:
+                # Contexto substituído no segmento por outra gravação: o segmento está pequeno para a quantidade de contextos
+                self.estatisticas["cargas_compartilhadas_incompletas"] += 1
+                self.logs.warning(f'Contexto do campo {field} (versão {versao}) não está mais no cache compartilhado: '
+                                  f'aumente SHARED_CACHE_CONTEXTOS_SLOTS')
+                return None
+            contextos[field] = context
+        return contextos
+
+    def guarda_compartilhado(self, versao, contextos: dict):
+        """
+        Grava os contextos carregados no segmento compartilhado (a lista de campos por último, para a carga ficar visível completa)
+        :param versao: Versão dos contextos
+        :param contextos: Dicionário {campo: contexto}
+        """
+        if self.shared is None:
+            return
+        gravados = [field for field, context in contextos.items() if self.shared.set(self.chave_compartilhada(versao, field), context, self.ttl)]
+        if len(gravados) < len(contextos) or not self.shared.set(self.chave_compartilhada(versao), gravados, self.ttl):
+            self.estatisticas["compartilhamentos_incompletos"] += 1
+            self.logs.warning(f'Carga dos contextos (versão {versao}) não compartilhada com os demais workers: {len(contextos) - len(gravados)} '
+                              f'contexto(s) ou a lista de campos maiores que SHARED_CACHE_CONTEXTOS_TAMANHO_SLOT')
+
+    async def monitorar_versao(self):
+        """
+        Verifica periodicamente o contador de versão no Redis e o TTL da carga, recarregando os contextos quando necessário
+        """
+        while True:
+            await asyncio.sleep(self.intervalo_versao)
+            try:
+                versao = await self.versao_atual()
+                if versao is not None and versao != self.versao:
+                    self.estatisticas["invalidacoes"] += 1
+                    await self.carregar(versao)
+                elif time.monotonic() - self.carregado_em >= self.ttl:
+                    await self.carregar(versao, forcar=True)
+            except Exception as ex:
+                self.logs.error(f'Erro ao monitorar a versão dos contextos: {ex}')
+
+    async def monitorar_change_stream(self):
+        """
+        Recarrega os contextos a cada alteração notificada pelo change stream da collection de contextos.
+        Se o change stream não estiver disponível (MongoDB sem replica set) o monitoramento fica apenas pela versão e pelo TTL.
+        """
+        try:
+            async with await self.context_model.mongo.get_collection().watch() as stream:
+                async for _ in stream:
+                    self.estatisticas["invalidacoes"] += 1
+                    await self.carregar(forcar=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:
+            self.logs.error(f'Change stream dos contextos indisponível, mantendo a invalidação pela versão no Redis: {ex}')
+
+    async def invalidar(self):
+        """
+        Incrementa o contador de versão no Redis (os demais workers recarregam na próxima verificação) e recarrega os contextos
+        """
+        versao = None
+        try:
+            versao = await self.redis.get_conn().incr(CHAVE_VERSAO)
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao incrementar a versão dos contextos no Redis: {ex}')
+        self.estatisticas["invalidacoes"] += 1
+        await self.carregar(versao)
+
+    async def get_context(self, field: str):
+        """
+        Recupera o contexto do campo da memória ou, se não estiver carregado, do MongoDB
+        :param field: Campo para o qual se deseja recuperar o contexto
+        :return: Retorna o contexto do campo ou None se não for encontrado
+        """
+        context = self.contextos.get(field)
+        if context is not None:
+            self.estatisticas["hits"] += 1
+            return context
+        self.estatisticas["misses"] += 1
+        if field in self.ausentes:
+            self.logs.error(f'Erro ao recuperar contexto - Error:Contexto não encontrado para o campo: {field}')
+            return None
+
+        context = await self.context_model.get_context(field=field)
+        if context is None:
+            self.ausentes.add(field)
+        else:
+            self.contextos[field] = context
+        return context
+
+    async def get_contexts(self, fields: list) -> dict:
+        """
+        Recupera o contexto de vários campos da memória, buscando no MongoDB em uma única consulta os que não estiverem carregados
+        :param fields: Campos para os quais se deseja recuperar o contexto
+        :return: Dicionário {campo: contexto} apenas com os campos encontrados
+        """
+        contextos = {field: self.contextos[field] for field in set(fields) if field in self.contextos}
+        self.estatisticas["hits"] += len(contextos)
+        faltantes = [field for field in set(fields) if field not in contextos and field not in self.ausentes]
+        self.estatisticas["misses"] += len(set(fields)) - len(contextos)
+        if faltantes:
+            encontrados = await self.context_model.get_contexts(faltantes)
+            self.contextos.update(encontrados)
+            self.ausentes.update(field for field in faltantes if field not in encontrados)
+            contextos.update(encontrados)
+        return contextos
+
+    async def close(self):
+        """
+        Encerra o monitoramento das alterações
+        """
+        for tarefa in self.tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self.tarefas, return_exceptions=True)
+        self.tarefas = []
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do cache de contextos
+        :return: Dicionário com os contadores, a quantidade de contextos, a versão e a idade da carga
+        """
+        return {**self.estatisticas, "contextos": len(self.contextos), "versao": self.versao,
+                "idade_carga": round(time.monotonic() - self.carregado_em, 1) if self.carregado_em else None}
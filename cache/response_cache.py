@@ -0,0 +1,153 @@
+"""
+Cache das respostas do chatbot no Redis para turnos idênticos
+"""
+# coding: utf-8
+
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+import hashlib
+import json
+import re
+import time
+
+# KEYS: [1] chave da resposta, [2] índice (zset) das respostas
+# ARGV: [1] agora (ms)
+SCRIPT_BUSCAR = """
+local valor = redis.call('GET', KEYS[1])
+if valor then
+    redis.call('ZADD', KEYS[2], 'XX', tonumber(ARGV[1]), KEYS[1])
+end
+return valor
+"""
+
+# KEYS: [1] chave da resposta, [2] índice (zset) das respostas
+# ARGV: [1] agora (ms), [2] valor, [3] ttl (s), [4] máximo de itens
+SCRIPT_GRAVAR = """
+redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+redis.call('ZADD', KEYS[2], tonumber(ARGV[1]), KEYS[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', tonumber(ARGV[1]) - tonumber(ARGV[3]) * 1000)
+local excedente = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if excedente > 0 then
+    local removidas = redis.call('ZPOPMIN', KEYS[2], excedente)
+    for i = 1, #removidas, 2 do
+        redis.call('DEL', removidas[i])
+    end
+    return excedente
+end
+return 0
+"""
+
+
+class ResponseCache:
+    """
+    Classe responsável por guardar as respostas do chatbot para turnos idênticos (mesmo campo, versão do contexto, texto,
+    histórico, comando, modelo e temperatura). As respostas expiram após RESPONSE_CACHE_TTL e o total de respostas é limitado
+    a RESPONSE_CACHE_MAX_ITENS, removendo as menos utilizadas recentemente.
+    """
+    PREFIXO = "resposta_cache:"
+    INDICE = "resposta_cache:indice"
+
+    def __init__(self, config, logs, redis: AsyncRedisAdapter):
+        """
+        Inicializa o cache
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado
+        """
+        self.logs = logs
+        self.ativo = config.get("RESPONSE_CACHE_ATIVO")
+        self.ttl = config.get("RESPONSE_CACHE_TTL")
+        self.max_itens = config.get("RESPONSE_CACHE_MAX_ITENS")
+        self.script_buscar = redis.get_conn().register_script(SCRIPT_BUSCAR)
+        self.script_gravar = redis.get_conn().register_script(SCRIPT_GRAVAR)
+        self.estatisticas = {"hits": 0, "misses": 0, "ignoradas": 0, "gravacoes": 0, "removidas": 0, "falhas_redis": 0}
+
+    @staticmethod
+    def normaliza(valor: str, minusculo: bool = False) -> str:
+        """
+        Normaliza um valor para compor a chave (espaços colapsados e, opcionalmente, em minúsculo)
+        :param valor: Valor a ser normalizado
+        :param minusculo: Se o valor deve ser convertido para minúsculo
+        :return: Valor normalizado
+        """
+        valor = re.sub(r"\s+", " ", valor or "").strip()
+        return valor.lower() if minusculo else valor
+
+    @staticmethod
+    def versao_contexto(context: dict) -> str:
+        """
+        Versão do contexto do campo: o campo version do documento, se existir, ou o hash do conteúdo utilizado no prompt
+        :param context: Contexto do campo
+        :return: Versão do contexto
+        """
+        if context.get("version") is not None:
+            return str(context.get("version"))
+        conteudo = json.dumps([context.get("context"), context.get("soft_limit", 0), context.get("hard_limit", 0)], ensure_ascii=False, default=str)
+        return hashlib.sha1(conteudo.encode()).hexdigest()
+
+    def chave(self, chatbot: dict, context: dict, modelo: str, temperatura: float) -> str:
+        """
+        Gera a chave da resposta a partir dos dados normalizados do turno
+        :param chatbot: Dados do chatbot (campo, comando, texto e histórico)
+        :param context: Contexto do campo
+        :param modelo: Modelo utilizado
+        :param temperatura: Temperatura utilizada
+        :return: Chave da resposta no Redis
+        """
+        dados = [self.normaliza(chatbot.get("campo")), self.versao_contexto(context), self.normaliza(chatbot.get("texto")),
+                 self.normaliza(chatbot.get("historico")), self.normaliza(chatbot.get("comando"), minusculo=True), modelo, temperatura]
+        return self.PREFIXO + hashlib.sha256(json.dumps(dados, ensure_ascii=False).encode()).hexdigest()
+
+    async def get(self, chave: str, ignorar: bool = False):
+        """
+        Busca a resposta no cache
+        :param chave: Chave da resposta
+        :param ignorar: Se a consulta ao cache deve ser ignorada (bypass solicitado na requisição)
+        :return: Tupla (sumario, texto) ou None se não estiver no cache
+        """
+        if not self.ativo:
+            return None
+        if ignorar:
+            self.estatisticas["ignoradas"] += 1
+            return None
+
+        try:
+            valor = await self.script_buscar(keys=[chave, self.INDICE], args=[int(time.time() * 1000)])
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao consultar o cache de respostas: {ex}')
+            return None
+
+        if valor is None:
+            self.estatisticas["misses"] += 1
+            return None
+
+        self.estatisticas["hits"] += 1
+        valor = json.loads(valor)
+        return valor.get("sumario"), valor.get("texto")
+
+    async def set(self, chave: str, sumario: str, texto: str):
+        """
+        Guarda a resposta no cache, removendo as respostas excedentes
+        :param chave: Chave da resposta
+        :param sumario: Sumário da alteração
+        :param texto: Texto do campo
+        """
+        if not self.ativo:
+            return
+
+        try:
+            valor = json.dumps({"sumario": sumario, "texto": texto}, ensure_ascii=False)
+            removidas = await self.script_gravar(keys=[chave, self.INDICE], args=[int(time.time() * 1000), valor, self.ttl, self.max_itens])
+            self.estatisticas["gravacoes"] += 1
+            self.estatisticas["removidas"] += int(removidas)
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao gravar o cache de respostas: {ex}')
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do cache
+        :return: Dicionário com os contadores e a taxa de acerto
+        """
+        consultas = self.estatisticas["hits"] + self.estatisticas["misses"]
+        return {**self.estatisticas, "ativo": self.ativo, "taxa_acerto": round(self.estatisticas["hits"] / consultas, 4) if consultas else 0.0}
@@ -0,0 +1,340 @@
+"""
+Cache semântico local das respostas do chatbot (similaridade vetorial dos comandos com NumPy)
+"""
+# coding: utf-8
+
+from cache.response_cache import ResponseCache
+from unidecode import unidecode
+import numpy as np
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zlib
+
+
+class VetorizadorNgrams:
+    """
+    Vetorizador local e determinístico: n-gramas de caracteres de cada palavra (sem acentos e em minúsculo) são mapeados
+    por hash (crc32) para uma dimensão fixa, com sinal, e o vetor é normalizado (a similaridade de cosseno vira um produto interno).
+    Captura variações de escrita e de pontuação dos comandos ("Resuma o texto." e "resuma o texto"), não sinônimos. Como os n-gramas não
+    distinguem comandos de sentidos opostos ("não resuma o texto" e "resuma o texto") ou com quantidades diferentes ("em 3 linhas" e
+    "em 5 linhas"), a assinatura das negações e dos números do comando também precisa ser igual para que dois comandos sejam similares.
+    """
+    NEGACOES = {"nao", "nem", "nunca", "jamais", "sem", "nenhum", "nenhuma", "nada", "exceto", "evite", "evitar"}
+    NUMERAIS = {"um", "uma", "dois", "duas", "tres", "quatro", "cinco", "seis", "sete", "oito", "nove", "dez", "cem", "mil",
+                "primeiro", "primeira", "segundo", "segunda", "terceiro", "terceira", "metade", "dobro", "triplo"}
+
+    def __init__(self, dimensao: int = 1024, n_min: int = 2, n_max: int = 4):
+        """
+        :param dimensao: Dimensão dos vetores
+        :param n_min: Tamanho mínimo dos n-gramas
+        :param n_max: Tamanho máximo dos n-gramas
+        """
+        self.dimensao = dimensao
+        self.n_min = n_min
+        self.n_max = n_max
+
+    @staticmethod
+    def normalizar(texto: str) -> str:
+        """
+        Normaliza o texto: sem acentos, em minúsculo, sem pontuação e com espaços colapsados
+        :param texto: Texto a ser normalizado
+        :return: Texto normalizado
+        """
+        texto = re.sub(r"[^a-z0-9]+", " ", unidecode(texto or "").lower())
+        return re.sub(r"\s+", " ", texto).strip()
+
+    def assinatura(self, texto: str) -> int:
+        """
+        Gera a assinatura dos termos que invertem ou quantificam o comando (negações e números)
+        :param texto: Texto do comando
+        :return: Inteiro de 64 bits (o mesmo para comandos com as mesmas negações e números)
+        """
+        termos = sorted((termo.lstrip("0") or "0") if termo.isdigit() else termo for termo in self.normalizar(texto).split(" ")
+                        if termo.isdigit() or termo in self.NEGACOES or termo in self.NUMERAIS)
+        return int.from_bytes(hashlib.sha1(" ".join(termos).encode()).digest()[:8], "little", signed=True)
+
+    def vetorizar(self, texto: str) -> np.ndarray:
+        """
+        Gera o vetor normalizado do texto
+        :param texto: Texto a ser vetorizado
+        :return: Vetor float32 de norma 1 (ou nulo se o texto for vazio)
+        """
+        vetor = np.zeros(self.dimensao, dtype=np.float32)
+        for palavra in self.normalizar(texto).split(" "):
+            palavra = f" {palavra} "
+            for n in range(self.n_min, self.n_max + 1):
+                for i in range(len(palavra) - n + 1):
+                    h = zlib.crc32(palavra[i:i + n].encode())
+                    vetor[h % self.dimensao] += 1.0 if h & 0x80000000 else -1.0
+        norma = np.linalg.norm(vetor)
+        return vetor / norma if norma > 0 else vetor
+
+
+class IndiceCampo:
+    """
+    Índice com os vetores dos comandos de um campo, limitado à capacidade configurada (a memória cresce sob demanda até o limite).
+    Cada entrada pertence a um grupo (backend e modelo, versão do contexto, texto e histórico) e só é comparada com consultas do mesmo grupo e com a mesma
+    assinatura de negações e números do comando.
+    """
+    ALOCACAO_INICIAL = 16
+
+    def __init__(self, capacidade: int, dimensao: int):
+        """
+        :param capacidade: Quantidade máxima de entradas (a menos utilizada recentemente é substituída)
+        :param dimensao: Dimensão dos vetores
+        """
+        self.capacidade = capacidade
+        self.vetores = np.zeros((0, dimensao), dtype=np.float32)
+        self.grupos = np.zeros(0, dtype=np.int64)
+        self.assinaturas = np.zeros(0, dtype=np.int64)
+        self.uso = np.zeros(0, dtype=np.int64)
+        self.respostas = []
+        self.tamanho = 0
+        self.reservar(min(capacidade, self.ALOCACAO_INICIAL))
+
+    def reservar(self, alocacao: int):
+        """
+        Aumenta a área alocada para o índice
+        :param alocacao: Nova quantidade de entradas alocadas
+        """
+        extra = alocacao - len(self.grupos)
+        if extra <= 0:
+            return
+        self.vetores = np.vstack([self.vetores, np.zeros((extra, self.vetores.shape[1]), dtype=np.float32)])
+        self.grupos = np.concatenate([self.grupos, np.zeros(extra, dtype=np.int64)])
+        self.assinaturas = np.concatenate([self.assinaturas, np.zeros(extra, dtype=np.int64)])
+        self.uso = np.concatenate([self.uso, np.zeros(extra, dtype=np.int64)])
+        self.respostas.extend([None] * extra)
+
+    def buscar(self, grupo: int, assinatura: int, vetor: np.ndarray, limiar: float, marca: int):
+        """
+        Busca a entrada mais similar do grupo com a mesma assinatura
+        :param grupo: Grupo da consulta
+        :param assinatura: Assinatura das negações e dos números do comando
+        :param vetor: Vetor do comando
+        :param limiar: Similaridade mínima
+        :param marca: Marca de uso (contador crescente) para a política de substituição
+        :return: Tupla (resposta, similaridade) ou None
+        """
+        candidatos = np.flatnonzero((self.grupos[:self.tamanho] == grupo) & (self.assinaturas[:self.tamanho] == assinatura))
+        if candidatos.size == 0:
+            return None
+        similaridades = self.vetores[candidatos] @ vetor
+        melhor = int(np.argmax(similaridades))
+        if similaridades[melhor] < limiar:
+            return None
+        posicao = int(candidatos[melhor])
+        self.uso[posicao] = marca
+        return self.respostas[posicao], float(similaridades[melhor])
+
+    def adicionar(self, grupo: int, assinatura: int, vetor: np.ndarray, resposta: list, marca: int):
+        """
+        Adiciona uma entrada, substituindo a menos utilizada recentemente quando o índice estiver cheio
+        :param grupo: Grupo da entrada
+        :param assinatura: Assinatura das negações e dos números do comando
+        :param vetor: Vetor do comando
+        :param resposta: Resposta [sumario, texto]
+        :param marca: Marca de uso
+        """
+        if self.tamanho == len(self.grupos) and self.tamanho < self.capacidade:
+            self.reservar(min(self.capacidade, 2 * self.tamanho))
+        if self.tamanho < self.capacidade:
+            posicao = self.tamanho
+            self.tamanho += 1
+        else:
+            posicao = int(np.argmin(self.uso[:self.tamanho]))
+        self.vetores[posicao] = vetor
+        self.grupos[posicao] = grupo
+        self.assinaturas[posicao] = assinatura
+        self.uso[posicao] = marca
+        self.respostas[posicao] = resposta
+
+    def entradas(self) -> tuple:
+        """
+        Entradas ocupadas do índice
+        :return: Tupla (vetores, grupos, assinaturas, uso, respostas)
+        """
+        return (self.vetores[:self.tamanho], self.grupos[:self.tamanho], self.assinaturas[:self.tamanho], self.uso[:self.tamanho],
+                self.respostas[:self.tamanho])
+
+
+class SemanticCache:
+    """
+    Classe responsável pelo cache semântico por campo: comandos próximos (similaridade acima de SEMANTIC_CACHE_LIMIAR) sobre o mesmo
+    campo, contexto, texto e histórico reaproveitam a resposta, sem chamar o modelo. Assim como no cache de respostas, as entradas são
+    separadas pelo backend e modelo ("backend/modelo") que gerou a resposta. Funciona totalmente offline, em memória do worker,
+    com persistência em disco (SEMANTIC_CACHE_ARQUIVO) na parada e carga na inicialização. Os workers compartilham o arquivo: cada um
+    mescla os seus índices aos já gravados, com uma trava exclusiva sobre o arquivo durante a gravação.
+    """
+    # Versão do formato do arquivo (arquivos de versões anteriores são ignorados)
+    VERSAO_ARQUIVO = 3
+
+    def __init__(self, config, logs):
+        """
+        Inicializa o cache semântico
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        """
+        self.logs = logs
+        self.limiar = config.get("SEMANTIC_CACHE_LIMIAR")
+        self.capacidade = config.get("SEMANTIC_CACHE_CAPACIDADE")
+        self.arquivo = config.get("SEMANTIC_CACHE_ARQUIVO")
+        self.vetorizador = VetorizadorNgrams(dimensao=config.get("SEMANTIC_CACHE_DIMENSAO"))
+        self.indices = {}
+        self.marca = 0
+        self.estatisticas = {"hits": 0, "misses": 0, "gravacoes": 0}
+
+    @staticmethod
+    def grupo(chatbot: dict, context: dict, modelo: str) -> int:
+        """
+        Grupo da consulta: hash do backend e modelo, da versão do contexto, do texto e do histórico normalizados
+        :param chatbot: Dados do chatbot
+        :param context: Contexto do campo
+        :param modelo: Backend e modelo que geraram a resposta ("backend/modelo")
+        :return: Inteiro de 64 bits
+        """
+        dados = [modelo, ResponseCache.versao_contexto(context), ResponseCache.normaliza(chatbot.get("texto")), ResponseCache.normaliza(chatbot.get("historico"))]
+        return int.from_bytes(hashlib.sha1(json.dumps(dados, ensure_ascii=False).encode()).digest()[:8], "little", signed=True)
+
+    def buscar(self, chatbot: dict, context: dict, modelo: str):
+        """
+        Busca uma resposta para um comando similar no mesmo campo, contexto, texto e histórico, gerada pelo mesmo backend e modelo
+        :param chatbot: Dados do chatbot
+        :param context: Contexto do campo
+        :param modelo: Backend e modelo que responderiam a consulta ("backend/modelo")
+        :return: Tupla (sumario, texto) ou None
+        """
+        indice = self.indices.get(ResponseCache.normaliza(chatbot.get("campo")))
+        self.marca += 1
+        resultado = None
+        if indice is not None:
+            comando = chatbot.get("comando")
+            resultado = indice.buscar(self.grupo(chatbot, context, modelo), self.vetorizador.assinatura(comando), self.vetorizador.vetorizar(comando),
+                                      self.limiar, self.marca)
+
+        if resultado is None:
+            self.estatisticas["misses"] += 1
+            return None
+
+        self.estatisticas["hits"] += 1
+        (sumario, texto), _ = resultado
+        return sumario, texto
+
+    def adicionar(self, chatbot: dict, context: dict, modelo: str, sumario: str, texto: str):
+        """
+        Adiciona a resposta de um comando ao índice do campo
+        :param chatbot: Dados do chatbot
+        :param context: Contexto do campo
+        :param modelo: Backend e modelo que geraram a resposta ("backend/modelo")
+        :param sumario: Sumário da alteração
+        :param texto: Texto do campo
+        """
+        campo = ResponseCache.normaliza(chatbot.get("campo"))
+        indice = self.indices.get(campo)
+        if indice is None:
+            indice = self.indices[campo] = IndiceCampo(self.capacidade, self.vetorizador.dimensao)
+        self.marca += 1
+        comando = chatbot.get("comando")
+        indice.adicionar(self.grupo(chatbot, context, modelo), self.vetorizador.assinatura(comando), self.vetorizador.vetorizar(comando), [sumario, texto], self.marca)
+        self.estatisticas["gravacoes"] += 1
+
+    def mesclar(self, persistidos: dict):
+        """
+        Mescla os índices persistidos (gravados também pelos outros workers) aos índices em memória: as entradas em memória têm prioridade,
+        seguidas das persistidas, das mais para as menos utilizadas, sem duplicatas e até a capacidade de cada campo
+        :param persistidos: Dicionário campo -> (vetores, grupos, assinaturas, uso, respostas)
+        """
+        for campo in list(self.indices.keys()) + [campo for campo in persistidos if campo not in self.indices]:
+            fontes = [self.indices[campo].entradas()] if campo in self.indices else []
+            if campo in persistidos:
+                fontes.append(persistidos[campo])
+            entradas = []
+            vistas = set()
+            for vetores, grupos, assinaturas, uso, respostas in fontes:
+                for posicao in np.argsort(-np.asarray(uso), kind="stable"):
+                    chave = (int(grupos[posicao]), int(assinaturas[posicao]), vetores[posicao].tobytes())
+                    if chave not in vistas:
+                        vistas.add(chave)
+                        entradas.append((int(grupos[posicao]), int(assinaturas[posicao]), vetores[posicao], respostas[posicao]))
+            entradas = entradas[:self.capacidade]
+            indice = IndiceCampo(self.capacidade, self.vetorizador.dimensao)
+            # As marcas de uso de workers diferentes não são comparáveis: são renumeradas pela ordem de prioridade
+            for marca, (grupo, assinatura, vetor, resposta) in enumerate(reversed(entradas), start=1):
+                indice.adicionar(grupo, assinatura, vetor, resposta, marca)
+            self.indices[campo] = indice
+            self.marca = max(self.marca, len(entradas))
+
+    def ler_arquivo(self) -> dict:
+        """
+        Lê os índices persistidos em disco
+        :return: Dicionário campo -> (vetores, grupos, assinaturas, uso, respostas) (vazio se o arquivo não existir ou for incompatível)
+        """
+        if not os.path.exists(self.arquivo):
+            return {}
+        try:
+            with np.load(self.arquivo, allow_pickle=False) as dados:
+                meta = json.loads(str(dados["meta"]))
+                if meta.get("versao") != self.VERSAO_ARQUIVO:
+                    self.logs.error(f'Cache semântico ignorado: formato persistido {meta.get("versao")} diferente do atual')
+                    return {}
+                if meta.get("dimensao") != self.vetorizador.dimensao:
+                    self.logs.error(f'Cache semântico ignorado: dimensão persistida {meta.get("dimensao")} diferente da configurada')
+                    return {}
+                return {campo: (dados[f"vetores_{i}"], dados[f"grupos_{i}"], dados[f"assinaturas_{i}"], dados[f"uso_{i}"], meta.get("respostas")[i])
+                        for i, campo in enumerate(meta.get("campos"))}
+        except Exception as ex:
+            self.logs.error(f'Erro ao ler o cache semântico: {ex}')
+            return {}
+
+    def salvar(self):
+        """
+        Persiste os índices em disco, mesclados aos já gravados pelos outros workers. A gravação é feita com uma trava exclusiva
+        (arquivo .lock) em um arquivo temporário único, publicado atomicamente
+        """
+        try:
+            diretorio = os.path.dirname(self.arquivo) or "."
+            os.makedirs(diretorio, exist_ok=True)
+            with open(f"{self.arquivo}.lock", "a") as trava:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+                self.mesclar(self.ler_arquivo())
+                campos = list(self.indices.keys())
+                arrays = {}
+                respostas = []
+                for i, campo in enumerate(campos):
+                    vetores, grupos, assinaturas, uso, respostas_campo = self.indices[campo].entradas()
+                    arrays[f"vetores_{i}"] = vetores
+                    arrays[f"grupos_{i}"] = grupos
+                    arrays[f"assinaturas_{i}"] = assinaturas
+                    arrays[f"uso_{i}"] = uso
+                    respostas.append(respostas_campo)
+                meta = {"versao": self.VERSAO_ARQUIVO, "campos": campos, "respostas": respostas, "dimensao": self.vetorizador.dimensao, "marca": self.marca}
+                descritor, temporario = tempfile.mkstemp(prefix=f"{os.path.basename(self.arquivo)}.", suffix=".tmp", dir=diretorio)
+                try:
+                    with os.fdopen(descritor, "wb") as destino:
+                        np.savez_compressed(destino, meta=np.array(json.dumps(meta, ensure_ascii=False)), **arrays)
+                    os.replace(temporario, self.arquivo)
+                except Exception:
+                    if os.path.exists(temporario):
+                        os.remove(temporario)
+                    raise
+        except Exception as ex:
+            self.logs.error(f'Erro ao salvar o cache semântico: {ex}')
+
+    def carregar(self):
+        """
+        Carrega os índices persistidos em disco, se existirem e tiverem o mesmo formato e a mesma dimensão configurada
+        """
+        self.mesclar(self.ler_arquivo())
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do cache semântico
+        :return: Dicionário com os contadores, a taxa de acerto e o total de entradas
+        """
+        consultas = self.estatisticas["hits"] + self.estatisticas["misses"]
+        return {**self.estatisticas, "taxa_acerto": round(self.estatisticas["hits"] / consultas, 4) if consultas else 0.0,
+                "campos": len(self.indices), "entradas": sum(indice.tamanho for indice in self.indices.values())}
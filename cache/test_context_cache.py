@@ -0,0 +1,131 @@
+"""
+Testes do cache de contextos em memória
+"""
+# coding: utf-8
+
+from cache.context_cache import ContextCache
+from loguru import logger
+from models.context_model import CHAVE_VERSAO
+from shared_cache.shared_cache import SharedMemoryCache
+import os
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+class ContextModelFake:
+    """
+    Modelo de contexto em memória, contando as cargas completas
+    """
+    def __init__(self, contextos: dict):
+        self.contextos = dict(contextos)
+        self.cargas = 0
+
+    async def get_all_contexts(self) -> dict:
+        self.cargas += 1
+        return dict(self.contextos)
+
+    async def get_context(self, field: str):
+        return self.contextos.get(field)
+
+    async def get_contexts(self, fields: list) -> dict:
+        return {field: self.contextos[field] for field in fields if field in self.contextos}
+
+
+@pytest.fixture
+def shared(tmp_path):
+    segmento = SharedMemoryCache({"SHARED_CACHE_CONTEXTOS_SLOTS": 64, "SHARED_CACHE_CONTEXTOS_TAMANHO_SLOT": 1024, "SHARED_CACHE_ARQUIVO": str(tmp_path / "shm")},
+                                 logger, segmento="contextos")
+    yield segmento
+    segmento.close()
+
+
+def cria_cache(model, redis, shared=None) -> ContextCache:
+    config = {"CONTEXT_CACHE_TTL": 300, "CONTEXT_CACHE_INTERVALO_VERSAO": 1, "CONTEXT_CACHE_CHANGE_STREAM": False}
+    return ContextCache(config, logger, context_model=model, redis=redis, shared=shared)
+
+
+async def test_carga_da_mesma_versao_e_reaproveitada_pelos_workers(redis, shared):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}})
+    worker_1, worker_2 = cria_cache(model, redis, shared), cria_cache(model, redis, shared)
+    await worker_1.carregar(0)
+    await worker_2.carregar(0)
+    assert model.cargas == 1
+    assert await worker_2.get_context("descricao") == {"contexto": "v1"}
+    assert worker_2.estatisticas["cargas_compartilhadas"] == 1
+
+
+async def test_recargas_do_change_stream_leem_o_mongodb(redis, shared):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}})
+    cache = cria_cache(model, redis, shared)
+    await cache.carregar(forcar=True)
+    model.contextos["descricao"] = {"contexto": "v2"}
+    await cache.carregar(forcar=True)
+    assert await cache.get_context("descricao") == {"contexto": "v2"}
+    assert model.cargas == 2
+    assert shared.get(ContextCache.chave_compartilhada(None)) is None
+
+
+async def test_carga_sem_versao_nao_usa_o_segmento_compartilhado(redis, shared):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}})
+    await cria_cache(model, redis, shared).carregar()
+    model.contextos["descricao"] = {"contexto": "v2"}
+    cache = cria_cache(model, redis, shared)
+    await cache.carregar()
+    assert await cache.get_context("descricao") == {"contexto": "v2"}
+
+
+async def test_expiracao_do_ttl_recarrega_do_mongodb_e_atualiza_o_segmento(redis, shared):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}})
+    worker_1, worker_2 = cria_cache(model, redis, shared), cria_cache(model, redis, shared)
+    await worker_1.carregar(3)
+    model.contextos["descricao"] = {"contexto": "v2"}
+    await worker_2.carregar(3, forcar=True)
+    assert await worker_2.get_context("descricao") == {"contexto": "v2"}
+    await cria_cache(model, redis, shared).carregar(3)
+    assert model.cargas == 2
+    assert shared.get(ContextCache.chave_compartilhada(3, "descricao")) == {"contexto": "v2"}
+
+
+async def test_invalidar_incrementa_a_versao_e_recarrega(redis, shared):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}})
+    cache = cria_cache(model, redis, shared)
+    await cache.carregar(await cache.versao_atual())
+    model.contextos["descricao"] = {"contexto": "v2"}
+    await cache.invalidar()
+    assert int(await redis.get(CHAVE_VERSAO)) == 1
+    assert cache.versao == 1
+    assert await cache.get_context("descricao") == {"contexto": "v2"}
+
+
+async def test_contextos_grandes_demais_nao_compartilham_a_carga(redis, shared):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}, "objeto": {"contexto": os.urandom(2000).hex()}})
+    worker_1, worker_2 = cria_cache(model, redis, shared), cria_cache(model, redis, shared)
+    await worker_1.carregar(0)
+    assert worker_1.estatisticas["compartilhamentos_incompletos"] == 1
+    await worker_2.carregar(0)
+    assert model.cargas == 2 and worker_2.estatisticas["cargas_compartilhadas"] == 0
+
+
+async def test_contexto_substituido_no_segmento_recarrega_do_mongodb(redis, shared):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}, "objeto": {"contexto": "v1"}})
+    await cria_cache(model, redis, shared).carregar(0)
+    # Simula a substituição do slot do contexto por outra gravação
+    hash_chave = shared.hash_chave(ContextCache.chave_compartilhada(0, "objeto"))
+    offset = next(offset for offset in shared.slots_conjunto(hash_chave) if shared.le_slot(offset, hash_chave)[0])
+    shared.mm[offset:offset + shared.tamanho_slot] = bytes(shared.tamanho_slot)
+
+    cache = cria_cache(model, redis, shared)
+    await cache.carregar(0)
+    assert cache.estatisticas["cargas_compartilhadas_incompletas"] == 1
+    assert model.cargas == 2 and await cache.get_context("objeto") == {"contexto": "v1"}
+
+
+async def test_campos_ausentes_nao_sao_buscados_novamente(redis):
+    model = ContextModelFake({"descricao": {"contexto": "v1"}})
+    cache = cria_cache(model, redis)
+    await cache.carregar(0)
+    assert await cache.get_contexts(["descricao", "titulo"]) == {"descricao": {"contexto": "v1"}}
+    model.contextos["titulo"] = {"contexto": "novo"}
+    assert await cache.get_context("titulo") is None
+    assert cache.estatisticas["misses"] == 2
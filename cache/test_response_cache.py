@@ -0,0 +1,85 @@
+"""
+Testes do cache de respostas do chatbot (scripts Lua executados no fakeredis)
+"""
+# coding: utf-8
+
+from cache.response_cache import ResponseCache
+from loguru import logger
+from types import SimpleNamespace
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"RESPONSE_CACHE_ATIVO": True, "RESPONSE_CACHE_TTL": 60, "RESPONSE_CACHE_MAX_ITENS": 2}
+
+CONTEXTO = {"_id": "descricao", "context": "Descrição do objeto", "soft_limit": 0, "hard_limit": 0}
+
+
+class Relogio:
+    def __init__(self, monkeypatch):
+        self.agora = 1_700_000_000.0
+        monkeypatch.setattr("cache.response_cache.time", SimpleNamespace(time=lambda: self.agora))
+
+
+def chave(cache: ResponseCache, comando: str, context: dict = None, modelo: str = "chat_gpt/gpt") -> str:
+    chatbot = {"campo": "descricao", "comando": comando, "texto": "Texto  do campo", "historico": None}
+    return cache.chave(chatbot, context or CONTEXTO, modelo, 0.2)
+
+
+async def test_chave_normaliza_o_turno_e_separa_contexto_e_modelo(redis):
+    cache = ResponseCache(CONFIG, logger, redis=redis)
+    assert chave(cache, "Resuma  o texto ") == chave(cache, "resuma o texto")
+    assert chave(cache, "resuma o texto") != chave(cache, "resuma o texto", modelo="mistral/mistral")
+    assert chave(cache, "resuma o texto") != chave(cache, "resuma o texto", context={**CONTEXTO, "context": "Outro contexto"})
+    assert chave(cache, "resuma o texto", context={**CONTEXTO, "version": 2}) != chave(cache, "resuma o texto", context={**CONTEXTO, "version": 3})
+
+
+async def test_grava_busca_e_ignora_quando_solicitado(redis):
+    cache = ResponseCache(CONFIG, logger, redis=redis)
+    assert await cache.get(chave(cache, "resuma")) is None
+    await cache.set(chave(cache, "resuma"), "sumário", "texto")
+    assert await cache.get(chave(cache, "resuma")) == ("sumário", "texto")
+    assert await cache.get(chave(cache, "resuma"), ignorar=True) is None
+    assert cache.metricas()["hits"] == 1 and cache.metricas()["misses"] == 1 and cache.metricas()["ignoradas"] == 1
+
+
+async def test_capacidade_remove_a_resposta_menos_utilizada(redis, monkeypatch):
+    relogio = Relogio(monkeypatch)
+    cache = ResponseCache(CONFIG, logger, redis=redis)
+    for comando in ("a", "b"):
+        await cache.set(chave(cache, comando), comando, comando)
+        relogio.agora += 1
+    assert await cache.get(chave(cache, "a")) == ("a", "a")
+    relogio.agora += 1
+    await cache.set(chave(cache, "c"), "c", "c")
+
+    assert await cache.get(chave(cache, "b")) is None
+    assert await cache.get(chave(cache, "a")) == ("a", "a")
+    assert await cache.get(chave(cache, "c")) == ("c", "c")
+    assert cache.estatisticas["removidas"] == 1
+    assert await redis.get_conn().zcard(ResponseCache.INDICE) == 2
+
+
+async def test_respostas_expiradas_saem_do_indice(redis, monkeypatch):
+    relogio = Relogio(monkeypatch)
+    cache = ResponseCache(CONFIG, logger, redis=redis)
+    await cache.set(chave(cache, "a"), "a", "a")
+    relogio.agora += 61
+    await cache.set(chave(cache, "b"), "b", "b")
+    assert await redis.get_conn().zrange(ResponseCache.INDICE, 0, -1) == [chave(cache, "b").encode()]
+
+
+async def test_cache_inativo_ou_redis_com_falha_nao_interrompe(redis):
+    inativo = ResponseCache({**CONFIG, "RESPONSE_CACHE_ATIVO": False}, logger, redis=redis)
+    await inativo.set(chave(inativo, "a"), "a", "a")
+    assert await inativo.get(chave(inativo, "a")) is None
+
+    cache = ResponseCache(CONFIG, logger, redis=redis)
+
+    async def falhar(**_):
+        raise ConnectionError("Redis indisponível")
+
+    cache.script_buscar = cache.script_gravar = falhar
+    await cache.set(chave(cache, "a"), "a", "a")
+    assert await cache.get(chave(cache, "a")) is None
+    assert cache.estatisticas["falhas_redis"] == 2
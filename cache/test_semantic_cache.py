@@ -0,0 +1,118 @@
+"""
+Testes do cache semântico local
+"""
+# coding: utf-8
+
+from cache.semantic_cache import SemanticCache, VetorizadorNgrams
+from loguru import logger
+import multiprocessing
+import pytest
+
+
+def cria_cache(arquivo, capacidade: int = 100, limiar: float = 0.9) -> SemanticCache:
+    config = {"SEMANTIC_CACHE_LIMIAR": limiar, "SEMANTIC_CACHE_CAPACIDADE": capacidade, "SEMANTIC_CACHE_DIMENSAO": 1024,
+              "SEMANTIC_CACHE_ARQUIVO": str(arquivo)}
+    return SemanticCache(config, logger)
+
+
+def chatbot(comando: str, campo: str = "descricao") -> dict:
+    return {"campo": campo, "comando": comando, "texto": "Texto original do campo", "historico": None}
+
+
+CONTEXTO = {"_id": "descricao", "contexto": "Contexto do campo"}
+MODELO = "chat_gpt/gpt-teste"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return cria_cache(tmp_path / "semantic_cache.npz")
+
+
+def test_variacoes_de_escrita_reaproveitam_a_resposta(cache):
+    cache.adicionar(chatbot("Resuma o texto."), CONTEXTO, MODELO, "sumario", "texto resumido")
+    assert cache.buscar(chatbot("resuma  o texto"), CONTEXTO, MODELO) == ("sumario", "texto resumido")
+
+
+@pytest.mark.parametrize("salvo, consultado", [
+    ("resuma o texto", "não resuma o texto"),
+    ("não resuma o texto", "resuma o texto"),
+    ("resuma o texto em 3 linhas", "resuma o texto em 5 linhas"),
+    ("resuma o texto em três linhas", "resuma o texto em cinco linhas"),
+    ("liste os itens sem numeração", "liste os itens com numeração"),
+])
+def test_comandos_com_negacoes_ou_numeros_diferentes_nao_sao_similares(cache, salvo, consultado):
+    cache.adicionar(chatbot(salvo), CONTEXTO, MODELO, "sumario", "texto")
+    assert cache.buscar(chatbot(consultado), CONTEXTO, MODELO) is None
+
+
+def test_limiar_padrao_rejeita_comandos_proximos_de_sentidos_diferentes(cache):
+    cache.adicionar(chatbot("deixe mais formal"), CONTEXTO, MODELO, "sumario", "texto")
+    assert cache.buscar(chatbot("deixe mais informal"), CONTEXTO, MODELO) is None
+
+
+def test_assinatura_ignora_ordem_acentos_e_zeros_a_esquerda():
+    vetorizador = VetorizadorNgrams()
+    assert vetorizador.assinatura("Não use gírias e resuma em 03 linhas") == vetorizador.assinatura("resuma em 3 linhas, nao use girias")
+    assert vetorizador.assinatura("resuma em 3 linhas") != vetorizador.assinatura("resuma em 30 linhas")
+
+
+def test_campos_e_textos_diferentes_nao_compartilham_respostas(cache):
+    cache.adicionar(chatbot("resuma o texto"), CONTEXTO, MODELO, "sumario", "texto")
+    assert cache.buscar(chatbot("resuma o texto", campo="titulo"), CONTEXTO, MODELO) is None
+    assert cache.buscar({**chatbot("resuma o texto"), "texto": "Outro texto"}, CONTEXTO, MODELO) is None
+
+
+def test_respostas_de_outro_backend_ou_modelo_nao_sao_reaproveitadas(cache):
+    cache.adicionar(chatbot("resuma o texto"), CONTEXTO, "mistral/mistral-teste", "sumario", "texto")
+    assert cache.buscar(chatbot("resuma o texto"), CONTEXTO, MODELO) is None
+    assert cache.buscar(chatbot("resuma o texto"), CONTEXTO, "mistral/outro-modelo") is None
+    assert cache.buscar(chatbot("resuma o texto"), CONTEXTO, "mistral/mistral-teste") == ("sumario", "texto")
+
+
+def test_capacidade_substitui_a_entrada_menos_utilizada(tmp_path):
+    cache = cria_cache(tmp_path / "semantic_cache.npz", capacidade=2)
+    cache.adicionar(chatbot("resuma o texto"), CONTEXTO, MODELO, "s1", "t1")
+    cache.adicionar(chatbot("corrija a ortografia"), CONTEXTO, MODELO, "s2", "t2")
+    assert cache.buscar(chatbot("resuma o texto"), CONTEXTO, MODELO) == ("s1", "t1")
+    cache.adicionar(chatbot("traduza para o inglês"), CONTEXTO, MODELO, "s3", "t3")
+    assert cache.buscar(chatbot("corrija a ortografia"), CONTEXTO, MODELO) is None
+    assert cache.buscar(chatbot("resuma o texto"), CONTEXTO, MODELO) == ("s1", "t1")
+
+
+def test_salvar_mescla_os_indices_dos_workers(tmp_path):
+    arquivo = tmp_path / "semantic_cache.npz"
+    worker_1, worker_2 = cria_cache(arquivo), cria_cache(arquivo)
+    worker_1.adicionar(chatbot("resuma o texto"), CONTEXTO, MODELO, "s1", "t1")
+    worker_2.adicionar(chatbot("corrija a ortografia"), CONTEXTO, MODELO, "s2", "t2")
+    worker_2.adicionar(chatbot("resuma o texto"), CONTEXTO, MODELO, "s1", "t1")
+    worker_1.salvar()
+    worker_2.salvar()
+
+    novo = cria_cache(arquivo)
+    novo.carregar()
+    assert novo.buscar(chatbot("resuma o texto"), CONTEXTO, MODELO) == ("s1", "t1")
+    assert novo.buscar(chatbot("corrija a ortografia"), CONTEXTO, MODELO) == ("s2", "t2")
+    assert novo.metricas()["entradas"] == 2
+    assert [caminho.name for caminho in tmp_path.iterdir() if caminho.name.endswith(".tmp")] == []
+
+
+def salvar_worker(arquivo: str, worker: int):
+    cache = cria_cache(arquivo, capacidade=1000)
+    for i in range(50):
+        cache.adicionar(chatbot(f"comando {worker} {i}", campo=f"campo_{worker}"), CONTEXTO, MODELO, f"s{worker}", f"t{i}")
+    cache.salvar()
+
+
+def test_gravacoes_simultaneas_nao_corrompem_nem_perdem_indices(tmp_path):
+    arquivo = str(tmp_path / "semantic_cache.npz")
+    processos = [multiprocessing.get_context("fork").Process(target=salvar_worker, args=(arquivo, worker)) for worker in range(4)]
+    for processo in processos:
+        processo.start()
+    for processo in processos:
+        processo.join()
+
+    cache = cria_cache(arquivo, capacidade=1000)
+    cache.carregar()
+    assert cache.metricas()["campos"] == 4
+    assert cache.metricas()["entradas"] == 200
+    assert cache.buscar(chatbot("comando 3 7", campo="campo_3"), CONTEXTO, MODELO) == ("s3", "t7")
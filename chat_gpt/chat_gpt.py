@@ -1,38 +1,159 @@
 # coding: utf-8
 
-from openai import OpenAI
-from redis_adapter.redis_adapter import RedisAdapter
-from time import sleep
+from openai import AsyncOpenAI, APIStatusError
+from backends.backend import Backend
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+from chat_gpt.openai_clients import OpenAIClientRegistry
+from key_scheduler.key_scheduler import KeyScheduler, Reserva
+from retry_policy.retry_policy import RetryPolicy
+import asyncio
 
 
-class ChatGpt:
+class ChatGpt(Backend):
     """
-    Classe para acessar a API ChatGPT
+    Classe para acessar a API ChatGPT (e as APIs compatíveis com a da OpenAI, através dos parâmetros do provedor)
     """
-    def __init__(self, config, logs):
+    NOME = "chat_gpt"
+    # Opções do streaming (a OpenAI só envia o consumo de tokens no último trecho quando solicitado)
+    OPCOES_STREAM = {"stream_options": {"include_usage": True}}
+
+    def __init__(self, config, logs, redis: AsyncRedisAdapter = None, keys_key: str = None, modelo: str = None, base_url: str = None, prefixo: str = "chaves_openai", custo: float = None):
         """
         Inicializa o objeto da ChatGPT
         :param config: Objeto de configuração
         :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado (se não informado, é criado um próprio)
+        :param keys_key: Chave no Redis onde as chaves da API estão armazenadas (se não informada, REDIS_CHAT_GPT_KEYS_KEY)
+        :param modelo: Modelo utilizado por padrão (se não informado, CHATGPT_AI_MODEL)
+        :param base_url: URL base da API (se não informada, a da OpenAI)
+        :param prefixo: Prefixo das chaves de estado do escalonador no Redis
+        :param custo: Custo por mil tokens (se não informado, CHATGPT_CUSTO_MIL_TOKENS)
         """
-        self.config = config
-        self.logs = logs
+        super().__init__(config, logs, modelo=modelo or config.get("CHATGPT_AI_MODEL"), custo=custo if custo is not None else config.get("CHATGPT_CUSTO_MIL_TOKENS"))
+        self.keys_key = keys_key or config.get("REDIS_CHAT_GPT_KEYS_KEY")
+        self.redis = redis if redis is not None else AsyncRedisAdapter(self.config.get('REDIS_DB_CONTROLES'))
+        self.redis_proprio = redis is None
+        self.clientes = OpenAIClientRegistry(config, logs, redis=self.redis, keys_key=self.keys_key, base_url=base_url)
+        self.escalonador = KeyScheduler(config, logs, redis=self.redis, keys_key=self.keys_key, prefixo=prefixo) if config.get("CHAVES_ESCALONADOR_ATIVO") else None
+        self.politica = RetryPolicy(config, logs, troca_chave=self.escalonador is not None)
 
-    def retorna_chave_chat_gpt_disponivel(self) -> str:
+    def retorna_cliente(self, chave: str) -> AsyncOpenAI:
+        """
+        Retorna o cliente da OpenAI da chave informada, reaproveitando o cliente (e suas conexões) entre as requisições
+        :param chave: Chave da API
+        :return: Cliente da OpenAI
+        """
+        return self.clientes.get(chave)
+
+    async def aquecer_clientes(self) -> int:
+        """
+        Cria antecipadamente os clientes da OpenAI de todas as chaves armazenadas no Redis e inicia a sincronização periódica das chaves
+        :return: Quantidade de clientes disponíveis
+        """
+        quantidade = await self.clientes.sincronizar()
+        self.clientes.iniciar()
+        return quantidade
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas dos clientes da OpenAI
+        :return: Dicionário com as métricas do registro de clientes
+        """
+        return {"clientes_openai": self.clientes.metricas(), "escalonador_chaves": self.escalonador.metricas() if self.escalonador is not None else None,
+                "novas_tentativas": self.politica.metricas()}
+
+    async def close(self):
+        """
+        Fecha os clientes da OpenAI e a conexão com o Redis, se ela pertencer ao objeto
+        """
+        await self.clientes.close()
+        if self.redis_proprio:
+            await self.redis.close()
+
+    async def retorna_chave_chat_gpt_disponivel(self) -> str:
         """
         Retorna uma chave disponível para a utilização da API da ChatGPT (através da rotação das chaves)
         :return: Chave disponível para uso
         """
         try:
-            redis = RedisAdapter(self.config.get('REDIS_DB_CONTROLES'))
-            resultado = redis.retorna_chave_disponivel(self.config.get("REDIS_CHAT_GPT_KEYS_KEY"))
-            redis.close()
+            resultado = await self.redis.retorna_chave_disponivel(self.keys_key)
 
             return resultado
         except Exception as ex:
             self.logs.error(f'Erro ao retornar a chave disponível - Error:{ex}')
 
-    def envia_mensagem_chat(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None) -> (str, int):
+    async def reserva_chave(self) -> Reserva:
+        """
+        Reserva a chave da chamada: a menos carregada entre as disponíveis (escalonador) ou sorteada (rotação das chaves)
+        :return: Reserva da chave
+        """
+        if self.escalonador is not None:
+            return await self.escalonador.reservar()
+        return Reserva(chave=await self.retorna_chave_chat_gpt_disponivel())
+
+    async def libera_chave(self, reserva: Reserva, headers=None, ex: Exception = None):
+        """
+        Libera a reserva da chave, repassando ao escalonador os cabeçalhos de limite da resposta ou do erro
+        :param reserva: Reserva da chave
+        :param headers: Cabeçalhos da resposta (sucesso)
+        :param ex: Exceção da chamada (erro)
+        """
+        if self.escalonador is None:
+            return
+        if isinstance(ex, APIStatusError):
+            # Erros da requisição (4xx que não são de limite ou de autorização) não contam contra a chave
+            falhou = ex.status_code not in (400, 404, 409, 413, 422)
+            await self.escalonador.liberar(reserva, headers=ex.response.headers, status_code=ex.status_code, codigo_erro=ex.code, falhou=falhou)
+        else:
+            await self.escalonador.liberar(reserva, headers=headers, falhou=ex is not None)
+
+    async def envia_mensagem_chat_stream(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None):
+        """
+        Envia uma mensagem para o chat do Chat GPT recebendo a resposta em streaming
+        As tentativas só são refeitas enquanto nenhum trecho da resposta tiver sido repassado (política em retry_policy.RetryPolicy).
+        :param mensagem: Mensagem a ser enviada
+        :param json_format: Formato da resposta
+        :param prefix: Prefixo da mensagem
+        :param context: Contexto da mensagem
+        :param temperature: Temperatura da resposta
+        :return: Gerador assíncrono de tuplas ("delta", trecho) e, ao final, ("tokens", total_tokens)
+        :raises Exception: Se ocorrer um erro não retentável ou após o início do streaming
+        :raises TentativasEsgotadasError: Se exceder o número de tentativas ou o prazo total
+        """
+        tentativas = self.politica.iniciar()
+        while True:
+            iniciado = False
+            reserva, headers, erro = None, None, None
+            try:
+                reserva = await self.reserva_chave()
+                client = self.retorna_cliente(reserva.chave)
+
+                pergunta = self.monta_mensagens(mensagem, prefix, context)
+                raw_response = await client.chat.completions.with_raw_response.create(messages=pergunta, stream=True, timeout=tentativas.restante(), **self.OPCOES_STREAM, **self.monta_parametros(json_format, temperature))
+                headers = raw_response.headers
+                stream = raw_response.parse()
+
+                total_tokens = 0
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        iniciado = True
+                        yield "delta", chunk.choices[0].delta.content
+                    if chunk.usage is not None:
+                        total_tokens = chunk.usage.total_tokens
+
+                yield "tokens", total_tokens
+                return
+            except Exception as ex:
+                erro = ex
+                self.logs.error(f'Erro ao enviar mensagem para o chat (stream) - Error:{ex}')
+                if iniciado:
+                    raise ex
+            finally:
+                # A chave fica reservada até o fim do streaming
+                await self.libera_chave(reserva, headers=headers, ex=erro)
+            await tentativas.aguardar(erro)
+
+    async def envia_mensagem_chat(self, mensagem: str, json_format: bool = False, prefix: str = None, context: str = None, temperature: float = None, modelo: str = None) -> (str, int):
         """
         Envia uma mensagem para o chat do Chat GPT
         :param mensagem: Mensagem a ser enviada
@@ -40,39 +161,26 @@ class ChatGpt:
         :param prefix: Prefixo da mensagem
         :param context: Contexto da mensagem
         :param temperature: Temperatura da resposta
+        :param modelo: Modelo a ser utilizado (se não informado, o modelo padrão)
         :return: Resposta do chat e o total de tokens utilizados
         :rtype: (str, int)
-        :raises Exception: Se ocorrer um erro ao enviar a mensagem ou se exceder o número de tentativas
+        :raises Exception: Se ocorrer um erro não retentável ao enviar a mensagem
+        :raises TentativasEsgotadasError: Se exceder o número de tentativas ou o prazo total
         """
-        retries = 0
-        while retries < self.config.get('CHAT_GPT_RETRIES'):
+        tentativas = self.politica.iniciar()
+        while True:
+            reserva = None
             try:
-                # Instanciando o objeto do mistral
-                chave_chat_gpt = self.retorna_chave_chat_gpt_disponivel()
-                client = OpenAI(api_key=chave_chat_gpt)
-
-                # Criando o chat
-                if prefix is not None:
-                    if context is not None:
-                        pergunta = [{"role": "system", "content": context}, {"role": "user", "content": mensagem}]
-                    else:
-                        pergunta = [{"role": "user", "content": mensagem}]
-                else:
-                    if context is not None:
-                        pergunta = [{"role": "system", "content": context}, {"role": "user", "content": mensagem}]
-                    else:
-                        pergunta = [{"role": "user", "content": mensagem}]
-
-                if json_format:
-                    if temperature is not None:
-                        chat_response = client.chat.completions.create(model=self.config.get("CHATGPT_AI_MODEL"), messages=pergunta, response_format={"type": "json_object"}, temperature=temperature)
-                    else:
-                        chat_response = client.chat.completions.create(model=self.config.get("CHATGPT_AI_MODEL"), messages=pergunta, response_format={"type": "json_object"})
-                else:
-                    if temperature is not None:
-                        chat_response = client.chat.completions.create(model=self.config.get("CHATGPT_AI_MODEL"), messages=pergunta, response_format={"type": "text"}, temperature=temperature)
-                    else:
-                        chat_response = client.chat.completions.create(model=self.config.get("CHATGPT_AI_MODEL"), messages=pergunta, response_format={"type": "text"})
+                # Reservando a chave e recuperando o cliente da OpenAI
+                reserva = await self.reserva_chave()
+                client = self.retorna_cliente(reserva.chave)
+
+                # Criando o chat (a resposta bruta traz os cabeçalhos de limite da chave)
+                pergunta = self.monta_mensagens(mensagem, prefix, context)
+                raw_response = await client.chat.completions.with_raw_response.create(messages=pergunta, timeout=tentativas.restante(), **self.monta_parametros(json_format, temperature, modelo))
+                await self.libera_chave(reserva, headers=raw_response.headers)
+                reserva = None
+                chat_response = raw_response.parse()
 
                 # Processando a resposta
                 retorno_chat_gpt = chat_response.choices[0].message.content
@@ -82,11 +190,14 @@ class ChatGpt:
                 total_tokens = chat_response.usage.total_tokens
 
                 return retorno_chat_gpt, total_tokens
+            except asyncio.CancelledError:
+                # Chamada cancelada (ex.: hedge perdedor): a chave é liberada sem contar como falha
+                if reserva is not None:
+                    await self.libera_chave(reserva)
+                raise
             except Exception as ex:
-                # Em caso de erro faz o log e aguarda de maneira incremental com relação a tentativa
+                # Em caso de erro faz o log e, se o erro for retentável, aguarda o backoff antes de tentar com outra chave
                 self.logs.error(f'Erro ao enviar mensagem para o chat - Error:{ex}')
-                retries += 1
-                sleep(self.config.get('CHAT_GPT_TIMEOUT') * retries * self.config.get('CHAT_GPT_INCREASE_FACTORY'))
-
-        # Caso estoure o limite de tentativas
-        raise Exception('Erro ao enviar mensagem para o chat - Excedido o número de tentativas')
+                if reserva is not None:
+                    await self.libera_chave(reserva, ex=ex)
+                await tentativas.aguardar(ex)
@@ -0,0 +1,164 @@
+"""
+Registro dos clientes da OpenAI de longa duração, um por chave da API
+"""
+# coding: utf-8
+
+from openai import AsyncOpenAI
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+import asyncio
+import httpx
+import time
+
+
+class EstatisticasConexao:
+    """
+    Contadores de reaproveitamento das conexões, alimentados pelos eventos de trace do httpcore
+    (cada requisição que não abre uma conexão TCP reaproveita uma conexão keep-alive do pool)
+    """
+    def __init__(self):
+        self.requisicoes = 0
+        self.conexoes_novas = 0
+        self.handshakes_tls = 0
+        self.tempo_conexao = 0.0
+
+    async def hook_requisicao(self, request: httpx.Request):
+        """
+        Hook de requisição do httpx: registra a requisição e instala o trace do httpcore
+        :param request: Requisição a ser enviada
+        """
+        self.requisicoes += 1
+        inicios = {}
+
+        async def trace(evento: str, info: dict):
+            if evento.endswith(".started"):
+                inicios[evento[:-len(".started")]] = time.perf_counter()
+            elif evento == "connection.connect_tcp.complete":
+                self.conexoes_novas += 1
+                self.tempo_conexao += time.perf_counter() - inicios.get("connection.connect_tcp", time.perf_counter())
+            elif evento == "connection.start_tls.complete":
+                self.handshakes_tls += 1
+                self.tempo_conexao += time.perf_counter() - inicios.get("connection.start_tls", time.perf_counter())
+
+        request.extensions["trace"] = trace
+
+    def metricas(self) -> dict:
+        """
+        Retorna os contadores de conexão
+        :return: Dicionário com as requisições, conexões novas, handshakes TLS, taxa de reaproveitamento e tempo médio de conexão
+        """
+        reaproveitadas = max(self.requisicoes - self.conexoes_novas, 0)
+        return {"requisicoes": self.requisicoes, "conexoes_novas": self.conexoes_novas, "handshakes_tls": self.handshakes_tls,
+                "taxa_reaproveitamento": round(reaproveitadas / self.requisicoes, 4) if self.requisicoes else 0.0,
+                "tempo_medio_conexao_ms": round(self.tempo_conexao / self.conexoes_novas * 1000, 2) if self.conexoes_novas else 0.0}
+
+
+class OpenAIClientRegistry:
+    """
+    Classe responsável por manter um cliente da OpenAI por chave do conjunto de chaves no Redis, criado uma única vez por worker,
+    com pool de conexões keep-alive e timeouts explícitos (OPENAI_HTTP_*), para que as chamadas ao modelo não paguem o estabelecimento
+    de conexão TCP/TLS. O conjunto de chaves é sincronizado a cada OPENAI_CHAVES_INTERVALO segundos: clientes de chaves novas são criados
+    e os de chaves removidas são fechados na sincronização seguinte (as chamadas em andamento terminam no cliente antigo).
+    """
+    def __init__(self, config, logs, redis: AsyncRedisAdapter, keys_key: str = None, base_url: str = None):
+        """
+        Inicializa o registro (os clientes são criados na sincronização ou no primeiro uso da chave)
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado
+        :param keys_key: Chave no Redis onde as chaves estão armazenadas (se não informada, REDIS_CHAT_GPT_KEYS_KEY)
+        :param base_url: URL base da API (APIs compatíveis com a da OpenAI; se não informada, a da OpenAI)
+        """
+        self.config = config
+        self.logs = logs
+        self.redis = redis
+        self.keys_key = keys_key or config.get("REDIS_CHAT_GPT_KEYS_KEY")
+        self.base_url = base_url
+        self.intervalo = config.get("OPENAI_CHAVES_INTERVALO")
+        self.clientes = {}
+        self.aposentados = []
+        self.conexoes = EstatisticasConexao()
+        self.tarefa = None
+        self.estatisticas = {"chaves_adicionadas": 0, "chaves_removidas": 0, "sincronizacoes": 0, "falhas_sincronizacao": 0}
+
+    def cria_cliente(self, chave: str) -> AsyncOpenAI:
+        """
+        Cria o cliente da OpenAI de uma chave, com o cliente HTTP configurado
+        :param chave: Chave da API
+        :return: Cliente da OpenAI
+        """
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.config.get("OPENAI_HTTP_MAX_CONNECTIONS"), max_keepalive_connections=self.config.get("OPENAI_HTTP_MAX_KEEPALIVE"), keepalive_expiry=self.config.get("OPENAI_HTTP_KEEPALIVE_EXPIRY")),
+            timeout=httpx.Timeout(self.config.get("OPENAI_HTTP_READ_TIMEOUT"), connect=self.config.get("OPENAI_HTTP_CONNECT_TIMEOUT")),
+            event_hooks={"request": [self.conexoes.hook_requisicao]})
+        # As novas tentativas são feitas pela RetryPolicy (com troca de chave e prazo total), não pelo SDK
+        return AsyncOpenAI(api_key=chave, base_url=self.base_url, http_client=http_client, max_retries=0)
+
+    def get(self, chave: str) -> AsyncOpenAI:
+        """
+        Retorna o cliente da chave, criando-o se ainda não existir
+        :param chave: Chave da API
+        :return: Cliente da OpenAI
+        """
+        client = self.clientes.get(chave)
+        if client is None:
+            client = self.clientes[chave] = self.cria_cliente(chave)
+            self.estatisticas["chaves_adicionadas"] += 1
+        return client
+
+    async def sincronizar(self) -> int:
+        """
+        Sincroniza os clientes com o conjunto de chaves do Redis
+        :return: Quantidade de clientes ativos
+        """
+        # Os clientes aposentados na sincronização anterior já não têm chamadas em andamento
+        aposentados, self.aposentados = self.aposentados, []
+        for client in aposentados:
+            await client.close()
+
+        chaves = {chave.decode('utf-8') for chave in await self.redis.get_conn().smembers(self.keys_key)}
+        for chave in chaves - self.clientes.keys():
+            self.get(chave)
+        for chave in self.clientes.keys() - chaves:
+            self.aposentados.append(self.clientes.pop(chave))
+            self.estatisticas["chaves_removidas"] += 1
+        self.estatisticas["sincronizacoes"] += 1
+        return len(self.clientes)
+
+    async def monitorar(self):
+        """
+        Sincroniza periodicamente os clientes com o conjunto de chaves do Redis
+        """
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.sincronizar()
+            except Exception as ex:
+                self.estatisticas["falhas_sincronizacao"] += 1
+                self.logs.error(f'Erro ao sincronizar os clientes da OpenAI com as chaves do Redis: {ex}')
+
+    def iniciar(self):
+        """
+        Inicia a sincronização periódica das chaves
+        """
+        if self.tarefa is None:
+            self.tarefa = asyncio.create_task(self.monitorar())
+
+    async def close(self):
+        """
+        Interrompe a sincronização e fecha todos os clientes
+        """
+        if self.tarefa is not None:
+            self.tarefa.cancel()
+            await asyncio.gather(self.tarefa, return_exceptions=True)
+            self.tarefa = None
+        for client in [*self.clientes.values(), *self.aposentados]:
+            await client.close()
+        self.clientes = {}
+        self.aposentados = []
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do registro
+        :return: Dicionário com os clientes ativos, as alterações das chaves e o reaproveitamento das conexões
+        """
+        return {**self.estatisticas, "clientes": len(self.clientes), "conexoes": self.conexoes.metricas()}
@@ -4,6 +4,7 @@ Configuração do ambiente para a aplicação
 # coding: utf-8
 
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -33,8 +34,6 @@ class Config:
     CHATGPT_AI_MODEL = os.getenv("CHATGPT_AI_MODEL")
     CHAT_GPT_API_KEYS = os.getenv("CHAT_GPT_API_KEYS")
     CHAT_GPT_RETRIES = os.getenv("CHAT_GPT_RETRIES")
-    CHAT_GPT_TIMEOUT = os.getenv("CHAT_GPT_TIMEOUT")
-    CHAT_GPT_INCREASE_FACTORY = os.getenv("CHAT_GPT_INCREASE_FACTORY")
     CHAT_GPT_MAX_TOKENS = os.getenv("CHAT_GPT_MAX_TOKENS")
     REDIS_CHAT_GPT_KEYS_KEY = os.getenv("REDIS_CHAT_GPT_KEYS_KEY")
     REDIS_CHAT_GPT_TOKENS_KEY = os.getenv("REDIS_CHAT_GPT_TOKENS_KEY")
@@ -47,6 +46,113 @@ class Config:
     AUTH_TOKEN_URI = os.getenv("AUTH_TOKEN_URI")
     UVICORN_RUN_LOG_LEVEL = os.getenv("UVICORN_RUN_LOG_LEVEL")
     TEMPERATURE_CHATBOT = os.getenv("TEMPERATURE_CHATBOT")
+    AUTH_CACHE_TTL = os.getenv("AUTH_CACHE_TTL", "300")
+    AUTH_CACHE_NEGATIVE_TTL = os.getenv("AUTH_CACHE_NEGATIVE_TTL", "30")
+    AUTH_CACHE_MAX_ITEMS = os.getenv("AUTH_CACHE_MAX_ITEMS", "10000")
+    AUTH_CACHE_REDIS = os.getenv("AUTH_CACHE_REDIS", "True")
+    AUTH_HTTP_MAX_CONNECTIONS = os.getenv("AUTH_HTTP_MAX_CONNECTIONS", "50")
+    AUTH_HTTP_MAX_KEEPALIVE = os.getenv("AUTH_HTTP_MAX_KEEPALIVE", "20")
+    AUTH_HTTP_KEEPALIVE_EXPIRY = os.getenv("AUTH_HTTP_KEEPALIVE_EXPIRY", "30")
+    AUTH_HTTP_CONNECT_TIMEOUT = os.getenv("AUTH_HTTP_CONNECT_TIMEOUT", "2")
+    AUTH_HTTP_READ_TIMEOUT = os.getenv("AUTH_HTTP_READ_TIMEOUT", "5")
+    AUTH_CIRCUIT_FAILURES = os.getenv("AUTH_CIRCUIT_FAILURES", "5")
+    AUTH_CIRCUIT_RESET = os.getenv("AUTH_CIRCUIT_RESET", "30")
+    BATCH_MAX_ITENS = os.getenv("BATCH_MAX_ITENS", "50")
+    BATCH_MAX_CONCORRENCIA = os.getenv("BATCH_MAX_CONCORRENCIA", "8")
+    ADMISSAO_MAX_CONCORRENCIA = os.getenv("ADMISSAO_MAX_CONCORRENCIA", "32")
+    ADMISSAO_MAX_FILA = os.getenv("ADMISSAO_MAX_FILA", "128")
+    ADMISSAO_MAX_FILA_REQUISITOR = os.getenv("ADMISSAO_MAX_FILA_REQUISITOR", "16")
+    ADMISSAO_TIMEOUT_FILA = os.getenv("ADMISSAO_TIMEOUT_FILA", "10")
+    RATE_LIMIT_ATIVO = os.getenv("RATE_LIMIT_ATIVO", "True")
+    RATE_LIMIT_JANELA = os.getenv("RATE_LIMIT_JANELA", "60")
+    RATE_LIMIT_REQUISICOES = os.getenv("RATE_LIMIT_REQUISICOES", "60")
+    RATE_LIMIT_TOKENS = os.getenv("RATE_LIMIT_TOKENS", "200000")
+    RESPONSE_CACHE_ATIVO = os.getenv("RESPONSE_CACHE_ATIVO", "True")
+    RESPONSE_CACHE_TTL = os.getenv("RESPONSE_CACHE_TTL", "3600")
+    RESPONSE_CACHE_MAX_ITENS = os.getenv("RESPONSE_CACHE_MAX_ITENS", "10000")
+    SINGLE_FLIGHT_REDIS = os.getenv("SINGLE_FLIGHT_REDIS", "False")
+    SINGLE_FLIGHT_LOCK_TTL = os.getenv("SINGLE_FLIGHT_LOCK_TTL", "60")
+    SINGLE_FLIGHT_RESULTADO_TTL = os.getenv("SINGLE_FLIGHT_RESULTADO_TTL", "10")
+    SINGLE_FLIGHT_ERRO_TTL = os.getenv("SINGLE_FLIGHT_ERRO_TTL", "2")
+    SINGLE_FLIGHT_INTERVALO = os.getenv("SINGLE_FLIGHT_INTERVALO", "0.1")
+    SEMANTIC_CACHE_ATIVO = os.getenv("SEMANTIC_CACHE_ATIVO", "False")
+    SEMANTIC_CACHE_LIMIAR = os.getenv("SEMANTIC_CACHE_LIMIAR", "0.9")
+    SEMANTIC_CACHE_CAPACIDADE = os.getenv("SEMANTIC_CACHE_CAPACIDADE", "1000")
+    SEMANTIC_CACHE_DIMENSAO = os.getenv("SEMANTIC_CACHE_DIMENSAO", "1024")
+    SEMANTIC_CACHE_ARQUIVO = os.getenv("SEMANTIC_CACHE_ARQUIVO", "./cache_semantico/semantic_cache.npz")
+    CONTEXT_CACHE_ATIVO = os.getenv("CONTEXT_CACHE_ATIVO", "True")
+    CONTEXT_CACHE_TTL = os.getenv("CONTEXT_CACHE_TTL", "300")
+    CONTEXT_CACHE_INTERVALO_VERSAO = os.getenv("CONTEXT_CACHE_INTERVALO_VERSAO", "2")
+    CONTEXT_CACHE_CHANGE_STREAM = os.getenv("CONTEXT_CACHE_CHANGE_STREAM", "False")
+    SHARED_CACHE_ATIVO = os.getenv("SHARED_CACHE_ATIVO", "True")
+    SHARED_CACHE_ARQUIVO = os.getenv("SHARED_CACHE_ARQUIVO", "/dev/shm/chatbots_bp_shared_cache")
+    SHARED_CACHE_SLOTS = os.getenv("SHARED_CACHE_SLOTS", "2048")
+    SHARED_CACHE_TAMANHO_SLOT = os.getenv("SHARED_CACHE_TAMANHO_SLOT", "8192")
+    SHARED_CACHE_CONTEXTOS_SLOTS = os.getenv("SHARED_CACHE_CONTEXTOS_SLOTS", "1024")
+    SHARED_CACHE_CONTEXTOS_TAMANHO_SLOT = os.getenv("SHARED_CACHE_CONTEXTOS_TAMANHO_SLOT", "16384")
+    CONTEXTOS_IMPORTACAO_LOTE = os.getenv("CONTEXTOS_IMPORTACAO_LOTE", "500")
+    CONTEXTOS_ADMINS = os.getenv("CONTEXTOS_ADMINS", "")
+    LOG_FILA_MAX = os.getenv("LOG_FILA_MAX", "10000")
+    LOG_LOTE = os.getenv("LOG_LOTE", "200")
+    LOG_INTERVALO = os.getenv("LOG_INTERVALO", "1.0")
+    LOG_POLITICA = os.getenv("LOG_POLITICA", "descartar")
+    LOG_TIMEOUT_BLOQUEIO = os.getenv("LOG_TIMEOUT_BLOQUEIO", "0.5")
+    LOG_TTL_DIAS = os.getenv("LOG_TTL_DIAS", "30")
+    LOG_GRANULARIDADE = os.getenv("LOG_GRANULARIDADE", "seconds")
+    MONGODB_COLLECTION_USO = os.getenv("MONGODB_COLLECTION_USO", "uso_eventos")
+    MONGODB_COLLECTION_USO_DIARIO = os.getenv("MONGODB_COLLECTION_USO_DIARIO", "uso_diario")
+    USO_ATIVO = os.getenv("USO_ATIVO", "True")
+    USO_FILA_MAX = os.getenv("USO_FILA_MAX", "10000")
+    USO_LOTE = os.getenv("USO_LOTE", "200")
+    USO_INTERVALO = os.getenv("USO_INTERVALO", "1.0")
+    USO_EVENTOS_TTL_DIAS = os.getenv("USO_EVENTOS_TTL_DIAS", "90")
+    USO_AGREGACAO_INTERVALO = os.getenv("USO_AGREGACAO_INTERVALO", "60")
+    USO_AGREGACAO_ATRASO = os.getenv("USO_AGREGACAO_ATRASO", "30")
+    USO_ADMINS = os.getenv("USO_ADMINS", "")
+    READY_TIMEOUT = os.getenv("READY_TIMEOUT", "2.0")
+    READY_CACHE_TTL = os.getenv("READY_CACHE_TTL", "1.0")
+    READY_DEPENDENCIAS = os.getenv("READY_DEPENDENCIAS", "redis,mongo,chaves_openai,contextos")
+    OPENAI_HTTP_MAX_CONNECTIONS = os.getenv("OPENAI_HTTP_MAX_CONNECTIONS", "100")
+    OPENAI_HTTP_MAX_KEEPALIVE = os.getenv("OPENAI_HTTP_MAX_KEEPALIVE", "20")
+    OPENAI_HTTP_KEEPALIVE_EXPIRY = os.getenv("OPENAI_HTTP_KEEPALIVE_EXPIRY", "60")
+    OPENAI_HTTP_CONNECT_TIMEOUT = os.getenv("OPENAI_HTTP_CONNECT_TIMEOUT", "5")
+    OPENAI_HTTP_READ_TIMEOUT = os.getenv("OPENAI_HTTP_READ_TIMEOUT", "60")
+    OPENAI_CHAVES_INTERVALO = os.getenv("OPENAI_CHAVES_INTERVALO", "60")
+    CHAVES_ESCALONADOR_ATIVO = os.getenv("CHAVES_ESCALONADOR_ATIVO", "true")
+    CHAVES_MAX_EM_VOO = os.getenv("CHAVES_MAX_EM_VOO", "0")
+    CHAVES_RESERVA_TTL = os.getenv("CHAVES_RESERVA_TTL", "120")
+    CHAVES_PESO_ERRO = os.getenv("CHAVES_PESO_ERRO", "4.0")
+    CHAVES_ALFA_ERRO = os.getenv("CHAVES_ALFA_ERRO", "0.2")
+    CHAVES_BLOQUEIO_PADRAO = os.getenv("CHAVES_BLOQUEIO_PADRAO", "20")
+    CHAVES_BLOQUEIO_QUOTA = os.getenv("CHAVES_BLOQUEIO_QUOTA", "3600")
+    CHAT_GPT_BACKOFF_BASE = os.getenv("CHAT_GPT_BACKOFF_BASE", "0.5")
+    CHAT_GPT_BACKOFF_MAX = os.getenv("CHAT_GPT_BACKOFF_MAX", "8")
+    CHAT_GPT_PRAZO_TOTAL = os.getenv("CHAT_GPT_PRAZO_TOTAL", "60")
+    HEDGE_ATIVO = os.getenv("HEDGE_ATIVO", "false")
+    HEDGE_PERCENTIL = os.getenv("HEDGE_PERCENTIL", "95")
+    HEDGE_ATRASO_MIN = os.getenv("HEDGE_ATRASO_MIN", "0.5")
+    HEDGE_ATRASO_INICIAL = os.getenv("HEDGE_ATRASO_INICIAL", "5")
+    HEDGE_AMOSTRAS_MIN = os.getenv("HEDGE_AMOSTRAS_MIN", "20")
+    HEDGE_JANELA = os.getenv("HEDGE_JANELA", "200")
+    HEDGE_ORCAMENTO = os.getenv("HEDGE_ORCAMENTO", "0.05")
+    HEDGE_MODELO = os.getenv("HEDGE_MODELO", "")
+    BACKENDS_ATIVOS = os.getenv("BACKENDS_ATIVOS", "chat_gpt")
+    CHATGPT_CUSTO_MIL_TOKENS = os.getenv("CHATGPT_CUSTO_MIL_TOKENS", "1.0")
+    MISTRAL_AI_MODEL = os.getenv("MISTRAL_AI_MODEL", "mistral-small-latest")
+    MISTRAL_BASE_URL = os.getenv("MISTRAL_BASE_URL", "https://api.mistral.ai/v1")
+    REDIS_MISTRAL_KEYS_KEY = os.getenv("REDIS_MISTRAL_KEYS_KEY", "mistral_keys")
+    REDIS_MISTRAL_TOKENS_KEY = os.getenv("REDIS_MISTRAL_TOKENS_KEY", "mistral_tokens")
+    MISTRAL_CUSTO_MIL_TOKENS = os.getenv("MISTRAL_CUSTO_MIL_TOKENS", "1.0")
+    FAKE_LATENCIA = os.getenv("FAKE_LATENCIA", "0.05")
+    FAKE_CUSTO_MIL_TOKENS = os.getenv("FAKE_CUSTO_MIL_TOKENS", "0.0")
+    ROTEADOR_SLO_P95 = os.getenv("ROTEADOR_SLO_P95", "10.0")
+    ROTEADOR_MAX_ERRO = os.getenv("ROTEADOR_MAX_ERRO", "0.2")
+    ROTEADOR_EXPLORACAO = os.getenv("ROTEADOR_EXPLORACAO", "0.05")
+    ROTEADOR_AMOSTRAS_MIN = os.getenv("ROTEADOR_AMOSTRAS_MIN", "10")
+    ROTEADOR_JANELA = os.getenv("ROTEADOR_JANELA", "100")
+    ROTEADOR_ALFA_ERRO = os.getenv("ROTEADOR_ALFA_ERRO", "0.1")
+    MISTRAL_AI_KEYS = os.getenv("MISTRAL_AI_KEYS", "")
+    USO_AGREGACAO_DIAS_RECALCULO = os.getenv("USO_AGREGACAO_DIAS_RECALCULO", "1")
 
     def get_config(self):
         """
@@ -75,8 +181,6 @@ class Config:
             "CHATGPT_AI_MODEL": self.CHATGPT_AI_MODEL,
             "CHAT_GPT_API_KEYS": self.CHAT_GPT_API_KEYS,
             "CHAT_GPT_RETRIES": int(self.CHAT_GPT_RETRIES),
-            "CHAT_GPT_TIMEOUT": int(self.CHAT_GPT_TIMEOUT),
-            "CHAT_GPT_INCREASE_FACTORY": float(self.CHAT_GPT_INCREASE_FACTORY),
             "CHAT_GPT_MAX_TOKENS": int(self.CHAT_GPT_MAX_TOKENS),
             "REDIS_CHAT_GPT_KEYS_KEY": self.REDIS_CHAT_GPT_KEYS_KEY,
             "REDIS_CHAT_GPT_TOKENS_KEY": self.REDIS_CHAT_GPT_TOKENS_KEY,
@@ -88,5 +192,121 @@ class Config:
             "AUTOR_URL": self.AUTOR_URL,
             "AUTH_TOKEN_URI": self.AUTH_TOKEN_URI,
             "UVICORN_RUN_LOG_LEVEL": self.UVICORN_RUN_LOG_LEVEL,
-            "TEMPERATURE_CHATBOT": float(self.TEMPERATURE_CHATBOT)
+            "TEMPERATURE_CHATBOT": float(self.TEMPERATURE_CHATBOT),
+            "AUTH_CACHE_TTL": int(self.AUTH_CACHE_TTL),
+            "AUTH_CACHE_NEGATIVE_TTL": int(self.AUTH_CACHE_NEGATIVE_TTL),
+            "AUTH_CACHE_MAX_ITEMS": int(self.AUTH_CACHE_MAX_ITEMS),
+            "AUTH_CACHE_REDIS": self.AUTH_CACHE_REDIS.strip().lower() in ("true", "1", "sim"),
+            "AUTH_HTTP_MAX_CONNECTIONS": int(self.AUTH_HTTP_MAX_CONNECTIONS),
+            "AUTH_HTTP_MAX_KEEPALIVE": int(self.AUTH_HTTP_MAX_KEEPALIVE),
+            "AUTH_HTTP_KEEPALIVE_EXPIRY": float(self.AUTH_HTTP_KEEPALIVE_EXPIRY),
+            "AUTH_HTTP_CONNECT_TIMEOUT": float(self.AUTH_HTTP_CONNECT_TIMEOUT),
+            "AUTH_HTTP_READ_TIMEOUT": float(self.AUTH_HTTP_READ_TIMEOUT),
+            "AUTH_CIRCUIT_FAILURES": int(self.AUTH_CIRCUIT_FAILURES),
+            "AUTH_CIRCUIT_RESET": float(self.AUTH_CIRCUIT_RESET),
+            "BATCH_MAX_ITENS": int(self.BATCH_MAX_ITENS),
+            "BATCH_MAX_CONCORRENCIA": int(self.BATCH_MAX_CONCORRENCIA),
+            "ADMISSAO_MAX_CONCORRENCIA": int(self.ADMISSAO_MAX_CONCORRENCIA),
+            "ADMISSAO_MAX_FILA": int(self.ADMISSAO_MAX_FILA),
+            "ADMISSAO_MAX_FILA_REQUISITOR": int(self.ADMISSAO_MAX_FILA_REQUISITOR),
+            "ADMISSAO_TIMEOUT_FILA": float(self.ADMISSAO_TIMEOUT_FILA),
+            "RATE_LIMIT_ATIVO": self.RATE_LIMIT_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "RATE_LIMIT_JANELA": int(self.RATE_LIMIT_JANELA),
+            "RATE_LIMIT_REQUISICOES": int(self.RATE_LIMIT_REQUISICOES),
+            "RATE_LIMIT_TOKENS": int(self.RATE_LIMIT_TOKENS),
+            "RESPONSE_CACHE_ATIVO": self.RESPONSE_CACHE_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "RESPONSE_CACHE_TTL": int(self.RESPONSE_CACHE_TTL),
+            "RESPONSE_CACHE_MAX_ITENS": int(self.RESPONSE_CACHE_MAX_ITENS),
+            "SINGLE_FLIGHT_REDIS": self.SINGLE_FLIGHT_REDIS.strip().lower() in ("true", "1", "sim"),
+            "SINGLE_FLIGHT_LOCK_TTL": int(self.SINGLE_FLIGHT_LOCK_TTL),
+            "SINGLE_FLIGHT_RESULTADO_TTL": int(self.SINGLE_FLIGHT_RESULTADO_TTL),
+            "SINGLE_FLIGHT_ERRO_TTL": int(self.SINGLE_FLIGHT_ERRO_TTL),
+            "SINGLE_FLIGHT_INTERVALO": float(self.SINGLE_FLIGHT_INTERVALO),
+            "SEMANTIC_CACHE_ATIVO": self.SEMANTIC_CACHE_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "SEMANTIC_CACHE_LIMIAR": float(self.SEMANTIC_CACHE_LIMIAR),
+            "SEMANTIC_CACHE_CAPACIDADE": int(self.SEMANTIC_CACHE_CAPACIDADE),
+            "SEMANTIC_CACHE_DIMENSAO": int(self.SEMANTIC_CACHE_DIMENSAO),
+            "SEMANTIC_CACHE_ARQUIVO": self.SEMANTIC_CACHE_ARQUIVO,
+            "CONTEXT_CACHE_ATIVO": self.CONTEXT_CACHE_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "CONTEXT_CACHE_TTL": int(self.CONTEXT_CACHE_TTL),
+            "CONTEXT_CACHE_INTERVALO_VERSAO": float(self.CONTEXT_CACHE_INTERVALO_VERSAO),
+            "CONTEXT_CACHE_CHANGE_STREAM": self.CONTEXT_CACHE_CHANGE_STREAM.strip().lower() in ("true", "1", "sim"),
+            "SHARED_CACHE_ATIVO": self.SHARED_CACHE_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "SHARED_CACHE_ARQUIVO": self.SHARED_CACHE_ARQUIVO,
+            "SHARED_CACHE_SLOTS": int(self.SHARED_CACHE_SLOTS),
+            "SHARED_CACHE_TAMANHO_SLOT": int(self.SHARED_CACHE_TAMANHO_SLOT),
+            "SHARED_CACHE_CONTEXTOS_SLOTS": int(self.SHARED_CACHE_CONTEXTOS_SLOTS),
+            "SHARED_CACHE_CONTEXTOS_TAMANHO_SLOT": int(self.SHARED_CACHE_CONTEXTOS_TAMANHO_SLOT),
+            "CONTEXTOS_IMPORTACAO_LOTE": int(self.CONTEXTOS_IMPORTACAO_LOTE),
+            "CONTEXTOS_ADMINS": self.CONTEXTOS_ADMINS,
+            "LOG_FILA_MAX": int(self.LOG_FILA_MAX),
+            "LOG_LOTE": int(self.LOG_LOTE),
+            "LOG_INTERVALO": float(self.LOG_INTERVALO),
+            "LOG_POLITICA": self.LOG_POLITICA,
+            "LOG_TIMEOUT_BLOQUEIO": float(self.LOG_TIMEOUT_BLOQUEIO),
+            "LOG_TTL_DIAS": int(self.LOG_TTL_DIAS),
+            "LOG_GRANULARIDADE": self.LOG_GRANULARIDADE,
+            "MONGODB_COLLECTION_USO": self.MONGODB_COLLECTION_USO,
+            "MONGODB_COLLECTION_USO_DIARIO": self.MONGODB_COLLECTION_USO_DIARIO,
+            "USO_ATIVO": self.USO_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "USO_FILA_MAX": int(self.USO_FILA_MAX),
+            "USO_LOTE": int(self.USO_LOTE),
+            "USO_INTERVALO": float(self.USO_INTERVALO),
+            "USO_EVENTOS_TTL_DIAS": int(self.USO_EVENTOS_TTL_DIAS),
+            "USO_AGREGACAO_INTERVALO": int(self.USO_AGREGACAO_INTERVALO),
+            "USO_AGREGACAO_ATRASO": int(self.USO_AGREGACAO_ATRASO),
+            "USO_ADMINS": self.USO_ADMINS,
+            "READY_TIMEOUT": float(self.READY_TIMEOUT),
+            "READY_CACHE_TTL": float(self.READY_CACHE_TTL),
+            "READY_DEPENDENCIAS": self.READY_DEPENDENCIAS,
+            "OPENAI_HTTP_MAX_CONNECTIONS": int(self.OPENAI_HTTP_MAX_CONNECTIONS),
+            "OPENAI_HTTP_MAX_KEEPALIVE": int(self.OPENAI_HTTP_MAX_KEEPALIVE),
+            "OPENAI_HTTP_KEEPALIVE_EXPIRY": float(self.OPENAI_HTTP_KEEPALIVE_EXPIRY),
+            "OPENAI_HTTP_CONNECT_TIMEOUT": float(self.OPENAI_HTTP_CONNECT_TIMEOUT),
+            "OPENAI_HTTP_READ_TIMEOUT": float(self.OPENAI_HTTP_READ_TIMEOUT),
+            "OPENAI_CHAVES_INTERVALO": float(self.OPENAI_CHAVES_INTERVALO),
+            "CHAVES_ESCALONADOR_ATIVO": self.CHAVES_ESCALONADOR_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "CHAVES_MAX_EM_VOO": int(self.CHAVES_MAX_EM_VOO),
+            "CHAVES_RESERVA_TTL": float(self.CHAVES_RESERVA_TTL),
+            "CHAVES_PESO_ERRO": float(self.CHAVES_PESO_ERRO),
+            "CHAVES_ALFA_ERRO": float(self.CHAVES_ALFA_ERRO),
+            "CHAVES_BLOQUEIO_PADRAO": float(self.CHAVES_BLOQUEIO_PADRAO),
+            "CHAVES_BLOQUEIO_QUOTA": float(self.CHAVES_BLOQUEIO_QUOTA),
+            "CHAT_GPT_BACKOFF_BASE": float(self.CHAT_GPT_BACKOFF_BASE),
+            "CHAT_GPT_BACKOFF_MAX": float(self.CHAT_GPT_BACKOFF_MAX),
+            "CHAT_GPT_PRAZO_TOTAL": float(self.CHAT_GPT_PRAZO_TOTAL),
+            "HEDGE_ATIVO": self.HEDGE_ATIVO.strip().lower() in ("true", "1", "sim"),
+            "HEDGE_PERCENTIL": float(self.HEDGE_PERCENTIL),
+            "HEDGE_ATRASO_MIN": float(self.HEDGE_ATRASO_MIN),
+            "HEDGE_ATRASO_INICIAL": float(self.HEDGE_ATRASO_INICIAL),
+            "HEDGE_AMOSTRAS_MIN": int(self.HEDGE_AMOSTRAS_MIN),
+            "HEDGE_JANELA": int(self.HEDGE_JANELA),
+            "HEDGE_ORCAMENTO": float(self.HEDGE_ORCAMENTO),
+            "HEDGE_MODELO": self.HEDGE_MODELO,
+            "BACKENDS_ATIVOS": self.BACKENDS_ATIVOS,
+            "CHATGPT_CUSTO_MIL_TOKENS": float(self.CHATGPT_CUSTO_MIL_TOKENS),
+            "MISTRAL_AI_MODEL": self.MISTRAL_AI_MODEL,
+            "MISTRAL_BASE_URL": self.MISTRAL_BASE_URL,
+            "REDIS_MISTRAL_KEYS_KEY": self.REDIS_MISTRAL_KEYS_KEY,
+            "REDIS_MISTRAL_TOKENS_KEY": self.REDIS_MISTRAL_TOKENS_KEY,
+            "MISTRAL_CUSTO_MIL_TOKENS": float(self.MISTRAL_CUSTO_MIL_TOKENS),
+            "FAKE_LATENCIA": float(self.FAKE_LATENCIA),
+            "FAKE_CUSTO_MIL_TOKENS": float(self.FAKE_CUSTO_MIL_TOKENS),
+            "ROTEADOR_SLO_P95": float(self.ROTEADOR_SLO_P95),
+            "ROTEADOR_MAX_ERRO": float(self.ROTEADOR_MAX_ERRO),
+            "ROTEADOR_EXPLORACAO": float(self.ROTEADOR_EXPLORACAO),
+            "ROTEADOR_AMOSTRAS_MIN": int(self.ROTEADOR_AMOSTRAS_MIN),
+            "ROTEADOR_JANELA": int(self.ROTEADOR_JANELA),
+            "ROTEADOR_ALFA_ERRO": float(self.ROTEADOR_ALFA_ERRO),
+            "MISTRAL_AI_KEYS": self.MISTRAL_AI_KEYS,
+            "USO_AGREGACAO_DIAS_RECALCULO": int(self.USO_AGREGACAO_DIAS_RECALCULO)
         }
+
+
+@lru_cache(maxsize=1)
+def get_config() -> dict:
+    """
+    Retorna as configurações do env, lidas e convertidas uma única vez por processo
+    :return: Dicionário com as configurações (compartilhado, não deve ser alterado)
+    """
+    return Config().get_config()
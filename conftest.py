@@ -0,0 +1,26 @@
+"""
+Configuração comum dos testes (os testes assíncronos rodam com o pytest-anyio no loop do asyncio)
+"""
+# coding: utf-8
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis():
+    """
+    Adaptador assíncrono do Redis sobre o fakeredis (com suporte aos scripts Lua pelo lupa)
+    """
+    from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+    import fakeredis
+
+    adaptador = AsyncRedisAdapter()
+    await adaptador.conn.aclose()
+    adaptador.conn = fakeredis.FakeAsyncRedis(protocol=3)
+    yield adaptador
+    await adaptador.conn.aclose()
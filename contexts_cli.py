@@ -0,0 +1,88 @@
+"""
+CLI para importar e exportar os contextos dos campos em JSONL através da API
+Uso:
+    python contexts_cli.py import contextos.jsonl --token TOKEN
+    python contexts_cli.py export contextos.jsonl --token TOKEN
+"""
+# coding: utf-8
+
+from config import get_config
+import argparse
+import httpx
+import json
+import os
+import sys
+
+config = get_config()
+
+TAMANHO_TRECHO = 64 * 1024
+
+
+def le_arquivo(caminho: str):
+    """
+    Lê o arquivo em trechos, para enviá-lo em streaming sem carregá-lo inteiro em memória
+    :param caminho: Caminho do arquivo JSONL
+    :return: Gerador com os trechos do arquivo
+    """
+    with open(caminho, "rb") as arquivo:
+        while trecho := arquivo.read(TAMANHO_TRECHO):
+            yield trecho
+
+
+def importar(cliente: httpx.Client, caminho: str) -> int:
+    """
+    Envia o JSONL para o endpoint de importação e exibe o relatório
+    :param cliente: Cliente HTTP autenticado
+    :param caminho: Caminho do arquivo JSONL
+    :return: Código de saída (0 sem erros, 1 se alguma linha falhou)
+    """
+    resposta = cliente.post("/contexts/import", content=le_arquivo(caminho), headers={"Content-Type": "application/x-ndjson"})
+    resposta.raise_for_status()
+    relatorio = resposta.json()
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    return 1 if relatorio.get("com_erro") else 0
+
+
+def exportar(cliente: httpx.Client, caminho: str = None) -> int:
+    """
+    Recebe o JSONL do endpoint de exportação e o grava no arquivo (ou na saída padrão)
+    :param cliente: Cliente HTTP autenticado
+    :param caminho: Caminho do arquivo de saída (None para a saída padrão)
+    :return: Código de saída
+    """
+    saida = open(caminho, "w", encoding="utf-8") if caminho else sys.stdout
+    try:
+        with cliente.stream("GET", "/contexts/export") as resposta:
+            resposta.raise_for_status()
+            for linha in resposta.iter_lines():
+                if linha:
+                    saida.write(linha + "\n")
+    finally:
+        if caminho:
+            saida.close()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importação e exportação dos contextos dos campos em JSONL")
+    parser.add_argument("operacao", choices=["import", "export"])
+    parser.add_argument("arquivo", nargs="?", help="Arquivo JSONL (obrigatório na importação, saída padrão na exportação se omitido)")
+    parser.add_argument("--url", default=f"http://{config.get('HOST')}:{config.get('PORT')}")
+    parser.add_argument("--token", default=os.getenv("CHATBOT_TOKEN"), help="Token de autenticação (padrão: variável CHATBOT_TOKEN)")
+    args = parser.parse_args()
+
+    if not args.token:
+        parser.error("Token de autenticação não informado (--token ou CHATBOT_TOKEN)")
+    if args.operacao == "import" and not args.arquivo:
+        parser.error("Arquivo JSONL obrigatório na importação")
+
+    try:
+        with httpx.Client(base_url=args.url, headers={"Authorization": f"Bearer {args.token}"}, timeout=httpx.Timeout(30.0, read=None)) as cliente:
+            codigo = importar(cliente, args.arquivo) if args.operacao == "import" else exportar(cliente, args.arquivo)
+    except httpx.HTTPStatusError as ex:
+        print(f"Erro {ex.response.status_code}: {ex.response.text}", file=sys.stderr)
+        codigo = 1
+    except Exception as ex:
+        print(f"Erro: {ex}", file=sys.stderr)
+        codigo = 1
+    sys.exit(codigo)
@@ -0,0 +1,262 @@
+"""
+Escalonamento das chaves das APIS de IA pela carga e pelos limites informados pelo provedor (estado compartilhado no Redis)
+"""
+# coding: utf-8
+
+from dataclasses import dataclass
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+import random
+import re
+import time
+import uuid
+
+# KEYS: [1] conjunto das chaves da API, [2] hash do estado das chaves ("<chave>|<campo>"), [3] zset das reservas ("<id>:<chave>", score = expiração)
+# ARGV: [1] agora (ms), [2] id da reserva, [3] duração máxima da reserva (ms), [4] máximo de chamadas em andamento por chave (0 = sem limite),
+#       [5] peso da taxa de erro, [6] deslocamento para o desempate entre chaves com a mesma carga
+# Retorno: {chave, espera até a liberação da primeira chave bloqueada (ms, -1 sem chaves), quantidade de chaves saturadas}
+SCRIPT_RESERVAR = """
+local agora = tonumber(ARGV[1])
+local max_em_voo = tonumber(ARGV[4])
+local peso_erro = tonumber(ARGV[5])
+
+-- Reservas expiradas (worker encerrado sem liberar a chave) deixam de contar como chamadas em andamento
+local expiradas = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', agora)
+for _, reserva in ipairs(expiradas) do
+    local chave = string.match(reserva, '^[^:]+:(.*)$')
+    if redis.call('HINCRBY', KEYS[2], chave .. '|em_voo', -1) < 0 then
+        redis.call('HSET', KEYS[2], chave .. '|em_voo', 0)
+    end
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', agora)
+
+local chaves = redis.call('SMEMBERS', KEYS[1])
+local n = #chaves
+if n == 0 then
+    return {'', '-1', '0'}
+end
+table.sort(chaves)
+
+local melhor, melhor_carga, proxima_liberacao, saturadas = nil, nil, nil, 0
+local inicio = tonumber(ARGV[6]) % n
+for i = 0, n - 1 do
+    local chave = chaves[(inicio + i) % n + 1]
+    local estado = redis.call('HMGET', KEYS[2], chave .. '|em_voo', chave .. '|bloqueada_ate', chave .. '|erro', chave .. '|folga', chave .. '|folga_ate')
+    local em_voo = tonumber(estado[1] or '0')
+    local bloqueada_ate = tonumber(estado[2] or '0')
+    if bloqueada_ate > agora then
+        if proxima_liberacao == nil or bloqueada_ate < proxima_liberacao then
+            proxima_liberacao = bloqueada_ate
+        end
+    elseif max_em_voo == 0 or em_voo < max_em_voo then
+        local folga = 1
+        if estado[4] and tonumber(estado[5] or '0') > agora then
+            folga = math.max(tonumber(estado[4]), 0.01)
+        end
+        local carga = (em_voo + 1) / folga * (1 + peso_erro * tonumber(estado[3] or '0'))
+        if melhor == nil or carga < melhor_carga then
+            melhor, melhor_carga = chave, carga
+        end
+    else
+        saturadas = saturadas + 1
+    end
+end
+
+if melhor == nil then
+    return {'', tostring(proxima_liberacao and (proxima_liberacao - agora) or 0), tostring(saturadas)}
+end
+redis.call('HINCRBY', KEYS[2], melhor .. '|em_voo', 1)
+redis.call('ZADD', KEYS[3], agora + tonumber(ARGV[3]), ARGV[2] .. ':' .. melhor)
+return {melhor, '0', '0'}
+"""
+
+# KEYS: [1] hash do estado das chaves, [2] zset das reservas
+# ARGV: [1] id da reserva, [2] chave, [3] agora (ms), [4] falhou (0 ou 1), [5] fator da média móvel da taxa de erro,
+#       [6] folga (fração restante do limite, vazio se desconhecida), [7] validade da folga (ms), [8] bloquear até (ms, 0 = não bloquear)
+SCRIPT_LIBERAR = """
+local chave = ARGV[2]
+if redis.call('ZREM', KEYS[2], ARGV[1] .. ':' .. chave) == 1 then
+    if redis.call('HINCRBY', KEYS[1], chave .. '|em_voo', -1) < 0 then
+        redis.call('HSET', KEYS[1], chave .. '|em_voo', 0)
+    end
+end
+
+local alfa = tonumber(ARGV[5])
+local erro = tonumber(redis.call('HGET', KEYS[1], chave .. '|erro') or '0') * (1 - alfa) + alfa * tonumber(ARGV[4])
+redis.call('HSET', KEYS[1], chave .. '|erro', tostring(erro))
+
+if ARGV[6] ~= '' then
+    redis.call('HSET', KEYS[1], chave .. '|folga', ARGV[6], chave .. '|folga_ate', ARGV[7])
+end
+if tonumber(ARGV[8]) > tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[1], chave .. '|bloqueada_ate', ARGV[8])
+    redis.call('HDEL', KEYS[1], chave .. '|folga', chave .. '|folga_ate')
+    return 1
+end
+return 0
+"""
+
+
+class ChavesIndisponiveisError(Exception):
+    """
+    Exceção para quando nenhuma chave pode ser utilizada (todas bloqueadas até o reset dos limites ou saturadas)
+    """
+    def __init__(self, detail: str, retry_after: float, saturadas: bool = False):
+        """
+        :param detail: Mensagem de erro
+        :param retry_after: Tempo em segundos até a liberação da primeira chave bloqueada
+        :param saturadas: Se há chaves apenas saturadas (CHAVES_MAX_EM_VOO atingido), liberadas ao fim das chamadas em andamento
+        """
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.saturadas = saturadas
+
+
+@dataclass
+class Reserva:
+    """
+    Reserva de uma chave para uma chamada ao provedor (id None quando a chave não foi reservada pelo escalonador)
+    """
+    chave: str
+    id: str = None
+
+
+class KeyScheduler:
+    """
+    Classe responsável por escolher a chave de cada chamada ao provedor. O estado das chaves fica em um hash no Redis, compartilhado entre
+    os workers: chamadas em andamento, folga dos limites de requisições e tokens (cabeçalhos x-ratelimit-* da última resposta), taxa de erro
+    recente (média móvel) e bloqueio até o reset do limite (respostas 429 ou limite esgotado). A escolha da chave menos carregada entre as
+    disponíveis e a reserva são feitas por um único script atômico. As reservas expiram, para que um worker encerrado não deixe a chave ocupada.
+    """
+    def __init__(self, config, logs, redis: AsyncRedisAdapter, keys_key: str, prefixo: str = "chaves_openai"):
+        """
+        Inicializa o escalonador
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado
+        :param keys_key: Chave no Redis onde as chaves estão armazenadas
+        :param prefixo: Prefixo das chaves de estado no Redis (um por provedor)
+        """
+        self.logs = logs
+        self.redis = redis
+        self.keys_key = keys_key
+        self.chave_estado = f"{prefixo}:{{escalonador}}:estado"
+        self.chave_reservas = f"{prefixo}:{{escalonador}}:reservas"
+        self.max_em_voo = config.get("CHAVES_MAX_EM_VOO")
+        self.duracao_reserva = config.get("CHAVES_RESERVA_TTL")
+        self.peso_erro = config.get("CHAVES_PESO_ERRO")
+        self.alfa_erro = config.get("CHAVES_ALFA_ERRO")
+        self.bloqueio_padrao = config.get("CHAVES_BLOQUEIO_PADRAO")
+        self.bloqueio_quota = config.get("CHAVES_BLOQUEIO_QUOTA")
+        self.script_reservar = redis.get_conn().register_script(SCRIPT_RESERVAR)
+        self.script_liberar = redis.get_conn().register_script(SCRIPT_LIBERAR)
+        self.estatisticas = {"reservas": 0, "sem_chave": 0, "bloqueios": 0, "falhas": 0, "falhas_redis": 0}
+
+    async def reservar(self) -> Reserva:
+        """
+        Reserva a chave menos carregada entre as disponíveis
+        :return: Reserva da chave
+        :raises ChavesIndisponiveisError: Se não houver chave disponível
+        """
+        id_reserva = uuid.uuid4().hex
+        try:
+            chave, espera, saturadas = await self.script_reservar(
+                keys=[self.keys_key, self.chave_estado, self.chave_reservas],
+                args=[int(time.time() * 1000), id_reserva, int(self.duracao_reserva * 1000), self.max_em_voo, self.peso_erro, random.randrange(1 << 30)])
+        except Exception as ex:
+            # Sem o escalonamento, a chave é sorteada como antes
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao reservar a chave no Redis: {ex}')
+            return Reserva(chave=await self.redis.retorna_chave_disponivel(self.keys_key))
+
+        chave = chave.decode('utf-8') if isinstance(chave, bytes) else chave
+        if not chave:
+            self.estatisticas["sem_chave"] += 1
+            espera = int(espera)
+            if espera < 0:
+                raise ChavesIndisponiveisError(f'Chaves não encontradas no Redis para a key: {self.keys_key}', 0)
+            if int(saturadas) > 0:
+                raise ChavesIndisponiveisError('Nenhuma chave disponível (chamadas em andamento no limite de todas as chaves)', espera / 1000, saturadas=True)
+            raise ChavesIndisponiveisError('Nenhuma chave disponível (limites do provedor atingidos)', espera / 1000)
+
+        self.estatisticas["reservas"] += 1
+        return Reserva(chave=chave, id=id_reserva)
+
+    @staticmethod
+    def duracao(valor: str) -> float:
+        """
+        Converte a duração dos cabeçalhos de limite ("1s", "6m0s", "20ms", "1h2m3.5s" ou segundos) para segundos
+        :param valor: Duração informada pelo provedor
+        :return: Duração em segundos (0 se não for possível interpretar)
+        """
+        if not valor:
+            return 0.0
+        try:
+            return float(valor)
+        except ValueError:
+            pass
+        unidades = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+        return sum(float(numero) * unidades[unidade] for numero, unidade in re.findall(r"([\d.]+)(ms|h|m|s)", valor))
+
+    def analisa_resposta(self, headers, status_code: int = None, codigo_erro: str = None) -> (float, float, float):
+        """
+        Extrai dos cabeçalhos da resposta a folga dos limites da chave e o bloqueio necessário
+        :param headers: Cabeçalhos da resposta do provedor
+        :param status_code: Status HTTP da resposta (None em caso de sucesso)
+        :param codigo_erro: Código do erro informado pelo provedor (ex.: insufficient_quota)
+        :return: Tupla (folga, validade da folga em segundos, bloqueio em segundos); folga None se não informada
+        """
+        headers = headers or {}
+        folga, validade, bloqueio = None, 0.0, 0.0
+        for tipo in ("requests", "tokens"):
+            limite, restante = headers.get(f"x-ratelimit-limit-{tipo}"), headers.get(f"x-ratelimit-remaining-{tipo}")
+            reset = self.duracao(headers.get(f"x-ratelimit-reset-{tipo}"))
+            if not limite or restante is None:
+                continue
+            fracao = max(float(restante), 0.0) / max(float(limite), 1.0)
+            folga = fracao if folga is None else min(folga, fracao)
+            validade = max(validade, reset)
+            if float(restante) <= 0:
+                bloqueio = max(bloqueio, reset)
+
+        if status_code == 429:
+            if codigo_erro == "insufficient_quota":
+                bloqueio = max(bloqueio, self.bloqueio_quota)
+            else:
+                bloqueio = max(bloqueio, self.duracao(headers.get("retry-after")) or self.bloqueio_padrao)
+        elif status_code in (401, 403):
+            bloqueio = max(bloqueio, self.bloqueio_quota)
+        return folga, validade, bloqueio
+
+    async def liberar(self, reserva: Reserva, headers=None, status_code: int = None, codigo_erro: str = None, falhou: bool = False):
+        """
+        Libera a reserva da chave, registrando o resultado da chamada e os limites informados pelo provedor
+        :param reserva: Reserva da chave
+        :param headers: Cabeçalhos da resposta do provedor (sucesso ou erro)
+        :param status_code: Status HTTP do erro
+        :param codigo_erro: Código do erro informado pelo provedor
+        :param falhou: Se a chamada falhou
+        """
+        if reserva is None or reserva.id is None:
+            return
+        if falhou:
+            self.estatisticas["falhas"] += 1
+        try:
+            folga, validade, bloqueio = self.analisa_resposta(headers, status_code, codigo_erro)
+            agora = int(time.time() * 1000)
+            bloqueada = await self.script_liberar(
+                keys=[self.chave_estado, self.chave_reservas],
+                args=[reserva.id, reserva.chave, agora, int(falhou), self.alfa_erro, "" if folga is None else round(folga, 4),
+                      agora + int(validade * 1000), agora + int(bloqueio * 1000) if bloqueio else 0])
+            if bloqueada:
+                self.estatisticas["bloqueios"] += 1
+                self.logs.warning(f'Chave ...{reserva.chave[-4:]} fora do rodízio por {bloqueio:.1f}s (status {status_code})')
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao liberar a chave no Redis: {ex}')
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do escalonador
+        :return: Dicionário com as reservas, as chamadas sem chave disponível, os bloqueios e as falhas
+        """
+        return dict(self.estatisticas)
@@ -0,0 +1,99 @@
+"""
+Testes do escalonamento das chaves (scripts Lua executados no fakeredis)
+"""
+# coding: utf-8
+
+from key_scheduler.key_scheduler import ChavesIndisponiveisError, KeyScheduler
+from loguru import logger
+from retry_policy.retry_policy import RetryPolicy
+from collections import Counter
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"CHAVES_MAX_EM_VOO": 0, "CHAVES_RESERVA_TTL": 120, "CHAVES_PESO_ERRO": 4.0, "CHAVES_ALFA_ERRO": 0.2,
+          "CHAVES_BLOQUEIO_PADRAO": 20, "CHAVES_BLOQUEIO_QUOTA": 3600,
+          "CHAT_GPT_RETRIES": 3, "CHAT_GPT_BACKOFF_BASE": 0.01, "CHAT_GPT_BACKOFF_MAX": 0.02, "CHAT_GPT_PRAZO_TOTAL": 5}
+
+
+async def cria_escalonador(redis, chaves: list, **config) -> KeyScheduler:
+    if chaves:
+        await redis.get_conn().sadd("chaves", *chaves)
+    return KeyScheduler({**CONFIG, **config}, logger, redis=redis, keys_key="chaves")
+
+
+async def test_reservas_distribuem_a_carga_entre_as_chaves(redis):
+    escalonador = await cria_escalonador(redis, ["k1", "k2", "k3"])
+    reservas = [await escalonador.reservar() for _ in range(6)]
+    assert Counter(reserva.chave for reserva in reservas) == {"k1": 2, "k2": 2, "k3": 2}
+    for reserva in reservas:
+        await escalonador.liberar(reserva)
+    estado = await redis.get_conn().hgetall(escalonador.chave_estado)
+    assert {campo: valor for campo, valor in estado.items() if campo.endswith(b"|em_voo")} == {b"k1|em_voo": b"0", b"k2|em_voo": b"0", b"k3|em_voo": b"0"}
+
+
+async def test_chave_com_429_sai_do_rodizio(redis):
+    escalonador = await cria_escalonador(redis, ["k1", "k2"])
+    reserva = await escalonador.reservar()
+    await escalonador.liberar(reserva, headers={"retry-after": "30"}, status_code=429, falhou=True)
+    outras = {(await escalonador.reservar()).chave for _ in range(5)}
+    assert outras == {"k1", "k2"} - {reserva.chave}
+    assert escalonador.estatisticas["bloqueios"] == 1
+
+
+async def test_todas_bloqueadas_informa_a_espera_ate_a_primeira_liberacao(redis):
+    escalonador = await cria_escalonador(redis, ["k1"])
+    reserva = await escalonador.reservar()
+    await escalonador.liberar(reserva, status_code=429, falhou=True)
+    with pytest.raises(ChavesIndisponiveisError) as erro:
+        await escalonador.reservar()
+    assert not erro.value.saturadas
+    assert 19 < erro.value.retry_after <= 20
+    assert RetryPolicy(CONFIG, logger).classifica(erro.value) == (True, erro.value.retry_after)
+
+
+async def test_chaves_saturadas_sao_retentaveis_com_backoff(redis):
+    escalonador = await cria_escalonador(redis, ["k1", "k2"], CHAVES_MAX_EM_VOO=1)
+    reservas = [await escalonador.reservar(), await escalonador.reservar()]
+    with pytest.raises(ChavesIndisponiveisError) as erro:
+        await escalonador.reservar()
+    assert erro.value.saturadas
+    assert RetryPolicy(CONFIG, logger).classifica(erro.value) == (True, None)
+
+    tentativas = RetryPolicy(CONFIG, logger).iniciar()
+    await tentativas.aguardar(erro.value)
+    await escalonador.liberar(reservas[0])
+    assert (await escalonador.reservar()).chave == reservas[0].chave
+
+
+async def test_sem_chaves_nao_e_retentavel(redis):
+    escalonador = await cria_escalonador(redis, [])
+    with pytest.raises(ChavesIndisponiveisError) as erro:
+        await escalonador.reservar()
+    assert RetryPolicy(CONFIG, logger).classifica(erro.value) == (False, 0)
+
+
+async def test_reservas_expiradas_deixam_de_ocupar_a_chave(redis):
+    escalonador = await cria_escalonador(redis, ["k1"], CHAVES_MAX_EM_VOO=1, CHAVES_RESERVA_TTL=0)
+    await escalonador.reservar()
+    assert (await escalonador.reservar()).chave == "k1"
+
+
+async def test_folga_dos_cabecalhos_desvia_a_carga(redis):
+    escalonador = await cria_escalonador(redis, ["k1", "k2"])
+    reserva = await escalonador.reservar()
+    headers = {"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "1", "x-ratelimit-reset-requests": "1m"}
+    await escalonador.liberar(reserva, headers=headers)
+    outra = ({"k1", "k2"} - {reserva.chave}).pop()
+    assert [(await escalonador.reservar()).chave for _ in range(5)] == [outra] * 5
+
+
+def test_analisa_resposta_e_duracao():
+    escalonador = KeyScheduler.__new__(KeyScheduler)
+    escalonador.bloqueio_padrao, escalonador.bloqueio_quota = 20, 3600
+    assert KeyScheduler.duracao("1h2m3.5s") == 3723.5
+    assert KeyScheduler.duracao("20ms") == 0.02
+    headers = {"x-ratelimit-limit-tokens": "1000", "x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "6m0s"}
+    assert escalonador.analisa_resposta(headers) == (0.0, 360.0, 360.0)
+    assert escalonador.analisa_resposta({}, 429, "insufficient_quota") == (None, 0.0, 3600)
+    assert escalonador.analisa_resposta({}, 401) == (None, 0.0, 3600)
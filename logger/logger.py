@@ -6,6 +6,9 @@ Custom Logger Module
 from loguru import logger
 from datetime import datetime
 from models.logs_model import LogsModel
+from logger.mongo_sink import MongoLogSink
+from config import get_config
+import atexit
 import warnings
 import sys
 
@@ -38,6 +41,7 @@ class CustomLogger:
 class CustomLoggerMongoDB:
     """
     Classe CustomLoggerMongoDB para criar um logger customizado com Loguru que envia logs para o MongoDB.
+    Os logs são gravados em lote por uma thread em segundo plano (MongoLogSink), fora do caminho das requisições.
     """
     def __init__(self):
         """
@@ -47,29 +51,22 @@ class CustomLoggerMongoDB:
         self.logger.remove()
         self.logger.add(sys.stdout, level="DEBUG")
         self.logs = LogsModel()
+        self.sink = MongoLogSink(get_config(), self.logs)
         self.logger.add(self.mongo_handler(), level="DEBUG", format="{message}")
+        atexit.register(self.logger_close_mongo)
 
     def mongo_handler(self):
         """
         Retorna um handler para o MongoDB
-        :return: Uma função de handler que formata a mensagem de log e manda para o MongoDB
+        :return: Uma função de handler que formata a mensagem de log e a coloca na fila de gravação do MongoDB
         """
         def handler(message):
             """
-            Função de handler que formata a mensagem de log e manda para o MongoDB
+            Função de handler que formata a mensagem de log e a coloca na fila de gravação do MongoDB
             :param message:
             """
-            record = message.record
-            log = {
-                "time": record["time"].replace(tzinfo=None),
-                "level": record["level"].name,
-                "message": record["message"],
-                "file": record["file"].name,
-                "line": record["line"],
-                "module": record["function"],
-                "function": record["name"]
-            }
-            self.logs.insert_log_mongodb(log)
+            log = LogsModel.formata_registro(message.record)
+            self.sink.enfileirar(log)
         return handler
 
     def get_logger(self):
@@ -79,9 +76,25 @@ class CustomLoggerMongoDB:
         """
         return self.logger
 
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas da gravação dos logs no MongoDB
+        :return: Dicionário com as métricas do sink
+        """
+        return self.sink.metricas()
+
+    def flush(self):
+        """
+        Grava imediatamente os logs pendentes no MongoDB
+        """
+        self.sink.flush()
+
     def logger_close_mongo(self):
         """
-        Fecha o logger
+        Fecha o logger, gravando os logs pendentes antes de fechar a conexão com o MongoDB
         """
+        if self.sink.parar.is_set():
+            return
         self.logger.remove()
+        self.sink.fechar()
         self.logs.close_connection()
@@ -0,0 +1,167 @@
+"""
+Sink assíncrono dos logs para o MongoDB (fila limitada em memória e gravação em lote por uma thread em segundo plano)
+"""
+# coding: utf-8
+
+from models.logs_model import LogsModel
+import asyncio
+import os
+import queue
+import threading
+import time
+
+
+class MongoLogSink:
+    """
+    Classe responsável por tirar a gravação dos logs no MongoDB do caminho das requisições.
+    Os logs são colocados em uma fila limitada (LOG_FILA_MAX) e uma thread em segundo plano os grava com insert_many não ordenado
+    ao acumular LOG_LOTE logs ou a cada LOG_INTERVALO segundos. Com a fila cheia (MongoDB lento ou indisponível) a política
+    LOG_POLITICA define se o log é descartado ("descartar") ou se o chamador aguarda até LOG_TIMEOUT_BLOQUEIO segundos por espaço
+    antes de descartá-lo ("bloquear"). A espera só é aplicada fora do event loop (scripts e threads): um log emitido na thread de um
+    event loop em execução (handlers assíncronos do uvicorn) é descartado com a fila cheia, para não parar todas as requisições do worker.
+    No encerramento os logs pendentes são gravados.
+    A thread é iniciada no primeiro log de cada processo, para que a importação não crie threads antes do fork dos workers.
+    """
+    def __init__(self, config, logs_model: LogsModel):
+        """
+        Inicializa a fila (a thread de gravação é iniciada no primeiro log)
+        :param config: Objeto de configuração
+        :param logs_model: Modelo utilizado na gravação dos logs
+        """
+        self.logs_model = logs_model
+        self.lote = config.get("LOG_LOTE")
+        self.intervalo = config.get("LOG_INTERVALO")
+        self.bloquear = config.get("LOG_POLITICA").strip().lower() == "bloquear"
+        self.timeout_bloqueio = config.get("LOG_TIMEOUT_BLOQUEIO")
+        self.fila_max = config.get("LOG_FILA_MAX")
+        self.fila = queue.Queue(maxsize=self.fila_max)
+        self.parar = threading.Event()
+        self.lock_gravacao = threading.Lock()
+        self.estatisticas = {"enfileirados": 0, "gravados": 0, "descartados": 0, "descartados_event_loop": 0, "lotes": 0, "falhas": 0}
+        self.thread = None
+        self.pid = None
+
+    def garante_thread(self):
+        """
+        Inicia a thread de gravação no processo atual, se ainda não foi iniciada
+        (após um fork a fila, os locks e a thread herdados do processo pai são recriados)
+        """
+        if self.pid == os.getpid():
+            return
+        if self.thread is not None:
+            self.fila = queue.Queue(maxsize=self.fila_max)
+            self.parar = threading.Event()
+            self.lock_gravacao = threading.Lock()
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self.executar, name="mongo-log-sink", daemon=True)
+        self.thread.start()
+
+    def enfileirar(self, log: dict):
+        """
+        Coloca o log na fila, aplicando a política configurada quando a fila estiver cheia (nunca lança exceção).
+        Na thread de um event loop em execução a política "bloquear" não é aplicada: a espera pararia o loop inteiro.
+        :param log: Log a ser gravado
+        """
+        self.garante_thread()
+        bloquear = self.bloquear and not self.em_event_loop()
+        try:
+            if bloquear:
+                self.fila.put(log, timeout=self.timeout_bloqueio)
+            else:
+                self.fila.put_nowait(log)
+            self.estatisticas["enfileirados"] += 1
+        except queue.Full:
+            self.estatisticas["descartados"] += 1
+            if self.bloquear and not bloquear:
+                self.estatisticas["descartados_event_loop"] += 1
+
+    @staticmethod
+    def em_event_loop() -> bool:
+        """
+        Verifica se a thread atual está executando um event loop
+        :return: True se houver um event loop em execução na thread
+        """
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    def retira_lote(self) -> list:
+        """
+        Aguarda o primeiro log (até o intervalo) e retira da fila os demais disponíveis até o tamanho do lote
+        :return: Lista de logs (vazia se nenhum log chegou no intervalo)
+        """
+        try:
+            logs = [self.fila.get(timeout=self.intervalo)]
+        except queue.Empty:
+            return []
+        limite = time.monotonic() + self.intervalo
+        while len(logs) < self.lote:
+            restante = limite - time.monotonic()
+            try:
+                logs.append(self.fila.get_nowait() if restante <= 0 or self.parar.is_set() else self.fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return logs
+
+    def gravar(self, logs: list):
+        """
+        Grava um lote de logs no MongoDB (em caso de falha o lote é descartado para não acumular memória)
+        :param logs: Logs a serem gravados
+        """
+        if not logs:
+            return
+        with self.lock_gravacao:
+            try:
+                gravados = self.logs_model.insert_logs_mongodb(logs)
+                self.estatisticas["gravados"] += gravados
+                self.estatisticas["descartados"] += len(logs) - gravados
+            except Exception as e:
+                self.estatisticas["falhas"] += 1
+                self.estatisticas["descartados"] += len(logs)
+                print(f'Erro ao gravar o lote de logs no mongodb - Error:{e}')
+            self.estatisticas["lotes"] += 1
+
+    def executar(self):
+        """
+        Laço da thread de gravação, até o encerramento do sink.
+        A collection de logs é preparada na própria thread, para a inicialização não aguardar o MongoDB.
+        """
+        self.logs_model.preparar_collection()
+        while not self.parar.is_set():
+            self.gravar(self.retira_lote())
+
+    def flush(self):
+        """
+        Grava imediatamente todos os logs pendentes na fila
+        """
+        while True:
+            logs = []
+            try:
+                while len(logs) < self.lote:
+                    logs.append(self.fila.get_nowait())
+            except queue.Empty:
+                pass
+            if not logs:
+                return
+            self.gravar(logs)
+
+    def fechar(self, timeout: float = 10.0):
+        """
+        Encerra a thread de gravação e grava os logs pendentes
+        :param timeout: Tempo máximo de espera pelo lote em gravação
+        """
+        if self.parar.is_set():
+            return
+        self.parar.set()
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(timeout=timeout)
+        self.flush()
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do sink
+        :return: Dicionário com os contadores e o tamanho atual da fila
+        """
+        return {**self.estatisticas, "fila": self.fila.qsize(), "politica": "bloquear" if self.bloquear else "descartar"}
@@ -0,0 +1,63 @@
+"""
+Testes do sink assíncrono dos logs para o MongoDB
+"""
+# coding: utf-8
+
+from logger.mongo_sink import MongoLogSink
+import asyncio
+import threading
+import time
+import pytest
+
+CONFIG = {"LOG_LOTE": 10, "LOG_INTERVALO": 0.01, "LOG_POLITICA": "bloquear", "LOG_TIMEOUT_BLOQUEIO": 0.2, "LOG_FILA_MAX": 1}
+
+
+class LogsModelFake:
+    """
+    Modelo de logs em memória; a preparação da collection aguarda a liberação (MongoDB lento)
+    """
+    def __init__(self):
+        self.liberado = threading.Event()
+        self.gravados = []
+
+    def preparar_collection(self):
+        self.liberado.wait()
+
+    def insert_logs_mongodb(self, logs: list) -> int:
+        self.gravados.extend(logs)
+        return len(logs)
+
+
+@pytest.fixture
+def sink():
+    logs_model = LogsModelFake()
+    sink = MongoLogSink(CONFIG, logs_model)
+    yield sink
+    logs_model.liberado.set()
+    sink.fechar()
+
+
+def test_politica_bloquear_aguarda_fora_do_event_loop(sink):
+    sink.enfileirar({"msg": "1"})
+    inicio = time.monotonic()
+    sink.enfileirar({"msg": "2"})
+    assert time.monotonic() - inicio >= CONFIG["LOG_TIMEOUT_BLOQUEIO"]
+    assert sink.estatisticas["descartados"] == 1 and sink.estatisticas["descartados_event_loop"] == 0
+
+
+def test_politica_bloquear_nao_para_o_event_loop(sink):
+    async def logar():
+        sink.enfileirar({"msg": "1"})
+        inicio = time.monotonic()
+        sink.enfileirar({"msg": "2"})
+        return time.monotonic() - inicio
+
+    assert asyncio.run(logar()) < CONFIG["LOG_TIMEOUT_BLOQUEIO"] / 2
+    assert sink.estatisticas["descartados"] == 1 and sink.estatisticas["descartados_event_loop"] == 1
+
+
+def test_logs_pendentes_sao_gravados_no_encerramento(sink):
+    sink.enfileirar({"msg": "1"})
+    sink.logs_model.liberado.set()
+    sink.fechar()
+    assert sink.logs_model.gravados == [{"msg": "1"}]
@@ -0,0 +1,135 @@
+"""
+Migração da collection de logs para o formato time-series compacto
+A collection atual é renomeada para <collection>_legado, a collection time-series é criada e os logs ainda dentro do
+tempo de expiração (LOG_TTL_DIAS) são copiados em lotes: os do formato antigo convertidos para o formato compacto e os já gravados
+no formato compacto na collection antiga (API atualizada antes da migração) copiados como estão.
+No formato antigo o campo time guardava a data/hora local do servidor, sem fuso; no formato compacto o campo t é gravado em UTC.
+Na conversão, a data/hora antiga é interpretada no fuso informado em --fuso-legado (ex.: America/Sao_Paulo) ou, se não informado,
+no fuso local da máquina que executa a migração.
+Execute com a API parada, para que nenhum log seja gravado na collection antiga durante a troca.
+Uso: python migrate_logs.py [--lote 1000] [--dry-run] [--remover-legado] [--fuso-legado America/Sao_Paulo]
+"""
+# coding: utf-8
+
+from models.logs_model import LogsModel
+from mongo.mongo import MongoDB
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import argparse
+import sys
+
+
+def utc_para_legado(valor: datetime, fuso=None) -> datetime:
+    """
+    Converte uma data/hora UTC sem fuso (formato compacto) para a data/hora local sem fuso do formato antigo
+    :param valor: Data/hora UTC
+    :param fuso: Fuso horário dos logs antigos (None para o fuso local)
+    :return: Data/hora local sem fuso
+    """
+    valor = valor.replace(tzinfo=timezone.utc)
+    return (valor.astimezone(fuso) if fuso is not None else valor.astimezone()).replace(tzinfo=None)
+
+
+def copiar(logs_model: LogsModel, cursor, converter, lote: int) -> int:
+    """
+    Copia os logs do cursor para a collection time-series em lotes
+    :param logs_model: Modelo da collection de destino
+    :param cursor: Cursor dos logs de origem
+    :param converter: Função de conversão de cada log para o formato compacto
+    :param lote: Quantidade de logs por inserção
+    :return: Quantidade de logs copiados
+    """
+    migrados, pendentes = 0, []
+    for log in cursor.batch_size(lote):
+        pendentes.append(converter(log))
+        if len(pendentes) >= lote:
+            migrados += logs_model.insert_logs_mongodb(pendentes)
+            pendentes = []
+            print(f"{migrados} logs migrados...")
+    if pendentes:
+        migrados += logs_model.insert_logs_mongodb(pendentes)
+    return migrados
+
+
+def migrar(lote: int, dry_run: bool, remover_legado: bool, fuso_legado: str = None) -> int:
+    """
+    Executa a migração
+    :param lote: Quantidade de logs por inserção
+    :param dry_run: Apenas informa o que seria migrado, sem alterar nada
+    :param remover_legado: Remove a collection antiga ao final da cópia
+    :param fuso_legado: Fuso horário (IANA) em que os logs do formato antigo foram gravados (None para o fuso local)
+    :return: Código de saída
+    """
+    fuso = ZoneInfo(fuso_legado) if fuso_legado else None
+    logs_model = LogsModel()
+    mongo = logs_model.mongo
+    nome = mongo.collection_name
+    legado = f"{nome}_legado"
+
+    info = mongo.collection_options(nome)
+    if info is not None and info.get("type") == "timeseries" and mongo.collection_options(legado) is None:
+        print(f"A collection {nome} já é time-series, nada a migrar.")
+        return 0
+
+    if info is None and mongo.collection_options(legado) is None:
+        if not dry_run:
+            logs_model.preparar_collection()
+        print(f"Collection {nome} inexistente, criada como time-series sem logs a migrar.")
+        return 0
+
+    # Logs do formato antigo (time, data/hora local) e do formato compacto (t, UTC) gravados na collection antiga
+    filtro_legado = {"time": {"$type": "date"}}
+    filtro_compacto = {"t": {"$type": "date"}}
+    if logs_model.ttl is not None:
+        limite = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=logs_model.ttl)
+        filtro_legado["time"]["$gte"] = utc_para_legado(limite, fuso)
+        filtro_compacto["t"]["$gte"] = limite
+
+    if info is not None and info.get("type") != "timeseries":
+        if mongo.collection_options(legado) is not None:
+            print(f"A collection {legado} já existe, remova-a ou conclua a migração anterior antes de continuar.", file=sys.stderr)
+            return 1
+        total = mongo.count_documents(filtro_legado) + mongo.count_documents(filtro_compacto)
+        print(f"{total} logs dentro do tempo de expiração serão migrados de {nome} (renomeada para {legado}).")
+        if dry_run:
+            return 0
+        mongo.rename_collection(legado)
+
+    if dry_run:
+        print(f"Migração pendente de {legado} para {nome}.")
+        return 0
+
+    # Criando a collection time-series (ou retomando uma migração interrompida a partir do último log copiado)
+    logs_model.preparar_collection()
+    ultimo = next(iter(mongo.get_collection().find({}, {"t": 1}).sort("t", -1).limit(1)), None)
+    if ultimo is not None and ultimo.get("t") is not None:
+        filtro_legado["time"] = {"$type": "date", "$gt": utc_para_legado(ultimo.get("t"), fuso)}
+        filtro_compacto["t"] = {"$type": "date", "$gt": ultimo.get("t")}
+
+    # Os logs do formato antigo são anteriores aos do formato compacto: a retomada pelo último log copiado vale para os dois
+    origem = MongoDB(collection=legado)
+    migrados = copiar(logs_model, origem.get_collection().find(filtro_legado).sort("time", 1), lambda log: LogsModel.converte_legado(log, fuso), lote)
+    migrados += copiar(logs_model, origem.get_collection().find(filtro_compacto).sort("t", 1),
+                       lambda log: {campo: valor for campo, valor in log.items() if campo != "_id"}, lote)
+    print(f"Migração concluída: {migrados} logs migrados para {nome}.")
+
+    if remover_legado:
+        origem.flush_collection()
+        print(f"Collection {legado} removida.")
+    origem.close()
+    logs_model.close_connection()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migração da collection de logs para time-series")
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--remover-legado", action="store_true")
+    parser.add_argument("--fuso-legado", default=None, help="Fuso horário em que os logs antigos foram gravados (ex.: America/Sao_Paulo)")
+    args = parser.parse_args()
+    try:
+        sys.exit(migrar(args.lote, args.dry_run, args.remover_legado, args.fuso_legado))
+    except Exception as ex:
+        print(f"Erro na migração dos logs: {ex}", file=sys.stderr)
+        sys.exit(1)
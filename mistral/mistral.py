@@ -0,0 +1,38 @@
+"""
+Backend da API da Mistral (compatível com a API de chat completions da OpenAI)
+"""
+# coding: utf-8
+
+from chat_gpt.chat_gpt import ChatGpt
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+
+
+class Mistral(ChatGpt):
+    """
+    Classe para acessar a API da Mistral. Reaproveita a implementação da ChatGpt (clientes por chave, escalonamento das chaves e política de
+    novas tentativas) com a URL, o modelo e o conjunto de chaves da Mistral. As chaves de MISTRAL_AI_KEYS são gravadas no conjunto
+    REDIS_MISTRAL_KEYS_KEY quando ele ainda não existe, como no RedisAdapter.retorna_chave_mistral_disponivel.
+    """
+    NOME = "mistral"
+    # A Mistral envia o consumo de tokens no último trecho do streaming sem opções adicionais
+    OPCOES_STREAM = {}
+
+    def __init__(self, config, logs, redis: AsyncRedisAdapter = None):
+        """
+        Inicializa o objeto da Mistral
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado (se não informado, é criado um próprio)
+        """
+        super().__init__(config, logs, redis=redis, keys_key=config.get("REDIS_MISTRAL_KEYS_KEY"), modelo=config.get("MISTRAL_AI_MODEL"),
+                         base_url=config.get("MISTRAL_BASE_URL"), prefixo="chaves_mistral", custo=config.get("MISTRAL_CUSTO_MIL_TOKENS"))
+
+    async def aquecer_clientes(self) -> int:
+        """
+        Grava as chaves configuradas no Redis (se o conjunto ainda não existir) e cria os clientes de todas as chaves
+        :return: Quantidade de clientes disponíveis
+        """
+        chaves = [chave.strip() for chave in (self.config.get("MISTRAL_AI_KEYS") or "").split(",") if chave.strip()]
+        if chaves and not await self.redis.exists(self.keys_key):
+            await self.redis.get_conn().sadd(self.keys_key, *chaves)
+        return await super().aquecer_clientes()
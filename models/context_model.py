@@ -4,9 +4,34 @@ Classe para manipular os dados de contexto dos campos para o chatbot genérico B
 # coding: utf-8
 
 from mongo.mongo import MongoDB
-from config import Config
+from mongo.async_mongo import AsyncMongoDB
+from redis_adapter.redis_adapter import RedisAdapter
+from pymongo import IndexModel, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from config import get_config
+import json
 
-config = Config().get_config()
+config = get_config()
+
+# Contador de versão dos contextos no Redis, incrementado a cada alteração para invalidar o cache em memória dos workers
+CHAVE_VERSAO = "contexto:versao"
+
+# Índice único do campo e índice composto que cobre a busca do contexto (a consulta é respondida apenas pelo índice, sem ler o documento)
+INDICE_COBERTURA = "field_contexto_cobertura"
+INDICES_CONTEXTO = [
+    IndexModel([("field", 1)], unique=True, name="field_unico"),
+    IndexModel([("field", 1), ("context", 1), ("soft_limit", 1), ("hard_limit", 1)], name=INDICE_COBERTURA)
+]
+
+# Projeções das buscas (somente campos do índice de cobertura e sem o _id)
+PROJECAO_CONTEXTO = {"_id": 0, "context": 1, "soft_limit": 1, "hard_limit": 1}
+PROJECAO_CONTEXTOS = {"_id": 0, "field": 1, "context": 1, "soft_limit": 1, "hard_limit": 1}
+
+# Quantidade máxima de erros detalhados no relatório da importação
+MAX_ERROS_IMPORTACAO = 1000
+
+# Limites aplicados apenas na inserção de um campo novo quando a linha da importação não os informa
+LIMITES_PADRAO = {"soft_limit": 0, "hard_limit": 0}
 
 
 class ContextModel:
@@ -34,15 +59,31 @@ class ContextModel:
             if not all(key in context for key in self.campos_validar):
                 raise Exception(f'Campos inválidos para inserir contexto: {context}')
 
-            # Verifica se o campo já existe
-            if self.mongo.find_one({"field": context.get("field")}):
+            # Inserção atômica: só insere se o campo ainda não existir (o índice único garante em caso de concorrência)
+            dados = {chave: valor for chave, valor in context.items() if chave != "field"}
+            try:
+                result = self.mongo.insert_if_absent({"field": context.get("field")}, dados)
+            except DuplicateKeyError:
+                result = None
+            if result is None:
                 raise Exception(f'Campo já existe: {context.get("field")}')
 
-            result = self.mongo.insert_into_collection(context)
+            self.notifica_alteracao()
             return result
         except Exception as e:
             self.logs.error(f'Erro ao inserir contexto no mongodb - Error:{e}')
 
+    def notifica_alteracao(self):
+        """
+        Incrementa a versão dos contextos no Redis, para que os workers da API recarreguem o cache em memória
+        """
+        try:
+            redis = RedisAdapter(config.get('REDIS_DB_CONTROLES'))
+            redis.get_conn().incr(CHAVE_VERSAO)
+            redis.close()
+        except Exception as e:
+            self.logs.error(f'Erro ao notificar a alteração dos contextos no Redis - Error:{e}')
+
     def get_context(self, field: str):
         """
         Recupera o contexto dos campos do MongoDB
@@ -52,7 +93,7 @@ class ContextModel:
         :raises Exception: Se ocorrer um erro ao recuperar o contexto do MongoDB ou se o contexto não for encontrado
         """
         try:
-            result = self.mongo.find_one({"field": field})
+            result = self.mongo.find_one({"field": field}, PROJECAO_CONTEXTO)
 
             if not result:
                 raise Exception(f'Contexto não encontrado para o campo: {field}')
@@ -66,3 +107,230 @@ class ContextModel:
         Fecha a conexão com o MongoDB
         """
         self.mongo.close()
+
+
+class AsyncContextModel:
+    """
+    Versão assíncrona do ContextModel, utilizada no caminho das requisições da API
+    Esta classe utiliza a classe AsyncMongoDB para recuperar os contextos dos campos sem bloquear o event loop.
+    """
+    def __init__(self, logs):
+        self.mongo = AsyncMongoDB(collection=config.get("MONGODB_COLLECTION_CONTEXT"))
+        self.logs = logs
+        self.hint = None
+
+    async def get_context(self, field: str):
+        """
+        Recupera o contexto dos campos do MongoDB
+        :param field: Campo para o qual se deseja recuperar o contexto
+        :return: Retorna o contexto do campo
+        :rtype: Dicionário com o contexto do campo
+        :raises Exception: Se ocorrer um erro ao recuperar o contexto do MongoDB ou se o contexto não for encontrado
+        """
+        try:
+            result = await self.mongo.find_one({"field": field}, PROJECAO_CONTEXTO, hint=self.hint)
+
+            if not result:
+                raise Exception(f'Contexto não encontrado para o campo: {field}')
+
+            return result
+        except Exception as e:
+            self.logs.error(f'Erro ao recuperar contexto do mongodb - Error:{e}')
+
+    async def get_contexts(self, fields: list) -> dict:
+        """
+        Recupera o contexto de vários campos do MongoDB em uma única consulta
+        :param fields: Campos para os quais se deseja recuperar o contexto
+        :return: Dicionário {campo: contexto} apenas com os campos encontrados
+        :raises Exception: Se ocorrer um erro ao recuperar os contextos do MongoDB
+        """
+        try:
+            result = await self.mongo.find({"field": {"$in": list(set(fields))}}, PROJECAO_CONTEXTOS)
+
+            return {context.get("field"): context for context in result}
+        except Exception as e:
+            self.logs.error(f'Erro ao recuperar contextos do mongodb - Error:{e}')
+            raise e
+
+    async def criar_indices(self):
+        """
+        Cria os índices da collection de contextos e verifica se a busca do contexto é coberta pelo índice.
+        A busca passa a indicar (hint) o índice de cobertura, para o MongoDB não optar pelo índice único e ler o documento.
+        A falha não impede a inicialização, as buscas continuam funcionando sem os índices.
+        """
+        try:
+            await self.mongo.create_indexes(INDICES_CONTEXTO)
+            self.hint = INDICE_COBERTURA
+            cobertura = await self.verificar_cobertura()
+            if not cobertura.get("coberta"):
+                self.logs.warning(f'Busca do contexto não coberta pelo índice - Estágios:{cobertura.get("estagios")}')
+        except Exception as e:
+            self.logs.error(f'Erro ao criar os índices da collection de contextos - Error:{e}')
+
+    @staticmethod
+    def estagios_plano(plano) -> list:
+        """
+        Lista os estágios de um plano de execução (incluindo os estágios de entrada aninhados)
+        :param plano: Plano de execução (winningPlan do explain)
+        :return: Lista com os nomes dos estágios
+        """
+        if isinstance(plano, list):
+            return [estagio for item in plano for estagio in AsyncContextModel.estagios_plano(item)]
+        if not isinstance(plano, dict):
+            return []
+        estagios = [plano["stage"]] if "stage" in plano else []
+        for valor in plano.values():
+            if isinstance(valor, (dict, list)):
+                estagios.extend(AsyncContextModel.estagios_plano(valor))
+        return estagios
+
+    @staticmethod
+    def nome_indice(plano):
+        """
+        Nome do índice utilizado no plano de execução
+        :param plano: Plano de execução (winningPlan do explain)
+        :return: Nome do índice ou None se a busca não utilizar índice
+        """
+        if isinstance(plano, list):
+            return next((nome for nome in map(AsyncContextModel.nome_indice, plano) if nome), None)
+        if not isinstance(plano, dict):
+            return None
+        if plano.get("indexName"):
+            return plano.get("indexName")
+        return next((nome for nome in map(AsyncContextModel.nome_indice, plano.values()) if nome), None)
+
+    async def verificar_cobertura(self, field: str = "") -> dict:
+        """
+        Verifica pelo explain se a busca do contexto de um campo é respondida apenas pelo índice (IXSCAN sem FETCH)
+        :param field: Campo utilizado na consulta de verificação
+        :return: Dicionário com a cobertura, o índice utilizado e os estágios do plano
+        :raises Exception: Se ocorrer um erro ao executar o explain no MongoDB
+        """
+        try:
+            plano = (await self.mongo.explain({"field": field}, PROJECAO_CONTEXTO, hint=self.hint)).get("queryPlanner", {}).get("winningPlan", {})
+            estagios = self.estagios_plano(plano)
+            return {"coberta": "IXSCAN" in estagios and "FETCH" not in estagios and "COLLSCAN" not in estagios,
+                    "indice": self.nome_indice(plano), "estagios": estagios}
+        except Exception as e:
+            self.logs.error(f'Erro ao verificar a cobertura da busca do contexto - Error:{e}')
+            raise e
+
+    async def get_all_contexts(self) -> dict:
+        """
+        Recupera o contexto de todos os campos do MongoDB
+        :return: Dicionário {campo: contexto}
+        :raises Exception: Se ocorrer um erro ao recuperar os contextos do MongoDB
+        """
+        try:
+            result = await self.mongo.find({}, PROJECAO_CONTEXTOS)
+
+            return {context.get("field"): context for context in result}
+        except Exception as e:
+            self.logs.error(f'Erro ao recuperar contextos do mongodb - Error:{e}')
+            raise e
+
+    @staticmethod
+    def valida_linha(linha) -> dict:
+        """
+        Valida e normaliza uma linha da importação de contextos
+        :param linha: Objeto da linha (field, context e, opcionalmente, soft_limit e hard_limit)
+        :return: Contexto normalizado (apenas com os limites informados na linha)
+        :raises ValueError: Se a linha for inválida
+        """
+        if not isinstance(linha, dict):
+            raise ValueError("A linha deve ser um objeto JSON")
+        if not isinstance(linha.get("field"), str) or not linha.get("field").strip():
+            raise ValueError("Campo 'field' obrigatório")
+        if not isinstance(linha.get("context"), str) or not linha.get("context").strip():
+            raise ValueError("Campo 'context' obrigatório")
+        context = {"field": linha.get("field").strip(), "context": linha.get("context")}
+        for limite in LIMITES_PADRAO:
+            if limite not in linha:
+                continue
+            valor = linha.get(limite)
+            if isinstance(valor, bool) or not isinstance(valor, int) or valor < 0:
+                raise ValueError(f"Campo '{limite}' deve ser um inteiro maior ou igual a zero")
+            context[limite] = valor
+        return context
+
+    async def grava_lote(self, lote: list, relatorio: dict):
+        """
+        Grava um lote da importação com upserts não ordenados (uma única chamada ao MongoDB), registrando os erros por linha.
+        Apenas os valores informados na linha são alterados; os limites ausentes recebem o padrão somente na inserção de um campo novo.
+        :param lote: Lista de tuplas (número da linha, contexto)
+        :param relatorio: Relatório da importação a ser atualizado
+        """
+        operacoes = []
+        for _, context in lote:
+            alteracao = {"$set": {chave: valor for chave, valor in context.items() if chave != "field"}}
+            padroes = {limite: valor for limite, valor in LIMITES_PADRAO.items() if limite not in context}
+            if padroes:
+                alteracao["$setOnInsert"] = padroes
+            operacoes.append(UpdateOne({"field": context.get("field")}, alteracao, upsert=True))
+        try:
+            resultado = (await self.mongo.bulk_write(operacoes, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            resultado = e.details
+            for erro in resultado.get("writeErrors", []):
+                numero, context = lote[erro.get("index")]
+                self.registra_erro_importacao(relatorio, numero, context.get("field"), erro.get("errmsg"))
+        relatorio["inseridos"] += resultado.get("nUpserted", 0)
+        relatorio["atualizados"] += resultado.get("nModified", 0)
+        relatorio["inalterados"] += resultado.get("nMatched", 0) - resultado.get("nModified", 0)
+
+    @staticmethod
+    def registra_erro_importacao(relatorio: dict, numero: int, field, erro: str):
+        """
+        Registra o erro de uma linha da importação (apenas os primeiros MAX_ERROS_IMPORTACAO são detalhados)
+        :param relatorio: Relatório da importação
+        :param numero: Número da linha
+        :param field: Campo da linha (se identificado)
+        :param erro: Mensagem de erro
+        """
+        relatorio["com_erro"] += 1
+        if len(relatorio["erros"]) < MAX_ERROS_IMPORTACAO:
+            relatorio["erros"].append({"linha": numero, "field": field, "erro": erro})
+
+    async def importar_contextos(self, linhas, tamanho_lote: int = 500) -> dict:
+        """
+        Importa os contextos de um JSONL (um contexto por linha), em lotes, inserindo os novos campos e atualizando os existentes
+        :param linhas: Iterável assíncrono com as linhas do JSONL
+        :param tamanho_lote: Quantidade de linhas por chamada ao MongoDB
+        :return: Relatório com as quantidades de linhas inseridas, atualizadas, inalteradas e com erro, e os erros por linha
+        """
+        relatorio = {"linhas": 0, "inseridos": 0, "atualizados": 0, "inalterados": 0, "com_erro": 0, "erros": []}
+        lote = []
+        numero = 0
+        async for linha in linhas:
+            numero += 1
+            if not linha.strip():
+                continue
+            relatorio["linhas"] += 1
+            field = None
+            try:
+                objeto = json.loads(linha)
+                field = objeto.get("field") if isinstance(objeto, dict) else None
+                lote.append((numero, self.valida_linha(objeto)))
+            except ValueError as e:
+                self.registra_erro_importacao(relatorio, numero, field, str(e))
+                continue
+            if len(lote) >= tamanho_lote:
+                await self.grava_lote(lote, relatorio)
+                lote = []
+        if lote:
+            await self.grava_lote(lote, relatorio)
+        return relatorio
+
+    async def exportar_contextos(self):
+        """
+        Percorre os contextos de todos os campos, ordenados pelo campo
+        :return: Gerador assíncrono com os contextos
+        """
+        async for context in self.mongo.iterate({}, PROJECAO_CONTEXTOS, sort=[("field", 1)]):
+            yield context
+
+    async def close_connection(self):
+        """
+        Fecha a conexão com o MongoDB
+        """
+        await self.mongo.close()
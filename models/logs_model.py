@@ -4,22 +4,89 @@ LogsModel
 # coding: utf-8
 
 from mongo.mongo import MongoDB
-from config import Config
+from pymongo.errors import BulkWriteError, CollectionInvalid, OperationFailure
+from datetime import timezone
+from config import get_config
 
-config = Config().get_config()
+config = get_config()
 
 
 class LogsModel:
     """
     Classe responsável por gerenciar os logs no MongoDB
     Esta classe utiliza a classe MongoDB para inserir logs no banco de dados.
-    Ela é inicializada com a coleção de logs definida na configuração.
-    A classe oferece métodos para inserir logs e fechar a conexão com o MongoDB.
-    A inserção de logs é feita através do método `insert_log_mongodb`, que recebe
-    um log como parâmetro e retorna o ID do documento inserido no MongoDB.
+    Ela é inicializada com a coleção de logs definida na configuração, criada como collection time-series (campo de tempo "t"
+    e metadados "m" com o nível e o módulo) com expiração após LOG_TTL_DIAS dias.
+    Os logs usam um formato compacto: t (data/hora UTC), m.l (nível), m.mod (módulo), msg (mensagem), fn (função) e ln (linha).
+    A inserção de logs é feita através dos métodos `insert_log_mongodb` e `insert_logs_mongodb` (lote).
     """
+    CAMPO_TEMPO = "t"
+    CAMPO_META = "m"
+
     def __init__(self):
         self.mongo = MongoDB(collection=config.get("MONGODB_COLLECTION_LOGS"))
+        self.ttl = config.get("LOG_TTL_DIAS") * 86400 if config.get("LOG_TTL_DIAS") > 0 else None
+
+    def preparar_collection(self):
+        """
+        Cria a collection de logs como time-series, se ainda não existir, e ajusta o tempo de expiração configurado.
+        Se a collection existente não for time-series é necessário migrá-la (migrate_logs.py): até a migração os logs continuam sendo
+        gravados nela, no formato compacto, e são copiados pela migração junto com os logs do formato antigo.
+        """
+        nome = self.mongo.collection_name
+        try:
+            info = self.mongo.collection_options(nome)
+            if info is None:
+                try:
+                    self.mongo.create_timeseries_collection(nome, time_field=self.CAMPO_TEMPO, meta_field=self.CAMPO_META,
+                                                            granularity=config.get("LOG_GRANULARIDADE"), expire_after_seconds=self.ttl)
+                except CollectionInvalid:
+                    # Criada por outro worker ao mesmo tempo
+                    pass
+            elif info.get("type") != "timeseries":
+                print(f'Collection de logs {nome} não é time-series, execute o migrate_logs.py para migrá-la')
+            elif self.ttl is not None and info.get("options", {}).get("expireAfterSeconds") != self.ttl:
+                self.mongo.coll_mod(nome, expireAfterSeconds=self.ttl)
+        except OperationFailure as e:
+            print(f'Erro ao preparar a collection de logs time-series no mongodb - Error:{e}')
+        except Exception as e:
+            print(f'Erro ao preparar a collection de logs no mongodb - Error:{e}')
+
+    @staticmethod
+    def formata_registro(record: dict) -> dict:
+        """
+        Formata um registro do Loguru no formato compacto da collection de logs
+        :param record: Registro do Loguru (message.record)
+        :return: Log no formato compacto
+        """
+        return {
+            "t": record["time"].astimezone(timezone.utc).replace(tzinfo=None),
+            "m": {"l": record["level"].name, "mod": record["name"]},
+            "msg": record["message"],
+            "fn": record["function"],
+            "ln": record["line"]
+        }
+
+    @staticmethod
+    def converte_legado(log: dict, fuso=None) -> dict:
+        """
+        Converte um log no formato antigo (time, level, message, file, line, module, function) para o formato compacto.
+        No formato antigo os campos module e function estavam trocados (module guardava a função e function o módulo) e o campo time
+        guardava a data/hora local do servidor sem fuso, convertida aqui para UTC (formato do campo t).
+        :param log: Log no formato antigo
+        :param fuso: Fuso horário (tzinfo) em que os logs antigos foram gravados (None para o fuso local da máquina)
+        :return: Log no formato compacto
+        """
+        tempo = log.get("time")
+        if tempo is not None:
+            tempo = (tempo.replace(tzinfo=fuso) if fuso is not None else tempo.astimezone()).astimezone(timezone.utc).replace(tzinfo=None)
+        return {
+            "t": tempo,
+            "m": {"l": log.get("level"), "mod": log.get("function")},
+            "msg": log.get("message"),
+            "fn": log.get("module"),
+            "ln": log.get("line")
+        }
 
     def insert_log_mongodb(self, log):
         """
@@ -34,6 +101,18 @@ class LogsModel:
         except Exception as e:
             print(f'Erro ao inserir log no mongodb - Error:{e}')
 
+    def insert_logs_mongodb(self, logs: list) -> int:
+        """
+        Insere um lote de logs no MongoDB em uma única chamada (inserção não ordenada, um log com erro não impede os demais)
+        :param logs: Logs a serem inseridos
+        :return: Quantidade de logs inseridos
+        """
+        try:
+            return len(self.mongo.insert_many_into_collection(logs, ordered=False))
+        except BulkWriteError as e:
+            print(f'Erro ao inserir parte do lote de logs no mongodb - Error:{e.details.get("writeErrors", [])[:1]}')
+            return e.details.get("nInserted", 0)
+
     def close_connection(self):
         """
         Fecha a conexão com o MongoDB
@@ -0,0 +1,65 @@
+"""
+Testes da importação em lote dos contextos (MongoDB simulado em memória)
+"""
+# coding: utf-8
+
+from loguru import logger
+from types import SimpleNamespace
+import json
+import models.context_model
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+class MongoFake:
+    """
+    Subconjunto do AsyncMongoDB utilizado na importação (upserts com $set e $setOnInsert por field)
+    """
+    def __init__(self):
+        self.documentos = {}
+
+    async def bulk_write(self, operacoes: list, ordered: bool = False):
+        resultado = {"nUpserted": 0, "nMatched": 0, "nModified": 0}
+        for operacao in operacoes:
+            field = operacao._filter["field"]
+            documento = self.documentos.get(field)
+            if documento is None:
+                self.documentos[field] = {"field": field, **operacao._doc.get("$setOnInsert", {}), **operacao._doc["$set"]}
+                resultado["nUpserted"] += 1
+                continue
+            anterior = dict(documento)
+            documento.update(operacao._doc["$set"])
+            resultado["nMatched"] += 1
+            resultado["nModified"] += int(documento != anterior)
+        return SimpleNamespace(bulk_api_result=resultado)
+
+
+@pytest.fixture
+def context_model(monkeypatch):
+    monkeypatch.setattr(models.context_model, "AsyncMongoDB", lambda collection=None: MongoFake())
+    return models.context_model.AsyncContextModel(logs=logger)
+
+
+async def linhas(*objetos):
+    for objeto in objetos:
+        yield json.dumps(objeto)
+
+
+async def test_reimportar_linha_sem_limites_preserva_os_limites_existentes(context_model):
+    await context_model.importar_contextos(linhas({"field": "descricao", "context": "Antigo", "soft_limit": 200, "hard_limit": 500}))
+    relatorio = await context_model.importar_contextos(linhas({"field": "descricao", "context": "Novo"}))
+    assert relatorio["atualizados"] == 1
+    assert context_model.mongo.documentos["descricao"] == {"field": "descricao", "context": "Novo", "soft_limit": 200, "hard_limit": 500}
+
+
+async def test_campo_novo_sem_limites_recebe_o_padrao(context_model):
+    relatorio = await context_model.importar_contextos(linhas({"field": "objeto", "context": "Objeto", "hard_limit": 300}))
+    assert relatorio["inseridos"] == 1
+    assert context_model.mongo.documentos["objeto"] == {"field": "objeto", "context": "Objeto", "soft_limit": 0, "hard_limit": 300}
+
+
+async def test_linhas_invalidas_sao_relatadas(context_model):
+    relatorio = await context_model.importar_contextos(linhas({"field": "a", "context": "A", "soft_limit": -1}, {"field": "", "context": "B"}, ["c"]))
+    assert relatorio["com_erro"] == 3 and context_model.mongo.documentos == {}
+    assert [erro["linha"] for erro in relatorio["erros"]] == [1, 2, 3]
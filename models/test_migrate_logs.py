@@ -0,0 +1,153 @@
+"""
+Testes da migração da collection de logs para time-series (MongoDB simulado em memória)
+"""
+# coding: utf-8
+
+from datetime import datetime, timedelta, timezone
+from models.logs_model import LogsModel
+from zoneinfo import ZoneInfo
+import migrate_logs
+import models.logs_model
+import pytest
+
+
+class CursorFake:
+    def __init__(self, documentos: list):
+        self.documentos = documentos
+
+    def sort(self, campo: str, direcao: int):
+        return CursorFake(sorted(self.documentos, key=lambda documento: documento[campo], reverse=direcao < 0))
+
+    def limit(self, quantidade: int):
+        return CursorFake(self.documentos[:quantidade])
+
+    def batch_size(self, _):
+        return self
+
+    def __iter__(self):
+        return iter(self.documentos)
+
+
+def atende(documento: dict, filtro: dict) -> bool:
+    for campo, condicoes in filtro.items():
+        valor = documento.get(campo)
+        if condicoes.get("$type") == "date" and not isinstance(valor, datetime):
+            return False
+        if "$gte" in condicoes and not valor >= condicoes["$gte"]:
+            return False
+        if "$gt" in condicoes and not valor > condicoes["$gt"]:
+            return False
+    return True
+
+
+class MongoFake:
+    """
+    Subconjunto da classe MongoDB utilizado pelo LogsModel e pela migração
+    """
+    def __init__(self, banco: dict, collection: str = None):
+        self.banco = banco
+        self.collection_name = collection
+
+    def collection_options(self, nome: str):
+        colecao = self.banco.get(nome)
+        return None if colecao is None else {"type": colecao["type"], "options": colecao["options"]}
+
+    def create_timeseries_collection(self, nome, time_field, meta_field=None, granularity="seconds", expire_after_seconds=None):
+        self.banco[nome] = {"type": "timeseries", "options": {"expireAfterSeconds": expire_after_seconds}, "documentos": []}
+
+    def coll_mod(self, nome, **opcoes):
+        self.banco[nome]["options"].update(opcoes)
+
+    def rename_collection(self, novo_nome: str):
+        self.banco[novo_nome] = self.banco.pop(self.collection_name)
+
+    def count_documents(self, filtro: dict) -> int:
+        return len([documento for documento in self.banco[self.collection_name]["documentos"] if atende(documento, filtro)])
+
+    def get_collection(self):
+        return self
+
+    def find(self, filtro: dict, projecao=None):
+        return CursorFake([documento for documento in self.banco[self.collection_name]["documentos"] if atende(documento, filtro)])
+
+    def insert_many_into_collection(self, documentos: list, ordered: bool = True) -> list:
+        self.banco[self.collection_name]["documentos"].extend(documentos)
+        return list(range(len(documentos)))
+
+    def flush_collection(self):
+        self.banco.pop(self.collection_name, None)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = {}
+    monkeypatch.setattr(models.logs_model, "MongoDB", lambda collection=None: MongoFake(banco, collection))
+    monkeypatch.setattr(migrate_logs, "MongoDB", lambda collection=None: MongoFake(banco, collection))
+    monkeypatch.setitem(models.logs_model.config, "MONGODB_COLLECTION_LOGS", "logs")
+    monkeypatch.setitem(models.logs_model.config, "LOG_TTL_DIAS", 30)
+    return banco
+
+
+def agora_utc() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def log_legado(tempo: datetime, mensagem: str) -> dict:
+    return {"_id": mensagem, "time": tempo, "level": "INFO", "message": mensagem, "file": "api.py", "line": 1, "module": "funcao", "function": "modulo"}
+
+
+def log_compacto(tempo: datetime, mensagem: str) -> dict:
+    return {"_id": mensagem, "t": tempo, "m": {"l": "INFO", "mod": "modulo"}, "msg": mensagem, "fn": "funcao", "ln": 1}
+
+
+def test_converte_legado_para_utc_e_desfaz_a_troca_dos_campos():
+    log = log_legado(datetime(2024, 1, 10, 9, 0), "mensagem")
+    convertido = LogsModel.converte_legado(log, ZoneInfo("America/Sao_Paulo"))
+    assert convertido == {"t": datetime(2024, 1, 10, 12, 0), "m": {"l": "INFO", "mod": "modulo"}, "msg": "mensagem", "fn": "funcao", "ln": 1}
+
+
+def test_migracao_copia_os_logs_compactos_gravados_na_collection_antiga(banco):
+    fuso = ZoneInfo("America/Sao_Paulo")
+    base = agora_utc() - timedelta(days=1)
+    banco["logs"] = {"type": "collection", "options": {}, "documentos": [
+        log_legado(migrate_logs.utc_para_legado(base - timedelta(days=40), fuso), "expirado"),
+        log_legado(migrate_logs.utc_para_legado(base, fuso), "antigo"),
+        log_compacto(base - timedelta(days=40), "compacto expirado"),
+        log_compacto(base + timedelta(hours=1), "compacto 1"),
+        log_compacto(base + timedelta(hours=2), "compacto 2"),
+    ]}
+
+    assert migrate_logs.migrar(lote=2, dry_run=False, remover_legado=True, fuso_legado="America/Sao_Paulo") == 0
+
+    assert banco["logs"]["type"] == "timeseries"
+    assert "logs_legado" not in banco
+    migrados = banco["logs"]["documentos"]
+    assert [log["msg"] for log in migrados] == ["antigo", "compacto 1", "compacto 2"]
+    assert migrados[0]["t"] == base
+    assert all("_id" not in log for log in migrados)
+
+
+def test_migracao_interrompida_e_retomada_sem_duplicar(banco):
+    base = agora_utc() - timedelta(days=1)
+    banco["logs_legado"] = {"type": "collection", "options": {}, "documentos": [
+        log_legado(migrate_logs.utc_para_legado(base), "antigo"),
+        log_compacto(base + timedelta(hours=1), "compacto 1"),
+        log_compacto(base + timedelta(hours=2), "compacto 2"),
+    ]}
+    banco["logs"] = {"type": "timeseries", "options": {"expireAfterSeconds": 30 * 86400},
+                     "documentos": [LogsModel.converte_legado(banco["logs_legado"]["documentos"][0]), log_compacto(base + timedelta(hours=1), "compacto 1")]}
+
+    assert migrate_logs.migrar(lote=10, dry_run=False, remover_legado=False) == 0
+    assert [log["msg"] for log in banco["logs"]["documentos"]] == ["antigo", "compacto 1", "compacto 2"]
+
+
+def test_dry_run_conta_os_dois_formatos_sem_alterar(banco, capsys):
+    base = agora_utc() - timedelta(days=1)
+    banco["logs"] = {"type": "collection", "options": {}, "documentos": [log_legado(migrate_logs.utc_para_legado(base), "antigo"),
+                                                                         log_compacto(base, "compacto")]}
+    assert migrate_logs.migrar(lote=10, dry_run=True, remover_legado=True) == 0
+    assert "2 logs" in capsys.readouterr().out
+    assert banco["logs"]["type"] == "collection"
@@ -0,0 +1,153 @@
+"""
+Classes para manipular os eventos de consumo de tokens e os consolidados diários de uso no MongoDB
+"""
+# coding: utf-8
+
+from mongo.mongo import MongoDB
+from mongo.async_mongo import AsyncMongoDB
+from pymongo import IndexModel
+from pymongo.errors import BulkWriteError, CollectionInvalid
+from datetime import datetime
+from config import get_config
+
+config = get_config()
+
+# Documento de controle da agregação incremental na collection dos consolidados (fim da última janela agregada)
+ID_CHECKPOINT = "checkpoint"
+
+
+class UsageModel:
+    """
+    Classe responsável pela agregação dos eventos de uso (executada fora do event loop, pelo job de agregação)
+    Os eventos ficam em uma collection time-series com expiração (USO_EVENTOS_TTL_DIAS) e são consolidados por requisitor,
+    campo e dia na collection MONGODB_COLLECTION_USO_DIARIO, de forma incremental, com um pipeline $merge que recalcula os dias
+    a partir do checkpoint e substitui os consolidados (idempotente).
+    """
+    def __init__(self, logs):
+        self.logs = logs
+        self.eventos = MongoDB(collection=config.get("MONGODB_COLLECTION_USO"))
+        self.diario = MongoDB(collection=config.get("MONGODB_COLLECTION_USO_DIARIO"))
+
+    def preparar_collections(self):
+        """
+        Cria a collection time-series dos eventos (se não existir) e o índice de consulta dos consolidados
+        """
+        try:
+            if self.eventos.collection_options(self.eventos.collection_name) is None:
+                ttl = config.get("USO_EVENTOS_TTL_DIAS") * 86400 if config.get("USO_EVENTOS_TTL_DIAS") > 0 else None
+                try:
+                    self.eventos.create_timeseries_collection(self.eventos.collection_name, time_field="t", meta_field="m", granularity="minutes", expire_after_seconds=ttl)
+                except CollectionInvalid:
+                    pass
+            self.diario.create_indexes([IndexModel([("_id.requisitor", 1), ("_id.dia", 1)], name="requisitor_dia")])
+        except Exception as e:
+            self.logs.error(f'Erro ao preparar as collections de uso no mongodb - Error:{e}')
+            raise e
+
+    def get_checkpoint(self) -> datetime:
+        """
+        Retorna o fim da última janela agregada
+        :return: Data/hora (UTC) ou None se nenhuma agregação foi executada
+        """
+        documento = self.diario.find_one({"_id": ID_CHECKPOINT})
+        return documento.get("ate") if documento else None
+
+    def pipeline(self, inicio: datetime, fim: datetime) -> list:
+        """
+        Pipeline que recalcula os consolidados dos dias inteiros entre inicio e fim e substitui os existentes
+        :param inicio: Data/hora a partir de cujo dia os consolidados são recalculados (UTC, None para todos os eventos)
+        :param fim: Fim dos eventos considerados (UTC)
+        :return: Pipeline de agregação
+        """
+        filtro_tempo = {"$lt": fim}
+        if inicio is not None:
+            filtro_tempo["$gte"] = inicio.replace(hour=0, minute=0, second=0, microsecond=0)
+        return [
+            {"$match": {"t": filtro_tempo}},
+            {"$group": {
+                "_id": {"requisitor": "$m.requisitor", "campo": "$m.campo", "dia": {"$dateToString": {"format": "%Y-%m-%d", "date": "$t"}}},
+                "tokens": {"$sum": "$tokens"},
+                "requisicoes": {"$sum": 1},
+                "cache_hits": {"$sum": {"$cond": ["$cache", 1, 0]}}
+            }},
+            {"$set": {"atualizado_em": "$$NOW"}},
+            {"$merge": {"into": self.diario.collection_name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+
+    def agregar(self, inicio: datetime, fim: datetime):
+        """
+        Recalcula os consolidados por requisitor, campo e dia dos dias inteiros entre inicio e fim e avança o checkpoint.
+        Os consolidados recalculados substituem os existentes: repetir a agregação (falha antes do checkpoint ou dois workers
+        na mesma janela) não conta os eventos duas vezes e os eventos gravados com atraso nos dias recalculados passam a ser contados.
+        :param inicio: Data/hora a partir de cujo dia os consolidados são recalculados (UTC, None para todos os eventos)
+        :param fim: Fim dos eventos considerados (UTC)
+        """
+        try:
+            self.eventos.aggregate(self.pipeline(inicio, fim))
+            self.diario.update_one({"_id": ID_CHECKPOINT}, {"$max": {"ate": fim}})
+        except Exception as e:
+            self.logs.error(f'Erro ao agregar os eventos de uso no mongodb - Error:{e}')
+            raise e
+
+    def close_connection(self):
+        """
+        Fecha as conexões com o MongoDB
+        """
+        self.eventos.close()
+        self.diario.close()
+
+
+class AsyncUsageModel:
+    """
+    Versão assíncrona para gravar os eventos de uso e consultar os consolidados no caminho das requisições da API
+    """
+    def __init__(self, logs):
+        self.logs = logs
+        self.eventos = AsyncMongoDB(collection=config.get("MONGODB_COLLECTION_USO"))
+
+    @property
+    def diario(self):
+        """
+        Collection dos consolidados diários (na mesma conexão da collection dos eventos)
+        :return: Collection object
+        """
+        return self.eventos.db[config.get("MONGODB_COLLECTION_USO_DIARIO")]
+
+    async def insert_eventos(self, eventos: list) -> int:
+        """
+        Insere um lote de eventos de uso (inserção não ordenada)
+        :param eventos: Eventos a serem inseridos
+        :return: Quantidade de eventos inseridos
+        """
+        try:
+            resultado = await self.eventos.get_collection().insert_many(eventos, ordered=False)
+            return len(resultado.inserted_ids)
+        except BulkWriteError as e:
+            self.logs.error(f'Erro ao inserir parte do lote de eventos de uso no mongodb - Error:{e.details.get("writeErrors", [])[:1]}')
+            return e.details.get("nInserted", 0)
+
+    async def get_usage(self, requisitor: str, inicio: str, fim: str, campo: str = None) -> list:
+        """
+        Recupera os consolidados diários do requisitor no período (consulta pelo índice requisitor/dia)
+        :param requisitor: Identificador do requisitor
+        :param inicio: Dia inicial (YYYY-MM-DD)
+        :param fim: Dia final (YYYY-MM-DD, inclusive)
+        :param campo: Campo (opcional)
+        :return: Lista com os consolidados (requisitor, campo, dia, tokens, requisicoes e cache_hits)
+        """
+        try:
+            filtro = {"_id.requisitor": requisitor, "_id.dia": {"$gte": inicio, "$lte": fim}}
+            if campo:
+                filtro["_id.campo"] = campo
+            cursor = self.diario.find(filtro).sort([("_id.dia", 1), ("_id.campo", 1)])
+            return [{**documento.get("_id"), "tokens": documento.get("tokens", 0), "requisicoes": documento.get("requisicoes", 0),
+                     "cache_hits": documento.get("cache_hits", 0)} for documento in await cursor.to_list()]
+        except Exception as e:
+            self.logs.error(f'Erro ao recuperar o uso do mongodb - Error:{e}')
+            raise e
+
+    async def close_connection(self):
+        """
+        Fecha a conexão com o MongoDB
+        """
+        await self.eventos.close()
@@ -0,0 +1,180 @@
+"""
+MongoDB Class assíncrona para as operações de banco de dados MongoDB no caminho das requisições da API
+"""
+# coding: utf-8
+
+from config import get_config
+from pymongo import AsyncMongoClient
+import os
+
+config = get_config()
+
+
+class AsyncMongoDB:
+    """
+    Classe para manipulação assíncrona de banco de dados MongoDB
+    """
+
+    def __init__(self, collection=None):
+        """
+        Inicializa os parâmetros de conexão assíncrona com o MongoDB (a conexão é aberta no primeiro uso)
+        """
+        self.host = config.get('MONGODB_HOST')
+        self.port = int(config.get('MONGODB_PORT'))
+        self.user = config.get('MONGODB_USER')
+        self.password = config.get('MONGODB_PASSWD')
+        self.db_name = config.get('MONGODB_DB')
+        self.collection_name = collection if collection is not None else config.get('MONGODB_COLLECTION')
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        """
+        Conexão com o MongoDB, aberta no primeiro uso em cada processo (o cliente do pymongo não pode ser herdado em um fork)
+        :return: AsyncMongoClient object
+        """
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = AsyncMongoClient(host=self.host, port=self.port, username=self.user, password=self.password, authSource=self.db_name)
+            self._pid = os.getpid()
+        return self._conn
+
+    @property
+    def db(self):
+        """
+        Banco de dados do MongoDB
+        :return: Database object
+        """
+        return self.conn[self.db_name]
+
+    @property
+    def collection(self):
+        """
+        Collection atual do MongoDB
+        :return: Collection object
+        """
+        return self.db[self.collection_name]
+
+    def get_conn(self):
+        """
+        Retorna conexão com o MongoDB
+        :return: MongoDB connection object
+        """
+        return self.conn
+
+    def get_collection(self):
+        """
+        Retorna collection do MongoDB
+        :return: MongoDB collection object
+        """
+        return self.collection
+
+    async def close(self):
+        """
+        Fecha conexão com o MongoDB (se tiver sido aberta neste processo)
+        :return: None
+        """
+        if self._conn is not None and self._pid == os.getpid():
+            await self._conn.close()
+        self._conn = None
+
+    async def ping(self):
+        """
+        Verifica a disponibilidade do MongoDB (abre o pool de conexões do processo, se necessário)
+        :return: Resultado do comando ping
+        """
+        try:
+            return await self.conn.admin.command("ping")
+        except Exception as e:
+            raise e
+
+    async def insert_into_collection(self, data):
+        """
+        Insere dados na collection do MongoDB
+        :param data: Dados a serem inseridos
+        :return: Retorna ID dinâmico do MongoDB do documento inserido
+        """
+        try:
+            result = await self.collection.insert_one(data)
+            return result.inserted_id
+        except Exception as err:
+            raise err
+
+    async def find_one(self, query, projection=None, hint=None):
+        """
+        Busca um documento na collection do MongoDB
+        :param query: Query a ser usada na busca
+        :param projection: Campos a serem retornados (None retorna o documento completo)
+        :param hint: Nome do índice a ser utilizado (None deixa a escolha para o MongoDB)
+        :return: Documento encontrado
+        """
+        try:
+            result = await self.collection.find_one(query, projection, hint=hint)
+            return result
+        except Exception as err:
+            raise err
+
+    async def find(self, query, projection=None):
+        """
+        Busca documentos na collection do MongoDB
+        :param query: Query a ser usada na busca
+        :param projection: Campos a serem retornados (None retorna os documentos completos)
+        :return: Lista com os documentos encontrados
+        """
+        try:
+            cursor = self.collection.find(query, projection)
+            return await cursor.to_list()
+        except Exception as err:
+            raise err
+
+    async def iterate(self, query, projection=None, sort=None):
+        """
+        Percorre os documentos da collection do MongoDB sem carregá-los todos em memória
+        :param query: Query a ser usada na busca
+        :param projection: Campos a serem retornados
+        :param sort: Ordenação (lista de tuplas (campo, direção))
+        :return: Gerador assíncrono com os documentos
+        """
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        async with cursor:
+            async for documento in cursor:
+                yield documento
+
+    async def bulk_write(self, operations, ordered: bool = False):
+        """
+        Executa várias operações de escrita na collection do MongoDB em uma única chamada
+        :param operations: Lista de operações (pymongo.UpdateOne, pymongo.InsertOne, ...)
+        :param ordered: Se as operações devem parar no primeiro erro
+        :return: Resultado (pymongo.results.BulkWriteResult)
+        :raises BulkWriteError: Com os detalhes das operações que falharam
+        """
+        try:
+            return await self.collection.bulk_write(operations, ordered=ordered)
+        except Exception as err:
+            raise err
+
+    async def create_indexes(self, indexes):
+        """
+        Cria indexes na collection do MongoDB (indexes já existentes com a mesma definição são ignorados)
+        :param indexes: Lista de pymongo.IndexModel
+        :return: Nomes dos indexes
+        """
+        try:
+            return await self.collection.create_indexes(indexes)
+        except Exception as err:
+            raise err
+
+    async def explain(self, query, projection=None, hint=None):
+        """
+        Retorna o plano de execução de uma busca na collection do MongoDB
+        :param query: Query a ser usada na busca
+        :param projection: Campos a serem retornados
+        :param hint: Nome do índice a ser utilizado
+        :return: Resultado do explain
+        """
+        try:
+            return await self.collection.find(query, projection, hint=hint).explain()
+        except Exception as err:
+            raise err
@@ -3,11 +3,12 @@ MongoDB Class para as operações de banco de dados MongoDB
 """
 # coding: utf-8
 
-from config import Config
+from config import get_config
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
+import os
 
-config = Config().get_config()
+config = get_config()
 
 
 class MongoDB:
@@ -17,7 +18,7 @@ class MongoDB:
 
     def __init__(self, collection=None):
         """
-        Inicializa conexão com o MongoDB
+        Inicializa os parâmetros de conexão com o MongoDB (a conexão é aberta no primeiro uso)
         """
         self.host = config.get('MONGODB_HOST')
         self.port = int(config.get('MONGODB_PORT'))
@@ -25,9 +26,35 @@ class MongoDB:
         self.password = config.get('MONGODB_PASSWD')
         self.db_name = config.get('MONGODB_DB')
         self.collection_name = collection if collection is not None else config.get('MONGODB_COLLECTION')
-        self.conn = MongoClient(host=self.host, port=self.port, username=self.user, password=self.password, authSource=self.db_name)
-        self.db = self.conn[self.db_name]
-        self.collection = self.db[self.collection_name]
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        """
+        Conexão com o MongoDB, aberta no primeiro uso em cada processo (o cliente do pymongo não pode ser herdado em um fork)
+        :return: MongoClient object
+        """
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = MongoClient(host=self.host, port=self.port, username=self.user, password=self.password, authSource=self.db_name)
+            self._pid = os.getpid()
+        return self._conn
+
+    @property
+    def db(self):
+        """
+        Banco de dados do MongoDB
+        :return: Database object
+        """
+        return self.conn[self.db_name]
+
+    @property
+    def collection(self):
+        """
+        Collection atual do MongoDB
+        :return: Collection object
+        """
+        return self.db[self.collection_name]
 
     def get_conn(self):
         """
@@ -51,10 +78,12 @@ class MongoDB:
 
     def close(self):
         """
-        Fecha conexão com o MongoDB
+        Fecha conexão com o MongoDB (se tiver sido aberta neste processo)
         :return: None
         """
-        self.conn.close()
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
 
     def delete_collection(self):
         """
@@ -86,26 +115,41 @@ class MongoDB:
         except Exception as err:
             raise err
 
-    def find_one(self, query):
+    def find_one(self, query, projection=None):
         """
         Busca um documento na collection do MongoDB
         :param query: Query a ser usada na busca
+        :param projection: Campos a serem retornados (None retorna o documento completo)
         :return: Documento encontrado
         """
         try:
-            result = self.collection.find_one(query)
+            result = self.collection.find_one(query, projection)
             return result
         except Exception as err:
             raise err
 
-    def insert_many_into_collection(self, data):
+    def insert_if_absent(self, query, data):
+        """
+        Insere o documento de forma atômica apenas se nenhum documento atender à query (upsert com $setOnInsert)
+        :param query: Query que identifica o documento
+        :param data: Dados a serem inseridos
+        :return: Retorna ID dinâmico do MongoDB do documento inserido ou None se já existir
+        """
+        try:
+            result = self.collection.update_one(query, {"$setOnInsert": data}, upsert=True)
+            return result.upserted_id
+        except Exception as err:
+            raise err
+
+    def insert_many_into_collection(self, data, ordered: bool = True):
         """
         Insere vários dados na collection do MongoDB
         :param data: Dados a serem inseridos
+        :param ordered: Se a inserção deve parar no primeiro erro (False insere os demais documentos)
         :return: Retorna ID dinâmico do MongoDB do log inserido
         """
         try:
-            result = self.collection.insert_many(data)
+            result = self.collection.insert_many(data, ordered=ordered)
             return result.inserted_ids
         except Exception as err:
             raise err
@@ -291,6 +335,63 @@ class MongoDB:
         except Exception as err:
             raise err
 
+    def create_timeseries_collection(self, collection, time_field: str, meta_field: str = None, granularity: str = "seconds", expire_after_seconds: int = None):
+        """
+        Cria uma collection time-series no MongoDB (MongoDB 5.0+)
+        :param collection: Collection a ser criada
+        :param time_field: Campo com a data/hora de cada documento
+        :param meta_field: Campo com os metadados que agrupam os documentos (valores de baixa cardinalidade)
+        :param granularity: Granularidade dos buckets (seconds, minutes ou hours)
+        :param expire_after_seconds: Tempo de vida dos documentos em segundos (None para não expirar)
+        :return: None
+        """
+        try:
+            timeseries = {"timeField": time_field, "granularity": granularity}
+            if meta_field is not None:
+                timeseries["metaField"] = meta_field
+            opcoes = {"timeseries": timeseries}
+            if expire_after_seconds is not None:
+                opcoes["expireAfterSeconds"] = expire_after_seconds
+            self.db.create_collection(collection, **opcoes)
+        except Exception as err:
+            raise err
+
+    def collection_options(self, collection):
+        """
+        Retorna as opções de criação de uma collection do MongoDB
+        :param collection: Collection a ser consultada
+        :return: Dicionário com as opções (type, options) ou None se a collection não existir
+        """
+        try:
+            for info in self.db.list_collections(filter={"name": collection}):
+                return {"type": info.get("type"), "options": info.get("options", {})}
+            return None
+        except Exception as err:
+            raise err
+
+    def coll_mod(self, collection, **options):
+        """
+        Altera as opções de uma collection do MongoDB (comando collMod)
+        :param collection: Collection a ser alterada
+        :param options: Opções a serem alteradas (ex.: expireAfterSeconds)
+        :return: Resultado do comando
+        """
+        try:
+            return self.db.command("collMod", collection, **options)
+        except Exception as err:
+            raise err
+
+    def rename_collection(self, new_name):
+        """
+        Renomeia a collection atual do MongoDB
+        :param new_name: Novo nome da collection
+        :return: None
+        """
+        try:
+            self.collection.rename(new_name)
+        except Exception as err:
+            raise err
+
     def list_collections(self):
         """
         Lista collections no MongoDB
@@ -345,7 +446,6 @@ class MongoDB:
         """
         try:
             self.collection_name = collection
-            self.collection = self.db[self.collection_name]
         except Exception as err:
             raise err
 
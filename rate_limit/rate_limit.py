@@ -0,0 +1,180 @@
+"""
+Limite de requisições e de tokens por requisitor (janela deslizante no Redis)
+"""
+# coding: utf-8
+
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+import math
+import time
+import uuid
+
+# KEYS: [1] zset das requisições, [2] zset dos consumos de tokens ("id:tokens"), [3] soma dos tokens da janela
+# ARGV: [1] agora (ms), [2] janela (ms), [3] limite de requisições, [4] limite de tokens, [5] id da requisição, [6] custo em requisições
+SCRIPT_VERIFICAR = """
+local agora = tonumber(ARGV[1])
+local janela = tonumber(ARGV[2])
+local inicio = agora - janela
+local custo = tonumber(ARGV[6])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', inicio)
+local expirados = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', inicio)
+if #expirados > 0 then
+    local soma = 0
+    for _, membro in ipairs(expirados) do
+        soma = soma + tonumber(string.match(membro, ':(%d+)$'))
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', inicio)
+    redis.call('DECRBY', KEYS[3], soma)
+end
+
+local requisicoes = redis.call('ZCARD', KEYS[1])
+local tokens = tonumber(redis.call('GET', KEYS[3]) or '0')
+local permitido = 0
+if requisicoes + custo <= tonumber(ARGV[3]) and tokens < tonumber(ARGV[4]) then
+    for i = 1, custo do
+        redis.call('ZADD', KEYS[1], agora, ARGV[5] .. ':' .. i)
+    end
+    requisicoes = requisicoes + custo
+    permitido = 1
+end
+
+local reset = janela
+local mais_antigo = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if mais_antigo[2] then
+    reset = tonumber(mais_antigo[2]) + janela - agora
+end
+if permitido == 0 and tokens >= tonumber(ARGV[4]) then
+    -- Negada pelos tokens: libera quando os consumos mais antigos saírem da janela e a soma ficar abaixo do limite
+    local reset_tokens = janela
+    local liberados = 0
+    local consumos = redis.call('ZRANGE', KEYS[2], 0, -1, 'WITHSCORES')
+    for i = 1, #consumos, 2 do
+        liberados = liberados + tonumber(string.match(consumos[i], ':(%d+)$'))
+        if tokens - liberados < tonumber(ARGV[4]) then
+            reset_tokens = tonumber(consumos[i + 1]) + janela - agora
+            break
+        end
+    end
+    if requisicoes + custo <= tonumber(ARGV[3]) then
+        reset = reset_tokens
+    else
+        reset = math.max(reset, reset_tokens)
+    end
+end
+redis.call('PEXPIRE', KEYS[1], janela)
+redis.call('PEXPIRE', KEYS[2], janela)
+redis.call('PEXPIRE', KEYS[3], janela)
+return {permitido, requisicoes, tokens, reset}
+"""
+
+# KEYS: [1] zset dos consumos de tokens ("id:tokens"), [2] soma dos tokens da janela
+# ARGV: [1] agora (ms), [2] janela (ms), [3] id da requisição, [4] tokens consumidos
+SCRIPT_REGISTRAR_TOKENS = """
+redis.call('ZADD', KEYS[1], tonumber(ARGV[1]), ARGV[3] .. ':' .. ARGV[4])
+redis.call('INCRBY', KEYS[2], tonumber(ARGV[4]))
+redis.call('PEXPIRE', KEYS[1], tonumber(ARGV[2]))
+redis.call('PEXPIRE', KEYS[2], tonumber(ARGV[2]))
+return 1
+"""
+
+
+class RateLimiter:
+    """
+    Classe responsável por limitar, por requisitor, a quantidade de requisições e de tokens consumidos em uma janela deslizante.
+    Cada verificação é feita por um único script atômico no Redis, compartilhado entre todos os workers.
+    Em caso de falha do Redis a requisição é permitida (fail-open), para que o limite não derrube a API.
+    """
+    def __init__(self, config, logs, redis: AsyncRedisAdapter):
+        """
+        Inicializa o limitador
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado
+        """
+        self.logs = logs
+        self.ativo = config.get("RATE_LIMIT_ATIVO")
+        self.janela = config.get("RATE_LIMIT_JANELA")
+        self.limite_requisicoes = config.get("RATE_LIMIT_REQUISICOES")
+        self.limite_tokens = config.get("RATE_LIMIT_TOKENS")
+        self.script_verificar = redis.get_conn().register_script(SCRIPT_VERIFICAR)
+        self.script_registrar_tokens = redis.get_conn().register_script(SCRIPT_REGISTRAR_TOKENS)
+        self.estatisticas = {"verificacoes": 0, "limitadas": 0, "falhas_redis": 0}
+
+    @staticmethod
+    def chaves(requisitor: str) -> list:
+        """
+        Chaves do requisitor no Redis (com hash tag para ficarem no mesmo slot em um cluster)
+        :param requisitor: Identificador do requisitor
+        :return: Lista com as chaves das requisições, dos consumos de tokens e da soma dos tokens
+        """
+        return [f"rate_limit:{{{requisitor}}}:requisicoes", f"rate_limit:{{{requisitor}}}:tokens", f"rate_limit:{{{requisitor}}}:soma_tokens"]
+
+    def resultado(self, permitido: bool, requisicoes: int, tokens: int, reset_ms: int) -> dict:
+        """
+        Monta o resultado da verificação com os cabeçalhos de limite
+        :param permitido: Se a requisição foi permitida
+        :param requisicoes: Requisições na janela
+        :param tokens: Tokens consumidos na janela
+        :param reset_ms: Tempo em milissegundos até a liberação da requisição mais antiga da janela (ou, se negada pelos tokens,
+                         até a soma dos tokens da janela ficar abaixo do limite)
+        :return: Dicionário com o resultado, os cabeçalhos e o tempo para nova tentativa
+        """
+        reset = max(1, math.ceil(reset_ms / 1000))
+        return {
+            "permitido": permitido,
+            "retry_after": reset,
+            "headers": {
+                "X-RateLimit-Limit-Requests": str(self.limite_requisicoes),
+                "X-RateLimit-Remaining-Requests": str(max(self.limite_requisicoes - requisicoes, 0)),
+                "X-RateLimit-Limit-Tokens": str(self.limite_tokens),
+                "X-RateLimit-Remaining-Tokens": str(max(self.limite_tokens - tokens, 0)),
+                "X-RateLimit-Reset": str(reset)
+            }
+        }
+
+    async def verificar(self, requisitor: str, custo: int = 1) -> dict:
+        """
+        Verifica se o requisitor pode fazer a requisição e, se puder, a contabiliza na janela
+        :param requisitor: Identificador do requisitor
+        :param custo: Quantidade de requisições contabilizadas (ex.: itens de um lote)
+        :return: Resultado da verificação (permitido, retry_after e headers)
+        """
+        if not self.ativo:
+            return {"permitido": True, "retry_after": 0, "headers": {}}
+
+        self.estatisticas["verificacoes"] += 1
+        try:
+            permitido, requisicoes, tokens, reset = await self.script_verificar(
+                keys=self.chaves(requisitor),
+                args=[int(time.time() * 1000), self.janela * 1000, self.limite_requisicoes, self.limite_tokens, uuid.uuid4().hex, custo])
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao verificar o limite de requisições do requisitor {requisitor}: {ex}')
+            return {"permitido": True, "retry_after": 0, "headers": {}}
+
+        if not permitido:
+            self.estatisticas["limitadas"] += 1
+
+        return self.resultado(bool(permitido), int(requisicoes), int(tokens), int(reset))
+
+    async def registrar_tokens(self, requisitor: str, tokens: int):
+        """
+        Contabiliza os tokens consumidos pelo requisitor na janela
+        :param requisitor: Identificador do requisitor
+        :param tokens: Total de tokens consumidos
+        """
+        if not self.ativo or not tokens:
+            return
+
+        try:
+            await self.script_registrar_tokens(keys=self.chaves(requisitor)[1:], args=[int(time.time() * 1000), self.janela * 1000, uuid.uuid4().hex, int(tokens)])
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao registrar o consumo de tokens do requisitor {requisitor}: {ex}')
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do limitador
+        :return: Dicionário com as verificações, requisições limitadas e falhas do Redis
+        """
+        return {**self.estatisticas, "ativo": self.ativo}
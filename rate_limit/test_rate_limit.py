@@ -0,0 +1,101 @@
+"""
+Testes do limite de requisições e de tokens (scripts Lua executados no fakeredis)
+"""
+# coding: utf-8
+
+from loguru import logger
+from rate_limit.rate_limit import RateLimiter
+from types import SimpleNamespace
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"RATE_LIMIT_ATIVO": True, "RATE_LIMIT_JANELA": 60, "RATE_LIMIT_REQUISICOES": 3, "RATE_LIMIT_TOKENS": 100}
+
+
+class Relogio:
+    def __init__(self, monkeypatch):
+        self.agora = 1_700_000_000.0
+        monkeypatch.setattr("rate_limit.rate_limit.time", SimpleNamespace(time=lambda: self.agora))
+
+
+async def test_limite_de_requisicoes_na_janela_deslizante(redis, monkeypatch):
+    relogio = Relogio(monkeypatch)
+    limitador = RateLimiter(CONFIG, logger, redis=redis)
+    for restantes in ("2", "1", "0"):
+        resultado = await limitador.verificar("usuario")
+        assert resultado["permitido"] and resultado["headers"]["X-RateLimit-Remaining-Requests"] == restantes
+        relogio.agora += 10
+
+    resultado = await limitador.verificar("usuario")
+    assert not resultado["permitido"]
+    assert resultado["retry_after"] == 30
+    assert limitador.estatisticas["limitadas"] == 1
+
+    relogio.agora += 30
+    assert (await limitador.verificar("usuario"))["permitido"]
+    assert not (await limitador.verificar("usuario"))["permitido"]
+
+
+async def test_lote_que_excede_o_limite_nao_e_contabilizado(redis, monkeypatch):
+    Relogio(monkeypatch)
+    limitador = RateLimiter(CONFIG, logger, redis=redis)
+    assert (await limitador.verificar("usuario", custo=2))["permitido"]
+    resultado = await limitador.verificar("usuario", custo=2)
+    assert not resultado["permitido"] and resultado["headers"]["X-RateLimit-Remaining-Requests"] == "1"
+    assert (await limitador.verificar("usuario"))["permitido"]
+
+
+async def test_tokens_consumidos_bloqueiam_ate_sairem_da_janela(redis, monkeypatch):
+    relogio = Relogio(monkeypatch)
+    limitador = RateLimiter({**CONFIG, "RATE_LIMIT_REQUISICOES": 100}, logger, redis=redis)
+    await limitador.registrar_tokens("usuario", 60)
+    relogio.agora += 30
+    await limitador.registrar_tokens("usuario", 40)
+
+    resultado = await limitador.verificar("usuario")
+    assert not resultado["permitido"] and resultado["headers"]["X-RateLimit-Remaining-Tokens"] == "0"
+
+    relogio.agora += 31
+    resultado = await limitador.verificar("usuario")
+    assert resultado["permitido"] and resultado["headers"]["X-RateLimit-Remaining-Tokens"] == "60"
+    assert int(await redis.get_conn().get(limitador.chaves("usuario")[2])) == 40
+
+
+async def test_negacao_pelos_tokens_informa_quando_a_soma_fica_abaixo_do_limite(redis, monkeypatch):
+    relogio = Relogio(monkeypatch)
+    limitador = RateLimiter({**CONFIG, "RATE_LIMIT_REQUISICOES": 100}, logger, redis=redis)
+    await limitador.registrar_tokens("usuario", 10)
+    relogio.agora += 5
+    assert (await limitador.verificar("usuario"))["permitido"]
+    relogio.agora += 5
+    await limitador.registrar_tokens("usuario", 50)
+    relogio.agora += 10
+    await limitador.registrar_tokens("usuario", 50)
+
+    # A saída do consumo de 10 tokens não basta (a soma continua em 100): o reset é o do consumo de 50 tokens
+    relogio.agora += 10
+    resultado = await limitador.verificar("usuario")
+    assert not resultado["permitido"]
+    assert resultado["retry_after"] == 40 and resultado["headers"]["X-RateLimit-Reset"] == "40"
+
+    relogio.agora += 40
+    assert (await limitador.verificar("usuario"))["permitido"]
+
+async def test_requisitores_tem_janelas_independentes(redis, monkeypatch):
+    Relogio(monkeypatch)
+    limitador = RateLimiter({**CONFIG, "RATE_LIMIT_REQUISICOES": 1}, logger, redis=redis)
+    assert (await limitador.verificar("a"))["permitido"]
+    assert (await limitador.verificar("b"))["permitido"]
+    assert not (await limitador.verificar("a"))["permitido"]
+
+
+async def test_falha_do_redis_permite_a_requisicao(redis):
+    limitador = RateLimiter(CONFIG, logger, redis=redis)
+
+    async def falhar(**_):
+        raise ConnectionError("Redis indisponível")
+
+    limitador.script_verificar = falhar
+    assert (await limitador.verificar("usuario"))["permitido"]
+    assert limitador.estatisticas["falhas_redis"] == 1
@@ -0,0 +1,174 @@
+"""
+Prontidão do worker: aquecimento das dependências na inicialização e verificação da disponibilidade para o endpoint /ready
+"""
+# coding: utf-8
+
+import asyncio
+import time
+
+
+class ReadinessChecker:
+    """
+    Classe responsável por aquecer as dependências do worker antes de ele receber tráfego (pools do Redis, do MongoDB e do serviço
+    de autenticação, clientes e chaves dos backends de IA e contextos dos campos) e por verificar, com a latência de cada uma, se elas estão disponíveis.
+    O aquecimento é feito no início do ciclo de vida, antes do uvicorn aceitar conexões no worker. O worker só é considerado pronto
+    quando as dependências de READY_DEPENDENCIAS estão disponíveis; as demais (ex.: auth) são apenas reportadas, para que a falha de
+    um serviço externo comum a todos os workers não retire todos eles do balanceamento.
+    """
+    DEPENDENCIAS = ("redis", "mongo", "chaves_openai", "auth", "contextos")
+
+    def __init__(self, config, logs, registry):
+        """
+        Inicializa a verificação de prontidão
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param registry: Registro dos clientes compartilhados do worker
+        """
+        self.config = config
+        self.logs = logs
+        self.registry = registry
+        self.timeout = config.get("READY_TIMEOUT")
+        self.cache_ttl = config.get("READY_CACHE_TTL")
+        self.obrigatorias = {dependencia.strip() for dependencia in config.get("READY_DEPENDENCIAS").split(",") if dependencia.strip()}
+        self.aquecido = False
+        self.total_contextos = None
+        self.resultado = None
+        self.verificado_em = 0.0
+        self.lock = asyncio.Lock()
+        self.estatisticas = {"verificacoes": 0, "nao_pronto": 0, "aquecimentos": 0}
+
+    async def medir(self, nome: str, verificacao) -> dict:
+        """
+        Executa a verificação de uma dependência com tempo máximo, medindo a latência
+        :param nome: Nome da dependência
+        :param verificacao: Função assíncrona da verificação (retorna um dicionário com os detalhes)
+        :return: Dicionário com a disponibilidade, a latência em milissegundos, os detalhes ou o erro
+        """
+        inicio = time.perf_counter()
+        try:
+            detalhes = await asyncio.wait_for(verificacao(), timeout=self.timeout)
+            resultado = {"ok": True, **(detalhes or {})}
+        except asyncio.TimeoutError:
+            resultado = {"ok": False, "erro": f"Tempo máximo de {self.timeout}s excedido"}
+        except Exception as ex:
+            resultado = {"ok": False, "erro": str(ex) or repr(ex)}
+        resultado["latencia_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+        resultado["obrigatoria"] = nome in self.obrigatorias
+        return resultado
+
+    async def verificar_redis(self) -> dict:
+        """
+        Verifica o Redis (abre a conexão do pool)
+        """
+        await self.registry.redis.get_conn().ping()
+        return {}
+
+    async def verificar_mongo(self) -> dict:
+        """
+        Verifica o MongoDB (abre o pool de conexões)
+        """
+        await self.registry.context_model.mongo.ping()
+        return {}
+
+    async def verificar_chaves_openai(self) -> dict:
+        """
+        Verifica se o conjunto de chaves de cada backend de BACKENDS_ATIVOS existe no Redis e não está vazio.
+        Backends sem conjunto de chaves (ex.: fake) não são verificados.
+        """
+        backend = self.registry.backend
+        backends = getattr(backend, "backends", None) or {backend.NOME: backend}
+        chaves = {}
+        for nome, backend in backends.items():
+            keys_key = getattr(backend, "keys_key", None)
+            if keys_key is None:
+                continue
+            chaves[nome] = await self.registry.redis.quantidade_chaves(keys_key)
+            if chaves[nome] == 0:
+                raise Exception(f'Chaves do backend {nome} não encontradas no Redis para a key: {keys_key}')
+        return {"chaves": chaves}
+
+    async def verificar_auth(self) -> dict:
+        """
+        Verifica o serviço de autenticação (abre a conexão keep-alive do pool)
+        """
+        status = await self.registry.auth_client.verificar_disponibilidade()
+        return {"status": status, "circuito": self.registry.auth_client.circuit_breaker.estado}
+
+    async def verificar_contextos(self) -> dict:
+        """
+        Verifica os contextos dos campos: com o cache de contextos, exige a carga em memória (refeita se tiver falhado);
+        sem o cache, os contextos são lidos uma vez no aquecimento, para trazer a collection para a memória do MongoDB
+        """
+        context_cache = self.registry.context_cache
+        if context_cache is not None:
+            if not context_cache.carregado_em:
+                await context_cache.carregar(await context_cache.versao_atual())
+            if not context_cache.carregado_em:
+                raise Exception('Contextos não carregados em memória')
+            return {"contextos": len(context_cache.contextos)}
+        if self.total_contextos is None:
+            self.total_contextos = len(await self.registry.context_model.get_all_contexts())
+        return {"contextos": self.total_contextos}
+
+    async def verificar_dependencias(self) -> dict:
+        """
+        Verifica todas as dependências em paralelo
+        :return: Dicionário com a prontidão do worker e o resultado de cada dependência
+        """
+        resultados = await asyncio.gather(*(self.medir(nome, getattr(self, f"verificar_{nome}")) for nome in self.DEPENDENCIAS))
+        dependencias = dict(zip(self.DEPENDENCIAS, resultados))
+        pronto = all(resultado["ok"] for nome, resultado in dependencias.items() if nome in self.obrigatorias)
+        return {"pronto": pronto, "dependencias": dependencias}
+
+    async def aquecer(self) -> dict:
+        """
+        Aquece as dependências do worker e cria os clientes de todas as chaves dos backends de IA.
+        Falhas não interrompem a inicialização: o worker sobe não pronto e o aquecimento é refeito nas verificações seguintes.
+        :return: Resultado da verificação das dependências
+        """
+        self.estatisticas["aquecimentos"] += 1
+        # Os clientes são criados antes da verificação, pois alguns backends gravam o seu conjunto de chaves no Redis ao aquecer (ex.: mistral)
+        clientes = None
+        try:
+            clientes = await asyncio.wait_for(self.registry.backend.aquecer_clientes(), timeout=self.timeout)
+        except Exception as ex:
+            self.logs.error(f'Erro ao criar os clientes dos backends de IA no aquecimento: {ex!r}')
+        resultado = await self.verificar_dependencias()
+        if clientes is not None:
+            resultado["dependencias"]["chaves_openai"]["clientes"] = clientes
+        self.aquecido = resultado["pronto"]
+        resultado["aquecido"] = self.aquecido
+        latencias = ", ".join(f'{nome}={dependencia["latencia_ms"]}ms{"" if dependencia["ok"] else " (falha)"}' for nome, dependencia in resultado["dependencias"].items())
+        if self.aquecido:
+            self.logs.info(f'Worker aquecido: {latencias}')
+        else:
+            self.logs.error(f'Worker não está pronto após o aquecimento: {latencias}')
+        self.resultado = resultado
+        self.verificado_em = time.monotonic()
+        return resultado
+
+    async def verificar(self) -> dict:
+        """
+        Verifica a prontidão do worker (refaz o aquecimento enquanto ele não tiver sido concluído).
+        O resultado é reaproveitado por READY_CACHE_TTL segundos, para que as sondas do balanceador não sobrecarreguem as dependências.
+        :return: Resultado da verificação das dependências
+        """
+        self.estatisticas["verificacoes"] += 1
+        async with self.lock:
+            if self.resultado is None or time.monotonic() - self.verificado_em >= self.cache_ttl:
+                if not self.aquecido:
+                    await self.aquecer()
+                else:
+                    self.resultado = {**await self.verificar_dependencias(), "aquecido": True}
+                    self.verificado_em = time.monotonic()
+        if not self.resultado["pronto"]:
+            self.estatisticas["nao_pronto"] += 1
+        return self.resultado
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas da prontidão
+        :return: Dicionário com os contadores, o estado do aquecimento e a última latência de cada dependência
+        """
+        latencias = {nome: dependencia["latencia_ms"] for nome, dependencia in self.resultado["dependencias"].items()} if self.resultado else None
+        return {**self.estatisticas, "aquecido": self.aquecido, "pronto": self.resultado["pronto"] if self.resultado else False, "latencias_ms": latencias}
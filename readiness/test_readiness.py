@@ -0,0 +1,60 @@
+"""
+Testes da verificação de prontidão do worker
+"""
+# coding: utf-8
+
+from backends.fake_backend import FakeBackend
+from loguru import logger
+from readiness.readiness import ReadinessChecker
+from types import SimpleNamespace
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"READY_TIMEOUT": 1, "READY_CACHE_TTL": 0, "READY_DEPENDENCIAS": "redis,chaves_openai", "FAKE_CUSTO_MIL_TOKENS": 0, "FAKE_LATENCIA": 0}
+
+
+class BackendComChaves:
+    """
+    Backend com conjunto de chaves no Redis; ao aquecer, grava as chaves configuradas (como o da Mistral)
+    """
+    def __init__(self, nome: str, redis, chaves: list = None):
+        self.NOME = nome
+        self.keys_key = f"chaves_{nome}"
+        self.redis = redis
+        self.chaves = chaves or []
+
+    async def aquecer_clientes(self) -> int:
+        if self.chaves:
+            await self.redis.get_conn().sadd(self.keys_key, *self.chaves)
+        return len(self.chaves)
+
+
+def cria_readiness(redis, *backends) -> ReadinessChecker:
+    registry = SimpleNamespace(redis=redis, backend=SimpleNamespace(NOME="roteador", backends={backend.NOME: backend for backend in backends},
+                                                                    aquecer_clientes=lambda: backends[0].aquecer_clientes()),
+                               context_model=None, auth_client=None, context_cache=None)
+    return ReadinessChecker(CONFIG, logger, registry=registry)
+
+
+async def test_backend_fake_nao_exige_chaves(redis):
+    readiness = cria_readiness(redis, FakeBackend(CONFIG, logger))
+    assert await readiness.verificar_chaves_openai() == {"chaves": {}}
+    assert (await readiness.verificar_dependencias())["pronto"]
+
+
+async def test_verifica_o_conjunto_de_chaves_de_cada_backend_ativo(redis):
+    readiness = cria_readiness(redis, BackendComChaves("chat_gpt", redis), BackendComChaves("mistral", redis), FakeBackend(CONFIG, logger))
+    await redis.get_conn().sadd("chaves_chat_gpt", "a", "b")
+    with pytest.raises(Exception, match="mistral"):
+        await readiness.verificar_chaves_openai()
+
+    await redis.get_conn().sadd("chaves_mistral", "c")
+    assert await readiness.verificar_chaves_openai() == {"chaves": {"chat_gpt": 2, "mistral": 1}}
+
+
+async def test_aquecimento_grava_as_chaves_antes_de_verificar(redis):
+    readiness = cria_readiness(redis, BackendComChaves("mistral", redis, chaves=["c"]))
+    resultado = await readiness.aquecer()
+    assert resultado["pronto"] and resultado["aquecido"]
+    assert resultado["dependencias"]["chaves_openai"]["clientes"] == 1
@@ -0,0 +1,112 @@
+"""
+Adaptador assíncrono para o Redis
+"""
+# coding: utf-8
+
+from redis.asyncio import Redis
+from config import get_config
+
+config = get_config()
+
+
+class AsyncRedisAdapter:
+    """
+    Classe adaptadora assíncrona para o Redis, utilizada no caminho das requisições da API para não bloquear o event loop
+    """
+
+    def __init__(self, db: int = 0):
+        """
+        Inicializa a conexão assíncrona com o Redis
+        :param db: Número do banco de dados a ser utilizado
+        """
+        self.host = config.get('REDIS_HOST')
+        self.port = config.get('REDIS_PORT')
+        self.pwd = config.get('REDIS_PWD')
+        self.db = db
+        if self.pwd is None or self.pwd == '':
+            self.conn = Redis(host=self.host, port=self.port, db=self.db, protocol=3)
+        else:
+            self.conn = Redis(host=self.host, port=self.port, db=self.db, password=self.pwd, protocol=3)
+
+    def get_conn(self):
+        """
+        Retorna a conexão com o Redis
+        :return: Redis connection object
+        """
+        try:
+            return self.conn
+        except Exception as e:
+            raise e
+
+    async def get(self, key):
+        """
+        Retorna o valor de uma chave no Redis
+        :param key: Chave a ser consultada
+        :return: Valor da chave
+        """
+        try:
+            return await self.conn.get(name=key)
+        except Exception as e:
+            raise e
+
+    async def set_ex(self, key, value, ttl: int):
+        """
+        Seta um valor para uma chave no Redis com tempo de expiração
+        :param key: Chave a ser setada
+        :param value: Valor a ser setado
+        :param ttl: Tempo de expiração em segundos
+        :return: Status da operação
+        """
+        try:
+            return await self.conn.set(name=key, value=value, ex=ttl)
+        except Exception as e:
+            raise e
+
+    async def exists(self, key):
+        """
+        Verifica se uma chave existe no Redis
+        :param key: Chave a ser verificada
+        :return: Status da operação
+        """
+        try:
+            return bool(await self.conn.exists(key))
+        except Exception as e:
+            raise e
+
+    async def quantidade_chaves(self, keys_key: str) -> int:
+        """
+        Retorna a quantidade de chaves das APIS de IA armazenadas no Redis
+        :param keys_key: Chave no Redis onde as chaves estão armazenadas
+        :return: Quantidade de chaves (0 se o conjunto não existir)
+        """
+        try:
+            return int(await self.conn.scard(keys_key))
+        except Exception as e:
+            raise e
+
+    async def retorna_chave_disponivel(self, keys_key: str):
+        """
+        Retorna uma chave disponível para a utilização das APIS de IA (através da rotação das chaves)
+        :param keys_key: Chave no Redis onde as chaves estão armazenadas
+        :return: Chave disponível para uso
+        """
+        try:
+            # Verificando se as chaves estão no Redis
+            if not await self.conn.exists(keys_key):
+                raise Exception(f'Chaves não encontradas no Redis para a key: {keys_key}')
+
+            # Retornando a chave disponível
+            chave = await self.conn.srandmember(keys_key)
+
+            return chave.decode('utf-8')
+        except Exception as ex:
+            raise ex
+
+    async def close(self):
+        """
+        Fecha a conexão com o Redis
+        """
+        try:
+            await self.conn.aclose()
+        except Exception as e:
+            raise e
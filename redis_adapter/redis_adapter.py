@@ -4,10 +4,10 @@ Adaptador para o Redis
 # coding: utf-8
 
 from redis import Redis
-from config import Config
+from config import get_config
 import hashlib
 
-config = Config().get_config()
+config = get_config()
 
 
 class RedisAdapter:
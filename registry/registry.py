@@ -0,0 +1,176 @@
+"""
+Registro dos clientes compartilhados pelo processo (worker) da API
+"""
+# coding: utf-8
+
+from models.context_model import CHAVE_VERSAO
+
+
+class ClientRegistry:
+    """
+    Classe responsável por construir uma única vez por worker os clientes utilizados pelas requisições (Redis, MongoDB, HTTP e OpenAI),
+    compartilhá-los entre as requisições e fechá-los ao final do ciclo de vida da aplicação
+    """
+    def __init__(self, config, logs):
+        """
+        Inicializa o registro (os clientes são criados no start)
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        """
+        self.config = config
+        self.logs = logs
+        self.redis = None
+        self.shared_cache = None
+        self.shared_contextos = None
+        self.context_model = None
+        self.context_cache = None
+        self.token_cache = None
+        self.auth_client = None
+        self.backend = None
+        self.ai_middleware = None
+        self.admission = None
+        self.rate_limiter = None
+        self.response_cache = None
+        self.semantic_cache = None
+        self.usage_model = None
+        self.usage_recorder = None
+        self.usage_aggregator = None
+        self.readiness = None
+
+    async def start(self):
+        """
+        Cria os clientes compartilhados
+        """
+        # Importações no start (em cada worker): o processo pai do uvicorn, que apenas supervisiona os workers,
+        # não carrega os clientes (OpenAI, httpx, pymongo) e os componentes opcionais só são carregados quando ativos
+        from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+        from models.context_model import AsyncContextModel
+        from backends.router import BackendRouter
+        from auth.token_cache import TokenCache
+        from auth.auth_client import AuthClient
+        from admission.admission import AdmissionController
+        from rate_limit.rate_limit import RateLimiter
+        from cache.response_cache import ResponseCache
+        from ai_middleware.ai_middleware import AIMiddleware
+        from readiness.readiness import ReadinessChecker
+
+        try:
+            self.redis = AsyncRedisAdapter(self.config.get('REDIS_DB_CONTROLES'))
+            if self.config.get("SHARED_CACHE_ATIVO"):
+                from shared_cache.shared_cache import SharedMemoryCache
+                self.shared_cache = SharedMemoryCache(self.config, self.logs)
+            self.context_model = AsyncContextModel(logs=self.logs)
+            await self.context_model.criar_indices()
+            if self.config.get("CONTEXT_CACHE_ATIVO"):
+                from cache.context_cache import ContextCache
+                if self.config.get("SHARED_CACHE_ATIVO"):
+                    # Segmento próprio dos contextos: uma carga não disputa os slots com as validações de token
+                    self.shared_contextos = SharedMemoryCache(self.config, self.logs, segmento="contextos")
+                self.context_cache = ContextCache(self.config, self.logs, context_model=self.context_model, redis=self.redis, shared=self.shared_contextos)
+                await self.context_cache.iniciar()
+            self.token_cache = TokenCache(self.config, self.logs, redis=self.redis, shared=self.shared_cache)
+            self.auth_client = AuthClient(self.config, self.logs, token_cache=self.token_cache)
+            nomes_backends = [nome.strip() for nome in self.config.get("BACKENDS_ATIVOS").split(",") if nome.strip()]
+            self.backend = BackendRouter(self.config, self.logs, backends=[self.cria_backend(nome) for nome in nomes_backends])
+            self.response_cache = ResponseCache(self.config, self.logs, redis=self.redis)
+            if self.config.get("SEMANTIC_CACHE_ATIVO"):
+                from cache.semantic_cache import SemanticCache
+                self.semantic_cache = SemanticCache(self.config, self.logs)
+                self.semantic_cache.carregar()
+            redis_single_flight = None
+            if self.config.get("SINGLE_FLIGHT_REDIS"):
+                from single_flight.single_flight import RedisSingleFlight
+                redis_single_flight = RedisSingleFlight(self.config, self.logs, redis=self.redis)
+            self.ai_middleware = AIMiddleware(self.config, self.logs, backend=self.backend, context_model=self.context_cache if self.context_cache is not None else self.context_model, response_cache=self.response_cache, redis_single_flight=redis_single_flight, semantic_cache=self.semantic_cache)
+            self.admission = AdmissionController(self.config, self.logs)
+            self.rate_limiter = RateLimiter(self.config, self.logs, redis=self.redis)
+            if self.config.get("USO_ATIVO"):
+                from models.usage_model import AsyncUsageModel
+                from usage.usage import UsageRecorder, UsageAggregator
+                self.usage_model = AsyncUsageModel(logs=self.logs)
+                self.usage_recorder = UsageRecorder(self.config, self.logs, usage_model=self.usage_model)
+                self.usage_aggregator = UsageAggregator(self.config, self.logs, redis=self.redis)
+                self.usage_aggregator.iniciar()
+            # Aquecimento antes do worker aceitar conexões (o lifespan só conclui a inicialização ao final do start)
+            self.readiness = ReadinessChecker(self.config, self.logs, registry=self)
+            await self.readiness.aquecer()
+        except Exception as ex:
+            self.logs.error(f'Erro ao iniciar os clientes compartilhados: {ex}')
+            raise ex
+
+    def cria_backend(self, nome: str):
+        """
+        Cria o backend de IA pelo nome (importado apenas quando ativo)
+        :param nome: Nome do backend (chat_gpt, mistral ou fake)
+        :return: Backend de IA
+        """
+        if nome == "chat_gpt":
+            from chat_gpt.chat_gpt import ChatGpt
+            return ChatGpt(self.config, self.logs, redis=self.redis)
+        if nome == "mistral":
+            from mistral.mistral import Mistral
+            return Mistral(self.config, self.logs, redis=self.redis)
+        if nome == "fake":
+            from backends.fake_backend import FakeBackend
+            return FakeBackend(self.config, self.logs)
+        raise Exception(f'Backend de IA desconhecido: {nome}')
+
+    async def close(self):
+        """
+        Fecha os clientes compartilhados, na ordem inversa da criação
+        """
+        for nome, fechar in (("usage_aggregator", lambda: self.usage_aggregator.close()),
+                             ("usage_recorder", lambda: self.usage_recorder.close()),
+                             ("usage_model", lambda: self.usage_model.close_connection()),
+                             ("backend", lambda: self.backend.close()),
+                             ("auth_client", lambda: self.auth_client.close()),
+                             ("context_cache", lambda: self.context_cache.close()),
+                             ("context_model", lambda: self.context_model.close_connection()),
+                             ("redis", lambda: self.redis.close())):
+            if getattr(self, nome) is None:
+                continue
+            try:
+                await fechar()
+            except Exception as ex:
+                self.logs.error(f'Erro ao fechar o cliente {nome}: {ex}')
+            setattr(self, nome, None)
+        if self.semantic_cache is not None:
+            self.semantic_cache.salvar()
+        for nome in ("shared_cache", "shared_contextos"):
+            if getattr(self, nome) is not None:
+                getattr(self, nome).close()
+                setattr(self, nome, None)
+        self.ai_middleware = None
+        self.token_cache = None
+        self.readiness = None
+
+    async def notificar_alteracao_contextos(self):
+        """
+        Invalida os contextos em memória de todos os workers após uma alteração (incrementa a versão dos contextos no Redis)
+        """
+        if self.context_cache is not None:
+            await self.context_cache.invalidar()
+            return
+        try:
+            await self.redis.get_conn().incr(CHAVE_VERSAO)
+        except Exception as ex:
+            self.logs.error(f'Erro ao incrementar a versão dos contextos no Redis: {ex}')
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas dos componentes compartilhados
+        :return: Dicionário com as métricas por componente
+        """
+        return {
+            "auth_token_cache": self.token_cache.metricas() if self.token_cache is not None else None,
+            "auth_client": self.auth_client.metricas() if self.auth_client is not None else None,
+            "context_cache": self.context_cache.metricas() if self.context_cache is not None else None,
+            "shared_cache": self.shared_cache.metricas() if self.shared_cache is not None else None,
+            "shared_cache_contextos": self.shared_contextos.metricas() if self.shared_contextos is not None else None,
+            "admission": self.admission.metricas() if self.admission is not None else None,
+            "rate_limit": self.rate_limiter.metricas() if self.rate_limiter is not None else None,
+            "response_cache": self.response_cache.metricas() if self.response_cache is not None else None,
+            "ai_middleware": self.ai_middleware.metricas() if self.ai_middleware is not None else None,
+            "readiness": self.readiness.metricas() if self.readiness is not None else None,
+            "uso": {"registro": self.usage_recorder.metricas(), "agregacao": self.usage_aggregator.metricas()} if self.usage_recorder is not None else None
+        }
@@ -4,18 +4,61 @@ Chatbot Banco de Preços - API RESTful
 # coding: utf-8
 
 import json
+import time
+from datetime import date, datetime, timezone
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from logger.logger import CustomLoggerMongoDB
-from config import Config
-from ai_middleware.ai_middleware import AIMiddleware
+from config import get_config
+from registry.registry import ClientRegistry
+from auth.auth_client import AuthClient, AuthIndisponivelError
+from auth.requisitor import identifica_requisitor
+from admission.admission import AdmissaoRejeitadaError
+from loguru import logger as logs
 import uvicorn
-import requests
 
-logs = CustomLoggerMongoDB().get_logger()
-config = Config().get_config()
-app = FastAPI(title=config.get("TITULO"), description=config.get("DESCRICAO_API"), version=config.get("API_VERSION"), openapi_url="/openapi_espec_tec.json", debug=config.get("DEBUG"), logger=logs, servers=[],
-              contact={"name": config.get("AUTOR"), "url": config.get("AUTOR_URL"), "email": config.get("AUTOR_EMAIL")}, terms_of_service="https://www.google.com.br",
+
+def aplica_configuracao(app: FastAPI, config: dict):
+    """
+    Aplica as configurações do env aos metadados da aplicação e às tags das rotas (documentação OpenAPI)
+    :param app: Aplicação FastAPI
+    :param config: Configurações do env
+    """
+    app.title = config.get("TITULO")
+    app.description = config.get("DESCRICAO_API")
+    app.version = config.get("API_VERSION")
+    app.contact = {"name": config.get("AUTOR"), "url": config.get("AUTOR_URL"), "email": config.get("AUTOR_EMAIL")}
+    app.debug = config.get("DEBUG")
+    for rota in app.routes:
+        if isinstance(rota, APIRoute):
+            rota.tags = [config.get("TITULO")]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida da aplicação: lê as configurações, cria o logger do MongoDB e os clientes compartilhados no início do worker
+    (depois do fork do uvicorn, nunca na importação do módulo) e os fecha no encerramento
+    """
+    config = get_config()
+    aplica_configuracao(app, config)
+    logger_mongo = CustomLoggerMongoDB()
+    app.state.logger_mongo = logger_mongo
+    registry = ClientRegistry(config=config, logs=logger_mongo.get_logger())
+    await registry.start()
+    app.state.registry = registry
+    try:
+        yield
+    finally:
+        await registry.close()
+        logger_mongo.flush()
+
+
+app = FastAPI(lifespan=lifespan, openapi_url="/openapi_espec_tec.json", logger=logs, servers=[], terms_of_service="https://www.google.com.br",
               license_info={"name": "MIT", "url": "https://opensource.org/licenses/MIT"})
 
 
@@ -28,6 +71,30 @@ class HealthCheck(BaseModel):
     port: int
 
 
+class DependenciaProntidao(BaseModel):
+    """
+    Classe de modelo para a verificação de uma dependência do worker
+    """
+    ok: bool
+    obrigatoria: bool
+    latencia_ms: float
+    erro: str | None = None
+    chaves: int | None = None
+    clientes: int | None = None
+    contextos: int | None = None
+    status: int | None = None
+    circuito: str | None = None
+
+
+class RetornoProntidao(BaseModel):
+    """
+    Classe de modelo para o retorno do endpoint de prontidão
+    """
+    pronto: bool
+    aquecido: bool
+    dependencias: dict[str, DependenciaProntidao]
+
+
 class GenericHTTPError(BaseModel):
     """
     Classe de modelo genérico para erros HTTP
@@ -51,95 +118,439 @@ class PayloadPadrao(BaseModel):
     comando: str
     texto: str = ""
     historico: str = ""
+    ignorar_cache: bool = False
 
 
-CUSTOM_RESPONSES = {400: {"content": {"application/json": {"example": {"detail": "string"}}}, "model": GenericHTTPError}, 401: {"content": {"application/json": {"example": {"detail": "string"}}}, "model": GenericHTTPError}}
+class PayloadLote(BaseModel):
+    """
+    Classe de modelo para o payload de preenchimento de vários campos em uma única requisição
+    """
+    itens: list[PayloadPadrao]
 
 
-def validar_token_api_auth(token: str) -> (bool, dict):
+class RetornoItemLote(BaseModel):
     """
-    Função para validar o token de autenticação
-    :param token: Token a ser validado
-    :return: True se o token for válido, False se não for
+    Classe de modelo para o retorno de cada campo do lote
     """
-    try:
-        # Validando se o token é uma string válida
-        if token is None or token == "":
-            return False, None
+    campo: str
+    sumario: str | None = None
+    texto: str | None = None
+    erro: str | None = None
+
+
+class RetornoLote(BaseModel):
+    """
+    Classe de modelo para o retorno do lote (na mesma ordem dos itens enviados)
+    """
+    itens: list[RetornoItemLote]
 
-        # Uri da solicitação
-        url = config.get("AUTH_TOKEN_URI")
 
-        # Montando o payload
-        payload = json.dumps({
-            "token": token
-        })
+class UsoDiario(BaseModel):
+    """
+    Classe de modelo para o consolidado de uso de um campo em um dia
+    """
+    dia: str
+    campo: str | None = None
+    tokens: int
+    requisicoes: int
+    cache_hits: int
 
-        # Montando o cabeçalho
-        headers = {
-            'Content-Type': 'application/json'
-        }
 
-        # Chamando a API de autenticação
-        response = requests.request("POST", url, headers=headers, data=payload)
+class RetornoUso(BaseModel):
+    """
+    Classe de modelo para o retorno do uso do requisitor no período
+    """
+    requisitor: str
+    inicio: str
+    fim: str
+    tokens: int
+    requisicoes: int
+    cache_hits: int
+    por_campo: dict[str, int]
+    por_dia: list[UsoDiario]
 
-        # Verificando o status da resposta
-        if response.status_code == 200:
-            response = json.loads(response.content)
-            if response.get("valid"):
-                return True, response.get("payload")
 
-        # Se o status não for 200 e/ou for inválido, retornar False e None
-        return False, None
+class ErroImportacao(BaseModel):
+    """
+    Classe de modelo para o erro de uma linha da importação de contextos
+    """
+    linha: int
+    field: str | None = None
+    erro: str
+
+
+class RetornoImportacao(BaseModel):
+    """
+    Classe de modelo para o relatório da importação de contextos
+    """
+    linhas: int
+    inseridos: int
+    atualizados: int
+    inalterados: int
+    com_erro: int
+    erros: list[ErroImportacao]
+
+
+CUSTOM_RESPONSES = {400: {"content": {"application/json": {"example": {"detail": "string"}}}, "model": GenericHTTPError}, 401: {"content": {"application/json": {"example": {"detail": "string"}}}, "model": GenericHTTPError}, 403: {"content": {"application/json": {"example": {"detail": "string"}}}, "model": GenericHTTPError}, 429: {"content": {"application/json": {"example": {"detail": "string"}}}, "model": GenericHTTPError}, 503: {"content": {"application/json": {"example": {"detail": "string"}}}, "model": GenericHTTPError}}
+
+
+async def validar_token_api_auth(token: str, auth_client: AuthClient) -> (bool, dict):
+    """
+    Função para validar o token de autenticação
+    :param token: Token a ser validado
+    :param auth_client: Cliente compartilhado do serviço de autenticação (pool de conexões, cache e circuit breaker)
+    :return: True se o token for válido, False se não for
+    :raises AuthIndisponivelError: Se o serviço de autenticação estiver indisponível
+    """
+    try:
+        return await auth_client.validar_token(token)
+    except AuthIndisponivelError as ex:
+        logs.error(f"Erro ao validar o token de autenticação: {ex}")
+        raise ex
     except Exception as ex:
         error = f"Erro ao validar o token de autenticação: {ex}"
         logs.error(error)
         return False, None
 
 
-@app.get("/health_check", tags=[config.get("TITULO")])
+async def autenticar_requisicao(request: Request) -> dict:
+    """
+    Lê o token do cabeçalho Authorization e o valida no serviço de autenticação
+    :param request: Requisição recebida
+    :return: Payload do requisitor retornado pelo serviço de autenticação
+    :raises HTTPException: 401 se o token for inválido e 503 se o serviço de autenticação estiver indisponível
+    """
+    token = request.headers.get("Authorization", "").replace("Bearer ", "").strip()
+    try:
+        valido, payload = await validar_token_api_auth(token=token, auth_client=request.app.state.registry.auth_client)
+    except AuthIndisponivelError:
+        raise HTTPException(status_code=503, detail="Serviço de autenticação indisponível.")
+    if not valido:
+        raise HTTPException(status_code=401, detail="Token inválido ou expirado.")
+    return payload
+
+
+def autorizar_admin_contextos(payload: dict) -> str:
+    """
+    Verifica se o requisitor pode importar e exportar os contextos (CONTEXTOS_ADMINS vazio permite qualquer requisitor autenticado)
+    :param payload: Payload do requisitor retornado pelo serviço de autenticação
+    :return: Identificador do requisitor
+    :raises HTTPException: 403 se o requisitor não estiver entre os administradores
+    """
+    requisitor = identifica_requisitor(payload)
+    admins = [admin.strip() for admin in get_config().get("CONTEXTOS_ADMINS").split(",") if admin.strip()]
+    if admins and requisitor not in admins:
+        raise HTTPException(status_code=403, detail="Requisitor sem permissão para gerenciar os contextos.")
+    return requisitor
+
+
+async def linhas_requisicao(request: Request):
+    """
+    Lê o corpo da requisição linha a linha, à medida que é recebido (sem carregar o arquivo inteiro em memória)
+    :param request: Requisição recebida
+    :return: Gerador assíncrono com as linhas decodificadas
+    """
+    restante = b""
+    async for trecho in request.stream():
+        restante += trecho
+        *linhas, restante = restante.split(b"\n")
+        for linha in linhas:
+            yield linha.decode("utf-8", errors="replace")
+    if restante:
+        yield restante.decode("utf-8", errors="replace")
+
+
+def registrar_uso(request: Request, requisitor: str, campo: str, tokens: int, endpoint: str, cache: bool = False):
+    """
+    Registra o evento estruturado de uso (gravado em segundo plano)
+    :param request: Requisição recebida
+    :param requisitor: Identificador do requisitor
+    :param campo: Campo inferido
+    :param tokens: Tokens consumidos
+    :param endpoint: Endpoint da requisição
+    :param cache: Se a resposta veio do cache
+    """
+    usage_recorder = request.app.state.registry.usage_recorder
+    if usage_recorder is not None:
+        usage_recorder.registrar(requisitor, campo, tokens, endpoint, cache)
+
+
+def erro_admissao(ex: AdmissaoRejeitadaError) -> HTTPException:
+    """
+    Converte a rejeição do controle de admissão para a resposta HTTP (429/503 com Retry-After)
+    :param ex: Rejeição do controle de admissão
+    :return: HTTPException correspondente
+    """
+    return HTTPException(status_code=ex.status_code, detail=ex.detail, headers={"Retry-After": str(ex.retry_after)})
+
+
+async def verificar_limite(request: Request, requisitor: str, custo: int = 1) -> dict:
+    """
+    Verifica o limite de requisições e tokens do requisitor
+    :param request: Requisição recebida
+    :param requisitor: Identificador do requisitor
+    :param custo: Quantidade de requisições contabilizadas
+    :return: Cabeçalhos de limite a serem enviados na resposta
+    :raises HTTPException: 429 com Retry-After se o limite do requisitor for excedido
+    """
+    limite = await request.app.state.registry.rate_limiter.verificar(requisitor, custo=custo)
+    if not limite.get("permitido"):
+        raise HTTPException(status_code=429, detail="Limite de requisições ou de tokens excedido.", headers={**limite.get("headers"), "Retry-After": str(limite.get("retry_after"))})
+    return limite.get("headers")
+
+
+def formata_evento_sse(evento: str, dados: dict) -> str:
+    """
+    Formata um evento no padrão Server-Sent Events
+    :param evento: Nome do evento
+    :param dados: Dados do evento (serializados em JSON)
+    :return: Evento formatado
+    """
+    return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+@app.get("/health_check")
 async def health_check() -> HealthCheck:
     """
     Endpoint de health check da API
     """
-    return HealthCheck(status="OK", host=config.get("HOST"), port=config.get("PORT"))
+    return HealthCheck(status="OK", host=get_config().get("HOST"), port=get_config().get("PORT"))
+
+
+@app.get("/ready", response_model_exclude_none=True, responses={503: {"model": RetornoProntidao, "description": "Worker não está pronto"}})
+async def ready(request: Request, response: Response) -> RetornoProntidao:
+    """
+    Endpoint de prontidão do worker: disponibilidade e latência de cada dependência (Redis, MongoDB, chaves da OpenAI,
+    serviço de autenticação e contextos). Retorna 503 enquanto alguma dependência obrigatória (READY_DEPENDENCIAS) não estiver disponível.
+    """
+    resultado = await request.app.state.registry.readiness.verificar()
+    if not resultado["pronto"]:
+        response.status_code = 503
+    return RetornoProntidao(**resultado)
 
 
-@app.post("/chatbot", tags=[config.get("TITULO")], responses=CUSTOM_RESPONSES)
-async def chatbot(body: PayloadPadrao, request: Request) -> RetornoPadrao:
+@app.get("/metrics")
+async def metrics(request: Request) -> dict:
+    """
+    Endpoint com as métricas internas do worker que atendeu a requisição
+    """
+    return {**request.app.state.registry.metricas(), "logs_mongodb": request.app.state.logger_mongo.metricas()}
+
+
+@app.post("/chatbot", responses=CUSTOM_RESPONSES)
+async def chatbot(body: PayloadPadrao, request: Request, response: Response) -> RetornoPadrao:
     """
     Recebe um comando do usuário, um texto se disponível do campo e o nome do campo para o qual se deseja fazer a inferência da resposta do chatbot
     """
     try:
         # Lendo o cabeçalho e validando o token
-        token = request.headers.get("Authorization", "").replace("Bearer ", "").strip()
-        valido, payload = validar_token_api_auth(token=token)
-        if not valido:
-            raise HTTPException(status_code=401, detail="Token inválido ou expirado.")
+        payload = await autenticar_requisicao(request)
+        registry = request.app.state.registry
 
         body_dict = body.model_dump()
 
-        ai_middleware = AIMiddleware(config=config, logs=logs)
+        requisitor = identifica_requisitor(payload)
+        response.headers.update(await verificar_limite(request, requisitor))
 
-        sumario, texto, tokens = ai_middleware.inferir_chatbot_from_context(body_dict)
+        detalhes = {"cache": False}
+        async with registry.admission.admitir(requisitor):
+            sumario, texto, tokens = await registry.ai_middleware.inferir_chatbot_from_context(body_dict, detalhes=detalhes)
 
-        # Logando consumo de tokens
+        # Logando e contabilizando consumo de tokens
         logs.success({"requisitor": payload, "tokens": tokens})
+        registrar_uso(request, requisitor, body.campo, tokens, "chatbot", detalhes["cache"])
+        await registry.rate_limiter.registrar_tokens(requisitor, tokens)
 
         return RetornoPadrao(sumario=sumario, texto=texto)
     except HTTPException as http_ex:
         raise http_ex
+    except AdmissaoRejeitadaError as ex:
+        raise erro_admissao(ex)
     except Exception as ex:
         mensagem = f"Erro ao processar a chamada: {body.model_dump()}. Error: {ex}"
         logs.error(mensagem)
         raise HTTPException(status_code=500, detail=mensagem)
 
 
+@app.post("/chatbot/batch", responses=CUSTOM_RESPONSES)
+async def chatbot_batch(body: PayloadLote, request: Request, response: Response) -> RetornoLote:
+    """
+    Recebe uma lista de campos (mesmo formato do /chatbot) e retorna o resultado de cada um, validando o token uma única vez
+    e executando as inferências concorrentemente. Erros de um campo são retornados no próprio item, sem interromper os demais.
+    """
+    try:
+        # Lendo o cabeçalho e validando o token
+        payload = await autenticar_requisicao(request)
+        registry = request.app.state.registry
+
+        if not body.itens:
+            raise HTTPException(status_code=400, detail="Nenhum item informado.")
+        if len(body.itens) > get_config().get("BATCH_MAX_ITENS"):
+            raise HTTPException(status_code=400, detail=f"Quantidade máxima de itens por lote: {get_config().get('BATCH_MAX_ITENS')}.")
+
+        requisitor = identifica_requisitor(payload)
+        response.headers.update(await verificar_limite(request, requisitor, custo=len(body.itens)))
+
+        resultados = await registry.ai_middleware.inferir_chatbot_lote([item.model_dump() for item in body.itens], admissao=lambda: registry.admission.admitir(requisitor))
+
+        # Logando consumo de tokens
+        for resultado in resultados:
+            if resultado.get("erro") is None:
+                logs.success({"requisitor": payload, "tokens": resultado.get("tokens")})
+                registrar_uso(request, requisitor, resultado.get("campo"), resultado.get("tokens"), "batch", resultado.get("cache"))
+            else:
+                logs.error(f"Erro ao processar o campo do lote: {resultado.get('campo')}. Error: {resultado.get('erro')}")
+        await registry.rate_limiter.registrar_tokens(requisitor, sum(resultado.get("tokens") or 0 for resultado in resultados))
+
+        return RetornoLote(itens=[RetornoItemLote(**resultado) for resultado in resultados])
+    except HTTPException as http_ex:
+        raise http_ex
+    except Exception as ex:
+        mensagem = f"Erro ao processar o lote: {body.model_dump()}. Error: {ex}"
+        logs.error(mensagem)
+        raise HTTPException(status_code=500, detail=mensagem)
+
+
+@app.post("/chatbot/stream", responses=CUSTOM_RESPONSES, response_class=StreamingResponse)
+async def chatbot_stream(body: PayloadPadrao, request: Request):
+    """
+    Versão em streaming (Server-Sent Events) do /chatbot: o texto do campo é enviado à medida que é gerado (eventos "texto")
+    e ao final são enviados o sumário, o texto completo e o total de tokens (evento "fim"). Em caso de erro é enviado o evento "erro".
+    """
+    # Lendo o cabeçalho e validando o token antes de iniciar o streaming
+    payload = await autenticar_requisicao(request)
+    registry = request.app.state.registry
+    body_dict = body.model_dump()
+
+    requisitor = identifica_requisitor(payload)
+    headers_limite = await verificar_limite(request, requisitor)
+
+    # A vaga de execução é adquirida antes do streaming para que a rejeição seja retornada como 429/503
+    try:
+        await registry.admission.adquirir(requisitor)
+    except AdmissaoRejeitadaError as ex:
+        raise erro_admissao(ex)
+    vaga = {"liberada": False, "inicio": time.monotonic()}
+
+    def liberar_vaga():
+        if not vaga["liberada"]:
+            vaga["liberada"] = True
+            registry.admission.liberar(time.monotonic() - vaga["inicio"])
+
+    async def eventos():
+        try:
+            async for evento in registry.ai_middleware.inferir_chatbot_from_context_stream(body_dict):
+                if evento.get("evento") == "fim":
+                    # Logando e contabilizando consumo de tokens
+                    logs.success({"requisitor": payload, "tokens": evento.get("tokens")})
+                    registrar_uso(request, requisitor, body.campo, evento.get("tokens"), "stream")
+                    await registry.rate_limiter.registrar_tokens(requisitor, evento.get("tokens"))
+                yield formata_evento_sse(evento.pop("evento"), evento)
+        except Exception as ex:
+            mensagem = f"Erro ao processar a chamada: {body_dict}. Error: {ex}"
+            logs.error(mensagem)
+            yield formata_evento_sse("erro", {"detail": mensagem})
+        finally:
+            liberar_vaga()
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **headers_limite}, background=BackgroundTask(liberar_vaga))
+
+
+@app.get("/usage", responses=CUSTOM_RESPONSES)
+async def usage(request: Request, inicio: date = None, fim: date = None, campo: str = None, requisitor: str = None) -> RetornoUso:
+    """
+    Retorna o consumo de tokens do requisitor por dia e por campo no período (padrão: mês atual), a partir dos consolidados diários.
+    Requisitores em USO_ADMINS podem consultar o uso de outro requisitor.
+    """
+    payload = await autenticar_requisicao(request)
+    registry = request.app.state.registry
+    if registry.usage_model is None:
+        raise HTTPException(status_code=503, detail="Registro de uso desativado.")
+
+    proprio = identifica_requisitor(payload)
+    admins = [admin.strip() for admin in get_config().get("USO_ADMINS").split(",") if admin.strip()]
+    if requisitor and requisitor != proprio and proprio not in admins:
+        raise HTTPException(status_code=403, detail="Requisitor sem permissão para consultar o uso de outro requisitor.")
+    requisitor = requisitor or proprio
+
+    hoje = datetime.now(timezone.utc).date()
+    inicio = inicio or hoje.replace(day=1)
+    fim = fim or hoje
+    if inicio > fim:
+        raise HTTPException(status_code=400, detail="A data inicial deve ser menor ou igual à data final.")
+
+    try:
+        consolidados = await registry.usage_model.get_usage(requisitor, inicio.isoformat(), fim.isoformat(), campo=campo)
+    except Exception as ex:
+        mensagem = f"Erro ao consultar o uso do requisitor {requisitor}. Error: {ex}"
+        logs.error(mensagem)
+        raise HTTPException(status_code=500, detail=mensagem)
+
+    por_campo = {}
+    for consolidado in consolidados:
+        por_campo[consolidado.get("campo")] = por_campo.get(consolidado.get("campo"), 0) + consolidado.get("tokens")
+
+    return RetornoUso(requisitor=requisitor, inicio=inicio.isoformat(), fim=fim.isoformat(), tokens=sum(item.get("tokens") for item in consolidados),
+                      requisicoes=sum(item.get("requisicoes") for item in consolidados), cache_hits=sum(item.get("cache_hits") for item in consolidados),
+                      por_campo=por_campo, por_dia=[UsoDiario(**consolidado) for consolidado in consolidados])
+
+
+@app.post("/contexts/import", responses=CUSTOM_RESPONSES)
+async def contexts_import(request: Request) -> RetornoImportacao:
+    """
+    Importa os contextos dos campos a partir de um JSONL no corpo da requisição (um objeto por linha com field, context,
+    soft_limit e hard_limit). Campos novos são inseridos e os existentes são atualizados, os erros são retornados por linha.
+    Limites ausentes na linha mantêm os valores do campo existente (0 em um campo novo).
+    """
+    try:
+        payload = await autenticar_requisicao(request)
+        requisitor = autorizar_admin_contextos(payload)
+        registry = request.app.state.registry
+
+        relatorio = await registry.context_model.importar_contextos(linhas_requisicao(request), tamanho_lote=get_config().get("CONTEXTOS_IMPORTACAO_LOTE"))
+        if relatorio.get("inseridos") or relatorio.get("atualizados"):
+            await registry.notificar_alteracao_contextos()
+
+        logs.success({"requisitor": payload, "importacao_contextos": {chave: valor for chave, valor in relatorio.items() if chave != "erros"}})
+        if relatorio.get("com_erro"):
+            logs.error(f"Importação de contextos com erros pelo requisitor {requisitor}: {relatorio.get('erros')[:10]}")
+
+        return RetornoImportacao(**relatorio)
+    except HTTPException as http_ex:
+        raise http_ex
+    except Exception as ex:
+        mensagem = f"Erro ao importar os contextos. Error: {ex}"
+        logs.error(mensagem)
+        raise HTTPException(status_code=500, detail=mensagem)
+
+
+@app.get("/contexts/export", responses=CUSTOM_RESPONSES, response_class=StreamingResponse)
+async def contexts_export(request: Request):
+    """
+    Exporta os contextos de todos os campos em JSONL (um objeto por linha, no mesmo formato aceito pela importação)
+    """
+    payload = await autenticar_requisicao(request)
+    autorizar_admin_contextos(payload)
+    registry = request.app.state.registry
+
+    async def linhas():
+        try:
+            async for context in registry.context_model.exportar_contextos():
+                yield json.dumps(context, ensure_ascii=False, default=str) + "\n"
+        except Exception as ex:
+            logs.error(f"Erro ao exportar os contextos. Error: {ex}")
+            raise ex
+
+    return StreamingResponse(linhas(), media_type="application/x-ndjson", headers={"Content-Disposition": 'attachment; filename="contexts.jsonl"'})
+
+
 if __name__ == "__main__":
     """
     Inicia a API RESTful com Uvicorn
     """
     try:
+        # Apenas no stdout: o logger do MongoDB é criado por worker no lifespan, depois do fork do uvicorn
+        config = get_config()
         logs.debug(f"Iniciando API - Especificação Técnica :: {config.get('TITULO')} - {config.get('DESCRICAO_API')} - {config.get('API_VERSION')}")
         uvicorn.run("rest_api:app", host=config.get("HOST"), port=config.get("PORT"), workers=config.get("WORKERS"), log_level=config.get("UVICORN_RUN_LOG_LEVEL"), use_colors=True)
     except Exception as ex:
@@ -0,0 +1,148 @@
+"""
+Política de novas tentativas das chamadas aos provedores de IA (classificação dos erros, backoff exponencial com jitter e prazo total)
+"""
+# coding: utf-8
+
+from key_scheduler.key_scheduler import ChavesIndisponiveisError
+from openai import APIConnectionError, APIStatusError
+import asyncio
+import random
+import time
+
+
+class TentativasEsgotadasError(Exception):
+    """
+    Exceção para quando as tentativas ou o prazo total da chamada se esgotam sem sucesso
+    """
+
+
+class Tentativas:
+    """
+    Controle das tentativas de uma chamada: quantidade de tentativas feitas e prazo total, contado a partir da criação
+    """
+    def __init__(self, politica):
+        """
+        :param politica: Política de novas tentativas
+        """
+        self.politica = politica
+        self.numero = 0
+        self.prazo = time.monotonic() + politica.prazo_total
+
+    def restante(self) -> float:
+        """
+        Tempo restante até o prazo total da chamada
+        :return: Tempo em segundos (0 se o prazo já passou)
+        """
+        return max(self.prazo - time.monotonic(), 0.0)
+
+    async def aguardar(self, ex: Exception):
+        """
+        Decide se a chamada que falhou deve ser refeita e aguarda o tempo de espera (sem bloquear o event loop)
+        :param ex: Erro da tentativa
+        :raises Exception: O próprio erro, se ele não for retentável
+        :raises TentativasEsgotadasError: Se as tentativas se esgotaram ou se a espera ultrapassaria o prazo total
+        """
+        self.numero += 1
+        retentavel, retry_after = self.politica.classifica(ex)
+        if not retentavel:
+            self.politica.estatisticas["nao_retentaveis"] += 1
+            raise ex
+        if self.numero >= self.politica.max_tentativas:
+            self.politica.estatisticas["esgotadas"] += 1
+            raise TentativasEsgotadasError('Erro ao enviar mensagem para o chat - Excedido o número de tentativas') from ex
+        espera = self.politica.espera(self.numero, retry_after)
+        if espera >= self.restante():
+            self.politica.estatisticas["prazo_excedido"] += 1
+            raise TentativasEsgotadasError(f'Erro ao enviar mensagem para o chat - Prazo total de {self.politica.prazo_total}s excedido') from ex
+        self.politica.estatisticas["novas_tentativas"] += 1
+        await asyncio.sleep(espera)
+
+
+class RetryPolicy:
+    """
+    Classe responsável por decidir quais erros das chamadas ao provedor são refeitos e quanto tempo aguardar entre as tentativas.
+    São refeitos os erros de conexão e timeout, 408, 409, 429, 5xx e os erros da chave (401 e 403, que tiram a chave do rodízio);
+    erros da requisição (demais 4xx) e de conversão da resposta não são refeitos. A espera é exponencial com jitter completo
+    (CHAT_GPT_BACKOFF_BASE até CHAT_GPT_BACKOFF_MAX), respeitando o Retry-After, e nenhuma espera ultrapassa o prazo total (CHAT_GPT_PRAZO_TOTAL).
+    Com o escalonador de chaves, a nova tentativa usa outra chave e o Retry-After de um 429 vale para a chave bloqueada: a espera só
+    é longa quando todas as chaves estão bloqueadas (ChavesIndisponiveisError); com todas as chaves saturadas (CHAVES_MAX_EM_VOO) a espera é o backoff.
+    """
+    STATUS_RETENTAVEIS = (401, 403, 408, 409, 429)
+
+    def __init__(self, config, logs, troca_chave: bool = True):
+        """
+        Inicializa a política
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param troca_chave: Se as novas tentativas usam outra chave (escalonador de chaves ativo)
+        """
+        self.logs = logs
+        self.max_tentativas = config.get("CHAT_GPT_RETRIES")
+        self.base = config.get("CHAT_GPT_BACKOFF_BASE")
+        self.maximo = config.get("CHAT_GPT_BACKOFF_MAX")
+        self.prazo_total = config.get("CHAT_GPT_PRAZO_TOTAL")
+        self.troca_chave = troca_chave
+        self.estatisticas = {"novas_tentativas": 0, "nao_retentaveis": 0, "esgotadas": 0, "prazo_excedido": 0}
+
+    def iniciar(self) -> Tentativas:
+        """
+        Inicia o controle das tentativas de uma chamada
+        :return: Controle das tentativas
+        """
+        return Tentativas(self)
+
+    @staticmethod
+    def retry_after(headers) -> float:
+        """
+        Tempo de espera sugerido pelo provedor (cabeçalhos retry-after-ms ou retry-after em segundos)
+        :param headers: Cabeçalhos da resposta de erro
+        :return: Tempo em segundos ou None se não informado
+        """
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers.get("retry-after-ms")) / 1000
+            if headers.get("retry-after"):
+                return float(headers.get("retry-after"))
+        except ValueError:
+            pass
+        return None
+
+    def classifica(self, ex: Exception) -> (bool, float):
+        """
+        Classifica o erro da tentativa
+        :param ex: Erro da tentativa
+        :return: Tupla (retentavel, retry_after em segundos ou None)
+        """
+        if isinstance(ex, ChavesIndisponiveisError):
+            # Chaves saturadas são liberadas ao fim das chamadas em andamento: a espera é o próprio backoff
+            if ex.saturadas:
+                return True, None
+            return ex.retry_after > 0, ex.retry_after
+        if isinstance(ex, APIStatusError):
+            retentavel = ex.status_code in self.STATUS_RETENTAVEIS or ex.status_code >= 500
+            if ex.status_code in (401, 403) and not self.troca_chave:
+                retentavel = False
+            # Com a troca de chave, o Retry-After de um 429 é tratado pelo bloqueio da chave no escalonador
+            retry_after = None if ex.status_code == 429 and self.troca_chave else self.retry_after(ex.response.headers)
+            return retentavel, retry_after
+        if isinstance(ex, (APIConnectionError, asyncio.TimeoutError, ConnectionError)):
+            return True, None
+        # Erros de conversão da resposta (JSON inválido) e demais erros se repetiriam em uma nova tentativa
+        return False, None
+
+    def espera(self, tentativa: int, retry_after: float = None) -> float:
+        """
+        Tempo de espera antes da nova tentativa: exponencial com jitter completo, no mínimo o Retry-After
+        :param tentativa: Número da tentativa que falhou (a partir de 1)
+        :param retry_after: Tempo de espera sugerido pelo provedor
+        :return: Tempo em segundos
+        """
+        espera = random.uniform(0, min(self.maximo, self.base * 2 ** (tentativa - 1)))
+        return max(espera, retry_after or 0.0)
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas da política
+        :return: Dicionário com as novas tentativas e os motivos de desistência
+        """
+        return dict(self.estatisticas)
@@ -0,0 +1,81 @@
+"""
+Testes da política de novas tentativas (classificação dos erros, backoff e prazo total)
+"""
+# coding: utf-8
+
+from loguru import logger
+from openai import APIConnectionError, APIStatusError
+from retry_policy.retry_policy import RetryPolicy, TentativasEsgotadasError
+from types import SimpleNamespace
+import asyncio
+import httpx
+import json
+import pytest
+
+CONFIG = {"CHAT_GPT_RETRIES": 3, "CHAT_GPT_BACKOFF_BASE": 0.5, "CHAT_GPT_BACKOFF_MAX": 4, "CHAT_GPT_PRAZO_TOTAL": 10}
+
+REQUISICAO = httpx.Request("POST", "https://api.openai.local/v1/chat/completions")
+
+
+def erro_status(status_code: int, headers: dict = None) -> APIStatusError:
+    return APIStatusError(f"Erro {status_code}", response=httpx.Response(status_code, headers=headers, request=REQUISICAO), body=None)
+
+
+@pytest.mark.parametrize("status_code, troca_chave, retentavel", [
+    (400, True, False), (404, True, False), (422, True, False),
+    (401, True, True), (403, True, True), (401, False, False), (403, False, False),
+    (408, True, True), (409, True, True), (429, True, True), (429, False, True), (500, True, True), (503, False, True),
+])
+def test_classificacao_por_status(status_code, troca_chave, retentavel):
+    assert RetryPolicy(CONFIG, logger, troca_chave=troca_chave).classifica(erro_status(status_code))[0] is retentavel
+
+
+@pytest.mark.parametrize("status_code, troca_chave, headers, retry_after", [
+    (503, True, {"retry-after": "2"}, 2.0),
+    (503, True, {"retry-after-ms": "1500", "retry-after": "9"}, 1.5),
+    (503, True, {"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"}, None),
+    (429, True, {"retry-after": "30"}, None),
+    (429, False, {"retry-after": "30"}, 30.0),
+])
+def test_retry_after_do_provedor(status_code, troca_chave, headers, retry_after):
+    assert RetryPolicy(CONFIG, logger, troca_chave=troca_chave).classifica(erro_status(status_code, headers)) == (True, retry_after)
+
+
+@pytest.mark.parametrize("erro, retentavel", [
+    (APIConnectionError(request=REQUISICAO), True),
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (json.JSONDecodeError("JSON inválido", "{", 0), False),
+    (ValueError("resposta vazia"), False),
+])
+def test_classificacao_dos_demais_erros(erro, retentavel):
+    assert RetryPolicy(CONFIG, logger).classifica(erro) == (retentavel, None)
+
+
+def test_espera_exponencial_limitada_e_no_minimo_o_retry_after(monkeypatch):
+    monkeypatch.setattr("retry_policy.retry_policy.random", SimpleNamespace(uniform=lambda inicio, fim: fim))
+    politica = RetryPolicy(CONFIG, logger)
+    assert [politica.espera(tentativa) for tentativa in range(1, 6)] == [0.5, 1.0, 2.0, 4, 4]
+    assert politica.espera(1, retry_after=3.0) == 3.0
+
+    monkeypatch.setattr("retry_policy.retry_policy.random", SimpleNamespace(uniform=lambda inicio, fim: inicio))
+    assert politica.espera(3) == 0.0
+
+
+@pytest.mark.anyio
+async def test_tentativas_esgotadas_nao_retentavel_e_prazo_total():
+    politica = RetryPolicy({**CONFIG, "CHAT_GPT_BACKOFF_BASE": 0.001, "CHAT_GPT_BACKOFF_MAX": 0.001}, logger)
+    tentativas = politica.iniciar()
+    await tentativas.aguardar(erro_status(500))
+    await tentativas.aguardar(erro_status(500))
+    with pytest.raises(TentativasEsgotadasError):
+        await tentativas.aguardar(erro_status(500))
+
+    erro = erro_status(400)
+    with pytest.raises(APIStatusError) as levantado:
+        await politica.iniciar().aguardar(erro)
+    assert levantado.value is erro
+
+    with pytest.raises(TentativasEsgotadasError, match="Prazo total"):
+        await politica.iniciar().aguardar(erro_status(503, {"retry-after": "60"}))
+    assert politica.metricas() == {"novas_tentativas": 2, "nao_retentaveis": 1, "esgotadas": 1, "prazo_excedido": 1}
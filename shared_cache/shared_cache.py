@@ -0,0 +1,201 @@
+"""
+Cache compartilhado entre os workers da API em memória compartilhada (arquivo mapeado com mmap, por padrão em /dev/shm)
+"""
+# coding: utf-8
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+MAGICO = b"BPSHMC01"
+# Cabeçalho do segmento: mágico, quantidade de slots, tamanho do slot
+CABECALHO = struct.Struct("<8sII")
+# Cabeçalho do slot: sequência (seqlock), hash da chave, expiração (epoch), tamanho do valor
+CABECALHO_SLOT = struct.Struct("<Q16sdI4x")
+SEQUENCIA = struct.Struct("<Q")
+
+
+class SharedMemoryCache:
+    """
+    Classe responsável por um segmento de memória compartilhada de tamanho fixo (SHARED_CACHE_SLOTS x SHARED_CACHE_TAMANHO_SLOT),
+    mapeado por todos os workers, para dados quentes e de leitura frequente (contextos dos campos e validações de token).
+    Cada uso pode ter o seu próprio segmento (ex.: "contextos"), dimensionado pela sua configuração, para que não disputem os mesmos slots.
+    A memória não cresce com a quantidade de workers e um valor gravado por um worker é lido pelos demais.
+    Os slots são organizados em conjuntos associativos de VIAS slots; ao encher, o slot expirado ou o que expira primeiro é substituído.
+    As leituras não usam lock (seqlock: a sequência do slot é ímpar durante a escrita e a leitura é refeita se a sequência mudar)
+    e as escritas são serializadas entre os processos por flock no próprio arquivo.
+    """
+    VIAS = 8
+    TENTATIVAS_LEITURA = 4
+
+    def __init__(self, config, logs, segmento: str = None):
+        """
+        Abre (ou cria) o segmento compartilhado
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param segmento: Nome do segmento (ex.: "contextos"): dimensionado por SHARED_CACHE_<SEGMENTO>_SLOTS e SHARED_CACHE_<SEGMENTO>_TAMANHO_SLOT,
+                         em um arquivo próprio (None utiliza o segmento padrão, SHARED_CACHE_SLOTS e SHARED_CACHE_TAMANHO_SLOT)
+        """
+        self.logs = logs
+        prefixo = "SHARED_CACHE_" if segmento is None else f"SHARED_CACHE_{segmento.upper()}_"
+        self.slots = max(self.VIAS, config.get(f"{prefixo}SLOTS") // self.VIAS * self.VIAS)
+        self.tamanho_slot = config.get(f"{prefixo}TAMANHO_SLOT")
+        self.capacidade_valor = self.tamanho_slot - CABECALHO_SLOT.size
+        self.tamanho = CABECALHO.size + self.slots * self.tamanho_slot
+        self.arquivo = config.get("SHARED_CACHE_ARQUIVO") or os.path.join(tempfile.gettempdir(), "chatbots_bp_shared_cache")
+        if segmento is not None:
+            self.arquivo = f"{self.arquivo}_{segmento}"
+        if not os.path.isdir(os.path.dirname(self.arquivo) or "."):
+            self.arquivo = os.path.join(tempfile.gettempdir(), os.path.basename(self.arquivo))
+        self.estatisticas = {"hits": 0, "misses": 0, "gravacoes": 0, "substituicoes": 0, "grandes_demais": 0, "leituras_concorrentes": 0}
+        self.fd = os.open(self.arquivo, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self.inicializa_segmento()
+            self.mm = mmap.mmap(self.fd, self.tamanho)
+        except Exception as ex:
+            os.close(self.fd)
+            self.logs.error(f'Erro ao abrir o cache compartilhado {self.arquivo}: {ex}')
+            raise ex
+
+    def inicializa_segmento(self):
+        """
+        Formata o arquivo se ele for novo ou tiver sido criado com outra configuração de slots (com lock exclusivo)
+        """
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            cabecalho = os.pread(self.fd, CABECALHO.size, 0)
+            esperado = CABECALHO.pack(MAGICO, self.slots, self.tamanho_slot)
+            if cabecalho != esperado or os.fstat(self.fd).st_size != self.tamanho:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, self.tamanho)
+                os.pwrite(self.fd, esperado, 0)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def hash_chave(chave: str) -> bytes:
+        """
+        Hash de 16 bytes da chave (nunca vazio, o hash nulo identifica o slot livre)
+        :param chave: Chave do valor
+        :return: Hash da chave
+        """
+        return hashlib.blake2b(chave.encode(), digest_size=16).digest()
+
+    def slots_conjunto(self, hash_chave: bytes) -> range:
+        """
+        Posições (offsets) dos slots do conjunto associativo da chave
+        :param hash_chave: Hash da chave
+        :return: Offsets dos slots
+        """
+        conjunto = int.from_bytes(hash_chave[:8], "little") % (self.slots // self.VIAS)
+        inicio = CABECALHO.size + conjunto * self.VIAS * self.tamanho_slot
+        return range(inicio, inicio + self.VIAS * self.tamanho_slot, self.tamanho_slot)
+
+    def le_slot(self, offset: int, hash_chave: bytes):
+        """
+        Lê um slot sem lock, refazendo a leitura se houver uma escrita concorrente (seqlock)
+        :param offset: Posição do slot
+        :param hash_chave: Hash da chave procurada
+        :return: Tupla (encontrado, valor): encontrado é False se o slot pertencer a outra chave, valor é None se estiver expirado
+        """
+        for _ in range(self.TENTATIVAS_LEITURA):
+            sequencia, hash_slot, expira, tamanho = CABECALHO_SLOT.unpack_from(self.mm, offset)
+            if sequencia & 1:
+                self.estatisticas["leituras_concorrentes"] += 1
+                continue
+            if hash_slot != hash_chave:
+                return False, None
+            inicio = offset + CABECALHO_SLOT.size
+            dados = self.mm[inicio:inicio + min(tamanho, self.capacidade_valor)]
+            if SEQUENCIA.unpack_from(self.mm, offset)[0] != sequencia:
+                self.estatisticas["leituras_concorrentes"] += 1
+                continue
+            if expira <= time.time():
+                return True, None
+            return True, dados
+        return False, None
+
+    def get(self, chave: str):
+        """
+        Busca um valor no segmento, sem lock
+        :param chave: Chave do valor
+        :return: Valor (desserializado do JSON) ou None se não existir ou estiver expirado
+        """
+        hash_chave = self.hash_chave(chave)
+        for offset in self.slots_conjunto(hash_chave):
+            encontrado, dados = self.le_slot(offset, hash_chave)
+            if not encontrado:
+                continue
+            if dados is not None:
+                self.estatisticas["hits"] += 1
+                return json.loads(zlib.decompress(dados))
+            break
+
+        self.estatisticas["misses"] += 1
+        return None
+
+    def set(self, chave: str, valor, ttl: float) -> bool:
+        """
+        Grava um valor no segmento (escritas serializadas entre os processos)
+        :param chave: Chave do valor
+        :param valor: Valor serializável em JSON
+        :param ttl: Tempo de vida em segundos
+        :return: True se o valor foi gravado (valores maiores que o slot não são gravados, com um aviso no log)
+        """
+        if ttl <= 0:
+            return False
+        dados = zlib.compress(json.dumps(valor, ensure_ascii=False, default=str).encode(), 1)
+        if len(dados) > self.capacidade_valor:
+            self.estatisticas["grandes_demais"] += 1
+            self.logs.warning(f'Valor grande demais para o cache compartilhado {self.arquivo}: {chave} com {len(dados)} bytes compactados '
+                              f'(máximo de {self.capacidade_valor} bytes por slot)')
+            return False
+
+        hash_chave = self.hash_chave(chave)
+        agora = time.time()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            # Mesmo slot da chave, se existir, senão o slot livre/expirado ou o que expira primeiro no conjunto
+            destino, expiracao_destino = None, None
+            for offset in self.slots_conjunto(hash_chave):
+                _, hash_slot, expira, _ = CABECALHO_SLOT.unpack_from(self.mm, offset)
+                if hash_slot == hash_chave:
+                    destino, expiracao_destino = offset, 0.0
+                    break
+                if destino is None or expira < expiracao_destino:
+                    destino, expiracao_destino = offset, expira
+            if expiracao_destino > agora:
+                self.estatisticas["substituicoes"] += 1
+
+            sequencia = SEQUENCIA.unpack_from(self.mm, destino)[0]
+            SEQUENCIA.pack_into(self.mm, destino, sequencia + 1)
+            self.mm[destino + CABECALHO_SLOT.size:destino + CABECALHO_SLOT.size + len(dados)] = dados
+            CABECALHO_SLOT.pack_into(self.mm, destino, sequencia + 1, hash_chave, agora + ttl, len(dados))
+            SEQUENCIA.pack_into(self.mm, destino, sequencia + 2)
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+        self.estatisticas["gravacoes"] += 1
+        return True
+
+    def close(self):
+        """
+        Desfaz o mapeamento do segmento (o arquivo é mantido para os demais workers)
+        """
+        self.mm.close()
+        os.close(self.fd)
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do cache compartilhado (contadores do worker atual)
+        :return: Dicionário com os contadores e o tamanho do segmento
+        """
+        consultas = self.estatisticas["hits"] + self.estatisticas["misses"]
+        return {**self.estatisticas, "taxa_acerto": round(self.estatisticas["hits"] / consultas, 4) if consultas else 0.0,
+                "slots": self.slots, "tamanho_slot": self.tamanho_slot, "tamanho_bytes": self.tamanho}
@@ -0,0 +1,126 @@
+"""
+Testes do cache em memória compartilhada entre os workers
+"""
+# coding: utf-8
+
+from loguru import logger
+from shared_cache.shared_cache import CABECALHO_SLOT, SEQUENCIA, SharedMemoryCache
+from types import SimpleNamespace
+import multiprocessing
+import os
+import pytest
+import time
+
+
+def cria_cache(arquivo, slots: int = 64, tamanho_slot: int = 256) -> SharedMemoryCache:
+    return SharedMemoryCache({"SHARED_CACHE_SLOTS": slots, "SHARED_CACHE_TAMANHO_SLOT": tamanho_slot, "SHARED_CACHE_ARQUIVO": str(arquivo)}, logger)
+
+
+@pytest.fixture
+def arquivo(tmp_path):
+    return tmp_path / "shm"
+
+
+class Relogio:
+    def __init__(self, monkeypatch):
+        self.agora = 1_700_000_000.0
+        monkeypatch.setattr("shared_cache.shared_cache.time", SimpleNamespace(time=lambda: self.agora))
+
+
+def test_valor_gravado_por_um_worker_e_lido_pelo_outro(arquivo):
+    worker_1, worker_2 = cria_cache(arquivo), cria_cache(arquivo)
+    assert worker_1.set("contexto:descricao", {"campo": "descricao", "limite": 100}, 60)
+    assert worker_2.get("contexto:descricao") == {"campo": "descricao", "limite": 100}
+    assert worker_2.get("contexto:outro") is None
+    assert worker_2.metricas()["hits"] == 1 and worker_2.metricas()["misses"] == 1
+    worker_1.close()
+    worker_2.close()
+
+
+def test_valores_expirados_e_grandes_demais(arquivo, monkeypatch):
+    relogio = Relogio(monkeypatch)
+    cache = cria_cache(arquivo)
+    cache.set("chave", "valor", 10)
+    relogio.agora += 10
+    assert cache.get("chave") is None
+    assert not cache.set("grande", os.urandom(300).hex(), 10)
+    assert cache.estatisticas["grandes_demais"] == 1
+    assert not cache.set("sem ttl", "valor", 0)
+    cache.close()
+
+
+def test_conjunto_cheio_substitui_o_slot_que_expira_primeiro(arquivo, monkeypatch):
+    Relogio(monkeypatch)
+    cache = cria_cache(arquivo, slots=SharedMemoryCache.VIAS)
+    for i in range(SharedMemoryCache.VIAS):
+        cache.set(f"chave {i}", i, 100 + i)
+    cache.set("chave 0", 0, 200)
+    cache.set("nova", "nova", 100)
+
+    assert cache.get("chave 1") is None
+    assert cache.get("nova") == "nova"
+    assert [cache.get(f"chave {i}") for i in (0, *range(2, SharedMemoryCache.VIAS))] == [0, *range(2, SharedMemoryCache.VIAS)]
+    assert cache.estatisticas["substituicoes"] == 1
+    cache.close()
+
+
+def test_leitura_durante_a_escrita_nao_retorna_o_valor_parcial(arquivo):
+    cache = cria_cache(arquivo)
+    cache.set("chave", {"valor": 1}, 60)
+    offset = next(offset for offset in cache.slots_conjunto(cache.hash_chave("chave"))
+                  if CABECALHO_SLOT.unpack_from(cache.mm, offset)[1] == cache.hash_chave("chave"))
+    sequencia = SEQUENCIA.unpack_from(cache.mm, offset)[0]
+
+    SEQUENCIA.pack_into(cache.mm, offset, sequencia + 1)
+    assert cache.get("chave") is None
+    assert cache.estatisticas["leituras_concorrentes"] == SharedMemoryCache.TENTATIVAS_LEITURA
+
+    SEQUENCIA.pack_into(cache.mm, offset, sequencia + 2)
+    assert cache.get("chave") == {"valor": 1}
+    cache.close()
+
+
+def test_configuracao_diferente_formata_o_segmento(arquivo):
+    antigo = cria_cache(arquivo, slots=16)
+    antigo.set("chave", "valor", 60)
+    antigo.close()
+    novo = cria_cache(arquivo, slots=32)
+    assert novo.get("chave") is None
+    assert novo.set("chave", "valor", 60) and novo.get("chave") == "valor"
+    novo.close()
+
+
+def test_segmento_nomeado_tem_configuracao_e_arquivo_proprios(arquivo):
+    config = {"SHARED_CACHE_SLOTS": 64, "SHARED_CACHE_TAMANHO_SLOT": 256, "SHARED_CACHE_CONTEXTOS_SLOTS": 16,
+              "SHARED_CACHE_CONTEXTOS_TAMANHO_SLOT": 4096, "SHARED_CACHE_ARQUIVO": str(arquivo)}
+    padrao, contextos = SharedMemoryCache(config, logger), SharedMemoryCache(config, logger, segmento="contextos")
+    assert contextos.arquivo == f"{arquivo}_contextos" and (contextos.slots, contextos.tamanho_slot) == (16, 4096)
+    valor = os.urandom(1000).hex()
+    assert contextos.set("chave", valor, 60) and not padrao.set("chave", valor, 60)
+    assert padrao.get("chave") is None and contextos.get("chave") == valor
+    padrao.close()
+    contextos.close()
+
+def escrever_continuamente(arquivo: str, limite: float):
+    cache = cria_cache(arquivo)
+    i = 0
+    while time.time() < limite:
+        i += 1
+        # Tamanhos diferentes a cada escrita: uma leitura misturada não passaria na descompressão ou na verificação
+        cache.set("quente", {"n": i, "eco": i, "dados": "x" * (i % 100)}, 60)
+    cache.close()
+
+
+def test_leituras_concorrentes_com_outro_processo_escrevendo(arquivo):
+    cache = cria_cache(arquivo)
+    processo = multiprocessing.get_context("fork").Process(target=escrever_continuamente, args=(str(arquivo), time.time() + 0.5))
+    processo.start()
+    lidos = 0
+    while processo.is_alive():
+        valor = cache.get("quente")
+        if valor is not None:
+            assert valor["n"] == valor["eco"] and valor["dados"] == "x" * (valor["n"] % 100)
+            lidos += 1
+    processo.join()
+    assert processo.exitcode == 0 and lidos > 0
+    cache.close()
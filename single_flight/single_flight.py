@@ -0,0 +1,191 @@
+"""
+Coalescência de chamadas concorrentes (single-flight)
+"""
+# coding: utf-8
+
+import asyncio
+import json
+import time
+import uuid
+
+
+class ExecucaoCompartilhadaError(Exception):
+    """
+    Exceção para quando a execução compartilhada falhou no dono do lock, em outro worker (repassada a quem aguardava o resultado)
+    """
+
+
+class SingleFlight:
+    """
+    Classe que garante que chamadas concorrentes com a mesma chave compartilhem uma única execução em andamento.
+    A primeira chamada executa a função e as demais aguardam o mesmo resultado (ou a mesma exceção).
+    """
+    def __init__(self):
+        """
+        Inicializa o controle das execuções em andamento
+        """
+        self.em_andamento = {}
+        self.estatisticas = {"execucoes": 0, "compartilhadas": 0}
+
+    async def executar(self, chave: str, funcao):
+        """
+        Executa a função uma única vez para as chamadas concorrentes com a mesma chave
+        :param chave: Chave que identifica chamadas equivalentes
+        :param funcao: Função sem parâmetros que retorna a coroutine a ser executada
+        :return: Resultado da função
+        """
+        tarefa = self.em_andamento.get(chave)
+        if tarefa is not None:
+            self.estatisticas["compartilhadas"] += 1
+        else:
+            self.estatisticas["execucoes"] += 1
+            tarefa = asyncio.ensure_future(funcao())
+            self.em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self.finalizar(chave, t))
+
+        # O shield impede que o cancelamento de quem aguarda cancele a execução compartilhada
+        return await asyncio.shield(tarefa)
+
+    def finalizar(self, chave: str, tarefa: asyncio.Future):
+        """
+        Remove a execução finalizada do controle
+        :param chave: Chave da execução
+        :param tarefa: Tarefa finalizada
+        """
+        if self.em_andamento.get(chave) is tarefa:
+            del self.em_andamento[chave]
+
+        # Marca a exceção como consumida caso todos que aguardavam tenham sido cancelados
+        if not tarefa.cancelled():
+            tarefa.exception()
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas de coalescência
+        :return: Dicionário com o total de execuções, chamadas compartilhadas e execuções em andamento
+        """
+        return {**self.estatisticas, "em_andamento": len(self.em_andamento)}
+
+
+# KEYS: [1] chave do lock; ARGV: [1] identificador do dono do lock
+SCRIPT_LIBERAR_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS: [1] chave do lock; ARGV: [1] identificador do dono do lock, [2] nova expiração (ms)
+SCRIPT_RENOVAR_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisSingleFlight:
+    """
+    Classe que estende a coalescência entre os workers através do Redis: quem obtém o lock (SET NX com expiração) executa a função
+    e publica o resultado em uma chave de vida curta, os demais aguardam esse resultado. Se a função lançar uma exceção, a falha é
+    publicada por SINGLE_FLIGHT_ERRO_TTL segundos e quem aguarda recebe um ExecucaoCompartilhadaError, em vez de todos repetirem a
+    chamada que acabou de falhar. Se o dono do lock for encerrado sem publicar nada ou o lock expirar, quem estava aguardando executa
+    a função por conta própria. O resultado precisa ser serializável em JSON.
+    """
+    PREFIXO = "single_flight:"
+
+    def __init__(self, config, logs, redis):
+        """
+        Inicializa a coalescência entre os workers
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado
+        """
+        self.logs = logs
+        self.conn = redis.get_conn()
+        self.lock_ttl = config.get("SINGLE_FLIGHT_LOCK_TTL")
+        self.resultado_ttl = config.get("SINGLE_FLIGHT_RESULTADO_TTL")
+        self.erro_ttl = config.get("SINGLE_FLIGHT_ERRO_TTL")
+        self.intervalo = config.get("SINGLE_FLIGHT_INTERVALO")
+        self.script_liberar_lock = self.conn.register_script(SCRIPT_LIBERAR_LOCK)
+        self.estatisticas = {"execucoes": 0, "compartilhadas": 0, "assumidas": 0, "falhas_compartilhadas": 0, "falhas_redis": 0}
+
+    async def executar(self, chave: str, funcao):
+        """
+        Executa a função uma única vez entre os workers para as chamadas concorrentes com a mesma chave
+        :param chave: Chave que identifica chamadas equivalentes
+        :param funcao: Função sem parâmetros que retorna a coroutine a ser executada
+        :return: Resultado da função
+        :raises ExecucaoCompartilhadaError: Se a execução do dono do lock, em outro worker, falhou
+        """
+        chave_lock = f"{self.PREFIXO}{chave}:lock"
+        chave_resultado = f"{self.PREFIXO}{chave}:resultado"
+        dono = uuid.uuid4().hex
+
+        try:
+            adquiriu = await self.conn.set(chave_lock, dono, nx=True, ex=self.lock_ttl)
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao obter o lock de coalescência no Redis: {ex}')
+            return await funcao()
+
+        if adquiriu:
+            self.estatisticas["execucoes"] += 1
+            try:
+                try:
+                    resultado = await funcao()
+                except Exception as ex:
+                    await self.publicar(chave_resultado, {"erro": f"{type(ex).__name__}: {ex}"}, self.erro_ttl)
+                    raise ex
+                await self.publicar(chave_resultado, {"resultado": resultado}, self.resultado_ttl)
+                return resultado
+            finally:
+                try:
+                    await self.script_liberar_lock(keys=[chave_lock], args=[dono])
+                except Exception as ex:
+                    self.logs.error(f'Erro ao liberar o lock de coalescência no Redis: {ex}')
+
+        # Aguardando o resultado publicado pelo dono do lock
+        limite = time.monotonic() + self.lock_ttl
+        try:
+            while time.monotonic() < limite:
+                publicado = await self.conn.get(chave_resultado)
+                if publicado is not None:
+                    publicado = json.loads(publicado)
+                    if "erro" in publicado:
+                        self.estatisticas["falhas_compartilhadas"] += 1
+                        raise ExecucaoCompartilhadaError(publicado["erro"])
+                    self.estatisticas["compartilhadas"] += 1
+                    return publicado["resultado"]
+                if not await self.conn.exists(chave_lock):
+                    break
+                await asyncio.sleep(self.intervalo)
+        except ExecucaoCompartilhadaError:
+            raise
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao aguardar o resultado da coalescência no Redis: {ex}')
+
+        # O dono do lock foi encerrado sem publicar o resultado
+        self.estatisticas["assumidas"] += 1
+        return await funcao()
+
+    async def publicar(self, chave_resultado: str, publicado: dict, ttl: int):
+        """
+        Publica o resultado ou a falha da execução para quem aguarda (a falha do Redis não afeta o retorno do dono do lock)
+        :param chave_resultado: Chave do resultado
+        :param publicado: Dicionário {"resultado": ...} ou {"erro": mensagem}
+        :param ttl: Tempo de vida em segundos
+        """
+        try:
+            await self.conn.set(chave_resultado, json.dumps(publicado), ex=ttl)
+        except Exception as ex:
+            self.estatisticas["falhas_redis"] += 1
+            self.logs.error(f'Erro ao publicar o resultado da coalescência no Redis: {ex}')
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas de coalescência entre os workers
+        :return: Dicionário com as execuções, resultados e falhas compartilhados e execuções assumidas após o encerramento do dono do lock
+        """
+        return dict(self.estatisticas)
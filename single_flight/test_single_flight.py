@@ -0,0 +1,139 @@
+"""
+Testes da coalescência de chamadas no worker e entre os workers (Redis simulado pelo fakeredis)
+"""
+# coding: utf-8
+
+from loguru import logger
+from single_flight.single_flight import ExecucaoCompartilhadaError, RedisSingleFlight, SingleFlight
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"SINGLE_FLIGHT_LOCK_TTL": 5, "SINGLE_FLIGHT_RESULTADO_TTL": 5, "SINGLE_FLIGHT_ERRO_TTL": 1, "SINGLE_FLIGHT_INTERVALO": 0.01}
+
+
+class Funcao:
+    """
+    Função simulada que conta as execuções e só termina quando liberada
+    """
+    def __init__(self, resultado=None, erro: Exception = None):
+        self.resultado = resultado
+        self.erro = erro
+        self.execucoes = 0
+        self.liberada = asyncio.Event()
+
+    async def __call__(self):
+        self.execucoes += 1
+        await self.liberada.wait()
+        if self.erro is not None:
+            raise self.erro
+        return self.resultado
+
+
+async def test_chamadas_concorrentes_compartilham_a_execucao():
+    single_flight = SingleFlight()
+    funcao = Funcao(resultado=["resposta", 10])
+    chamadas = [asyncio.create_task(single_flight.executar("chave", funcao)) for _ in range(3)]
+    await asyncio.sleep(0)
+    funcao.liberada.set()
+    assert await asyncio.gather(*chamadas) == [["resposta", 10]] * 3
+    assert funcao.execucoes == 1
+    assert single_flight.metricas() == {"execucoes": 1, "compartilhadas": 2, "em_andamento": 0}
+
+
+async def test_cancelar_quem_aguarda_nao_cancela_a_execucao_compartilhada():
+    single_flight = SingleFlight()
+    funcao = Funcao(resultado="resposta")
+    cancelada = asyncio.create_task(single_flight.executar("chave", funcao))
+    await asyncio.sleep(0)
+    seguinte = asyncio.create_task(single_flight.executar("chave", funcao))
+    await asyncio.sleep(0)
+    cancelada.cancel()
+    funcao.liberada.set()
+    assert await seguinte == "resposta"
+    assert funcao.execucoes == 1
+
+
+async def test_excecao_e_entregue_a_todos_e_a_chave_e_liberada():
+    single_flight = SingleFlight()
+    funcao = Funcao(erro=ValueError("falha"))
+    chamadas = [asyncio.create_task(single_flight.executar("chave", funcao)) for _ in range(2)]
+    await asyncio.sleep(0)
+    funcao.liberada.set()
+    resultados = await asyncio.gather(*chamadas, return_exceptions=True)
+    assert all(isinstance(resultado, ValueError) for resultado in resultados)
+    assert single_flight.metricas()["em_andamento"] == 0
+
+
+async def test_resultado_publicado_pelo_dono_do_lock_e_compartilhado_entre_workers(redis):
+    worker_1, worker_2 = RedisSingleFlight(CONFIG, logger, redis), RedisSingleFlight(CONFIG, logger, redis)
+    funcao_1, funcao_2 = Funcao(resultado=["resposta", 10]), Funcao(resultado=["outra", 20])
+    dono = asyncio.create_task(worker_1.executar("chave", funcao_1))
+    await asyncio.sleep(0.01)
+    aguardando = asyncio.create_task(worker_2.executar("chave", funcao_2))
+    await asyncio.sleep(0.02)
+    funcao_1.liberada.set()
+
+    assert await dono == ["resposta", 10]
+    assert await aguardando == ["resposta", 10]
+    assert funcao_2.execucoes == 0
+    assert worker_2.metricas()["compartilhadas"] == 1
+    assert not await redis.get_conn().exists("single_flight:chave:lock")
+
+
+async def test_falha_do_dono_do_lock_e_repassada_a_quem_aguarda(redis):
+    workers = [RedisSingleFlight(CONFIG, logger, redis) for _ in range(3)]
+    funcoes = [Funcao(erro=RuntimeError("falha no dono")), Funcao(resultado="repetida"), Funcao(resultado="repetida")]
+    for funcao in funcoes[1:]:
+        funcao.liberada.set()
+    dono = asyncio.create_task(workers[0].executar("chave", funcoes[0]))
+    await asyncio.sleep(0.01)
+    aguardando = [asyncio.create_task(worker.executar("chave", funcao)) for worker, funcao in zip(workers[1:], funcoes[1:])]
+    await asyncio.sleep(0.02)
+    funcoes[0].liberada.set()
+
+    with pytest.raises(RuntimeError):
+        await dono
+    for tarefa in aguardando:
+        with pytest.raises(ExecucaoCompartilhadaError, match="RuntimeError: falha no dono"):
+            await tarefa
+    assert [funcao.execucoes for funcao in funcoes[1:]] == [0, 0]
+    assert workers[1].metricas()["falhas_compartilhadas"] == 1 and workers[1].metricas()["assumidas"] == 0
+
+    # A falha é publicada por pouco tempo (SINGLE_FLIGHT_ERRO_TTL) e só para quem aguardava: uma nova chamada executa a função
+    assert 0 < await redis.get_conn().ttl("single_flight:chave:resultado") <= CONFIG["SINGLE_FLIGHT_ERRO_TTL"]
+    assert await workers[1].executar("chave", funcoes[1]) == "repetida"
+
+
+async def test_lock_abandonado_expira_e_quem_aguarda_assume(redis):
+    await redis.get_conn().set("single_flight:chave:lock", "worker encerrado", px=100)
+    worker = RedisSingleFlight(CONFIG, logger, redis)
+    funcao = Funcao(resultado="assumida")
+    funcao.liberada.set()
+    assert await asyncio.wait_for(worker.executar("chave", funcao), timeout=2) == "assumida"
+    assert worker.metricas()["assumidas"] == 1
+
+
+async def test_lock_de_outro_dono_nao_e_liberado(redis):
+    worker = RedisSingleFlight(CONFIG, logger, redis)
+
+    async def lock_expira_e_outro_worker_o_obtem():
+        await redis.get_conn().set("single_flight:chave:lock", "outro worker")
+        return "resposta"
+
+    assert await worker.executar("chave", lock_expira_e_outro_worker_o_obtem) == "resposta"
+    assert await redis.get_conn().get("single_flight:chave:lock") == b"outro worker"
+
+
+async def test_falha_do_redis_executa_localmente(redis):
+    worker = RedisSingleFlight(CONFIG, logger, redis)
+
+    async def falhar(*args, **kwargs):
+        raise ConnectionError("Redis indisponível")
+
+    worker.conn.set = falhar
+    funcao = Funcao(resultado="local")
+    funcao.liberada.set()
+    assert await worker.executar("chave", funcao) == "local"
+    assert worker.metricas()["falhas_redis"] == 1
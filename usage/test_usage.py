@@ -0,0 +1,85 @@
+"""
+Testes do registro dos eventos de uso e do job de agregação
+"""
+# coding: utf-8
+
+from datetime import datetime, timedelta, timezone
+from loguru import logger
+from models.usage_model import UsageModel
+from usage.usage import UsageAggregator, UsageRecorder
+import asyncio
+import pytest
+import threading
+
+pytestmark = pytest.mark.anyio
+
+CONFIG = {"USO_LOTE": 10, "USO_INTERVALO": 0.01, "USO_FILA_MAX": 10, "USO_AGREGACAO_INTERVALO": 60, "USO_AGREGACAO_ATRASO": 30,
+          "USO_AGREGACAO_DIAS_RECALCULO": 1}
+
+
+class UsageModelFake:
+    def __init__(self, checkpoint: datetime = None, duracao: float = 0.0):
+        self.checkpoint = checkpoint
+        self.duracao = duracao
+        self.janelas = []
+        self.eventos = []
+        self.liberar = threading.Event()
+
+    async def insert_eventos(self, eventos: list) -> int:
+        self.eventos.extend(eventos)
+        return len(eventos)
+
+    def get_checkpoint(self):
+        return self.checkpoint
+
+    def agregar(self, inicio, fim):
+        self.liberar.wait(self.duracao)
+        self.janelas.append((inicio, fim))
+
+
+async def test_somente_respostas_do_cache_contam_como_cache_hit():
+    model = UsageModelFake()
+    recorder = UsageRecorder(CONFIG, logger, usage_model=model)
+    recorder.registrar("req", "descricao", 120, "chatbot")
+    recorder.registrar("req", "descricao", 0, "chatbot", cache=True)
+    # Chamada idêntica compartilhada (coalescência): sem tokens, mas não veio do cache
+    recorder.registrar("req", "descricao", 0, "batch")
+    await recorder.close()
+    assert [(evento["tokens"], evento["cache"]) for evento in model.eventos] == [(120, False), (0, True), (0, False)]
+
+
+def test_pipeline_recalcula_dias_inteiros_e_substitui_os_consolidados():
+    pipeline = UsageModel(logger).pipeline(datetime(2024, 5, 10, 13, 45), datetime(2024, 5, 11, 8, 0))
+    assert pipeline[0] == {"$match": {"t": {"$gte": datetime(2024, 5, 10), "$lt": datetime(2024, 5, 11, 8, 0)}}}
+    assert pipeline[-1]["$merge"]["whenMatched"] == "replace"
+    assert UsageModel(logger).pipeline(None, datetime(2024, 5, 11))[0] == {"$match": {"t": {"$lt": datetime(2024, 5, 11)}}}
+
+
+@pytest.mark.parametrize("atraso_checkpoint, recalculo", [(None, None), (timedelta(minutes=1), timedelta(days=1)), (timedelta(days=5), timedelta(days=5))])
+async def test_janela_recalculada_inclui_os_dias_anteriores(redis, atraso_checkpoint, recalculo):
+    agregador = UsageAggregator(CONFIG, logger, redis=redis)
+    agora = datetime.now(timezone.utc).replace(tzinfo=None)
+    agregador.usage_model = UsageModelFake(checkpoint=None if atraso_checkpoint is None else agora - atraso_checkpoint)
+    fim = agregador.agregar_sincrono()
+    inicio, _ = agregador.usage_model.janelas[0]
+    if recalculo is None:
+        assert inicio is None
+    else:
+        assert abs((fim - inicio) - recalculo) < timedelta(minutes=2)
+
+
+async def test_lock_e_renovado_durante_agregacoes_longas(redis):
+    agregador, concorrente = UsageAggregator(CONFIG, logger, redis=redis), UsageAggregator(CONFIG, logger, redis=redis)
+    agregador.lock_ttl = 0.3
+    agregador.usage_model = UsageModelFake(duracao=5)
+    concorrente.usage_model = UsageModelFake()
+
+    execucao = asyncio.create_task(agregador.agregar())
+    await asyncio.sleep(0.7)
+    assert await redis.get_conn().exists(UsageAggregator.CHAVE_LOCK)
+    assert not await concorrente.agregar()
+    agregador.usage_model.liberar.set()
+    assert await execucao
+    assert not await redis.get_conn().exists(UsageAggregator.CHAVE_LOCK)
+    assert await concorrente.agregar()
+    assert agregador.estatisticas["locks_perdidos"] == 0
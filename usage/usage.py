@@ -0,0 +1,222 @@
+"""
+Registro dos eventos de consumo de tokens e job de agregação incremental dos consolidados de uso
+"""
+# coding: utf-8
+
+from models.usage_model import UsageModel, AsyncUsageModel
+from redis_adapter.async_redis_adapter import AsyncRedisAdapter
+from single_flight.single_flight import SCRIPT_LIBERAR_LOCK, SCRIPT_RENOVAR_LOCK
+from datetime import datetime, timedelta, timezone
+import asyncio
+import uuid
+
+
+class UsageRecorder:
+    """
+    Classe responsável por registrar os eventos estruturados de uso (requisitor, campo, tokens, endpoint e acerto de cache)
+    sem adicionar latência às requisições: os eventos vão para uma fila limitada (USO_FILA_MAX, descartando quando cheia)
+    e uma tarefa em segundo plano os grava em lote (USO_LOTE eventos ou a cada USO_INTERVALO segundos).
+    """
+    def __init__(self, config, logs, usage_model: AsyncUsageModel):
+        """
+        Inicializa a fila e a tarefa de gravação
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param usage_model: Modelo de uso utilizado na gravação
+        """
+        self.logs = logs
+        self.usage_model = usage_model
+        self.lote = config.get("USO_LOTE")
+        self.intervalo = config.get("USO_INTERVALO")
+        self.fila = asyncio.Queue(maxsize=config.get("USO_FILA_MAX"))
+        self.estatisticas = {"registrados": 0, "gravados": 0, "descartados": 0, "falhas": 0}
+        self.tarefa = asyncio.create_task(self.executar())
+
+    def registrar(self, requisitor: str, campo: str, tokens: int, endpoint: str, cache: bool = False):
+        """
+        Registra um evento de uso (nunca bloqueia nem lança exceção)
+        :param requisitor: Identificador do requisitor
+        :param campo: Campo inferido
+        :param tokens: Tokens consumidos (0 quando a resposta veio do cache ou de uma chamada idêntica compartilhada)
+        :param endpoint: Endpoint da requisição (chatbot, batch ou stream)
+        :param cache: Se a resposta veio do cache de respostas ou do cache semântico
+        """
+        evento = {"t": datetime.now(timezone.utc).replace(tzinfo=None), "m": {"requisitor": requisitor, "campo": campo},
+                  "tokens": int(tokens or 0), "cache": bool(cache), "endpoint": endpoint}
+        try:
+            self.fila.put_nowait(evento)
+            self.estatisticas["registrados"] += 1
+        except asyncio.QueueFull:
+            self.estatisticas["descartados"] += 1
+
+    async def retira_lote(self) -> list:
+        """
+        Aguarda o primeiro evento e retira os demais disponíveis até o tamanho do lote ou o fim do intervalo
+        :return: Lista de eventos
+        """
+        eventos = [await self.fila.get()]
+        limite = asyncio.get_running_loop().time() + self.intervalo
+        while len(eventos) < self.lote:
+            restante = limite - asyncio.get_running_loop().time()
+            if restante <= 0:
+                break
+            try:
+                eventos.append(await asyncio.wait_for(self.fila.get(), timeout=restante))
+            except asyncio.TimeoutError:
+                break
+        return eventos
+
+    async def gravar(self, eventos: list):
+        """
+        Grava um lote de eventos (em caso de falha o lote é descartado)
+        :param eventos: Eventos a serem gravados
+        """
+        if not eventos:
+            return
+        try:
+            gravados = await self.usage_model.insert_eventos(eventos)
+            self.estatisticas["gravados"] += gravados
+            self.estatisticas["descartados"] += len(eventos) - gravados
+        except Exception as ex:
+            self.estatisticas["falhas"] += 1
+            self.estatisticas["descartados"] += len(eventos)
+            self.logs.error(f'Erro ao gravar os eventos de uso: {ex}')
+
+    async def executar(self):
+        """
+        Laço da tarefa de gravação
+        """
+        while True:
+            await self.gravar(await self.retira_lote())
+
+    async def close(self):
+        """
+        Encerra a tarefa de gravação e grava os eventos pendentes
+        """
+        self.tarefa.cancel()
+        await asyncio.gather(self.tarefa, return_exceptions=True)
+        eventos = []
+        while not self.fila.empty():
+            eventos.append(self.fila.get_nowait())
+        for inicio in range(0, len(eventos), self.lote):
+            await self.gravar(eventos[inicio:inicio + self.lote])
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do registro de uso
+        :return: Dicionário com os contadores e o tamanho atual da fila
+        """
+        return {**self.estatisticas, "fila": self.fila.qsize()}
+
+
+class UsageAggregator:
+    """
+    Classe responsável pelo job de agregação incremental: a cada USO_AGREGACAO_INTERVALO segundos um único worker (lock no Redis,
+    renovado durante a execução) recalcula os consolidados diários dos eventos até agora menos USO_AGREGACAO_ATRASO segundos
+    (margem para os eventos ainda na fila de gravação dos workers). São recalculados os dias desde o último checkpoint e os
+    USO_AGREGACAO_DIAS_RECALCULO dias anteriores, para que os eventos gravados com atraso também sejam contados.
+    """
+    CHAVE_LOCK = "uso:agregacao:lock"
+
+    def __init__(self, config, logs, redis: AsyncRedisAdapter):
+        """
+        Inicializa o job (a agregação é executada em uma thread, com o cliente síncrono do MongoDB)
+        :param config: Objeto de configuração
+        :param logs: Objeto de log
+        :param redis: Adaptador do Redis compartilhado
+        """
+        self.logs = logs
+        self.redis = redis
+        self.intervalo = config.get("USO_AGREGACAO_INTERVALO")
+        self.atraso = config.get("USO_AGREGACAO_ATRASO")
+        self.dias_recalculo = config.get("USO_AGREGACAO_DIAS_RECALCULO")
+        self.lock_ttl = max(self.intervalo, 60)
+        self.usage_model = None
+        self.tarefa = None
+        self.script_liberar_lock = redis.get_conn().register_script(SCRIPT_LIBERAR_LOCK)
+        self.script_renovar_lock = redis.get_conn().register_script(SCRIPT_RENOVAR_LOCK)
+        self.estatisticas = {"execucoes": 0, "falhas": 0, "locks_perdidos": 0, "ultimo_checkpoint": None}
+
+    def iniciar(self):
+        """
+        Inicia a execução periódica do job
+        """
+        self.tarefa = asyncio.create_task(self.executar())
+
+    def agregar_sincrono(self):
+        """
+        Prepara as collections (na primeira execução) e agrega a janela pendente
+        :return: Fim da janela agregada
+        """
+        if self.usage_model is None:
+            usage_model = UsageModel(self.logs)
+            usage_model.preparar_collections()
+            self.usage_model = usage_model
+        fim = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.atraso)
+        checkpoint = self.usage_model.get_checkpoint()
+        inicio = None if checkpoint is None else min(checkpoint, fim - timedelta(days=self.dias_recalculo))
+        self.usage_model.agregar(inicio, fim)
+        return fim
+
+    async def renovar_lock(self, dono: str):
+        """
+        Renova o lock da agregação enquanto ela estiver em execução (a cada terço da expiração)
+        :param dono: Identificador do dono do lock
+        """
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                if not await self.script_renovar_lock(keys=[self.CHAVE_LOCK], args=[dono, int(self.lock_ttl * 1000)]):
+                    # Outro worker pode executar a mesma janela: a agregação é idempotente, apenas o trabalho é repetido
+                    self.estatisticas["locks_perdidos"] += 1
+                    self.logs.warning('Lock da agregação de uso perdido durante a execução')
+                    return
+            except Exception as ex:
+                self.logs.error(f'Erro ao renovar o lock da agregação de uso no Redis: {ex}')
+
+    async def agregar(self):
+        """
+        Executa uma agregação se nenhum outro worker estiver executando
+        :return: True se a agregação foi executada
+        """
+        dono = uuid.uuid4().hex
+        if not await self.redis.get_conn().set(self.CHAVE_LOCK, dono, nx=True, px=int(self.lock_ttl * 1000)):
+            return False
+        renovacao = asyncio.create_task(self.renovar_lock(dono))
+        try:
+            self.estatisticas["ultimo_checkpoint"] = (await asyncio.to_thread(self.agregar_sincrono)).isoformat()
+            self.estatisticas["execucoes"] += 1
+            return True
+        finally:
+            renovacao.cancel()
+            await asyncio.gather(renovacao, return_exceptions=True)
+            await self.script_liberar_lock(keys=[self.CHAVE_LOCK], args=[dono])
+
+    async def executar(self):
+        """
+        Laço do job de agregação
+        """
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.agregar()
+            except Exception as ex:
+                self.estatisticas["falhas"] += 1
+                self.logs.error(f'Erro no job de agregação de uso: {ex}')
+
+    async def close(self):
+        """
+        Encerra o job de agregação
+        """
+        if self.tarefa is not None:
+            self.tarefa.cancel()
+            await asyncio.gather(self.tarefa, return_exceptions=True)
+        if self.usage_model is not None:
+            self.usage_model.close_connection()
+
+    def metricas(self) -> dict:
+        """
+        Retorna as métricas do job de agregação (do worker atual)
+        :return: Dicionário com as execuções, falhas e o último checkpoint
+        """
+        return dict(self.estatisticas)